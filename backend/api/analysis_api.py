@@ -1,9 +1,24 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
+import asyncio
+import json
+import os
+
+from services.ai_service import ServiceOverloaded
+from services.llm_router import LLMUnavailable
+from services.telemetry import log_error
 
 router = APIRouter()
 
+# How often to check whether the client is still connected during an LLM call
+DISCONNECT_POLL_SECONDS = 0.5
+
+# Default fan-out for batch analysis (capped by the AI service concurrency)
+BATCH_CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", "4"))
+BATCH_OVERLOAD_RETRIES = 3
+
 class PlayAnalysisRequest(BaseModel):
     play_name: str
     formation: str
@@ -17,6 +32,106 @@ class GeneratePlayRequest(BaseModel):
 class CounterPlayRequest(BaseModel):
     defensive_scheme: str
 
+class BatchAnalysisRequest(BaseModel):
+    playbook_id: Optional[str] = None
+    play_ids: List[str] = []
+    concurrency: Optional[int] = None
+
+class AnalysisAdjustments(BaseModel):
+    vsMan: str = ""
+    vsZone: str = ""
+    vsBlitz: str = ""
+
+class PlayAnalysis(BaseModel):
+    whenToCall: List[str] = []
+    bestAgainst: List[str] = []
+    strengths: List[str] = []
+    weaknesses: List[str] = []
+    coachingPoints: List[str] = []
+    qbProgression: List[str] = []
+    adjustments: AnalysisAdjustments = AnalysisAdjustments()
+    redZone: str = ""
+    keyMatchups: List[str] = []
+
+class GeneratedPlay(BaseModel):
+    name: str
+    formation: str = ""
+    personnel: str = "11"
+    concept: str = ""
+    players: List[Dict] = []
+    routes: List[Dict] = []
+    blocking: Optional[Dict] = None
+    description: str = ""
+    coachingNotes: str = ""
+
+async def _run_cancellable(request: Request, coro):
+    """
+    Await an AI call, cancelling it if the client goes away before it finishes
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                task.cancel()
+                raise HTTPException(status_code=499, detail="Client disconnected")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def _event_stream(events, validate):
+    """
+    Turn AIService stream events into a Server-Sent Events response.
+    The first event is pulled before responding so overload still maps to 503.
+    """
+    try:
+        first = await events.__anext__()
+    except (ServiceOverloaded, LLMUnavailable) as e:
+        raise _overloaded(e)
+    except StopAsyncIteration:
+        first = None
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    async def body():
+        event = first
+        try:
+            while event is not None:
+                if event[0] == "field":
+                    yield _sse("field", {"key": event[1], "value": event[2]})
+                else:
+                    yield _sse("done", validate(event[1]))
+                try:
+                    event = await events.__anext__()
+                except StopAsyncIteration:
+                    event = None
+        except Exception as e:
+            log_error(f"Streaming Error: {str(e)}")
+            yield _sse("error", {"detail": str(e)})
+        finally:
+            await events.aclose()
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _overloaded(e) -> HTTPException:
+    """
+    503 with Retry-After for a shed call (ServiceOverloaded) or when no LLM provider is up (LLMUnavailable)
+    """
+    return HTTPException(
+        status_code=503,
+        detail=str(e),
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
 @router.post("/analyze")
 async def analyze_play(request: Request, play_data: PlayAnalysisRequest):
     """
@@ -24,17 +139,37 @@ async def analyze_play(request: Request, play_data: PlayAnalysisRequest):
     """
     try:
         ai_service = request.app.state.ai_service
-        analysis = await ai_service.analyze_play(
+        analysis = await _run_cancellable(request, ai_service.analyze_play(
             play_name=play_data.play_name,
             formation=play_data.formation,
             personnel=play_data.personnel,
             routes=play_data.routes,
             concept=play_data.concept
-        )
+        ))
         return {"success": True, "analysis": analysis}
+    except HTTPException:
+        raise
+    except (ServiceOverloaded, LLMUnavailable) as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/analyze/stream")
+async def analyze_play_stream(request: Request, play_data: PlayAnalysisRequest):
+    """
+    Stream a play analysis as Server-Sent Events: one `field` event per
+    top-level field as soon as it is parsed, then a validated `done` payload
+    """
+    ai_service = request.app.state.ai_service
+    events = ai_service.stream_analysis(
+        play_name=play_data.play_name,
+        formation=play_data.formation,
+        personnel=play_data.personnel,
+        routes=play_data.routes,
+        concept=play_data.concept
+    )
+    return await _event_stream(events, lambda a: PlayAnalysis(**a).dict())
+
 @router.post("/generate")
 async def generate_play(request: Request, play_request: GeneratePlayRequest):
     """
@@ -42,11 +177,26 @@ async def generate_play(request: Request, play_request: GeneratePlayRequest):
     """
     try:
         ai_service = request.app.state.ai_service
-        play = await ai_service.generate_play_from_description(play_request.description)
+        play = await _run_cancellable(
+            request, ai_service.generate_play_from_description(play_request.description)
+        )
         return {"success": True, "play": play}
+    except HTTPException:
+        raise
+    except (ServiceOverloaded, LLMUnavailable) as e:
+        raise _overloaded(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/generate/stream")
+async def generate_play_stream(request: Request, play_request: GeneratePlayRequest):
+    """
+    Stream a generated play as Server-Sent Events (see /analyze/stream)
+    """
+    ai_service = request.app.state.ai_service
+    events = ai_service.stream_generation(play_request.description)
+    return await _event_stream(events, lambda p: GeneratedPlay(**p).dict())
+
 @router.post("/suggest-counters")
 async def suggest_counter_plays(request: Request, counter_request: CounterPlayRequest):
     """
@@ -54,7 +204,101 @@ async def suggest_counter_plays(request: Request, counter_request: CounterPlayRe
     """
     try:
         ai_service = request.app.state.ai_service
-        suggestions = await ai_service.suggest_counter_plays(counter_request.defensive_scheme)
+        suggestions = await _run_cancellable(
+            request, ai_service.suggest_counter_plays(counter_request.defensive_scheme)
+        )
         return {"success": True, "suggestions": suggestions}
+    except HTTPException:
+        raise
+    except (ServiceOverloaded, LLMUnavailable) as e:
+        raise _overloaded(e)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+async def _analyze_stored_play(ai_service, play_id: str, stored: Optional[Dict]) -> Dict:
+    """
+    Analyze one saved play for a batch, reporting failures instead of raising
+    """
+    if stored is None:
+        return {"play_id": play_id, "success": False, "error": "Play not found"}
+
+    play = stored["play"]
+    for attempt in range(BATCH_OVERLOAD_RETRIES + 1):
+        try:
+            analysis = await ai_service.analyze_play(
+                play_name=play["name"],
+                formation=play["formation"],
+                personnel=play.get("personnel", "11"),
+                routes=play.get("routes", []),
+                concept=play.get("concept")
+            )
+            return {"play_id": play_id, "success": True, "analysis": analysis}
+        except (ServiceOverloaded, LLMUnavailable) as e:
+            if attempt == BATCH_OVERLOAD_RETRIES:
+                return {"play_id": play_id, "success": False, "error": str(e)}
+            await asyncio.sleep(e.retry_after * (attempt + 1) / 2)
+        except Exception as e:
+            return {"play_id": play_id, "success": False, "error": str(e)}
+
+@router.post("/batch")
+async def analyze_batch(request: Request, batch: BatchAnalysisRequest):
+    """
+    Analyze every play in a playbook (or a list of play ids) with bounded
+    parallelism, streaming one NDJSON line per play as it finishes and a
+    final summary line. Failed plays are reported without aborting the batch.
+    """
+    store = request.app.state.play_store
+    play_ids = list(batch.play_ids)
+    if batch.playbook_id:
+        playbook = store.get_playbook(batch.playbook_id)
+        if playbook is None:
+            raise HTTPException(status_code=404, detail="Playbook not found")
+        play_ids += playbook["plays"]
+    play_ids = list(dict.fromkeys(play_ids))
+    if not play_ids:
+        raise HTTPException(status_code=400, detail="No plays to analyze")
+    plays = store.get_plays(play_ids)
+
+    ai_service = request.app.state.ai_service
+    concurrency = max(1, min(batch.concurrency or BATCH_CONCURRENCY, ai_service.max_concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(play_id: str) -> Dict:
+        async with semaphore:
+            return await _analyze_stored_play(ai_service, play_id, plays.get(play_id))
+
+    async def body():
+        tasks = [asyncio.ensure_future(run(play_id)) for play_id in play_ids]
+        succeeded = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                result = await next_result
+                succeeded += result["success"]
+                yield json.dumps(result) + "\n"
+            yield json.dumps({"summary": {
+                "total": len(play_ids),
+                "succeeded": succeeded,
+                "failed": len(play_ids) - succeeded,
+                "concurrency": concurrency
+            }}) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def analysis_cache_stats(request: Request):
+    """
+    Hit/miss/eviction counters for the analysis cache
+    """
+    ai_service = request.app.state.ai_service
+    return {"success": True, "cache": ai_service.cache.stats(), "llm": ai_service.stats()}
+
+@router.post("/cache/invalidate")
+async def invalidate_analysis_cache(request: Request):
+    """
+    Drop all cached analyses (e.g. after changing prompt templates)
+    """
+    removed = await request.app.state.cluster.invalidate_analysis_cache()
+    return {"success": True, "removed": removed}
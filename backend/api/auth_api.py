@@ -1,9 +1,6 @@
 from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
-from typing import Optional
-import os
-from datetime import datetime, timedelta
-import secrets
+from typing import Dict, Optional
 
 router = APIRouter()
 
@@ -24,133 +21,124 @@ class UserProfile(BaseModel):
     role: str
     subscription: str = "free"  # free, pro, enterprise
 
-# In-memory storage for demo (will move to Supabase)
-users_storage = {}
-sessions_storage = {}
+def _public_user(user: Dict) -> Dict:
+    return {
+        "id": user["id"],
+        "email": user["email"],
+        "name": user["name"],
+        "team": user["team"],
+        "role": user["role"],
+        "subscription": user.get("subscription", "free")
+    }
 
 @router.post("/signup")
-async def signup(signup_data: SignupRequest):
+async def signup(request: Request, signup_data: SignupRequest):
     """
     Create a new user account
     """
-    if signup_data.email in users_storage:
+    auth_store = request.app.state.auth_store
+    user = await auth_store.create_user(
+        signup_data.email,
+        signup_data.password,
+        signup_data.name,
+        team=signup_data.team,
+        role=signup_data.role
+    )
+    if user is None:
         raise HTTPException(status_code=400, detail="User already exists")
     
-    user_id = f"user_{datetime.now().timestamp()}"
-    users_storage[signup_data.email] = {
-        "id": user_id,
-        "email": signup_data.email,
-        "password": signup_data.password,  # In production, hash this!
-        "name": signup_data.name,
-        "team": signup_data.team,
-        "role": signup_data.role,
-        "created_at": datetime.now().isoformat()
-    }
-    
-    # Create session
-    session_token = secrets.token_urlsafe(32)
-    sessions_storage[session_token] = {
-        "user_id": user_id,
-        "email": signup_data.email,
-        "expires_at": (datetime.now() + timedelta(days=7)).isoformat()
-    }
+    session_token = await auth_store.create_session(user)
     
     return {
         "success": True,
-        "user_id": user_id,
+        "user_id": user["id"],
         "session_token": session_token,
         "user": {
-            "email": signup_data.email,
-            "name": signup_data.name,
-            "team": signup_data.team,
-            "role": signup_data.role
+            "email": user["email"],
+            "name": user["name"],
+            "team": user["team"],
+            "role": user["role"],
+            "subscription": user.get("subscription", "free")
         }
     }
 
 @router.post("/login")
-async def login(login_data: LoginRequest):
+async def login(request: Request, login_data: LoginRequest):
     """
     Login user
     """
-    if login_data.email not in users_storage:
+    auth_store = request.app.state.auth_store
+    user = await auth_store.authenticate(login_data.email, login_data.password)
+    if user is None:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
-    user = users_storage[login_data.email]
-    if user["password"] != login_data.password:  # In production, verify hashed password
-        raise HTTPException(status_code=401, detail="Invalid credentials")
-    
-    # Create session
-    session_token = secrets.token_urlsafe(32)
-    sessions_storage[session_token] = {
-        "user_id": user["id"],
-        "email": user["email"],
-        "expires_at": (datetime.now() + timedelta(days=7)).isoformat()
-    }
+    session_token = await auth_store.create_session(user)
     
     return {
         "success": True,
         "session_token": session_token,
-        "user": {
-            "id": user["id"],
-            "email": user["email"],
-            "name": user["name"],
-            "team": user["team"],
-            "role": user["role"]
-        }
+        "user": _public_user(user)
     }
 
 @router.post("/logout")
-async def logout(session_token: str):
+async def logout(request: Request, session_token: str):
     """
     Logout user
     """
-    if session_token in sessions_storage:
-        del sessions_storage[session_token]
+    await request.app.state.auth_store.delete_session(session_token)
     
     return {"success": True, "message": "Logged out successfully"}
 
 @router.get("/profile")
-async def get_profile(session_token: str):
+async def get_profile(request: Request, session_token: str):
     """
     Get user profile
     """
-    if session_token not in sessions_storage:
+    auth_store = request.app.state.auth_store
+    session = await auth_store.get_session(session_token)
+    if session is None:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    session = sessions_storage[session_token]
+    user = await auth_store.get_user(session["user_id"])
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    # Find user by email
-    for email, user in users_storage.items():
-        if user["id"] == session["user_id"]:
-            return {
-                "success": True,
-                "user": {
-                    "id": user["id"],
-                    "email": user["email"],
-                    "name": user["name"],
-                    "team": user["team"],
-                    "role": user["role"]
-                }
-            }
-    
-    raise HTTPException(status_code=404, detail="User not found")
+    return {"success": True, "user": _public_user(user)}
 
 @router.put("/profile")
-async def update_profile(session_token: str, profile: UserProfile):
+async def update_profile(request: Request, session_token: str, profile: UserProfile):
     """
     Update user profile
     """
-    if session_token not in sessions_storage:
+    auth_store = request.app.state.auth_store
+    session = await auth_store.get_session(session_token)
+    if session is None:
         raise HTTPException(status_code=401, detail="Invalid session")
     
-    session = sessions_storage[session_token]
+    # subscription is set by billing, not by the user
+    user = await auth_store.update_user(
+        session["user_id"],
+        {"name": profile.name, "team": profile.team, "role": profile.role}
+    )
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return {"success": True, "message": "Profile updated"}
+
+@router.get("/usage")
+async def get_usage(request: Request, session_token: str):
+    """
+    Today's AI token usage against the plan's daily budget
+    """
+    auth_store = request.app.state.auth_store
+    session = await auth_store.get_session(session_token)
+    if session is None:
+        raise HTTPException(status_code=401, detail="Invalid session")
     
-    # Update user
-    for email, user in users_storage.items():
-        if user["id"] == session["user_id"]:
-            user["name"] = profile.name
-            user["team"] = profile.team
-            user["role"] = profile.role
-            return {"success": True, "message": "Profile updated"}
+    user = await auth_store.get_user(session["user_id"])
+    if user is None:
+        raise HTTPException(status_code=404, detail="User not found")
     
-    raise HTTPException(status_code=404, detail="User not found")
\ No newline at end of file
+    limiter = request.app.state.limiter
+    principal = limiter.principal(user["id"], user.get("subscription"))
+    return {"success": True, "usage": await limiter.usage(principal)}
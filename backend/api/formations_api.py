@@ -0,0 +1,83 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from typing import List, Dict, Optional
+import asyncio
+
+from services.formation_rules import validate_batch, validate_formation
+
+router = APIRouter()
+
+class FormationPositions(BaseModel):
+    positions: Dict[str, Dict]  # {playerId: {x, y, onLOS, eligible}}
+
+class ValidateBatchRequest(BaseModel):
+    # Plain dicts ({"positions": {...}}) so large imports skip per-player model parsing
+    formations: List[Dict]
+
+class CustomFormation(BaseModel):
+    name: str
+    personnel: str
+    category: str
+    description: Optional[str] = None
+    positions: Dict[str, Dict]
+    tags: List[str] = []
+    is_public: bool = False
+    formation_id: Optional[str] = None  # set to update an existing formation
+
+@router.post("/validate")
+async def validate(formation: FormationPositions):
+    """
+    Check one formation against the NFL alignment rules
+    """
+    return {"success": True, **validate_formation(formation.positions)}
+
+@router.post("/validate-batch")
+async def validate_many(body: ValidateBatchRequest):
+    """
+    Check many formations in one vectorized pass; results are in request order
+    """
+    positions = []
+    for i, formation in enumerate(body.formations):
+        if not isinstance(formation.get("positions"), dict):
+            raise HTTPException(status_code=422, detail=f"formations[{i}] is missing positions")
+        positions.append(formation["positions"])
+    results = await asyncio.to_thread(validate_batch, positions)
+    valid_count = sum(1 for r in results if r["valid"])
+    # Results are plain JSON types already, so skip the per-item response encoding pass
+    return JSONResponse({
+        "success": True,
+        "count": len(results),
+        "valid_count": valid_count,
+        "invalid_count": len(results) - valid_count,
+        "results": results
+    })
+
+@router.get("/")
+async def get_custom_formations(request: Request, validated: Optional[bool] = None):
+    """
+    Get custom formations, optionally only the ones that pass (or fail) validation
+    """
+    return {"success": True, "formations": request.app.state.play_store.list_formations(validated)}
+
+@router.get("/{formation_id}")
+async def get_custom_formation(request: Request, formation_id: str):
+    formation = request.app.state.play_store.get_formation(formation_id)
+    if formation is None:
+        raise HTTPException(status_code=404, detail="Formation not found")
+    return {"success": True, "formation": formation}
+
+@router.post("/save")
+async def save_custom_formation(request: Request, formation: CustomFormation):
+    """
+    Save a custom formation. It is validated on the way in, so is_validated
+    always reflects the current positions.
+    """
+    validation = validate_formation(formation.positions)
+    record = formation.dict()
+    record["id"] = record.pop("formation_id")
+    record["is_validated"] = validation["valid"]
+    record["violations"] = validation["violations"]
+    record["warnings"] = validation["warnings"]
+    formation_id = request.app.state.play_store.save_formations([record])[0]
+    return {"success": True, "formation_id": formation_id, **validation}
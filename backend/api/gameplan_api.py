@@ -0,0 +1,218 @@
+from fastapi import APIRouter, HTTPException, Query, Request
+from pydantic import BaseModel
+from typing import List, Dict, Optional
+from datetime import date
+import asyncio
+
+from services.call_sheet import SECTION_KEYS, CallSheetOptimizer
+from services.outcome_analytics import ROLLUP_LEVELS
+from services.recommender import coverage_mix
+
+router = APIRouter()
+
+class PlayOutcome(BaseModel):
+    play_id: str
+    game_date: date
+    result: str  # touchdown, first_down, incomplete, etc.
+    yards_gained: Optional[int] = None
+    opponent: Optional[str] = None
+    defensive_front: Optional[str] = None
+    coverage: Optional[str] = None
+    # Game situation; defaults to the play's situational data when omitted
+    down: Optional[int] = None
+    distance: Optional[int] = None
+    field_position: Optional[str] = None
+    hash: Optional[str] = None
+    notes: Optional[str] = None
+
+class LogOutcomesRequest(BaseModel):
+    outcomes: List[PlayOutcome]
+
+class OpponentTendencies(BaseModel):
+    opponent_name: str
+    defensive_fronts: Dict[str, float] = {}  # {"4-3": 0.45, "nickel": 0.20}
+    coverages: Dict[str, float] = {}  # {"cover_1": 0.25, "cover_2": 0.30}
+    blitz_rate: Optional[float] = None
+    situational_tendencies: Dict[str, Dict] = {}  # {"3rd_and_long": {"blitz_rate": 0.65, "coverage": {...}}}
+
+class RecommendRequest(BaseModel):
+    down: Optional[int] = None
+    distance: Optional[int] = None
+    field_position: Optional[str] = None
+    hash: Optional[str] = None
+    opponent: Optional[str] = None
+    coverages: Optional[Dict[str, float]] = None  # ad-hoc mix instead of a stored opponent
+    category: Optional[str] = "offense"
+    limit: int = 20
+
+@router.post("/outcomes")
+async def log_outcomes(request: Request, body: LogOutcomesRequest):
+    """
+    Log play results from a game and fold them into the analytics rollups
+    and the recommender
+    """
+    store = request.app.state.play_store
+    plays = store.get_plays(list({o.play_id for o in body.outcomes}))
+    missing = sorted({o.play_id for o in body.outcomes} - set(plays))
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Unknown plays: {', '.join(missing)}")
+
+    rows = []
+    for outcome in body.outcomes:
+        row = outcome.dict()
+        row["game_date"] = outcome.game_date.isoformat()
+        play = plays[outcome.play_id]["play"]
+        for field in ("down", "distance", "field_position", "hash"):
+            if row[field] is None:
+                row[field] = play.get(field)
+        rows.append(row)
+
+    stored = request.app.state.analytics.log_outcomes(rows, plays)
+    request.app.state.cluster.outcomes_logged(stored)
+    return {"success": True, "outcome_ids": [row["id"] for row in stored]}
+
+@router.get("/opponents")
+async def get_opponents(request: Request):
+    """
+    Get scouting tendencies for every opponent
+    """
+    return {"success": True, "opponents": request.app.state.play_store.list_opponents()}
+
+@router.post("/opponents")
+async def save_opponent(request: Request, tendencies: OpponentTendencies):
+    """
+    Create or replace an opponent's tendencies
+    """
+    request.app.state.play_store.save_opponent(tendencies.dict())
+    return {"success": True, "opponent_name": tendencies.opponent_name}
+
+@router.get("/opponents/{opponent_name}")
+async def get_opponent(request: Request, opponent_name: str):
+    opponent = request.app.state.play_store.get_opponent(opponent_name)
+    if opponent is None:
+        raise HTTPException(status_code=404, detail="Opponent not found")
+    return {"success": True, "opponent": opponent}
+
+@router.post("/recommend")
+async def recommend_plays(request: Request, body: RecommendRequest):
+    """
+    Rank the play library by expected success against the opponent's coverage
+    mix for this down, distance and field position
+    """
+    if body.coverages:
+        mix = coverage_mix({"coverages": body.coverages})
+    elif body.opponent:
+        opponent = request.app.state.play_store.get_opponent(body.opponent)
+        if opponent is None:
+            raise HTTPException(status_code=404, detail="Opponent not found")
+        mix = coverage_mix(opponent, body.down, body.distance, body.field_position)
+    else:
+        mix = {}
+
+    plays = request.app.state.recommender.recommend(
+        mix,
+        down=body.down,
+        distance=body.distance,
+        field_position=body.field_position,
+        hash=body.hash,
+        category=body.category,
+        limit=max(1, min(body.limit, 200))
+    )
+    return {"success": True, "coverage_mix": mix, "plays": plays}
+
+class CallSheetRequest(BaseModel):
+    opponent: Optional[str] = None
+    coverages: Optional[Dict[str, float]] = None  # ad-hoc mix instead of a stored opponent
+    sections: Optional[List[str]] = None  # default: every section
+    sizes: Dict[str, int] = {}  # {"openers": 20}
+    max_plays: int = 60
+    max_sections_per_play: int = 3
+    min_personnel: int = 2
+    max_formation_share: float = 0.5
+    break_tendencies: Dict[str, str] = {}  # {"Pistol Ace": "run"} -> put a pass from Pistol Ace on the sheet
+    category: Optional[str] = "offense"
+    save: bool = False  # also store each section as a play sheet
+
+@router.post("/call-sheet")
+async def build_call_sheet(request: Request, body: CallSheetRequest):
+    """
+    Build a whole call sheet against an opponent in one pass: openers,
+    down-and-distance, red zone, goal line, 2-minute and backed-up sections
+    """
+    unknown = sorted(set(body.sections or []) - set(SECTION_KEYS)) + sorted(set(body.sizes) - set(SECTION_KEYS))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown sections: {', '.join(unknown)}")
+    bad = sorted(f for f, kind in body.break_tendencies.items() if kind not in ("run", "pass"))
+    if bad:
+        raise HTTPException(status_code=400, detail=f"Tendencies must be 'run' or 'pass': {', '.join(bad)}")
+
+    opponent = None
+    if body.opponent and not body.coverages:
+        opponent = request.app.state.play_store.get_opponent(body.opponent)
+        if opponent is None:
+            raise HTTPException(status_code=404, detail="Opponent not found")
+
+    sheet = CallSheetOptimizer(request.app.state.recommender).build(
+        opponent=opponent,
+        coverages=body.coverages,
+        sections=body.sections,
+        sizes={key: max(0, min(size, 50)) for key, size in body.sizes.items()},
+        max_plays=max(1, min(body.max_plays, 500)),
+        max_sections_per_play=max(1, body.max_sections_per_play),
+        min_personnel=max(1, body.min_personnel),
+        max_formation_share=min(1.0, max(0.05, body.max_formation_share)),
+        break_tendencies=body.break_tendencies,
+        category=body.category
+    )
+
+    if body.save:
+        store = request.app.state.play_store
+        title = body.opponent or "Call Sheet"
+        for section in sheet["sections"]:
+            section["sheet_id"] = store.create_sheet({
+                "name": f"{title} - {section['label']}",
+                "situation": section["label"],
+                "play_ids": [play["id"] for play in section["plays"]]
+            })
+    return {"success": True, "opponent": body.opponent, **sheet}
+
+def _check_level(level: str):
+    if level not in ROLLUP_LEVELS:
+        raise HTTPException(status_code=404, detail=f"Unknown analytics level: {level}")
+
+@router.get("/analytics/{level}")
+async def get_analytics_leaders(
+    request: Request,
+    level: str,
+    min_plays: int = Query(1, ge=1),
+    limit: int = Query(25, ge=1, le=500)
+):
+    """
+    Best all-time success rates at a level: play, concept or formation
+    """
+    _check_level(level)
+    return {"success": True, "level": level, "leaders": request.app.state.analytics.leaders(level, min_plays, limit)}
+
+@router.post("/analytics/rebuild")
+async def rebuild_analytics(request: Request):
+    """
+    Recompute every rollup from the logged outcomes (after a backfill)
+    """
+    processed = await asyncio.to_thread(request.app.state.analytics.rebuild)
+    return {"success": True, "outcomes": processed}
+
+@router.get("/analytics/{level}/{key}")
+async def get_analytics(
+    request: Request,
+    level: str,
+    key: str,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+):
+    """
+    Yards per play, success and explosive rates for one play, concept or
+    formation, split by coverage, front, down-and-distance and opponent.
+    start/end select whole weeks (Monday to Sunday).
+    """
+    _check_level(level)
+    return {"success": True, "analytics": request.app.state.analytics.summary(level, key, start, end)}
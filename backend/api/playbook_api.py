@@ -1,7 +1,10 @@
 from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-from datetime import datetime
+import os
+
+from services.playbook_export import EXPORT_FORMATS, export_filename
 
 router = APIRouter()
 
@@ -16,84 +19,109 @@ class PlaySheet(BaseModel):
     situation: str  # e.g., "3rd Down", "Red Zone", "2 Minute"
     play_ids: List[str]
 
-# In-memory storage
-playbooks_storage = {}
-playsheets_storage = {}
-
 @router.get("/")
-async def get_playbooks():
+async def get_playbooks(request: Request):
     """
     Get all playbooks
     """
-    return {"success": True, "playbooks": list(playbooks_storage.values())}
+    store = request.app.state.play_store
+    # Deleting a play drops it from playbooks without bumping their version
+    return request.app.state.http_cache.respond(
+        request,
+        [store.version("playbooks"), store.version("plays")],
+        lambda: {"success": True, "playbooks": store.list_playbooks()}
+    )
 
 @router.post("/create")
-async def create_playbook(playbook: Playbook):
+async def create_playbook(request: Request, playbook: Playbook):
     """
     Create a new playbook
     """
-    playbook_id = f"pb_{datetime.now().timestamp()}"
-    
-    playbooks_storage[playbook_id] = {
-        "id": playbook_id,
-        "name": playbook.name,
-        "team": playbook.team,
-        "season": playbook.season,
-        "description": playbook.description,
-        "created_at": datetime.now().isoformat(),
-        "plays": []
-    }
+    playbook_id = request.app.state.play_store.create_playbook(playbook.dict())
     
     return {"success": True, "playbook_id": playbook_id}
 
 @router.post("/{playbook_id}/add-play")
-async def add_play_to_playbook(playbook_id: str, play_id: str):
+async def add_play_to_playbook(request: Request, playbook_id: str, play_id: str):
     """
     Add a play to a playbook
     """
-    if playbook_id not in playbooks_storage:
+    if not request.app.state.play_store.add_play_to_playbook(playbook_id, play_id):
         raise HTTPException(status_code=404, detail="Playbook not found")
     
-    if play_id not in playbooks_storage[playbook_id]["plays"]:
-        playbooks_storage[playbook_id]["plays"].append(play_id)
-    
     return {"success": True, "message": "Play added to playbook"}
 
 @router.post("/sheets/create")
-async def create_play_sheet(sheet: PlaySheet):
+async def create_play_sheet(request: Request, sheet: PlaySheet):
     """
     Create a situational play sheet
     """
-    sheet_id = f"sheet_{datetime.now().timestamp()}"
-    
-    playsheets_storage[sheet_id] = {
-        "id": sheet_id,
-        "name": sheet.name,
-        "situation": sheet.situation,
-        "play_ids": sheet.play_ids,
-        "created_at": datetime.now().isoformat()
-    }
+    sheet_id = request.app.state.play_store.create_sheet(sheet.dict())
     
     return {"success": True, "sheet_id": sheet_id}
 
 @router.get("/sheets")
-async def get_play_sheets():
+async def get_play_sheets(request: Request):
     """
     Get all play sheets
     """
-    return {"success": True, "sheets": list(playsheets_storage.values())}
+    store = request.app.state.play_store
+    return request.app.state.http_cache.respond(
+        request, [store.version("sheets")], lambda: {"success": True, "sheets": store.list_sheets()}
+    )
+
+def _export_playbook(request: Request, playbook_id: str, format: str) -> Dict:
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported export format: {format}")
+    playbook = request.app.state.play_store.get_playbook(playbook_id)
+    if playbook is None:
+        raise HTTPException(status_code=404, detail="Playbook not found")
+    return playbook
 
 @router.get("/export/{playbook_id}")
-async def export_playbook(playbook_id: str, format: str = "pdf"):
+async def export_playbook(request: Request, playbook_id: str, format: str = "pdf"):
     """
-    Export playbook to PDF or other format
+    Export a playbook as a PDF of play cards (format=pdf) or a ZIP of card
+    SVGs (format=zip). The file streams back page by page; playbooks over
+    EXPORT_STREAM_MAX_PLAYS become a background job instead (202 + job status).
     """
-    if playbook_id not in playbooks_storage:
-        raise HTTPException(status_code=404, detail="Playbook not found")
-    
-    # TODO: Implement actual PDF generation
-    return {
-        "success": True, 
-        "message": f"Export to {format} will be implemented",
-        "playbook": playbooks_storage[playbook_id]
-    }
\ No newline at end of file
+    playbook = _export_playbook(request, playbook_id, format)
+    if len(playbook["plays"]) > int(os.getenv("EXPORT_STREAM_MAX_PLAYS", "200")):
+        job = request.app.state.export_jobs.start(playbook, format)
+        return JSONResponse({"success": True, "job": job}, status_code=202)
+
+    return StreamingResponse(
+        request.app.state.exporter.stream(playbook, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{export_filename(playbook, format)}"'}
+    )
+
+@router.post("/export/{playbook_id}/jobs", status_code=202)
+async def start_export_job(request: Request, playbook_id: str, format: str = "pdf"):
+    """
+    Export in the background; poll the job for progress, then download it
+    """
+    playbook = _export_playbook(request, playbook_id, format)
+    return {"success": True, "job": request.app.state.export_jobs.start(playbook, format)}
+
+@router.get("/export/jobs/{job_id}")
+async def get_export_job(request: Request, job_id: str):
+    """
+    Export job progress: state is queued, running, done, failed or cancelled
+    """
+    job = request.app.state.export_jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    return {"success": True, "job": job}
+
+@router.get("/export/jobs/{job_id}/download")
+async def download_export(request: Request, job_id: str):
+    """
+    Download a finished export
+    """
+    job = request.app.state.export_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Export job not found")
+    if job["state"] != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job['state']}")
+    return FileResponse(job["path"], media_type=EXPORT_FORMATS[job["format"]], filename=job["filename"])
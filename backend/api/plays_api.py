@@ -1,8 +1,12 @@
-from fastapi import APIRouter, HTTPException, Request
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
-import json
-import os
+import asyncio
+
+from services.http_cache import etag_matches
+from services.play_import import IMPORT_FORMATS, PlayImporter
+from services.route_geometry import annotate_batch, play_geometry
 
 router = APIRouter()
 
@@ -10,6 +14,7 @@ class Player(BaseModel):
     id: str
     x: int
     y: int
+    action: Optional[str] = None  # block type or route, drawn under the player
 
 class Route(BaseModel):
     from_player: str = None
@@ -26,80 +31,338 @@ class Play(BaseModel):
     routes: List[Route]
     concept: Optional[str] = None
     description: Optional[str] = None
+    # Situational data (mirrors the plays table)
+    down: Optional[int] = None
+    distance: Optional[int] = None
+    field_position: Optional[str] = None
+    hash: Optional[str] = None
+    # Diagram extras from the play designer
+    drawing_elements: List[Dict] = []
+    motions: List[Dict] = []
+    blocking: Optional[Dict] = None
 
 class SavePlayRequest(BaseModel):
     play: Play
     category: str = "offense"
     tags: List[str] = []
-
-# In-memory storage for now (will move to Supabase)
-plays_storage = {}
+    play_id: Optional[str] = None  # set to update an existing play
 
 @router.get("/")
-async def get_all_plays():
+async def get_all_plays(
+    request: Request,
+    category: Optional[str] = None,
+    tag: Optional[str] = None,
+    formation: Optional[str] = None,
+    down: Optional[int] = None,
+    distance_min: Optional[int] = None,
+    distance_max: Optional[int] = None,
+    field_position: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None
+):
+    """
+    Get saved plays, one page at a time. Pass next_cursor back as cursor for
+    the next page, and fields=name,formation to only return those play fields.
+    Pages carry an ETag; If-None-Match gets a 304 until a play changes.
+    """
+    store = request.app.state.play_store
+
+    def page() -> Dict:
+        try:
+            plays, next_cursor = store.list_plays(
+                category=category,
+                tag=tag,
+                formation=formation,
+                down=down,
+                distance_min=distance_min,
+                distance_max=distance_max,
+                field_position=field_position,
+                limit=limit,
+                cursor=cursor,
+                fields=[f.strip() for f in fields.split(",") if f.strip()] if fields else None
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"success": True, "plays": plays, "next_cursor": next_cursor}
+
+    return request.app.state.http_cache.respond(request, [store.version("plays")], page)
+
+class ThumbnailsRequest(BaseModel):
+    play_ids: List[str]
+
+class GeometryBatchRequest(BaseModel):
+    play_ids: List[str]
+
+def _require_play(request: Request, play_id: str):
+    # Stored plays with nothing drawn aren't in the similarity index
+    if request.app.state.play_store.get_play(play_id) is None:
+        raise HTTPException(status_code=404, detail="Play not found")
+
+def _svg_response(request: Request, etag: str, svg: bytes) -> Response:
+    """
+    Serve a rendered diagram with a strong ETag, or 304 if the client has it
+    """
+    headers = {"ETag": f'"{etag}"', "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=svg, media_type="image/svg+xml", headers=headers)
+
+@router.get("/search")
+async def search_plays(
+    request: Request,
+    q: str,
+    limit: int = Query(20, ge=1, le=200),
+    category: Optional[str] = None,
+    prefix: bool = True
+):
+    """
+    Full-text search over play names, concepts, formations, tags and notes.
+    Typos and shorthand are tolerated ("trps rt mesh"), and the last word is
+    treated as a prefix unless prefix=false.
+    """
+    results = request.app.state.search_index.search(q, limit=limit, prefix=prefix, category=category)
+    return {"success": True, "query": q, "count": len(results), "results": results}
+
+@router.get("/search/suggest")
+async def suggest_terms(request: Request, q: str, limit: int = Query(10, ge=1, le=50)):
+    """
+    Autocomplete the last word of a search query
+    """
+    return {"success": True, "suggestions": request.app.state.search_index.suggest(q, limit=limit)}
+
+@router.get("/duplicates")
+async def get_duplicates(request: Request, limit: int = Query(100, ge=1, le=1000), category: Optional[str] = None):
+    """
+    Likely duplicate pairs across the library: the same play saved under
+    different names, including mirrored copies
+    """
+    similarity = request.app.state.similarity
+    await similarity.ensure_pairs()
+    return {
+        "success": True,
+        "threshold": similarity.duplicate_threshold,
+        "pairs": similarity.duplicates(limit=limit, category=category)
+    }
+
+@router.post("/similar")
+async def find_similar(request: Request, play: Play, limit: int = Query(10, ge=1, le=100), category: Optional[str] = None):
     """
-    Get all saved plays
+    Stored plays structurally closest to an unsaved play (e.g. from the designer)
     """
-    return {"success": True, "plays": list(plays_storage.values())}
+    return {"success": True, "plays": request.app.state.similarity.similar(play.dict(), limit=limit, category=category)}
 
 @router.get("/{play_id}")
-async def get_play(play_id: str):
+async def get_play(request: Request, play_id: str):
     """
     Get a specific play by ID
     """
-    if play_id not in plays_storage:
+    play = request.app.state.play_store.get_play(play_id)
+    if play is None:
         raise HTTPException(status_code=404, detail="Play not found")
-    return {"success": True, "play": plays_storage[play_id]}
+    return {"success": True, "play": play}
+
+@router.get("/{play_id}/diagram.svg")
+async def get_play_diagram(request: Request, play_id: str, size: str = Query("full", pattern="^(full|thumb)$")):
+    """
+    Play diagram as a standalone SVG (size=full or thumb), cached by content hash
+    """
+    record = request.app.state.play_store.get_play(play_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Play not found")
+    etag, svg = request.app.state.renderer.render(record["play"], size)
+    return _svg_response(request, etag, svg)
+
+@router.post("/render")
+async def render_play(request: Request, play: Play, size: str = Query("full", pattern="^(full|thumb)$")):
+    """
+    Render an unsaved play (e.g. from the designer) to SVG
+    """
+    etag, svg = request.app.state.renderer.render(play.dict(), size)
+    return _svg_response(request, etag, svg)
+
+@router.post("/thumbnails")
+async def get_thumbnails(request: Request, body: ThumbnailsRequest):
+    """
+    Thumbnails for a page of the library grid in one round trip
+    """
+    renderer = request.app.state.renderer
+    records = request.app.state.play_store.get_plays(body.play_ids)
+    thumbnails = {}
+    for play_id in body.play_ids:
+        if play_id in records:
+            etag, svg = renderer.render(records[play_id]["play"], "thumb")
+            thumbnails[play_id] = {"etag": etag, "svg": svg.decode("utf-8")}
+    return {"success": True, "thumbnails": thumbnails}
+
+@router.get("/{play_id}/similar")
+async def get_similar(request: Request, play_id: str, limit: int = Query(10, ge=1, le=100), category: Optional[str] = None):
+    """
+    Plays most like this one, whatever they're named; mirrored copies count
+    """
+    plays = request.app.state.similarity.similar_to(play_id, limit=limit, category=category)
+    if plays is None:
+        _require_play(request, play_id)
+        plays = []
+    return {"success": True, "plays": plays}
+
+@router.get("/{play_id}/duplicates")
+async def get_play_duplicates(request: Request, play_id: str, limit: int = Query(10, ge=1, le=100)):
+    """
+    Plays similar enough to this one to be the same play
+    """
+    similarity = request.app.state.similarity
+    plays = similarity.duplicates_of(play_id, limit=limit)
+    if plays is None:
+        _require_play(request, play_id)
+        plays = []
+    return {"success": True, "threshold": similarity.duplicate_threshold, "plays": plays}
+
+@router.get("/{play_id}/geometry")
+async def get_play_geometry(request: Request, play_id: str):
+    """
+    Route depths, stems, breaks and spacing conflicts for a saved play
+    """
+    record = request.app.state.play_store.get_play(play_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Play not found")
+    return {"success": True, **play_geometry(record["play"])}
+
+@router.post("/geometry")
+async def analyze_geometry(play: Play):
+    """
+    Route geometry for an unsaved play (e.g. from the designer)
+    """
+    return {"success": True, **play_geometry(play.dict())}
+
+@router.post("/geometry/batch")
+async def annotate_geometry(request: Request, body: GeometryBatchRequest):
+    """
+    Route geometry for many saved plays in one vectorized pass
+    """
+    records = request.app.state.play_store.get_plays(body.play_ids)
+    play_ids = [play_id for play_id in body.play_ids if play_id in records]
+    results = await asyncio.to_thread(annotate_batch, [records[play_id]["play"] for play_id in play_ids])
+    # Results are plain JSON types already, so skip the per-item response encoding pass
+    return JSONResponse({
+        "success": True,
+        "count": len(results),
+        "conflict_count": sum(len(result["conflicts"]) for result in results),
+        "results": dict(zip(play_ids, results))
+    })
 
 @router.post("/save")
-async def save_play(play_data: SavePlayRequest):
+async def save_play(request: Request, play_data: SavePlayRequest):
     """
     Save a new play or update existing
     """
-    play_id = f"{play_data.category}_{play_data.play.name.lower().replace(' ', '_')}"
-    
-    plays_storage[play_id] = {
-        "id": play_id,
-        "play": play_data.play.dict(),
-        "category": play_data.category,
-        "tags": play_data.tags
-    }
+    store = request.app.state.play_store
+    play_id = store.save_play(
+        play_data.play.dict(),
+        play_data.category,
+        play_data.tags,
+        play_id=play_data.play_id
+    )
+    request.app.state.cluster.plays_saved([store.get_play(play_id)])
     
     return {"success": True, "play_id": play_id}
 
+@router.post("/import")
+async def import_plays(
+    request: Request,
+    format: Optional[str] = None,
+    category: str = "offense",
+    tags: Optional[str] = None,
+    dry_run: bool = False
+):
+    """
+    Bulk import from a streamed request body: NDJSON (one play, or one
+    save request, per line) or a Hudl-style CSV export. Defaults to the
+    Content-Type; tags is comma-separated and applied to every play.
+    dry_run validates without saving. Returns counts plus errors by line.
+    """
+    if format is None:
+        format = "csv" if "csv" in request.headers.get("content-type", "") else "ndjson"
+    if format not in IMPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported import format: {format}")
+
+    importer = PlayImporter(request.app.state.play_store, Play, on_saved=request.app.state.cluster.plays_saved)
+    report = await importer.run(
+        request.stream(),
+        format,
+        category=category,
+        tags=[t.strip() for t in (tags or "").split(",") if t.strip()],
+        dry_run=dry_run
+    )
+    return {"success": True, **report}
+
 @router.delete("/{play_id}")
-async def delete_play(play_id: str):
+async def delete_play(request: Request, play_id: str):
     """
     Delete a play
     """
-    if play_id not in plays_storage:
+    if not request.app.state.play_store.delete_play(play_id):
         raise HTTPException(status_code=404, detail="Play not found")
+    request.app.state.cluster.play_deleted(play_id)
     
-    del plays_storage[play_id]
     return {"success": True, "message": "Play deleted"}
 
 @router.get("/library/formations")
-async def get_formations():
+async def get_formations(request: Request):
     """
     Get all available formations
     """
-    formations_path = "/root/coach-grind/src/data/catalogs/formations.json"
-    try:
-        with open(formations_path, 'r') as f:
-            formations = json.load(f)
-        return {"success": True, "formations": formations}
-    except Exception as e:
-        return {"success": True, "formations": []}
+    catalog = request.app.state.catalog
+    return request.app.state.http_cache.respond(
+        request, [catalog.version], lambda: {"success": True, "formations": catalog.all("formations")}
+    )
 
 @router.get("/library/concepts")
-async def get_route_concepts():
+async def get_route_concepts(request: Request):
     """
     Get all route concepts
     """
-    concepts_path = "/root/coach-grind/src/data/catalogs/route_concepts.json"
-    try:
-        with open(concepts_path, 'r') as f:
-            concepts = json.load(f)
-        return {"success": True, "concepts": concepts}
-    except Exception as e:
-        return {"success": True, "concepts": []}
\ No newline at end of file
+    catalog = request.app.state.catalog
+    return request.app.state.http_cache.respond(
+        request, [catalog.version], lambda: {"success": True, "concepts": catalog.all("concepts")}
+    )
+
+@router.get("/library/query")
+async def query_library(
+    request: Request,
+    kind: str = "formations",
+    personnel: Optional[str] = None,
+    backfield: Optional[str] = None,
+    strength: Optional[str] = None,
+    systems: Optional[str] = None,
+    tags: Optional[str] = None,
+    type: Optional[str] = None,
+    category: Optional[str] = None
+):
+    """
+    Filter a catalog from its indexes, e.g. ?kind=formations&personnel=11&strength=right&tags=trips.
+    Comma-separated values must all match.
+    """
+    catalog = request.app.state.catalog
+    if kind not in catalog.kinds():
+        raise HTTPException(status_code=404, detail=f"Unknown catalog: {kind}")
+
+    filters = {
+        field: [v for v in value.split(",") if v.strip()]
+        for field, value in {
+            "personnel": personnel,
+            "backfield": backfield,
+            "strength": strength,
+            "systems": systems,
+            "tags": tags,
+            "type": type,
+            "category": category
+        }.items()
+        if value
+    }
+
+    def query() -> Dict:
+        results = catalog.query(kind, filters)
+        return {"success": True, "kind": kind, "count": len(results), "results": results}
+
+    return request.app.state.http_cache.respond(request, [catalog.version], query)
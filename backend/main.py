@@ -1,11 +1,22 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response
 from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
 
-from api import plays_api, analysis_api, playbook_api, auth_api
+from api import plays_api, analysis_api, playbook_api, auth_api, gameplan_api, formations_api
 from services.ai_service import AIService
+from services.auth_store import AuthStore
+from services.catalog_registry import CatalogRegistry
+from services.cluster import ClusterSync
+from services.http_cache import ResponseCache
+from services.play_store import PlayStore
+from services.outcome_analytics import OutcomeAnalytics
+from services.play_renderer import PlayRenderer
+from services.playbook_export import ExportJobs, PlaybookExporter
+from services.rate_limits import TierLimiter, TierLimitMiddleware
+from services.telemetry import CONTENT_TYPE, REGISTRY, TelemetryMiddleware
 
 load_dotenv()
 
@@ -13,10 +24,40 @@ load_dotenv()
 async def lifespan(app: FastAPI):
     # Startup
     print("🏈 CoachGrind Backend Starting...")
-    app.state.ai_service = AIService()
+    app.state.catalog = CatalogRegistry()
+    app.state.play_store = PlayStore()
+    # Builds search_index, recommender and similarity; keeps them in step across workers
+    app.state.cluster = ClusterSync.from_env(app.state)
+    app.state.cluster.rebuild()
+    app.state.analytics = OutcomeAnalytics(app.state.play_store, app.state.catalog)
+    app.state.renderer = PlayRenderer.from_env()
+    app.state.http_cache = ResponseCache.from_env()
+    REGISTRY.register_collector(app.state.http_cache.collect_metrics)
+    app.state.exporter = PlaybookExporter.from_env(app.state.play_store, app.state.catalog)
+    app.state.export_jobs = ExportJobs.from_env(app.state.exporter)
+    app.state.ai_service = AIService(catalog=app.state.catalog)
+    REGISTRY.register_collector(app.state.ai_service.collect_metrics)
+    app.state.auth_store = AuthStore.from_env()
+    app.state.auth_store.start()
+    app.state.limiter = TierLimiter.from_env()
+    app.state.ai_service.usage_listeners.append(app.state.limiter.record_usage)
+    REGISTRY.register_collector(app.state.limiter.collect_metrics)
+    await app.state.cluster.start()
+    REGISTRY.register_collector(app.state.cluster.collect_metrics)
     yield
     # Shutdown
     print("🏈 CoachGrind Backend Shutting Down...")
+    REGISTRY.unregister_collector(app.state.ai_service.collect_metrics)
+    REGISTRY.unregister_collector(app.state.limiter.collect_metrics)
+    REGISTRY.unregister_collector(app.state.cluster.collect_metrics)
+    REGISTRY.unregister_collector(app.state.http_cache.collect_metrics)
+    await app.state.cluster.close()
+    await app.state.export_jobs.close()
+    app.state.exporter.close()
+    await app.state.ai_service.close()
+    await app.state.auth_store.close()
+    await app.state.limiter.close()
+    app.state.play_store.close()
 
 app = FastAPI(
     title="CoachGrind API",
@@ -25,6 +66,8 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Innermost, so 429s still get CORS headers
+app.add_middleware(TierLimitMiddleware)
 # CORS configuration
 app.add_middleware(
     CORSMiddleware,
@@ -32,13 +75,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "Retry-After", "ETag"],
 )
+# Outermost, so timings include CORS handling and every response gets a request id
+app.add_middleware(TelemetryMiddleware)
 
 # Include routers
 app.include_router(plays_api.router, prefix="/api/plays", tags=["plays"])
 app.include_router(analysis_api.router, prefix="/api/analysis", tags=["analysis"])
 app.include_router(playbook_api.router, prefix="/api/playbook", tags=["playbook"])
 app.include_router(auth_api.router, prefix="/api/auth", tags=["auth"])
+app.include_router(gameplan_api.router, prefix="/api/gameplan", tags=["gameplan"])
+app.include_router(formations_api.router, prefix="/api/formations", tags=["formations"])
 
 @app.get("/")
 async def root():
@@ -46,4 +94,11 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "coachgrind-backend"}
\ No newline at end of file
+    return {"status": "healthy", "service": "coachgrind-backend"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus scrape endpoint (request, LLM, cache, catalog and storage metrics)
+    """
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
\ No newline at end of file
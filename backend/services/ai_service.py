@@ -1,13 +1,253 @@
 import os
-from typing import Dict, List, Optional
-from openai import OpenAI
+import time
+import asyncio
+import heapq
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+import httpx
 import json
 
+from services.analysis_cache import AnalysisCache, analysis_cache_key
+from services.json_stream import TopLevelFieldParser
+from services.analysis_engine import ANALYSIS_FIELDS, PlayAnalysisEngine
+from services.catalog_registry import CatalogRegistry
+from services.llm_router import LLMRouter, LLMUnavailable
+from services.prompt_builder import PROMPT_VERSION, Prompt, PromptBuilder
+from services.rate_limits import current_principal
+from services.telemetry import LLM_QUEUE_WAIT, log_error, log_event
+
+# Bump whenever the analysis prompt template changes so cached analyses roll over
+ANALYSIS_PROMPT_VERSION = f"analysis-{PROMPT_VERSION}"
+
+class ServiceOverloaded(Exception):
+    """
+    Raised when the LLM admission queue is full and the call is shed
+    """
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+# Admission priority for calls made outside a rate-limited request
+DEFAULT_PRIORITY = 1
+
+class PriorityGate:
+    """
+    A semaphore whose waiters are woken lowest priority number first (FIFO
+    within a priority), so enterprise calls overtake queued free-tier ones
+    """
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.active = 0
+        self._waiters: List = []
+        self._order = itertools.count()
+
+    def locked(self) -> bool:
+        return self.active >= self.slots
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int):
+        if self.active < self.slots and not self.waiting():
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Woken and cancelled in the same tick: hand the slot on
+            if future.done() and not future.cancelled() and future.exception() is None:
+                self.release()
+            raise
+
+    def release(self):
+        # The slot passes straight to the next live waiter, so active is unchanged
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def shed(self, priority: int, error: Exception) -> bool:
+        """
+        Fail the lowest-priority, most recent waiter if it ranks below `priority`
+        """
+        live = [entry for entry in self._waiters if not entry[2].done()]
+        if not live:
+            return False
+        worst = max(live, key=lambda entry: (entry[0], entry[1]))
+        if worst[0] <= priority:
+            return False
+        worst[2].set_exception(error)
+        return True
+
 class AIService:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.model = "gpt-4o-mini"  # Using cost-effective model
+    def __init__(self, catalog: Optional[CatalogRegistry] = None):
+        self.timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+        self.max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+        self.max_queue = int(os.getenv("LLM_MAX_QUEUE", "32"))
         
+        # One pooled HTTP client shared by every request on this worker
+        max_connections = int(os.getenv("LLM_MAX_CONNECTIONS", str(self.max_concurrency * 2)))
+        self.http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections
+            ),
+            timeout=httpx.Timeout(self.timeout, connect=5.0)
+        )
+        self.router = LLMRouter.from_env(self.http_client)
+        self.usage = self.router.usage
+        
+        self._gate = PriorityGate(self.max_concurrency)
+        self._waiting = 0
+        self._active = 0
+        # Called with every finished llm_span, e.g. to charge token budgets
+        self.usage_listeners: List[Callable[[Dict], None]] = []
+        
+        self.cache = AnalysisCache.from_env()
+        self.engine = PlayAnalysisEngine(catalog or CatalogRegistry())
+        self.prompts = PromptBuilder(self.engine)
+    
+    async def close(self):
+        """
+        Release pooled connections on shutdown
+        """
+        await self.http_client.aclose()
+        await self.cache.close()
+    
+    def stats(self) -> Dict:
+        """
+        Current admission state, provider health and token usage for this worker
+        """
+        return {
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "active": self._active,
+            "waiting": self._waiting,
+            "router": self.router.stats(),
+            "usage": self.usage.stats()
+        }
+    
+    def collect_metrics(self):
+        """
+        Scrape-time samples for /metrics: admission queue, analysis cache and breakers
+        """
+        yield ("llm_admission_active", "gauge", "LLM calls holding a concurrency slot", [({}, self._active)])
+        yield ("llm_admission_waiting", "gauge", "LLM calls queued for a concurrency slot", [({}, self._waiting)])
+        yield ("analysis_cache_events_total", "counter", "Analysis cache hits, misses, evictions and errors", [
+            ({"event": event}, value) for event, value in self.cache.counters.items()
+        ])
+        yield ("analysis_cache_entries", "gauge", "Analyses held in the in-memory cache", [({}, self.cache.stats()["entries"])])
+        yield ("llm_circuit_breaker_open", "gauge", "1 while a provider's breaker is open or half-open", [
+            ({"provider": provider}, int(breaker.state != breaker.CLOSED))
+            for provider, breaker in self.router.breakers.items()
+        ])
+    
+    @contextmanager
+    def _span(self, task: str, stream: bool):
+        """
+        One llm_span log record per logical call: queue wait, winning route,
+        provider latency, tokens (including prompt-cache hits) and outcome
+        """
+        span = {"task": task, "stream": stream}
+        started = time.perf_counter()
+        try:
+            yield span
+            span["outcome"] = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            span["outcome"] = "cancelled"
+            raise
+        except Exception as e:
+            span["outcome"] = type(e).__name__
+            raise
+        finally:
+            span["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            log_event("llm_span", **span)
+            for listener in self.usage_listeners:
+                try:
+                    listener(span)
+                except Exception as e:
+                    log_error(f"Usage Listener Error: {str(e)}")
+    
+    @asynccontextmanager
+    async def _admitted(self, span: Dict):
+        """
+        Hold one LLM concurrency slot for the duration of the block. Waiters
+        are admitted by their tier's priority; once the queue is full a new
+        call displaces a lower-priority waiter or is shed with ServiceOverloaded.
+        """
+        principal = current_principal.get()
+        priority = principal.priority if principal is not None else DEFAULT_PRIORITY
+        overloaded = ServiceOverloaded("AI service is at capacity, please retry shortly")
+        if self._gate.locked() and self._waiting >= self.max_queue:
+            if not self._gate.shed(priority, overloaded):
+                raise overloaded
+        
+        self._waiting += 1
+        queued = time.perf_counter()
+        try:
+            await self._gate.acquire(priority)
+        finally:
+            self._waiting -= 1
+        wait = time.perf_counter() - queued
+        LLM_QUEUE_WAIT.labels(span["task"]).observe(wait)
+        span["queue_wait_ms"] = round(wait * 1000, 1)
+        span["priority"] = priority
+        
+        self._active += 1
+        try:
+            yield
+        finally:
+            self._active -= 1
+            self._gate.release()
+    
+    async def _complete(self, prompt: Prompt, temperature: float, max_tokens: int) -> str:
+        """
+        Run one completion through admission control and return the message content
+        """
+        with self._span(prompt.task, stream=False) as span:
+            async with self._admitted(span):
+                return await self.router.complete(prompt, temperature, max_tokens, span, timeout=self.timeout)
+    
+    async def _stream_complete(
+        self,
+        prompt: Prompt,
+        temperature: float,
+        max_tokens: int
+    ) -> AsyncIterator[str]:
+        """
+        Stream one completion through admission control, yielding content deltas
+        """
+        with self._span(prompt.task, stream=True) as span:
+            async with self._admitted(span):
+                # The timeout covers time to first token, as stream creation's used to
+                deltas = self.router.stream(prompt, temperature, max_tokens, span, timeout=self.timeout)
+                try:
+                    try:
+                        first = await deltas.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    yield first
+                    async for delta in deltas:
+                        yield delta
+                finally:
+                    await deltas.aclose()
+    
+    async def _stream_fields(self, prompt: Prompt, temperature: float, max_tokens: int):
+        """
+        Stream a JSON completion, yielding ("field", key, value) for each top-level
+        member as soon as it parses and ("done", payload) once the object is complete
+        """
+        parser = TopLevelFieldParser()
+        async for delta in self._stream_complete(prompt, temperature, max_tokens):
+            for key, value in parser.feed(delta):
+                yield ("field", key, value)
+        yield ("done", parser.result())
+    
     async def analyze_play(
         self,
         play_name: str,
@@ -17,198 +257,156 @@ class AIService:
         concept: Optional[str] = None
     ) -> Dict:
         """
-        Analyze a football play and provide coaching insights
-        """
-        
-        # Build prompt with play details
-        prompt = f"""
-        You are an expert football coach analyzing a play. Provide detailed coaching analysis for:
-        
-        Play: {play_name}
-        Formation: {formation}
-        Personnel: {personnel}
-        Concept: {concept or 'Custom'}
-        Routes: {json.dumps(routes, indent=2)}
-        
-        Provide analysis in the following JSON format:
-        {{
-            "whenToCall": [3-4 specific game situations when this play is effective],
-            "bestAgainst": [3-4 defensive schemes/coverages this beats],
-            "strengths": [3-4 key advantages of this play],
-            "weaknesses": [2-3 vulnerabilities to watch for],
-            "coachingPoints": [3-4 key coaching points for execution],
-            "qbProgression": [3-5 step QB read progression],
-            "adjustments": {{
-                "vsMan": "Adjustment against man coverage",
-                "vsZone": "Adjustment against zone coverage",
-                "vsBlitz": "Hot route adjustment for blitz"
-            }},
-            "redZone": "Effectiveness and adjustments in red zone",
-            "keyMatchups": [2-3 critical player matchups for success]
-        }}
-        
-        Be specific, practical, and use real football terminology. Focus on actionable coaching insights.
+        Analyze a football play and provide coaching insights.
+        Identical plays share one cached analysis and one in-flight LLM call.
+        Raises LLMUnavailable when no provider can answer rather than
+        returning an analysis that isn't about this play.
         """
+        # Catalog plays are answered by the rules engine; the LLM only fills the gaps
+        engine_analysis, missing = self.engine.analyze(play_name, formation, personnel, routes, concept)
+        if not missing:
+            return engine_analysis
         
+        key = self._analysis_key(formation, personnel, routes, concept, missing)
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert football coach with deep knowledge of offensive schemes, defensive coverages, and game strategy."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.7,
-                max_tokens=1500
+            llm_analysis = await self.cache.get_or_compute(
+                key,
+                lambda: self._llm_analysis(play_name, formation, personnel, routes, concept, missing)
             )
-            
-            analysis = json.loads(response.choices[0].message.content)
-            return analysis
-            
+        except (ServiceOverloaded, LLMUnavailable):
+            raise
         except Exception as e:
-            print(f"AI Analysis Error: {str(e)}")
-            # Return default analysis if AI fails
-            return self._get_default_analysis(play_name, formation, concept)
+            log_error(f"AI Analysis Error: {str(e)}")
+            raise
+        
+        return self._merge_analysis(engine_analysis, llm_analysis)
     
-    async def generate_play_from_description(self, description: str) -> Dict:
+    def _analysis_key(
+        self,
+        formation: str,
+        personnel: str,
+        routes: List[Dict],
+        concept: Optional[str],
+        fields: List[str]
+    ) -> str:
+        version = f"{ANALYSIS_PROMPT_VERSION}:{','.join(fields)}"
+        return analysis_cache_key(formation, personnel, routes, concept, version)
+    
+    def _merge_analysis(self, engine_analysis: Dict, llm_analysis: Dict) -> Dict:
         """
-        Generate a complete play from natural language description
+        Combine engine and LLM fields in the standard field order, preferring the engine
         """
-        prompt = f"""
-        You are an expert football coach. Generate a complete football play based on this description:
-        
-        "{description}"
+        merged = {}
+        for field in ANALYSIS_FIELDS:
+            if engine_analysis.get(field):
+                merged[field] = engine_analysis[field]
+            elif field in llm_analysis:
+                merged[field] = llm_analysis[field]
+        return merged
+    
+    async def stream_analysis(
+        self,
+        play_name: str,
+        formation: str,
+        personnel: str,
+        routes: List[Dict],
+        concept: Optional[str] = None
+    ):
+        """
+        Streaming variant of analyze_play. Yields ("field", key, value) events as
+        each top-level field is parsed, then ("done", analysis). Cache hits are
+        replayed immediately and completed streams are written back to the cache.
+        """
+        engine_analysis, missing = self.engine.analyze(play_name, formation, personnel, routes, concept)
+        for field in ANALYSIS_FIELDS:
+            if field not in missing:
+                yield ("field", field, engine_analysis[field])
+        if not missing:
+            yield ("done", engine_analysis)
+            return
         
-        Return a JSON object with:
-        {{
-            "name": "Play name",
-            "formation": "Formation name (e.g., Gun Trips Right, I-Form Strong)",
-            "personnel": "Personnel grouping (e.g., 11, 12, 21)",
-            "concept": "Core concept (e.g., Mesh, Smash, Power)",
-            "players": [
-                {{"id": "position", "x": x_coord, "y": y_coord}} // positions on 1200x600 field
-            ],
-            "routes": [
-                {{
-                    "from": "player_id",
-                    "routeType": "route name",
-                    "path": "SVG path string",
-                    "label": "Route label"
-                }}
-            ],
-            "blocking": {{
-                "scheme": "Blocking scheme name",
-                "assignments": {{"position": "assignment"}}
-            }},
-            "description": "Brief play description",
-            "coachingNotes": "Key coaching points"
-        }}
+        key = self._analysis_key(formation, personnel, routes, concept, missing)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            for field in missing:
+                if field in cached:
+                    yield ("field", field, cached[field])
+            yield ("done", self._merge_analysis(engine_analysis, cached))
+            return
         
-        Use standard football positions: QB, RB, FB, X, Z, Y, F, H, C, LG, RG, LT, RT
-        Field dimensions: 1200px wide x 600px tall, offense starts around y=380
+        prompt = self.prompts.analysis(play_name, formation, personnel, routes, concept, missing)
+        async for event in self._stream_fields(prompt, temperature=0.7, max_tokens=1500):
+            if event[0] == "done":
+                await self.cache.set(key, event[1])
+                yield ("done", self._merge_analysis(engine_analysis, event[1]))
+            elif event[1] in missing:
+                yield event
+    
+    async def _llm_analysis(
+        self,
+        play_name: str,
+        formation: str,
+        personnel: str,
+        routes: List[Dict],
+        concept: Optional[str],
+        fields: List[str]
+    ) -> Dict:
+        """
+        Ask the LLM for a play analysis, raising on any failure
         """
+        content = await self._complete(
+            self.prompts.analysis(play_name, formation, personnel, routes, concept, fields),
+            temperature=0.7,
+            max_tokens=1500
+        )
         
+        return json.loads(content)
+    
+    async def generate_play_from_description(self, description: str) -> Dict:
+        """
+        Generate a complete play from natural language description
+        """
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert football coach and play designer."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
+            content = await self._complete(
+                self.prompts.generation(description),
                 temperature=0.8,
                 max_tokens=2000
             )
             
-            play_data = json.loads(response.choices[0].message.content)
+            play_data = json.loads(content)
             return play_data
             
+        except (ServiceOverloaded, LLMUnavailable):
+            raise
         except Exception as e:
-            print(f"Play Generation Error: {str(e)}")
+            log_error(f"Play Generation Error: {str(e)}")
             raise Exception(f"Failed to generate play: {str(e)}")
     
+    async def stream_generation(self, description: str):
+        """
+        Streaming variant of generate_play_from_description, yielding the same
+        ("field", key, value) / ("done", play) events as stream_analysis
+        """
+        prompt = self.prompts.generation(description)
+        async for event in self._stream_fields(prompt, temperature=0.8, max_tokens=2000):
+            yield event
+    
     async def suggest_counter_plays(self, defensive_scheme: str) -> List[Dict]:
         """
         Suggest offensive plays that work well against a specific defense
         """
-        prompt = f"""
-        You are an expert offensive coordinator. Suggest 5 effective plays against: {defensive_scheme}
-        
-        For each play, provide:
-        {{
-            "playName": "Name of the play",
-            "formation": "Offensive formation",
-            "concept": "Core concept",
-            "reasoning": "Why this works against {defensive_scheme}",
-            "keyPoints": ["2-3 execution keys"]
-        }}
-        
-        Return as JSON array.
-        """
-        
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are an expert offensive coordinator."},
-                    {"role": "user", "content": prompt}
-                ],
-                response_format={"type": "json_object"},
+            content = await self._complete(
+                self.prompts.counters(defensive_scheme),
                 temperature=0.7,
                 max_tokens=1000
             )
             
-            result = json.loads(response.choices[0].message.content)
+            result = json.loads(content)
             return result.get("plays", [])
             
+        except (ServiceOverloaded, LLMUnavailable):
+            raise
         except Exception as e:
-            print(f"Counter Play Suggestion Error: {str(e)}")
+            log_error(f"Counter Play Suggestion Error: {str(e)}")
             return []
-    
-    def _get_default_analysis(self, play_name: str, formation: str, concept: Optional[str]) -> Dict:
-        """
-        Fallback analysis if AI service fails
-        """
-        return {
-            "whenToCall": [
-                "3rd and medium (4-7 yards)",
-                "Red zone situations",
-                "2-minute drill",
-                "After successful run plays"
-            ],
-            "bestAgainst": [
-                "Cover 2 defense",
-                "Man coverage",
-                "Aggressive blitzing teams"
-            ],
-            "strengths": [
-                "Multiple options for quarterback",
-                "Can exploit mismatches",
-                "Good ball control play"
-            ],
-            "weaknesses": [
-                "Takes time to develop",
-                "Vulnerable to interior pressure"
-            ],
-            "coachingPoints": [
-                "Ensure proper spacing between receivers",
-                "QB must go through full progression",
-                "RB check protection first"
-            ],
-            "qbProgression": [
-                "Pre-snap: Identify Mike linebacker",
-                "First read: Quick game concept",
-                "Second read: Intermediate routes",
-                "Checkdown: RB in flat"
-            ],
-            "adjustments": {
-                "vsMan": "Convert to quick slants and hot routes",
-                "vsZone": "Sit in open windows, work option routes",
-                "vsBlitz": "RB stays in for protection, hot route to slot"
-            },
-            "redZone": "Effective inside the 20, consider fade routes to corners",
-            "keyMatchups": [
-                "Slot receiver vs nickel corner",
-                "X receiver vs boundary corner"
-            ]
-        }
\ No newline at end of file
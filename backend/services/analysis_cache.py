@@ -0,0 +1,224 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from services.telemetry import log_error
+
+def analysis_cache_key(
+    formation: str,
+    personnel: str,
+    routes: List[Dict],
+    concept: Optional[str],
+    version: str
+) -> str:
+    """
+    Canonical content hash for a play analysis request.
+    Play names are left out on purpose so the same play saved under
+    different names by different coaches shares one entry.
+    """
+    def norm(value: Optional[str]) -> str:
+        return " ".join((value or "").lower().split())
+
+    canonical = json.dumps(
+        {
+            "v": version,
+            "formation": norm(formation),
+            "personnel": norm(personnel),
+            "concept": norm(concept),
+            "routes": routes
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class AnalysisCache:
+    """
+    Two-tier cache for LLM analyses: an in-process LRU with TTL in front of
+    an optional Redis tier, with single-flight dedupe of concurrent misses.
+    """
+    def __init__(
+        self,
+        max_entries: int = 2048,
+        ttl_seconds: int = 86400,
+        redis_url: Optional[str] = None,
+        namespace: str = "coachgrind:analysis"
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.namespace = namespace
+        self.redis = aioredis.from_url(redis_url) if redis_url else None
+
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, json)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.counters = {
+            "hits": 0,
+            "redis_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "redis_errors": 0
+        }
+
+    @classmethod
+    def from_env(cls) -> "AnalysisCache":
+        return cls(
+            max_entries=int(os.getenv("ANALYSIS_CACHE_SIZE", "2048")),
+            ttl_seconds=int(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "86400")),
+            redis_url=os.getenv("REDIS_URL") or None
+        )
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def _get_local(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, payload = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            self.counters["expirations"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return payload
+
+    def _set_local(self, key: str, payload: str):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, payload)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.counters["evictions"] += 1
+
+    async def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached analysis in memory, then Redis
+        """
+        payload = self._get_local(key)
+        if payload is not None:
+            self.counters["hits"] += 1
+            return json.loads(payload)
+
+        if self.redis is not None:
+            try:
+                raw = await self.redis.get(self._redis_key(key))
+            except Exception as e:
+                log_error(f"Analysis Cache Redis Error: {str(e)}")
+                self.counters["redis_errors"] += 1
+                raw = None
+            if raw is not None:
+                payload = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                self._set_local(key, payload)
+                self.counters["redis_hits"] += 1
+                return json.loads(payload)
+
+        return None
+
+    async def set(self, key: str, value: Dict):
+        payload = json.dumps(value, separators=(",", ":"))
+        self._set_local(key, payload)
+        if self.redis is not None:
+            try:
+                await self.redis.set(self._redis_key(key), payload, ex=self.ttl_seconds)
+            except Exception as e:
+                log_error(f"Analysis Cache Redis Error: {str(e)}")
+                self.counters["redis_errors"] += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        """
+        Return the cached analysis for key, or run compute once no matter how
+        many callers ask for the same key at the same time. The shared call is
+        only cancelled when every caller waiting on it has gone away.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached
+
+        task = self._inflight.get(key)
+        if task is None:
+            self.counters["misses"] += 1
+            task = asyncio.ensure_future(self._compute_and_store(key, compute))
+            self._inflight[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key))
+        else:
+            self.counters["coalesced"] += 1
+
+        self._waiters[key] += 1
+        try:
+            result = await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if key in self._waiters:
+                self._waiters[key] -= 1
+                if self._waiters[key] == 0:
+                    task.cancel()
+            raise
+        # Each caller gets its own copy of the shared result
+        return json.loads(json.dumps(result))
+
+    async def _compute_and_store(self, key: str, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        result = await compute()
+        await self.set(key, result)
+        return result
+
+    def _forget(self, key: str):
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+
+    async def invalidate(self) -> int:
+        """
+        Drop every cached analysis, e.g. after prompt templates change.
+        Returns how many distinct analyses were removed; one held in both
+        tiers counts once.
+        """
+        removed = set(self._entries)
+        self.clear_local()
+        if self.redis is not None:
+            try:
+                keys = [k async for k in self.redis.scan_iter(match=f"{self.namespace}:*")]
+                if keys:
+                    async with self.redis.pipeline(transaction=False) as pipe:
+                        for k in keys:
+                            pipe.delete(k)
+                        deleted = await pipe.execute()
+                    prefix = len(self.namespace) + 1
+                    for k, count in zip(keys, deleted):
+                        if count:
+                            k = k.decode("utf-8") if isinstance(k, bytes) else k
+                            removed.add(k[prefix:])
+            except Exception as e:
+                log_error(f"Analysis Cache Redis Error: {str(e)}")
+                self.counters["redis_errors"] += 1
+        return len(removed)
+
+    def clear_local(self) -> int:
+        """
+        Drop this worker's memory tier only, when another worker has already
+        cleared Redis
+        """
+        removed = len(self._entries)
+        self._entries.clear()
+        return removed
+
+    def stats(self) -> Dict:
+        return {
+            **self.counters,
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "redis": self.redis is not None
+        }
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.aclose()
@@ -0,0 +1,318 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+from services.catalog_registry import CatalogRegistry
+from services.route_geometry import route_geometry
+from services.route_tree import route_id
+
+# Shape of an analyze_play response, in display order
+ANALYSIS_FIELDS = [
+    "whenToCall",
+    "bestAgainst",
+    "strengths",
+    "weaknesses",
+    "coachingPoints",
+    "qbProgression",
+    "adjustments",
+    "redZone",
+    "keyMatchups"
+]
+
+# Concept tags -> situational calls
+TAG_SITUATIONS = {
+    "quick_game": ["3rd and short to medium (2-6 yards)", "Vs soft corners on early downs"],
+    "3_step": ["Two-minute drill: rhythm throw to beat the clock"],
+    "5_step": ["3rd and medium (4-8 yards)", "2nd and long to get back on schedule"],
+    "7_step": ["1st and 10 in plus territory"],
+    "shot_play": ["Shot play after a successful run", "Vs single-high safety rolled down"],
+    "play_action": ["Early downs off an established run game"],
+    "boot": ["Early downs vs flow-happy linebackers"],
+    "crossers": ["3rd down vs man-heavy defenses"],
+    "man_beater": ["3rd and medium vs Cover 1 / pressure"],
+    "zone_beater": ["Vs spot-drop zone on passing downs"],
+    "flood": ["Into the boundary vs 3-deep zone"],
+    "overload": ["Vs rotated safeties to the strength"],
+    "horizontal_stretch": ["Vs soft flat defenders and off coverage"],
+    "vertical_stretch": ["Vs 2-high shells that don't carry seams"]
+}
+
+# Concept tags -> strengths / weaknesses
+TAG_STRENGTHS = {
+    "quick_game": "Ball comes out fast, neutralizing pressure",
+    "high_low": "High-low read puts one defender in conflict",
+    "vs_zone": "Sits receivers in zone voids",
+    "zone_beater": "Layers routes between zone drops",
+    "man_beater": "Crossing releases create natural rubs vs man",
+    "crossers": "Crossers run away from man leverage",
+    "vertical_stretch": "Stretches the deep safeties vertically",
+    "horizontal_stretch": "Spreads underneath defenders sideline to sideline",
+    "flood": "Three-level stretch outnumbers the zone on one side",
+    "overload": "Overloads the strength with more receivers than defenders",
+    "play_action": "Run action holds linebackers and opens the second level",
+    "boot": "Moves the pocket away from backside pressure",
+    "shot_play": "Creates explosive-play opportunities"
+}
+TAG_WEAKNESSES = {
+    "quick_game": "Limited yards after catch vs squatting corners",
+    "7_step": "Needs time: vulnerable to interior pressure",
+    "5_step": "Protection must hold through the full drop",
+    "zone_beater": "Windows tighten vs press man",
+    "man_beater": "Crossers can get muddied by zone droppers",
+    "vertical_stretch": "Vulnerable to robber and trap coverage",
+    "shot_play": "Low completion rate if the shot is covered",
+    "play_action": "Loses effect without a credible run threat",
+    "flood": "Backside is often left without a route",
+    "overload": "Backside is often left without a route",
+    "horizontal_stretch": "Rally-tackling defenses limit the gain"
+}
+
+# Protection ids -> blitz answers
+PROTECTION_HOT_RULES = {
+    "scat_5": "5-man protection: throw hot to the {hot} vs any unblocked rusher",
+    "half_slide_r": "RB scans Mike to Will; sight adjust to the {hot} vs a sixth rusher",
+    "half_slide_l": "RB scans Mike to Will; sight adjust to the {hot} vs a sixth rusher",
+    "bob": "Big-on-big picks up four; throw hot to the {hot} vs double edge pressure",
+    "full_slide": "Slide away, RB takes the edge; hot to the {hot} vs overload",
+    "max_pro": "7-man protection absorbs pressure; stay with the two-man combo"
+}
+
+CHECKDOWN_PLAYERS = {"RB", "HB", "FB"}
+
+# Catalog route types outside the designer's route tree -> the route-tree id they are drawn as
+CATALOG_ROUTE_TYPES = {
+    "deep_dig": "dig", "clearout_go": "go", "shallow_cross": "shallow", "deep_over": "deep-cross",
+    "speed_out": "out", "deep_out": "out", "mini_curl": "curl", "bubble": "swing"
+}
+# Route-tree ids close enough to stand in for each other in a catalog read
+ROUTE_FAMILIES = {
+    "curl": "hitch", "hook": "hitch", "sit": "hitch", "seam": "go", "fade": "go",
+    "arrow": "flat", "checkdown": "check", "swing": "check", "flare": "check"
+}
+# Drawn depth may be off the catalog depth by this much before the read no longer applies
+DEPTH_TOLERANCE_YARDS = 5
+
+def _normalize(name: Optional[str]) -> str:
+    return re.sub(r"[^a-z0-9]+", "_", (name or "").lower()).strip("_")
+
+class PlayAnalysisEngine:
+    """
+    Rules-based analysis built from the shipped catalogs.
+
+    Produces the same shape as AIService.analyze_play for plays that map to a
+    catalog concept or run scheme, and reports which fields it could not fill
+    so only those need to go to the LLM.
+    """
+    def __init__(self, catalog: CatalogRegistry):
+        self.catalog = catalog
+        self._version = None
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Rebuild lookups whenever the catalog registry has hot-reloaded
+        """
+        snapshot = self.catalog.snapshot
+        if snapshot.version == self._version:
+            return
+        self.concepts = {c["id"]: c for c in snapshot.items["expanded_concepts"]}
+        self.concept_notes = {c["id"]: c for c in snapshot.items["concepts"]}
+        self.protections = {p["id"]: p for p in snapshot.items["protections"]}
+        self.run_schemes = {r["id"]: r for r in snapshot.items["run_schemes"]}
+        self.personnel_groups = snapshot.personnel_groups
+
+        # Name lookups so "4 Verts", "verts" and "Four Verts" all resolve
+        self._aliases: Dict[str, Tuple[str, str]] = {}
+        for kind, catalog in (("run", self.run_schemes), ("notes", self.concept_notes), ("pass", self.concepts)):
+            for item_id, item in catalog.items():
+                if kind == "notes" and item_id in self.concepts:
+                    kind_for_item = "pass"
+                else:
+                    kind_for_item = kind
+                self._aliases[_normalize(item_id)] = (kind_for_item, item_id)
+                self._aliases[_normalize(item["name"])] = (kind_for_item, item_id)
+        self._protection_aliases = {}
+        for item_id, item in self.protections.items():
+            self._protection_aliases[_normalize(item_id)] = item_id
+            self._protection_aliases[_normalize(item["name"].split("(")[0])] = item_id
+        self._version = snapshot.version
+
+    def resolve_concept(self, concept: Optional[str], play_name: str = "") -> Optional[Tuple[str, str]]:
+        """
+        Map a concept (or, failing that, a play name) to a catalog entry
+        """
+        match = self._aliases.get(_normalize(concept))
+        if match:
+            return match
+        name = "_" + _normalize(play_name) + "_"
+        for alias in sorted(self._aliases, key=len, reverse=True):
+            if alias and f"_{alias}_" in name:
+                return self._aliases[alias]
+        return None
+
+    def resolve_protection(self, play_name: str, protection: Optional[str] = None) -> Optional[str]:
+        match = self._protection_aliases.get(_normalize(protection))
+        if match:
+            return match
+        name = "_" + _normalize(play_name) + "_"
+        for alias in sorted(self._protection_aliases, key=len, reverse=True):
+            if f"_{alias}_" in name:
+                return self._protection_aliases[alias]
+        return None
+
+    def analyze(
+        self,
+        play_name: str,
+        formation: str,
+        personnel: str,
+        routes: List[Dict],
+        concept: Optional[str] = None,
+        protection: Optional[str] = None
+    ) -> Tuple[Dict, List[str]]:
+        """
+        Returns (analysis, missing_fields). Custom plays come back empty with
+        every field missing.
+        """
+        self._refresh()
+        match = self.resolve_concept(concept, play_name)
+        analysis: Dict = {}
+        if match and match[0] == "pass" and not routes_conflict(routes, self.concepts[match[1]]):
+            analysis = self._pass_analysis(
+                self.concepts[match[1]],
+                personnel,
+                self.resolve_protection(play_name, protection)
+            )
+        elif match and match[0] == "run":
+            analysis = self._run_analysis(self.run_schemes[match[1]], personnel)
+        elif match and match[0] == "notes":
+            analysis = self._notes_analysis(self.concept_notes[match[1]], personnel)
+
+        missing = [field for field in ANALYSIS_FIELDS if not analysis.get(field)]
+        return analysis, missing
+
+    def _progression(self, concept: Dict) -> Tuple[List[Tuple[str, Dict]], List[Tuple[str, Dict]]]:
+        receivers = [(p, r) for p, r in concept["routes"].items() if p not in CHECKDOWN_PLAYERS]
+        backs = [(p, r) for p, r in concept["routes"].items() if p in CHECKDOWN_PLAYERS]
+        deep_first = bool({"shot_play", "vertical_stretch", "7_step"} & set(concept.get("tags", [])))
+        receivers.sort(key=lambda pr: pr[1].get("depth", 0), reverse=deep_first)
+        return receivers, backs
+
+    def _pass_analysis(self, concept: Dict, personnel: str, protection_id: Optional[str]) -> Dict:
+        tags = concept.get("tags", [])
+        receivers, backs = self._progression(concept)
+        by_depth = sorted(concept["routes"].items(), key=lambda pr: pr[1].get("depth", 0))
+        hot_player, hot_route = next(
+            ((p, r) for p, r in by_depth if p not in CHECKDOWN_PLAYERS and r.get("depth", 0) >= 0),
+            by_depth[0]
+        )
+        deep_player, deep_route = by_depth[-1]
+        max_depth = deep_route.get("depth", 0)
+
+        def describe(player: str, route: Dict) -> str:
+            return f"{player} {route['type'].replace('_', ' ')} ({route.get('depth', 0)} yds)"
+
+        when = [s for tag in tags for s in TAG_SITUATIONS.get(tag, [])]
+        if max_depth <= 12:
+            when.append("Red zone: fits inside the 20 without needing the back line")
+
+        shell = "1-high vs 2-high shell"
+        progression = [f"Pre-snap: identify {shell} and the Mike"]
+        for i, (player, route) in enumerate(receivers, start=1):
+            option = f", {route['option'].replace('_', ' ')}" if route.get("option") else ""
+            progression.append(f"Read {i}: {describe(player, route)}{option}")
+        for player, route in backs:
+            progression.append(f"Checkdown: {describe(player, route)}")
+
+        strengths = [TAG_STRENGTHS[tag] for tag in tags if tag in TAG_STRENGTHS]
+        strengths.append(f"Built-in answer vs {', '.join(concept.get('bestAgainst', []))}")
+        weaknesses = [TAG_WEAKNESSES[tag] for tag in tags if tag in TAG_WEAKNESSES]
+        if not {"Man", "Cover 1"} & set(concept.get("bestAgainst", [])):
+            weaknesses.append("No true man-beater: tight coverage forces the checkdown")
+
+        coaching = [concept.get("coachingPoint", ""), concept.get("description", "")]
+        notes = self.concept_notes.get(concept["id"])
+        if notes:
+            coaching.append(notes["notes"])
+        group = self.personnel_groups.get(personnel)
+        if group:
+            coaching.append(f"Personnel: {group['name']}")
+        if protection_id:
+            protection = self.protections[protection_id]
+            coaching.append(f"Protection: {protection['name']} - {protection['notes']}")
+
+        blitz_rule = PROTECTION_HOT_RULES.get(
+            protection_id,
+            "Throw hot to the {hot} vs unaccounted rushers"
+        ).format(hot=describe(hot_player, hot_route))
+
+        if max_depth > 20:
+            red_zone = "Limited inside the 20: deep routes run out of field, convert to back-line fades and sits"
+        elif max_depth > 12:
+            red_zone = "Playable in the high red zone; compress the deep route to the back line inside the 10"
+        else:
+            red_zone = "Effective in the red zone: all routes fit inside the field"
+
+        matchups = [f"{deep_player} vs the deep defender on the {deep_route['type'].replace('_', ' ')}"]
+        matchups.append(f"{hot_player} vs the underneath/flat defender")
+        if "F" in concept["routes"] and group and group.get("wr", 0) >= 3:
+            matchups.append("Slot (F) vs nickel")
+
+        return {
+            "whenToCall": when,
+            "bestAgainst": list(concept.get("bestAgainst", [])),
+            "strengths": strengths,
+            "weaknesses": weaknesses,
+            "coachingPoints": [c for c in coaching if c],
+            "qbProgression": progression,
+            "adjustments": {
+                "vsMan": "Win leverage off the line; convert option routes away from the defender"
+                         if "man_beater" not in tags else "Crossers: stay on the rub path, run away from leverage",
+                "vsZone": "Throttle down in the void between zone drops; QB reads the flat/hook defender",
+                "vsBlitz": blitz_rule
+            },
+            "redZone": red_zone,
+            "keyMatchups": matchups
+        }
+
+    def _run_analysis(self, scheme: Dict, personnel: str) -> Dict:
+        # Run schemes only ship blocking rules, so the coverage-facing fields stay missing
+        return {"coachingPoints": self._notes_with_personnel(scheme, personnel)}
+
+    def _notes_analysis(self, concept: Dict, personnel: str) -> Dict:
+        # Concepts without route depths only have a one-line note
+        return {"coachingPoints": self._notes_with_personnel(concept, personnel)}
+
+    def _notes_with_personnel(self, item: Dict, personnel: str) -> List[str]:
+        coaching = [f"{item['name']}: {item['notes']}"]
+        group = self.personnel_groups.get(personnel)
+        if group:
+            coaching.append(f"Personnel: {group['name']}")
+        return coaching
+
+def _route_family(route_type: Optional[str]) -> Optional[str]:
+    return ROUTE_FAMILIES.get(route_type, route_type)
+
+def routes_conflict(routes: List[Dict], concept: Dict) -> bool:
+    """
+    True when the play's routes don't match the catalog concept: a player the
+    concept doesn't use, a different route type, or a depth outside
+    DEPTH_TOLERANCE_YARDS. The play is then a customized version and the
+    catalog read no longer applies.
+    """
+    for route in routes or []:
+        player = route.get("from_player") or route.get("from")
+        if not player:
+            continue
+        expected = concept["routes"].get(player)
+        if expected is None:
+            return True
+        expected_type = CATALOG_ROUTE_TYPES.get(expected["type"]) or route_id({"route_type": expected["type"]})
+        drawn_type = route_id(route)
+        if drawn_type and expected_type and _route_family(drawn_type) != _route_family(expected_type):
+            return True
+        geometry = route_geometry(route)
+        if geometry is not None:
+            gap = geometry["depth"] - expected.get("depth", 0)
+            # Vertical routes run until the ball arrives, so only too short is off
+            if gap < -DEPTH_TOLERANCE_YARDS or (gap > DEPTH_TOLERANCE_YARDS and _route_family(expected_type) != "go"):
+                return True
+    return False
@@ -0,0 +1,296 @@
+import os
+import hmac
+import json
+import time
+import uuid
+import heapq
+import base64
+import asyncio
+import hashlib
+import secrets
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from services.telemetry import log_error
+
+# scrypt cost: 16 MB and ~50 ms per hash on a typical core
+SCRYPT_N = 2 ** 14
+SCRYPT_R = 8
+SCRYPT_P = 1
+
+def hash_password(password: str, n: int = SCRYPT_N, r: int = SCRYPT_R, p: int = SCRYPT_P) -> str:
+    """
+    Self-describing scrypt hash: scrypt$n$r$p$salt$key
+    """
+    salt = secrets.token_bytes(16)
+    key = hashlib.scrypt(password.encode("utf-8"), salt=salt, n=n, r=r, p=p, dklen=32, maxmem=64 * 1024 * 1024)
+    return "$".join([
+        "scrypt", str(n), str(r), str(p),
+        base64.b64encode(salt).decode("ascii"),
+        base64.b64encode(key).decode("ascii")
+    ])
+
+def verify_password(password: str, encoded: str) -> bool:
+    try:
+        scheme, n, r, p, salt, key = encoded.split("$")
+    except ValueError:
+        return False
+    if scheme != "scrypt":
+        return False
+    expected = base64.b64decode(key)
+    actual = hashlib.scrypt(
+        password.encode("utf-8"),
+        salt=base64.b64decode(salt),
+        n=int(n), r=int(r), p=int(p),
+        dklen=len(expected),
+        maxmem=64 * 1024 * 1024
+    )
+    return hmac.compare_digest(actual, expected)
+
+def normalize_email(email: str) -> str:
+    return email.strip().lower()
+
+class MemoryAuthBackend:
+    """
+    Users indexed by id and email, sessions by token, all plain dicts.
+    Expiry times sit in a heap so the sweeper only touches sessions that are due.
+    """
+    def __init__(self):
+        self._users: Dict[str, Dict] = {}
+        self._user_ids_by_email: Dict[str, str] = {}
+        self._sessions: Dict[str, Dict] = {}
+        self._expiries: List[Tuple[float, str]] = []
+
+    async def add_user(self, user: Dict) -> bool:
+        if user["email"] in self._user_ids_by_email:
+            return False
+        self._users[user["id"]] = user
+        self._user_ids_by_email[user["email"]] = user["id"]
+        return True
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        return self._users.get(user_id)
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict]:
+        user_id = self._user_ids_by_email.get(email)
+        return self._users.get(user_id) if user_id else None
+
+    async def update_user(self, user: Dict):
+        self._users[user["id"]] = user
+
+    async def put_session(self, token: str, session: Dict, ttl_seconds: int):
+        self._sessions[token] = session
+        heapq.heappush(self._expiries, (session["expires_at"], token))
+
+    async def get_session(self, token: str) -> Optional[Dict]:
+        session = self._sessions.get(token)
+        if session is not None and session["expires_at"] <= time.time():
+            del self._sessions[token]
+            return None
+        return session
+
+    async def delete_session(self, token: str):
+        self._sessions.pop(token, None)
+
+    async def sweep(self) -> int:
+        """
+        Drop expired sessions; heap entries for sessions already gone are skipped
+        """
+        now = time.time()
+        removed = 0
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, token = heapq.heappop(self._expiries)
+            session = self._sessions.get(token)
+            if session is not None and session["expires_at"] == expires_at:
+                del self._sessions[token]
+                removed += 1
+        return removed
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "users": len(self._users), "sessions": len(self._sessions)}
+
+    async def close(self):
+        pass
+
+class RedisAuthBackend:
+    """
+    Same interface on Redis so every worker sees the same users and sessions.
+    Session keys carry a TTL, so Redis does the eviction.
+    """
+    def __init__(self, redis_url: str, namespace: str = "coachgrind:auth"):
+        self.redis = aioredis.from_url(redis_url)
+        self.namespace = namespace
+
+    def _key(self, kind: str, value: str) -> str:
+        return f"{self.namespace}:{kind}:{value}"
+
+    async def _get_json(self, key: str) -> Optional[Dict]:
+        raw = await self.redis.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    async def add_user(self, user: Dict) -> bool:
+        # The email key is the uniqueness check, claimed atomically before the user is written
+        if not await self.redis.set(self._key("email", user["email"]), user["id"], nx=True):
+            return False
+        await self.redis.set(self._key("user", user["id"]), json.dumps(user))
+        return True
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        return await self._get_json(self._key("user", user_id))
+
+    async def get_user_by_email(self, email: str) -> Optional[Dict]:
+        user_id = await self.redis.get(self._key("email", email))
+        if user_id is None:
+            return None
+        return await self.get_user(user_id.decode("utf-8") if isinstance(user_id, bytes) else user_id)
+
+    async def update_user(self, user: Dict):
+        await self.redis.set(self._key("user", user["id"]), json.dumps(user))
+
+    async def put_session(self, token: str, session: Dict, ttl_seconds: int):
+        await self.redis.set(self._key("session", token), json.dumps(session), ex=ttl_seconds)
+
+    async def get_session(self, token: str) -> Optional[Dict]:
+        return await self._get_json(self._key("session", token))
+
+    async def delete_session(self, token: str):
+        await self.redis.delete(self._key("session", token))
+
+    async def sweep(self) -> int:
+        return 0
+
+    def stats(self) -> Dict:
+        return {"backend": "redis"}
+
+    async def close(self):
+        await self.redis.aclose()
+
+class AuthStore:
+    """
+    Users and sessions with O(1) lookups by email, user id and session token.
+
+    Password hashing runs in a small thread pool (hashlib.scrypt releases the
+    GIL), so a burst of logins queues on the pool instead of stalling the
+    event loop. Expired sessions are rejected on read and swept out in the
+    background.
+    """
+    def __init__(
+        self,
+        backend=None,
+        session_ttl_seconds: int = 7 * 24 * 3600,
+        sweep_interval: float = 60,
+        hash_workers: int = 4
+    ):
+        self.backend = backend or MemoryAuthBackend()
+        self.session_ttl_seconds = session_ttl_seconds
+        self.sweep_interval = sweep_interval
+        self._executor = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="auth-hash")
+        self._sweeper: Optional[asyncio.Task] = None
+        # Compared against on unknown emails so a miss costs the same as a wrong password
+        self._dummy_hash = hash_password(secrets.token_urlsafe(16))
+
+    @classmethod
+    def from_env(cls) -> "AuthStore":
+        redis_url = os.getenv("REDIS_URL") or None
+        return cls(
+            backend=RedisAuthBackend(redis_url) if redis_url else MemoryAuthBackend(),
+            session_ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", str(7 * 24 * 3600))),
+            sweep_interval=float(os.getenv("SESSION_SWEEP_INTERVAL_SECONDS", "60")),
+            hash_workers=int(os.getenv("AUTH_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+        )
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def create_user(
+        self,
+        email: str,
+        password: str,
+        name: str,
+        team: Optional[str] = None,
+        role: str = "coach"
+    ) -> Optional[Dict]:
+        """
+        Returns the new user, or None if the email is taken
+        """
+        email = normalize_email(email)
+        if await self.backend.get_user_by_email(email) is not None:
+            return None
+        user = {
+            "id": f"user_{uuid.uuid4().hex}",
+            "email": email,
+            "password_hash": await self._run(hash_password, password),
+            "name": name,
+            "team": team,
+            "role": role,
+            "subscription": "free",
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+        }
+        # Checked again on insert: another signup may have landed while we were hashing
+        if not await self.backend.add_user(user):
+            return None
+        return user
+
+    async def authenticate(self, email: str, password: str) -> Optional[Dict]:
+        user = await self.backend.get_user_by_email(normalize_email(email))
+        encoded = user["password_hash"] if user else self._dummy_hash
+        if not await self._run(verify_password, password, encoded) or user is None:
+            return None
+        return user
+
+    async def create_session(self, user: Dict) -> str:
+        token = secrets.token_urlsafe(32)
+        now = time.time()
+        session = {
+            "user_id": user["id"],
+            "email": user["email"],
+            "created_at": now,
+            "expires_at": now + self.session_ttl_seconds
+        }
+        await self.backend.put_session(token, session, self.session_ttl_seconds)
+        return token
+
+    async def get_session(self, token: str) -> Optional[Dict]:
+        return await self.backend.get_session(token)
+
+    async def get_user(self, user_id: str) -> Optional[Dict]:
+        return await self.backend.get_user(user_id)
+
+    async def delete_session(self, token: str):
+        await self.backend.delete_session(token)
+
+    async def update_user(self, user_id: str, fields: Dict) -> Optional[Dict]:
+        user = await self.backend.get_user(user_id)
+        if user is None:
+            return None
+        user = {**user, **fields}
+        await self.backend.update_user(user)
+        return user
+
+    async def _sweep_forever(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.backend.sweep()
+            except Exception as e:
+                log_error(f"Session Sweep Error: {str(e)}")
+
+    def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_forever())
+
+    def stats(self) -> Dict:
+        return self.backend.stats()
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+        await self.backend.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,327 @@
+import heapq
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.recommender import KIND_CODES, PlayRecommender, coverage_mix
+
+# Every section of a game-plan call sheet. down/distance/field_position drive
+# the situational fit and pick the opponent's coverage mix; tendency names the
+# situational_tendencies entry checked first; kinds nudges run/pass balance.
+SECTIONS = (
+    {"key": "openers", "label": "Openers", "size": 15, "tendency": "openers"},
+    {"key": "first_10", "label": "1st & 10", "size": 12, "down": 1, "distance": 10},
+    {"key": "second_long", "label": "2nd & Long", "size": 8, "down": 2, "distance": 8},
+    {"key": "second_short", "label": "2nd & Short", "size": 6, "down": 2, "distance": 2, "kinds": {"run": 1.05}},
+    {"key": "third_short", "label": "3rd & Short", "size": 6, "down": 3, "distance": 2, "kinds": {"run": 1.05}},
+    {"key": "third_medium", "label": "3rd & Medium", "size": 8, "down": 3, "distance": 5, "kinds": {"pass": 1.05}},
+    {"key": "third_long", "label": "3rd & Long", "size": 8, "down": 3, "distance": 9, "kinds": {"pass": 1.1, "run": 0.8}},
+    {"key": "fourth_short", "label": "4th & Short", "size": 4, "down": 4, "distance": 1, "kinds": {"run": 1.05}},
+    {"key": "red_zone", "label": "Red Zone", "size": 8, "field_position": "opp_19_10"},
+    {"key": "goal_line", "label": "Goal Line", "size": 5, "down": 1, "distance": 5, "field_position": "opp_9_goal",
+     "tendency": "goal_line", "kinds": {"run": 1.05}},
+    {"key": "two_minute", "label": "2-Minute", "size": 10, "tendency": "two_minute", "kinds": {"pass": 1.1, "run": 0.75}},
+    {"key": "backed_up", "label": "Backed Up", "size": 6, "field_position": "own_1_10", "tendency": "backed_up",
+     "kinds": {"run": 1.05, "pass": 0.95}},
+)
+SECTION_KEYS = tuple(section["key"] for section in SECTIONS)
+
+# Each repeat of a personnel group within a section costs this factor, so
+# sections spread across groupings before the hard minimum has to kick in
+PERSONNEL_REPEAT_DECAY = 0.93
+# Candidates per section considered by the greedy pass (a multiple of its
+# size), and how many of them may share concept, formation and personnel
+POOL_FACTOR = 30
+MIN_POOL = 300
+GROUP_DEPTH = 3
+
+def _key(value) -> Optional[str]:
+    if value is None:
+        return None
+    return str(value).strip().lower() or None
+
+def _opposite(kind: str) -> int:
+    return KIND_CODES["run"] if kind == "pass" else KIND_CODES["pass"]
+
+class _Section:
+    __slots__ = ("spec", "index", "size", "picks", "concepts", "formations", "personnel", "min_personnel", "formation_cap")
+
+    def __init__(self, spec: Dict, index: int, size: int, min_personnel: int, max_formation_share: float):
+        self.spec = spec
+        self.index = index
+        self.size = size
+        self.picks: List[int] = []
+        self.concepts = set()
+        self.formations: Dict[Optional[str], int] = {}
+        self.personnel: Dict[Optional[str], int] = {}
+        self.min_personnel = min_personnel
+        self.formation_cap = max(1, math.ceil(max_formation_share * size))
+
+    @property
+    def full(self) -> bool:
+        return len(self.picks) >= self.size
+
+class CallSheetOptimizer:
+    """
+    Builds a whole game-plan call sheet in one pass over the recommender's
+    play x coverage rate matrix. Every section's coverage mix (from the
+    opponent's tendencies) is stacked into one matrix product, multiplied by
+    situational fit and a run/pass nudge, then a lazy-greedy assignment fills
+    all sections at once from their top candidates, highest score first.
+
+    Constraints: section sizes, a cap on distinct plays across the sheet, no
+    concept twice in a section, a minimum number of personnel groupings and
+    a maximum formation share per section, a cap on how many sections one
+    play appears in, and formations whose tendency (run or pass) should be
+    broken at least once somewhere on the sheet.
+    """
+    def __init__(self, recommender: PlayRecommender):
+        self.recommender = recommender
+
+    def _situations(self, sections: List[Dict], opponent: Optional[Dict], coverages: Optional[Dict[str, float]]) -> List[Dict]:
+        situations = []
+        for spec in sections:
+            if coverages:
+                mix = coverage_mix({"coverages": coverages})
+            else:
+                mix = coverage_mix(
+                    opponent, spec.get("down"), spec.get("distance"), spec.get("field_position"), spec.get("tendency")
+                )
+            situations.append({
+                "mix": mix,
+                "down": spec.get("down"),
+                "distance": spec.get("distance"),
+                "field_position": spec.get("field_position")
+            })
+        return situations
+
+    def build(
+        self,
+        opponent: Optional[Dict] = None,
+        coverages: Optional[Dict[str, float]] = None,
+        sections: Optional[List[str]] = None,
+        sizes: Optional[Dict[str, int]] = None,
+        max_plays: int = 60,
+        max_sections_per_play: int = 3,
+        min_personnel: int = 2,
+        max_formation_share: float = 0.5,
+        break_tendencies: Optional[Dict[str, str]] = None,
+        category: Optional[str] = "offense"
+    ) -> Dict:
+        started = time.perf_counter()
+        specs = [spec for spec in SECTIONS if not sections or spec["key"] in sections]
+        sizes = sizes or {}
+        situations = self._situations(specs, opponent, coverages)
+        recommender = self.recommender
+        scores, expected = recommender.score_matrix(situations, category=category)
+
+        kinds = recommender.kinds()
+        for row, spec in enumerate(specs):
+            for kind, weight in (spec.get("kinds") or {}).items():
+                scores[row, kinds == KIND_CODES[kind]] *= weight
+
+        state = [
+            _Section(spec, row, max(0, int(sizes.get(spec["key"], spec["size"]))), min_personnel, max_formation_share)
+            for row, spec in enumerate(specs)
+        ]
+        attributes: Dict[int, Tuple[Optional[str], Optional[str], Optional[str]]] = {}
+
+        def attrs(slot: int) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+            # (concept, formation, personnel), only for slots that reach the pool
+            found = attributes.get(slot)
+            if found is None:
+                info = recommender.play_info(slot)
+                found = attributes[slot] = (
+                    _key(info.get("concept")) or f"play:{info['id']}",
+                    _key(info.get("formation")),
+                    _key(info.get("personnel"))
+                )
+            return found
+
+        # Candidate pools: each section's best plays, at most GROUP_DEPTH per
+        # concept/formation/personnel and topped up past the pool size with any
+        # concept it's short of, so a library full of near-identical scores
+        # still offers the greedy pass enough variety to fill a section
+        heap = []
+        for section in state:
+            row = scores[section.index]
+            finite = np.flatnonzero(np.isfinite(row))
+            finite = finite[np.argsort(-row[finite], kind="stable")]
+            pool = max(MIN_POOL, section.size * POOL_FACTOR)
+            groups: Dict[Tuple, int] = {}
+            concepts: Dict[Optional[str], int] = {}
+            kept = []
+            for slot in finite.tolist():
+                group = attrs(slot)
+                if groups.get(group, 0) >= GROUP_DEPTH:
+                    continue
+                # Past the pool size, only concepts the pool is still short of
+                if len(kept) >= pool and concepts.get(group[0], 0) >= GROUP_DEPTH:
+                    continue
+                groups[group] = groups.get(group, 0) + 1
+                concepts[group[0]] = concepts.get(group[0], 0) + 1
+                kept.append(slot)
+            available = len({personnel for _, _, personnel in groups})
+            section.min_personnel = min(section.min_personnel, available, section.size)
+            heap.extend((-float(row[slot]), section.index, slot) for slot in kept)
+        heapq.heapify(heap)
+
+        on_sheet: Dict[int, int] = {}
+
+        def allowed(section: _Section, slot: int) -> bool:
+            concept, formation, personnel = attrs(slot)
+            if concept in section.concepts or slot in section.picks:
+                return False
+            if section.formations.get(formation, 0) >= section.formation_cap:
+                return False
+            if slot in on_sheet:
+                if on_sheet[slot] >= max_sections_per_play:
+                    return False
+            elif len(on_sheet) >= max_plays:
+                return False
+            # Hold back the last slots for groupings the section still needs
+            needed = section.min_personnel - len(section.personnel)
+            if needed > 0 and personnel in section.personnel and needed >= section.size - len(section.picks):
+                return False
+            return True
+
+        def effective(section: _Section, slot: int) -> float:
+            return float(scores[section.index, slot]) * PERSONNEL_REPEAT_DECAY ** section.personnel.get(attrs(slot)[2], 0)
+
+        remaining = sum(section.size for section in state)
+        while heap and remaining:
+            negative, row, slot = heapq.heappop(heap)
+            section = state[row]
+            if section.full or not allowed(section, slot):
+                continue
+            # Penalties only grow, so a stale entry is re-queued at its current score
+            score = effective(section, slot)
+            if score < -negative - 1e-12 and heap and score < -heap[0][0]:
+                heapq.heappush(heap, (-score, row, slot))
+                continue
+            self._add(section, slot, attrs, on_sheet)
+            remaining -= 1
+
+        breakers = self._break_tendencies(state, scores, break_tendencies or {}, attrs, on_sheet, max_plays)
+
+        sheet = []
+        for section in state:
+            picks = sorted(section.picks, key=lambda slot: -scores[section.index, slot])
+            sheet.append({
+                "key": section.spec["key"],
+                "label": section.spec["label"],
+                "situation": {k: section.spec.get(k) for k in ("down", "distance", "field_position") if section.spec.get(k)},
+                "coverage_mix": situations[section.index]["mix"],
+                "size": section.size,
+                "unfilled": section.size - len(section.picks),
+                "plays": [
+                    {
+                        **recommender.play_info(slot),
+                        "score": round(float(scores[section.index, slot]), 4),
+                        "expected_success": round(float(expected[section.index, slot]), 4),
+                        "tendency_breaker": (section.index, slot) in breakers
+                    }
+                    for slot in picks
+                ]
+            })
+        return {
+            "sections": sheet,
+            "play_count": len(on_sheet),
+            "max_plays": max_plays,
+            "library_size": len(recommender),
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    def _break_tendencies(self, state, scores, tendencies: Dict[str, str], attrs, on_sheet, max_plays) -> set:
+        """
+        For each formation we're known to run (or pass) from, make sure the
+        sheet has at least one call of the other kind from it: the best such
+        play goes where it costs the least score, into an open slot or in
+        place of a section's weakest pick (or the pick it shares a concept with)
+        """
+        kinds = self.recommender.kinds()
+        placed = set()
+        for formation, known_for in tendencies.items():
+            formation = _key(formation)
+            if known_for not in KIND_CODES:
+                continue
+            wanted = _opposite(known_for)
+            if any(kinds[slot] == wanted and attrs(slot)[1] == formation for section in state for slot in section.picks):
+                continue
+            eligible = (kinds == wanted) & np.isfinite(scores).any(axis=0)
+            candidates = [int(slot) for slot in np.flatnonzero(eligible) if attrs(int(slot))[1] == formation]
+
+            best = None
+            for section in state:
+                if not section.size:
+                    continue
+                for slot in sorted(candidates, key=lambda c: -scores[section.index, c]):
+                    score = scores[section.index, slot]
+                    if not np.isfinite(score):
+                        break
+                    if slot in section.picks:
+                        continue
+                    victim = self._victim(section, slot, scores, attrs, placed)
+                    if victim is False:
+                        continue
+                    if slot not in on_sheet and len(on_sheet) >= max_plays and (victim is None or on_sheet[victim] > 1):
+                        continue
+                    gain = score - (scores[section.index, victim] if victim is not None else 0.0)
+                    if best is None or gain > best[0]:
+                        best = (gain, section, slot, victim)
+                    break
+            if best is None:
+                continue
+            _, section, slot, victim = best
+            if victim is not None:
+                self._drop(section, victim, attrs, on_sheet)
+            self._add(section, slot, attrs, on_sheet)
+            placed.add((section.index, slot))
+        return placed
+
+    @staticmethod
+    def _victim(section: _Section, slot: int, scores, attrs, placed: set):
+        """
+        The pick a tendency breaker would replace in this section: None when
+        there's room, False when nothing can make way
+        """
+        concept, formation, _ = attrs(slot)
+        capped = section.formations.get(formation, 0) >= section.formation_cap
+        clash = next((p for p in section.picks if attrs(p)[0] == concept), None)
+        if clash is not None:
+            if (section.index, clash) in placed or (capped and attrs(clash)[1] != formation):
+                return False
+            return clash
+        if not section.full and not capped:
+            return None
+        options = [
+            p for p in section.picks
+            if (section.index, p) not in placed and (not capped or attrs(p)[1] == formation)
+        ]
+        if not options:
+            return False
+        return min(options, key=lambda p: scores[section.index, p])
+
+    @staticmethod
+    def _add(section: _Section, slot: int, attrs, on_sheet: Dict[int, int]):
+        concept, formation, personnel = attrs(slot)
+        section.picks.append(slot)
+        section.concepts.add(concept)
+        section.formations[formation] = section.formations.get(formation, 0) + 1
+        section.personnel[personnel] = section.personnel.get(personnel, 0) + 1
+        on_sheet[slot] = on_sheet.get(slot, 0) + 1
+
+    @staticmethod
+    def _drop(section: _Section, slot: int, attrs, on_sheet: Dict[int, int]):
+        concept, formation, personnel = attrs(slot)
+        section.picks.remove(slot)
+        section.concepts.discard(concept)
+        section.formations[formation] -= 1
+        section.personnel[personnel] -= 1
+        if not section.personnel[personnel]:
+            del section.personnel[personnel]
+        on_sheet[slot] -= 1
+        if not on_sheet[slot]:
+            del on_sheet[slot]
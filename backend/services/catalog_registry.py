@@ -0,0 +1,157 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from types import MappingProxyType
+from typing import Dict, List, Optional, Tuple
+
+from services.telemetry import JSON_LOGS, log_error, log_event, timed, timed_methods
+
+DEFAULT_CATALOG_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "src", "data")
+
+# kind -> (path relative to the catalog dir, key holding the list or None)
+CATALOG_FILES = {
+    "formations": ("catalogs/formations.json", None),
+    "concepts": ("catalogs/route_concepts.json", None),
+    "expanded_concepts": ("expanded_route_concepts.json", None),
+    "protections": ("catalogs/protections.json", None),
+    "run_schemes": ("catalogs/run_schemes.json", None),
+    "base_formations": ("formations.json", "formations")
+}
+
+# Fields with secondary indexes; list-valued fields index every element
+INDEXED_FIELDS = ("personnel", "backfield", "strength", "systems", "tags", "type", "category")
+
+def _index_key(value) -> str:
+    return str(value).strip().lower()
+
+class CatalogSnapshot:
+    """
+    One immutable load of every catalog plus its indexes. Reloads build a new
+    snapshot and swap it in, so readers never see a half-built registry.
+    """
+    def __init__(self, catalog_dir: str, mtimes: Dict[str, float]):
+        self.mtimes = mtimes
+        self.version = hashlib.sha1(json.dumps(mtimes, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+        items = {}
+        positions = {}
+        indexes = {}
+        extras = {}
+        for kind, (relative_path, key) in CATALOG_FILES.items():
+            with open(os.path.join(catalog_dir, relative_path), "r") as f:
+                data = json.load(f)
+            if key:
+                extras.update({k: v for k, v in data.items() if k != key})
+                data = data[key]
+
+            kind_index: Dict[str, Dict[str, set]] = {}
+            for position, item in enumerate(data):
+                for field in INDEXED_FIELDS:
+                    if field not in item:
+                        continue
+                    values = item[field] if isinstance(item[field], list) else [item[field]]
+                    for value in values:
+                        kind_index.setdefault(field, {}).setdefault(_index_key(value), set()).add(item["id"])
+
+            items[kind] = tuple(data)
+            positions[kind] = MappingProxyType({item["id"]: i for i, item in enumerate(data)})
+            indexes[kind] = MappingProxyType({
+                field: MappingProxyType({value: frozenset(ids) for value, ids in values.items()})
+                for field, values in kind_index.items()
+            })
+
+        self.items = MappingProxyType(items)
+        self.positions = MappingProxyType(positions)
+        self.indexes = MappingProxyType(indexes)
+        self.personnel_groups = MappingProxyType(extras.get("personnel_groups", {}))
+        self.rules = MappingProxyType(extras.get("rules", {}))
+
+    def get(self, kind: str, item_id: str) -> Optional[Dict]:
+        position = self.positions[kind].get(item_id)
+        return None if position is None else self.items[kind][position]
+
+    def query(self, kind: str, filters: Dict[str, List[str]]) -> List[Dict]:
+        """
+        AND together every filter; a field given several values must match all of them
+        """
+        if kind not in self.items:
+            raise KeyError(kind)
+        matched = None
+        for field, values in filters.items():
+            field_index = self.indexes[kind].get(field, {})
+            for value in values:
+                ids = field_index.get(_index_key(value), frozenset())
+                matched = ids if matched is None else matched & ids
+        if matched is None:
+            return list(self.items[kind])
+        positions = sorted(self.positions[kind][item_id] for item_id in matched)
+        return [self.items[kind][p] for p in positions]
+
+@timed_methods("catalog")
+class CatalogRegistry:
+    """
+    Loads every catalog once and serves reads from memory. Files are re-stat'ed
+    at most every reload_interval seconds and reloaded when an mtime changes.
+    """
+    def __init__(self, catalog_dir: Optional[str] = None, reload_interval: Optional[float] = None):
+        self.catalog_dir = os.path.abspath(catalog_dir or os.getenv("CATALOG_DIR") or DEFAULT_CATALOG_DIR)
+        if reload_interval is None:
+            reload_interval = float(os.getenv("CATALOG_RELOAD_INTERVAL_SECONDS", "2"))
+        self.reload_interval = reload_interval
+        self._lock = threading.Lock()
+        self._checked_at = time.monotonic()
+        self._snapshot = CatalogSnapshot(self.catalog_dir, self._mtimes())
+
+    def _mtimes(self) -> Dict[str, float]:
+        return {
+            kind: os.stat(os.path.join(self.catalog_dir, path)).st_mtime
+            for kind, (path, _) in CATALOG_FILES.items()
+        }
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        if self.reload_interval > 0 and time.monotonic() - self._checked_at >= self.reload_interval:
+            self._maybe_reload()
+        return self._snapshot
+
+    @timed("catalog", "reload_check")
+    def _maybe_reload(self):
+        with self._lock:
+            self._checked_at = time.monotonic()
+            try:
+                mtimes = self._mtimes()
+                if mtimes != self._snapshot.mtimes:
+                    self._snapshot = CatalogSnapshot(self.catalog_dir, mtimes)
+                    if JSON_LOGS:
+                        log_event("catalog_reload", catalog_dir=self.catalog_dir)
+                    else:
+                        print(f"🏈 Catalogs reloaded from {self.catalog_dir}")
+            except Exception as e:
+                # Keep serving the last good snapshot if a file is mid-write or invalid
+                log_error(f"Catalog Reload Error: {str(e)}")
+
+    def reload(self):
+        """
+        Rebuild the snapshot now, whether or not any mtime changed
+        """
+        with self._lock:
+            self._snapshot = CatalogSnapshot(self.catalog_dir, self._mtimes())
+            self._checked_at = time.monotonic()
+
+    @property
+    def version(self) -> str:
+        return self.snapshot.version
+
+    def kinds(self) -> Tuple[str, ...]:
+        return tuple(CATALOG_FILES)
+
+    def all(self, kind: str) -> List[Dict]:
+        return list(self.snapshot.items[kind])
+
+    def get(self, kind: str, item_id: str) -> Optional[Dict]:
+        return self.snapshot.get(kind, item_id)
+
+    def query(self, kind: str, filters: Dict[str, List[str]]) -> List[Dict]:
+        return self.snapshot.query(kind, filters)
@@ -0,0 +1,281 @@
+import os
+import json
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Set
+
+import redis.asyncio as aioredis
+
+from services.play_store import PlayStore
+from services.recommender import PlayRecommender
+from services.search_index import PlaySearchIndex
+from services.similarity_index import PlaySimilarityIndex
+from services.telemetry import log_error, log_event
+
+CHANNEL = "coachgrind:events"
+RECONNECT_SECONDS = (0.5, 1.0, 2.0, 5.0)
+# Store tables the in-process indexes are derived from
+TRACKED_VERSIONS = ("plays", "outcomes")
+
+Handler = Callable[[Dict], Awaitable[None]]
+
+class LocalEventBus:
+    """
+    Single worker: there is nobody to tell, so publishing is a no-op
+    """
+    shared = False
+
+    def __init__(self):
+        self.worker_id = str(os.getpid())
+
+    async def start(self, handler: Handler, on_subscribed: Callable[[], Awaitable[None]]):
+        pass
+
+    async def publish(self, event: Dict):
+        pass
+
+    def stats(self) -> Dict:
+        return {"backend": "local", "worker_id": self.worker_id}
+
+    async def close(self):
+        pass
+
+class RedisEventBus:
+    """
+    Redis pub/sub fan-out between workers. Messages carry the publishing
+    worker's id so a worker skips its own. Pub/sub drops whatever is sent
+    while a subscriber is disconnected, so every (re)subscribe calls
+    on_subscribed, which checks the store for changes made in the gap.
+    """
+    shared = True
+
+    def __init__(self, redis_url: str, channel: str = CHANNEL):
+        self.redis = aioredis.from_url(redis_url, health_check_interval=30)
+        self.channel = channel
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.counters = {"published": 0, "received": 0, "errors": 0, "reconnects": 0}
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self, handler: Handler, on_subscribed: Callable[[], Awaitable[None]]):
+        subscribed = asyncio.Event()
+        self._task = asyncio.create_task(self._listen(handler, on_subscribed, subscribed))
+        # Don't serve requests before we can hear about other workers' writes,
+        # but don't block startup on a Redis outage either
+        try:
+            await asyncio.wait_for(subscribed.wait(), timeout=5)
+        except asyncio.TimeoutError:
+            log_error("Cluster Bus Error: not subscribed after 5s, retrying in the background")
+
+    async def _listen(self, handler: Handler, on_subscribed: Callable[[], Awaitable[None]], subscribed: asyncio.Event):
+        attempt = 0
+        while True:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(self.channel)
+                if subscribed.is_set():
+                    self.counters["reconnects"] += 1
+                subscribed.set()
+                attempt = 0
+                await on_subscribed()
+                async for message in pubsub.listen():
+                    if message.get("type") != "message":
+                        continue
+                    try:
+                        event = json.loads(message["data"])
+                    except ValueError:
+                        continue
+                    if event.get("origin") == self.worker_id:
+                        continue
+                    self.counters["received"] += 1
+                    try:
+                        await handler(event)
+                    except Exception as e:
+                        log_error(f"Cluster Event Error: {str(e)}", event_type=event.get("type"))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.counters["errors"] += 1
+                log_error(f"Cluster Bus Error: {str(e)}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(RECONNECT_SECONDS[min(attempt, len(RECONNECT_SECONDS) - 1)])
+            attempt += 1
+
+    async def publish(self, event: Dict):
+        try:
+            await self.redis.publish(self.channel, json.dumps({**event, "origin": self.worker_id}, default=str))
+            self.counters["published"] += 1
+        except Exception as e:
+            self.counters["errors"] += 1
+            log_error(f"Cluster Bus Error: {str(e)}")
+
+    def stats(self) -> Dict:
+        return {"backend": "redis", "worker_id": self.worker_id, "channel": self.channel, **self.counters}
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        await self.redis.aclose()
+
+class ClusterSync:
+    """
+    Keeps each worker's in-process state in step when several uvicorn workers
+    serve the same library. Shared state already lives outside the process
+    (plays, playbooks, sheets and outcomes in SQLite; sessions, the analysis
+    cache and rate limits in Redis when REDIS_URL is set). The derived
+    indexes (search, recommender, similarity) and the analysis cache's memory
+    tier are per worker: a write applies locally and is published, and the
+    other workers reload the affected plays from the store. Rendered SVGs are
+    keyed by a content hash, so they can't go stale and need no events.
+    """
+    def __init__(self, bus, state):
+        self.bus = bus
+        self.state = state
+        self.counters = {"published": 0, "applied": 0, "resyncs": 0}
+        self._versions: Dict[str, int] = {}
+        self._pending: Set[asyncio.Task] = set()
+        self._resync_lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls, state) -> "ClusterSync":
+        redis_url = os.getenv("REDIS_URL") or None
+        if not redis_url and int(os.getenv("WEB_CONCURRENCY", "1")) > 1:
+            log_error(
+                "Cluster Warning: WEB_CONCURRENCY > 1 without REDIS_URL; sessions, "
+                "rate limits and play indexes will differ between workers"
+            )
+        return cls(RedisEventBus(redis_url) if redis_url else LocalEventBus(), state)
+
+    @property
+    def store(self) -> PlayStore:
+        return self.state.play_store
+
+    def _store_versions(self) -> Dict[str, int]:
+        return {name: self.store.version(name) for name in TRACKED_VERSIONS}
+
+    def _build(self) -> Dict:
+        search_index = PlaySearchIndex()
+        search_index.rebuild(self.store.iter_plays())
+        recommender = PlayRecommender(self.state.catalog)
+        recommender.rebuild(self.store.iter_plays(), self.store.iter_outcomes())
+        similarity = PlaySimilarityIndex(self.state.catalog)
+        similarity.rebuild(self.store.iter_plays())
+        return {"search_index": search_index, "recommender": recommender, "similarity": similarity}
+
+    def rebuild(self):
+        """
+        Build the play indexes from the store and install them on app.state.
+        Versions are read first, so a write that lands mid-build is caught by
+        the next resync rather than lost.
+        """
+        self._versions = self._store_versions()
+        for name, index in self._build().items():
+            setattr(self.state, name, index)
+
+    async def start(self):
+        await self.bus.start(self._apply, self.resync)
+
+    async def resync(self):
+        """
+        Rebuild off the event loop if the store changed since the last build,
+        e.g. writes published while this worker was unsubscribed. Requests
+        keep using the old indexes until the new ones are swapped in, and
+        writes that land during the build trigger another pass.
+        """
+        async with self._resync_lock:
+            for _ in range(3):
+                versions = self._store_versions()
+                if versions == self._versions:
+                    return
+                built = await asyncio.to_thread(self._build)
+                for name, index in built.items():
+                    setattr(self.state, name, index)
+                self._versions = versions
+                self.counters["resyncs"] += 1
+                log_event("cluster_resync", versions=versions)
+
+    def _publish(self, event: Dict):
+        if not self.bus.shared:
+            return
+        self.counters["published"] += 1
+        task = asyncio.ensure_future(self.bus.publish(event))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    # -- local writes ------------------------------------------------------
+
+    def _index(self, records: List[Dict]):
+        for record in records:
+            self.state.search_index.add(record)
+            self.state.recommender.add_play(record)
+            self.state.similarity.add(record)
+
+    def _unindex(self, play_id: str):
+        self.state.search_index.remove(play_id)
+        self.state.recommender.remove_play(play_id)
+        self.state.similarity.remove(play_id)
+
+    def plays_saved(self, records: List[Dict]):
+        self._index(records)
+        self._publish({"type": "plays", "ids": [record["id"] for record in records]})
+
+    def play_deleted(self, play_id: str):
+        self._unindex(play_id)
+        self._publish({"type": "plays", "ids": [play_id]})
+
+    def outcomes_logged(self, rows: List[Dict]):
+        for row in rows:
+            self.state.recommender.record_outcome(row)
+        self._publish({"type": "outcomes", "rows": rows})
+
+    async def invalidate_analysis_cache(self) -> int:
+        removed = await self.state.ai_service.cache.invalidate()
+        self._publish({"type": "analysis_cache"})
+        return removed
+
+    # -- other workers' writes ---------------------------------------------
+
+    async def _apply(self, event: Dict):
+        kind = event.get("type")
+        if kind == "plays":
+            # Events carry ids only; the store has the current state, so a
+            # save and a delete arriving out of order still converge
+            ids = event.get("ids") or []
+            records = self.store.get_plays(ids)
+            self._index([records[play_id] for play_id in ids if play_id in records])
+            for play_id in ids:
+                if play_id not in records:
+                    self._unindex(play_id)
+        elif kind == "outcomes":
+            for row in event.get("rows") or []:
+                self.state.recommender.record_outcome(row)
+        elif kind == "analysis_cache":
+            self.state.ai_service.cache.clear_local()
+        else:
+            return
+        self.counters["applied"] += 1
+
+    def stats(self) -> Dict:
+        return {**self.counters, "versions": dict(self._versions), "bus": self.bus.stats()}
+
+    def collect_metrics(self):
+        yield (
+            "cluster_events_total", "counter", "Cache invalidation events published to or applied from other workers",
+            [
+                ({"direction": "published"}, self.counters["published"]),
+                ({"direction": "applied"}, self.counters["applied"])
+            ]
+        )
+        yield (
+            "cluster_resyncs_total", "counter", "Index rebuilds after missing events from other workers",
+            [({}, self.counters["resyncs"])]
+        )
+
+    async def close(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        await self.bus.close()
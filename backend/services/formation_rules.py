@@ -0,0 +1,171 @@
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+
+# Port of NFLRulesEngine.validateFormation (src/services/rules.service.ts).
+# Messages and rule order match the browser so both sides report the same thing.
+
+LOS_Y = 350  # line of scrimmage y coordinate
+LOS_TOLERANCE = 10  # same tolerance the play designer uses to set onLOS
+CENTER_X = 600
+PLAYER_COUNT = 11
+MIN_ON_LINE = 7
+MAX_BACKFIELD = 4
+
+LINEMAN_MARKERS = ("C", "LG", "RG", "LT", "RT", "OL")
+RECEIVER_MARKERS = ("WR", "X", "Y", "Z", "S", "F", "W")
+
+@lru_cache(maxsize=4096)
+def is_lineman(player_id: str) -> bool:
+    return any(marker in player_id for marker in LINEMAN_MARKERS)
+
+@lru_cache(maxsize=4096)
+def is_receiver(player_id: str) -> bool:
+    return any(marker in player_id for marker in RECEIVER_MARKERS)
+
+def _first_true(mask: np.ndarray) -> np.ndarray:
+    """
+    Column index of the first True in each row, one-hot; rows with none stay empty
+    """
+    hit = np.zeros_like(mask)
+    rows = np.flatnonzero(mask.any(axis=1))
+    hit[rows, mask[rows].argmax(axis=1)] = True
+    return hit
+
+def _extreme(x: np.ndarray, mask: np.ndarray, lowest: bool, last_on_tie: bool = False) -> np.ndarray:
+    """
+    One-hot of the masked player with the lowest/highest x in each row. Ties go
+    to the earliest player, or the latest when last_on_tie (a stable sort's
+    last element).
+    """
+    fill = np.inf if lowest else -np.inf
+    values = np.where(mask, x, fill)
+    target = values.min(axis=1, keepdims=True) if lowest else values.max(axis=1, keepdims=True)
+    at_target = mask & (values == target)
+    if last_on_tie:
+        return _first_true(at_target[:, ::-1])[:, ::-1]
+    return _first_true(at_target)
+
+def validate_batch(formations: List[Dict[str, Dict]]) -> List[Dict]:
+    """
+    Validate many formations in one pass. Each formation is a positions dict
+    ({playerId: {x, y, onLOS, eligible}}); onLOS falls back to the player's
+    distance from the line when it isn't given.
+    Returns [{"valid", "violations", "warnings"}] in input order.
+    """
+    batch = len(formations)
+    if not batch:
+        return []
+    width = max(PLAYER_COUNT, max(len(f) for f in formations))
+
+    ids = [list(f) for f in formations]
+    rows, cols, xs, ys, los, elig, roles = [], [], [], [], [], [], []
+    for row, positions in enumerate(formations):
+        for col, (player_id, pos) in enumerate(positions.items()):
+            rows.append(row)
+            cols.append(col)
+            xs.append(pos.get("x", 0))
+            ys.append(pos.get("y", 0))
+            los.append(pos.get("onLOS"))
+            elig.append(bool(pos.get("eligible")))
+            roles.append((is_lineman(player_id), is_receiver(player_id)))
+
+    # Scatter the flat per-player lists into padded (formation x player) arrays
+    index = (np.array(rows, dtype=np.intp), np.array(cols, dtype=np.intp))
+    present = np.zeros((batch, width), dtype=bool)
+    present[index] = True
+    x = np.zeros((batch, width))
+    x[index] = xs
+    given = np.array([v is not None for v in los])
+    near_line = np.abs(np.array(ys, dtype=float) - LOS_Y) < LOS_TOLERANCE
+    on_line = np.zeros((batch, width), dtype=bool)
+    on_line[index] = np.where(given, np.array([bool(v) for v in los]), near_line)
+    eligible = np.zeros((batch, width), dtype=bool)
+    eligible[index] = elig
+    role_flags = np.array(roles, dtype=bool).reshape(-1, 2)
+    lineman = np.zeros((batch, width), dtype=bool)
+    lineman[index] = role_flags[:, 0]
+    receiver = np.zeros((batch, width), dtype=bool)
+    receiver[index] = role_flags[:, 1]
+
+    line = present & on_line
+    counts = present.sum(axis=1)
+    line_counts = line.sum(axis=1)
+    backfield_counts = (present & ~on_line).sum(axis=1)
+
+    # Only the two ends of the line may be eligible, and an end can't be an ineligible lineman
+    ends = _extreme(x, line, lowest=True) | _extreme(x, line, lowest=False, last_on_tie=True)
+    covered_eligible = line & eligible & ~ends
+    ineligible_end = line & ~eligible & ends & lineman
+
+    # Outermost player on each side of the ball must be eligible if he's a receiver
+    left_end = _extreme(x, line & (x < CENTER_X), lowest=True)
+    right_end = _extreme(x, line & (x > CENTER_X), lowest=False)
+    covered_left = left_end & ~eligible & receiver
+    covered_right = right_end & ~eligible & receiver
+
+    left_linemen = (line & lineman & (x < CENTER_X)).sum(axis=1)
+    right_linemen = (line & lineman & (x > CENTER_X)).sum(axis=1)
+
+    flagged = (
+        (counts != PLAYER_COUNT)
+        | (line_counts < MIN_ON_LINE)
+        | (backfield_counts > MAX_BACKFIELD)
+        | covered_eligible.any(axis=1)
+        | ineligible_end.any(axis=1)
+        | covered_left.any(axis=1)
+        | covered_right.any(axis=1)
+        | (np.abs(left_linemen - right_linemen) > 1)
+    )
+
+    results = [{"valid": True, "violations": [], "warnings": []} for _ in range(batch)]
+    flagged_rows = np.flatnonzero(flagged)
+    if not len(flagged_rows):
+        return results
+
+    # Message building is per formation, so pull plain Python values out first
+    counts, line_counts, backfield_counts, left_linemen, right_linemen = (
+        a.tolist() for a in (counts, line_counts, backfield_counts, left_linemen, right_linemen)
+    )
+    line_problems = {}
+    for row, col in zip(*np.nonzero(covered_eligible | ineligible_end)):
+        line_problems.setdefault(row, []).append((x[row, col], col, bool(covered_eligible[row, col])))
+    side_problems = {}
+    for row, col in zip(*np.nonzero(covered_left | covered_right)):
+        side_problems.setdefault(row, []).append((not covered_left[row, col], col))
+
+    for row in flagged_rows.tolist():
+        violations = []
+        if counts[row] != PLAYER_COUNT:
+            violations.append(f"Must have exactly {PLAYER_COUNT} players, found {counts[row]}")
+        if line_counts[row] < MIN_ON_LINE:
+            violations.append(
+                f"Must have at least {MIN_ON_LINE} players on the line of scrimmage, found {line_counts[row]}"
+            )
+        if backfield_counts[row] > MAX_BACKFIELD:
+            violations.append(
+                f"Cannot have more than {MAX_BACKFIELD} players in the backfield, found {backfield_counts[row]}"
+            )
+
+        # Line violations are reported left to right, like the browser's sorted walk
+        for _, col, is_covered in sorted(line_problems.get(row, ())):
+            player_id = ids[row][col]
+            if is_covered:
+                violations.append(f"{player_id} is an eligible receiver but not on the end of the line (covered)")
+            else:
+                violations.append(f"{player_id} is on the end of the line and must be eligible or report as eligible")
+
+        # Left side first, then right
+        for _, col in sorted(side_problems.get(row, ())):
+            violations.append(f"{ids[row][col]} is covered and ineligible")
+
+        warnings = []
+        if abs(left_linemen[row] - right_linemen[row]) > 1:
+            warnings.append(f"Unbalanced line: {left_linemen[row]} linemen left, {right_linemen[row]} right")
+
+        results[row] = {"valid": not violations, "violations": violations, "warnings": warnings}
+    return results
+
+def validate_formation(positions: Dict[str, Dict]) -> Dict:
+    return validate_batch([positions])[0]
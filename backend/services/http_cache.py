@@ -0,0 +1,167 @@
+import os
+import gzip
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip only
+    brotli = None
+
+# Bump when the shape of a cached response changes, so clients holding an
+# old ETag can't get a 304 for a payload they never received
+RESPONSE_VERSION = "1"
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+def dumps(payload) -> bytes:
+    """
+    Compact JSON bytes, through orjson when it's installed
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, default=str, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    True when If-None-Match names `etag` (or any of its compressed variants)
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    for tag in header.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        tag = tag.strip('"')
+        if tag == etag or tag.rsplit("-", 1)[0] == etag:
+            return True
+    return False
+
+def _encoding(request: Request) -> Optional[str]:
+    accepted = {
+        part.split(";")[0].strip().lower()
+        for part in request.headers.get("accept-encoding", "").split(",")
+    }
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+class ResponseCache:
+    """
+    Conditional GET for read endpoints whose payload is fully determined by
+    store version counters (or the catalog version) plus the query string.
+    The ETag is computed from those before any work is done, so a poll with a
+    current If-None-Match is answered 304 without touching the data. Bodies are
+    encoded once (orjson when available), compressed above `min_compress_bytes`
+    with brotli or gzip, and kept in a byte-bounded LRU for other clients.
+    The versions live in the shared database, so every worker agrees on tags.
+    """
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, min_compress_bytes: int = 1024):
+        self.max_bytes = max_bytes
+        self.min_compress_bytes = min_compress_bytes
+        # (etag, accepted encoding) -> (body, encoding applied)
+        self._entries: "OrderedDict[Tuple[str, Optional[str]], Tuple[bytes, Optional[str]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.counters = {"not_modified": 0, "hits": 0, "misses": 0, "evictions": 0}
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+            min_compress_bytes=int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+        )
+
+    def etag(self, request: Request, versions: Iterable) -> str:
+        key = "|".join([RESPONSE_VERSION, request.url.path, request.url.query] + [str(v) for v in versions])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+
+    def _get(self, key: Tuple[str, Optional[str]]) -> Optional[Tuple[bytes, Optional[str]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _put(self, key: Tuple[str, Optional[str]], body: bytes, applied: Optional[str]):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, applied)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, (evicted, _) = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.counters["evictions"] += 1
+
+    def _encode(self, payload, encoding: Optional[str]) -> Tuple[bytes, Optional[str]]:
+        body = dumps(payload)
+        if encoding is None or len(body) < self.min_compress_bytes:
+            return body, None
+        if encoding == "br":
+            return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+
+    def respond(self, request: Request, versions: Iterable, build: Callable[[], Dict]) -> Response:
+        """
+        304 if the client is current, else the (cached) encoded body of build()
+        """
+        etag = self.etag(request, versions)
+        encoding = _encoding(request)
+        headers = {"Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        entry = self._get((etag, encoding))
+        if etag_matches(request, etag):
+            self.counters["not_modified"] += 1
+            # Name the variant this client would be sent, when we know it
+            applied = entry[1] if entry is not None else None
+            return Response(status_code=304, headers={**headers, "ETag": f'"{etag}-{applied}"' if applied else f'"{etag}"'})
+
+        if entry is not None:
+            self.counters["hits"] += 1
+            body, applied = entry
+        else:
+            self.counters["misses"] += 1
+            body, applied = self._encode(build(), encoding)
+            self._put((etag, encoding), body, applied)
+
+        headers["ETag"] = f'"{etag}-{applied}"' if applied else f'"{etag}"'
+        if applied:
+            headers["Content-Encoding"] = applied
+        return Response(content=body, media_type="application/json", headers=headers)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                **self.counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "orjson": orjson is not None,
+                "brotli": brotli is not None
+            }
+
+    def collect_metrics(self):
+        yield (
+            "response_cache_requests_total", "counter", "Conditional JSON responses by outcome",
+            [({"outcome": name}, self.counters[name]) for name in ("not_modified", "hits", "misses")]
+        )
+        yield ("response_cache_bytes", "gauge", "Encoded response bodies held in memory", [({}, self._bytes)])
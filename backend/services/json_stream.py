@@ -0,0 +1,69 @@
+import json
+from typing import Iterator, Tuple, Any
+
+class TopLevelFieldParser:
+    """
+    Incremental parser for a streamed JSON object.
+
+    Feed it text chunks as they arrive from the model; it yields each
+    top-level (key, value) pair as soon as that member is complete, without
+    waiting for the rest of the object.
+    """
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = None
+        self.done = False
+
+    def feed(self, chunk: str) -> Iterator[Tuple[str, Any]]:
+        self.buffer += chunk
+        while self._pos < len(self.buffer) and not self.done:
+            i = self._pos
+            c = self.buffer[i]
+            self._pos += 1
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                continue
+
+            if c == '"':
+                self._in_string = True
+            elif c in "{[":
+                self._depth += 1
+                if self._depth == 1 and c == "{":
+                    self._member_start = i + 1
+            elif c in "}]":
+                if self._depth == 1:
+                    yield from self._emit(i)
+                    self.done = True
+                self._depth -= 1
+            elif c == "," and self._depth == 1:
+                yield from self._emit(i)
+                self._member_start = i + 1
+
+    def _emit(self, end: int) -> Iterator[Tuple[str, Any]]:
+        if self._member_start is None:
+            return
+        member = self.buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except json.JSONDecodeError:
+            return
+        for key, value in parsed.items():
+            yield key, value
+
+    def result(self) -> Any:
+        """
+        Parse the full buffered document once the stream has ended
+        """
+        return json.loads(self.buffer)
@@ -0,0 +1,189 @@
+import os
+import time
+from collections import deque
+from typing import AsyncIterator, Dict, Optional, Tuple
+
+import httpx
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from services.prompt_builder import Prompt
+
+def empty_usage() -> Dict:
+    return {"input_tokens": 0, "output_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0}
+
+class OpenAIProvider:
+    """
+    Chat completions in JSON mode. OpenAI caches long prompt prefixes on its
+    own; the static-first prompt layout is what lets that kick in.
+    """
+    name = "openai"
+
+    def __init__(self, model: str, http_client: httpx.AsyncClient, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.model = model
+        self.client = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,  # e.g. a local stub server
+            http_client=http_client,
+            max_retries=0
+        )
+
+    def _usage(self, usage) -> Dict:
+        result = empty_usage()
+        if usage is None:
+            return result
+        result["input_tokens"] = usage.prompt_tokens or 0
+        result["output_tokens"] = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        result["cached_tokens"] = (getattr(details, "cached_tokens", None) or 0) if details else 0
+        return result
+
+    async def complete(self, prompt: Prompt, temperature: float, max_tokens: int) -> Tuple[str, Dict]:
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=prompt.messages(),
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            max_tokens=max_tokens
+        )
+        return response.choices[0].message.content, self._usage(response.usage)
+
+    async def stream(self, prompt: Prompt, temperature: float, max_tokens: int, usage: Dict) -> AsyncIterator[str]:
+        """
+        Yield content deltas; `usage` is filled in from the final chunk
+        """
+        stream = await self.client.chat.completions.create(
+            model=self.model,
+            messages=prompt.messages(),
+            response_format={"type": "json_object"},
+            temperature=temperature,
+            max_tokens=max_tokens,
+            stream=True,
+            stream_options={"include_usage": True}
+        )
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage.update(self._usage(chunk.usage))
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+
+class AnthropicProvider:
+    """
+    Messages API with the static system prompt marked as a cache breakpoint.
+    There is no JSON mode, so the reply is prefilled with "{".
+    """
+    name = "anthropic"
+
+    def __init__(self, model: str, http_client: httpx.AsyncClient, api_key: Optional[str] = None, base_url: Optional[str] = None):
+        self.model = model
+        self.client = AsyncAnthropic(
+            api_key=api_key,
+            base_url=base_url,
+            http_client=http_client,
+            max_retries=0
+        )
+
+    def _request(self, prompt: Prompt, temperature: float, max_tokens: int) -> Dict:
+        return {
+            "model": self.model,
+            "max_tokens": max_tokens,
+            "temperature": min(temperature, 1.0),
+            "system": [{"type": "text", "text": prompt.system, "cache_control": {"type": "ephemeral"}}],
+            "messages": [
+                {"role": "user", "content": prompt.user},
+                {"role": "assistant", "content": "{"}
+            ]
+        }
+
+    def _usage(self, usage, result: Optional[Dict] = None) -> Dict:
+        result = result if result is not None else empty_usage()
+        cached = getattr(usage, "cache_read_input_tokens", None) or 0
+        written = getattr(usage, "cache_creation_input_tokens", None) or 0
+        # Anthropic reports cache reads/writes separately from input_tokens
+        result["input_tokens"] = (getattr(usage, "input_tokens", None) or 0) + cached + written
+        result["cached_tokens"] = cached
+        result["cache_write_tokens"] = written
+        result["output_tokens"] = getattr(usage, "output_tokens", None) or 0
+        return result
+
+    async def complete(self, prompt: Prompt, temperature: float, max_tokens: int) -> Tuple[str, Dict]:
+        message = await self.client.beta.prompt_caching.messages.create(**self._request(prompt, temperature, max_tokens))
+        text = "".join(block.text for block in message.content if getattr(block, "type", "") == "text")
+        return "{" + text, self._usage(message.usage)
+
+    async def stream(self, prompt: Prompt, temperature: float, max_tokens: int, usage: Dict) -> AsyncIterator[str]:
+        stream = await self.client.beta.prompt_caching.messages.create(
+            **self._request(prompt, temperature, max_tokens),
+            stream=True
+        )
+        try:
+            prefill = "{"
+            async for event in stream:
+                if event.type == "message_start":
+                    self._usage(event.message.usage, usage)
+                elif event.type == "content_block_delta" and getattr(event.delta, "text", None):
+                    # Held back until real output arrives so time to first token stays honest
+                    yield prefill + event.delta.text
+                    prefill = ""
+                elif event.type == "message_delta":
+                    usage["output_tokens"] = event.usage.output_tokens or 0
+        finally:
+            await stream.close()
+
+PROVIDERS = {
+    "openai": (OpenAIProvider, "OPENAI", "gpt-4o-mini"),  # Using cost-effective model
+    "anthropic": (AnthropicProvider, "ANTHROPIC", "claude-3-5-haiku-latest")
+}
+
+def build_provider(name: str, http_client: httpx.AsyncClient, model: Optional[str] = None):
+    """
+    Provider for `name`, configured from its <NAME>_API_KEY / _BASE_URL / _MODEL env vars
+    """
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name}")
+    provider_class, prefix, default_model = PROVIDERS[name]
+    return provider_class(
+        model=model or os.getenv(f"{prefix}_MODEL", default_model),
+        http_client=http_client,
+        api_key=os.getenv(f"{prefix}_API_KEY"),
+        base_url=os.getenv(f"{prefix}_BASE_URL") or None  # e.g. a local stub server
+    )
+
+class LLMUsage:
+    """
+    Token accounting per task: totals plus the most recent calls
+    """
+    def __init__(self, recent: int = 50):
+        self.totals: Dict[str, Dict] = {}
+        self.recent = deque(maxlen=recent)
+
+    def record(self, task: str, provider: str, model: str, usage: Dict, latency: float):
+        totals = self.totals.setdefault(task, {"calls": 0, "latency_seconds": 0.0, **empty_usage()})
+        totals["calls"] += 1
+        totals["latency_seconds"] += latency
+        for key, value in usage.items():
+            totals[key] = totals.get(key, 0) + value
+        self.recent.append({
+            "task": task,
+            "provider": provider,
+            "model": model,
+            "latency_ms": round(latency * 1000, 1),
+            "at": time.time(),
+            **usage
+        })
+
+    def stats(self) -> Dict:
+        by_task = {}
+        for task, totals in self.totals.items():
+            calls = totals["calls"] or 1
+            by_task[task] = {
+                **{k: v for k, v in totals.items() if k != "latency_seconds"},
+                "avg_input_tokens": round(totals["input_tokens"] / calls, 1),
+                "avg_output_tokens": round(totals["output_tokens"] / calls, 1),
+                "cached_ratio": round(totals["cached_tokens"] / totals["input_tokens"], 3) if totals["input_tokens"] else 0.0,
+                "avg_latency_ms": round(totals["latency_seconds"] / calls * 1000, 1)
+            }
+        return {"by_task": by_task, "recent": list(self.recent)[-10:]}
@@ -0,0 +1,424 @@
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+import httpx
+
+from services.llm_providers import LLMUsage, build_provider, empty_usage
+from services.prompt_builder import Prompt
+from services.telemetry import LLM_DURATION, LLM_FAILOVERS, LLM_HEDGES, LLM_TOKENS, log_error, log_event
+
+# Latency samples needed before a route is ranked on its own numbers
+MIN_SAMPLES = 5
+# Hedge delay used with LLM_HEDGE_DELAY_SECONDS=auto until the primary has samples
+DEFAULT_HEDGE_DELAY = 2.0
+MIN_HEDGE_DELAY = 0.05
+
+class LLMUnavailable(Exception):
+    """
+    Raised when every provider failed or is behind an open circuit breaker
+    """
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class RollingStats:
+    """
+    Latency and outcome of the last `window` calls to one model
+    """
+    def __init__(self, window: int = 200):
+        self.latencies = deque(maxlen=window)
+        self.outcomes = deque(maxlen=window)
+
+    def record(self, latency: float, ok: bool):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+
+    def record_latency(self, latency: float):
+        """
+        A lower bound from a call that was cancelled or timed out
+        """
+        self.latencies.append(latency)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    @property
+    def error_rate(self) -> float:
+        if not self.outcomes:
+            return 0.0
+        return 1 - sum(self.outcomes) / len(self.outcomes)
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single probe through (half-open)
+    """
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def available(self) -> bool:
+        if self.state == self.OPEN:
+            return time.monotonic() - self.opened_at >= self.reset_timeout
+        if self.state == self.HALF_OPEN:
+            return not self._probing
+        return True
+
+    def acquire(self) -> bool:
+        if not self.available():
+            return False
+        if self.state == self.OPEN:
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            self._probing = True
+        return True
+
+    def release(self):
+        """
+        The call was cancelled; free the probe slot without a verdict
+        """
+        self._probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def retry_after(self) -> float:
+        if self.state != self.OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+class LLMRoute:
+    """
+    One provider + model the router can send a prompt to
+    """
+    def __init__(self, provider, breaker: CircuitBreaker, window: int = 200):
+        self.provider = provider
+        self.breaker = breaker
+        self.stats = RollingStats(window)
+        self.name = f"{provider.name}:{provider.model}"
+
+    def score(self) -> Optional[float]:
+        """
+        Expected seconds to a good answer: p95 inflated by the error rate
+        """
+        if len(self.stats.outcomes) < MIN_SAMPLES:
+            return None
+        p95 = self.stats.percentile(95)
+        if p95 is None:
+            return math.inf
+        return p95 / max(0.05, 1 - self.stats.error_rate)
+
+def _consume(task: asyncio.Task):
+    if not task.cancelled():
+        task.exception()
+
+class LLMRouter:
+    """
+    Sends each prompt to the healthiest route (lowest score; unmeasured routes
+    are tried first so they get measured). If no answer arrives within the
+    hedge delay, the same prompt goes to the next-best route and whichever
+    finishes first wins; the other call is cancelled. Failed calls fail over
+    to the next route. Each provider has a circuit breaker shared by its models.
+
+    A call that runs past the caller's timeout, or a primary that loses to its
+    hedge, counts as a failure for the route and its breaker; a hedge that
+    loses to the primary, or a call cancelled with the request, doesn't.
+    """
+    def __init__(
+        self,
+        providers: List,
+        hedge_delay: Optional[float] = None,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        window: int = 200
+    ):
+        if not providers:
+            raise ValueError("LLMRouter needs at least one provider")
+        self.hedge_delay = hedge_delay  # None = the primary's rolling p95; <= 0 disables hedging
+        breakers: Dict[str, CircuitBreaker] = {}
+        self.routes = [
+            LLMRoute(provider, breakers.setdefault(provider.name, CircuitBreaker(failure_threshold, reset_timeout)), window)
+            for provider in providers
+        ]
+        self.breakers = breakers
+        self.usage = LLMUsage()
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+
+    @classmethod
+    def from_env(cls, http_client: httpx.AsyncClient) -> "LLMRouter":
+        """
+        LLM_PROVIDERS is a comma-separated list of provider[:model] entries,
+        e.g. "openai:gpt-4o-mini,anthropic:claude-3-5-haiku-latest"; without
+        it the single LLM_PROVIDER is used
+        """
+        spec = os.getenv("LLM_PROVIDERS") or os.getenv("LLM_PROVIDER", "openai")
+        providers = []
+        for entry in spec.split(","):
+            name, _, model = entry.strip().partition(":")
+            if name:
+                providers.append(build_provider(name.lower(), http_client, model or None))
+
+        hedge = os.getenv("LLM_HEDGE_DELAY_SECONDS", "auto").strip().lower()
+        return cls(
+            providers,
+            hedge_delay=None if hedge == "auto" else float(hedge),
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30")),
+            window=int(os.getenv("LLM_LATENCY_WINDOW", "200"))
+        )
+
+    def ranked(self) -> List[LLMRoute]:
+        """
+        Routes whose breaker would let a call through, best first
+        """
+        available = [route for route in self.routes if route.breaker.available()]
+        order = {id(route): index for index, route in enumerate(self.routes)}
+        return sorted(available, key=lambda r: (r.score() is not None, r.score() or 0.0, order[id(r)]))
+
+    def _hedge_after(self, route: LLMRoute) -> Optional[float]:
+        if self.hedge_delay is not None:
+            return self.hedge_delay if self.hedge_delay > 0 else None
+        p95 = route.stats.percentile(95) if len(route.stats.latencies) >= MIN_SAMPLES else None
+        return max(MIN_HEDGE_DELAY, p95) if p95 is not None else DEFAULT_HEDGE_DELAY
+
+    def _unavailable(self, errors: List[str]) -> LLMUnavailable:
+        waits = [b.retry_after() for b in self.breakers.values() if b.state == CircuitBreaker.OPEN]
+        retry_after = max(1, math.ceil(min(waits))) if waits else 5
+        detail = "; ".join(errors) if errors else "all circuit breakers are open"
+        return LLMUnavailable(f"AI service is unavailable ({detail})", retry_after=retry_after)
+
+    def _observe(self, task: str, route: LLMRoute, outcome: str, elapsed: float):
+        LLM_DURATION.labels(task, route.name, outcome).observe(elapsed)
+        log_event("llm_call", task=task, route=route.name, outcome=outcome, latency_ms=round(elapsed * 1000, 1))
+
+    def _failed(self, task: str, route: LLMRoute, started: float, error: BaseException, errors: List[str]):
+        elapsed = time.perf_counter() - started
+        route.stats.record(elapsed, False)
+        route.breaker.record_failure()
+        errors.append(f"{route.name}: {type(error).__name__}: {error}")
+        self._observe(task, route, "error", elapsed)
+        log_error(f"LLM Router Error: {route.name} failed: {str(error)}", route=route.name)
+
+    def _succeeded(self, task: str, route: LLMRoute, started: float, hedged: bool):
+        elapsed = time.perf_counter() - started
+        route.stats.record(elapsed, True)
+        route.breaker.record_success()
+        self._observe(task, route, "ok", elapsed)
+        if hedged:
+            self.hedge_wins += 1
+
+    def _abandon(self, task: str, route: LLMRoute, started: float, call: asyncio.Task, outcome: str = "cancelled"):
+        """
+        Cancel a call; its elapsed time still counts as a latency lower bound.
+        "timeout" and "lost" (a primary beaten by its hedge) are failures,
+        "cancelled" frees the breaker without a verdict.
+        """
+        call.cancel()
+        elapsed = time.perf_counter() - started
+        route.stats.record_latency(elapsed)
+        if outcome == "cancelled":
+            route.breaker.release()
+        else:
+            route.stats.record(elapsed, False)
+            route.breaker.record_failure()
+        self._observe(task, route, outcome, elapsed)
+
+    def _record_usage(self, task: str, route: LLMRoute, usage: Dict, started: float, span: Optional[Dict]):
+        self.usage.record(task, route.provider.name, route.provider.model, usage, time.perf_counter() - started)
+        for kind, count in usage.items():
+            if count:
+                LLM_TOKENS.labels(task, route.name, kind.replace("_tokens", "")).inc(count)
+        if span is not None:
+            span.update(usage)
+
+    async def _race(
+        self,
+        task: str,
+        start_call,
+        span: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> Tuple[object, LLMRoute, float]:
+        """
+        Run calls built by start_call(route) -> awaitable across the ranked routes
+        with hedging and failover. Returns the first successful result with its
+        route and start time; every other call has been cancelled. `span`, if
+        given, gets the winning route, its latency and whether it was a hedge.
+        Raises LLMUnavailable if nothing answers within `timeout` seconds.
+        """
+        candidates = self.ranked()
+        if not candidates:
+            raise self._unavailable([])
+
+        pending: Dict[asyncio.Task, Tuple[LLMRoute, float, bool]] = {}
+        errors: List[str] = []
+
+        def launch(hedge: bool) -> bool:
+            while candidates:
+                route = candidates.pop(0)
+                if route.breaker.acquire():
+                    task = asyncio.ensure_future(start_call(route))
+                    task.add_done_callback(_consume)
+                    pending[task] = (route, time.perf_counter(), hedge)
+                    return True
+            return False
+
+        launch(hedge=False)
+        hedge_launched = False
+        hedge_at = None
+        deadline = time.perf_counter() + timeout if timeout else None
+        winner_hedged = None
+        if pending:
+            primary = next(iter(pending.values()))[0]
+            delay = self._hedge_after(primary)
+            hedge_at = time.perf_counter() + delay if delay is not None else None
+        try:
+            while pending:
+                wake = [at for at in (hedge_at if candidates else None, deadline) if at is not None]
+                wait = max(0.0, min(wake) - time.perf_counter()) if wake else None
+                done, _ = await asyncio.wait(pending, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+                if not done and deadline is not None and time.perf_counter() >= deadline:
+                    for call, (route, started, _) in pending.items():
+                        self._abandon(task, route, started, call, "timeout")
+                        errors.append(f"{route.name}: no answer within {timeout:g}s")
+                    log_error(f"LLM Router Error: timed out after {timeout:g}s", task=task)
+                    pending.clear()
+                    break
+                if not done:
+                    hedge_at = None
+                    if launch(hedge=True):
+                        hedge_launched = True
+                        self.hedges += 1
+                    continue
+                for call in done:
+                    route, started, hedged = pending.pop(call)
+                    if call.exception() is None:
+                        winner_hedged = hedged
+                        self._succeeded(task, route, started, hedged)
+                        if hedge_launched:
+                            LLM_HEDGES.labels("hedge" if hedged else "primary").inc()
+                        if span is not None:
+                            span.update(
+                                route=route.name,
+                                provider_latency_ms=round((time.perf_counter() - started) * 1000, 1),
+                                hedged=hedged,
+                                failed_attempts=len(errors)
+                            )
+                        return call.result(), route, started
+                    self._failed(task, route, started, call.exception(), errors)
+                if not pending and candidates:
+                    self.failovers += 1
+                    LLM_FAILOVERS.labels().inc()
+                    launch(hedge=False)
+        finally:
+            for call, (route, started, hedged) in pending.items():
+                lost = winner_hedged is True and not hedged
+                self._abandon(task, route, started, call, "lost" if lost else "cancelled")
+        raise self._unavailable(errors)
+
+    async def complete(
+        self,
+        prompt: Prompt,
+        temperature: float,
+        max_tokens: int,
+        span: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> str:
+        async def call(route: LLMRoute):
+            return await route.provider.complete(prompt, temperature, max_tokens)
+
+        (content, usage), route, started = await self._race(prompt.task, call, span, timeout)
+        self._record_usage(prompt.task, route, usage, started, span)
+        return content
+
+    async def stream(
+        self,
+        prompt: Prompt,
+        temperature: float,
+        max_tokens: int,
+        span: Optional[Dict] = None,
+        timeout: Optional[float] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streaming calls race on time to first token; once a route has produced
+        output the others are cancelled and there is no failover mid-stream.
+        Route latency stats for streams are time to first token, and `timeout`
+        covers the wait for it.
+        """
+        ready = {}
+
+        async def first_delta(route: LLMRoute):
+            usage = empty_usage()
+            deltas = route.provider.stream(prompt, temperature, max_tokens, usage)
+            try:
+                first = await deltas.__anext__()
+            except StopAsyncIteration:
+                first = ""
+            except BaseException:
+                await deltas.aclose()
+                raise
+            ready[route.name] = (deltas, usage)
+            return first
+
+        first, route, started = await self._race(prompt.task, first_delta, span, timeout)
+        deltas, usage = ready.pop(route.name)
+        # Losers that answered in the same tick as the winner; cancelled ones closed themselves
+        for other, _ in ready.values():
+            await other.aclose()
+        try:
+            yield first
+            async for delta in deltas:
+                yield delta
+        except Exception:
+            route.breaker.record_failure()
+            raise
+        finally:
+            await deltas.aclose()
+        self._record_usage(prompt.task, route, usage, started, span)
+
+    def stats(self) -> Dict:
+        routes = []
+        for route in self.routes:
+            p50, p95 = route.stats.percentile(50), route.stats.percentile(95)
+            routes.append({
+                "route": route.name,
+                "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+                "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+                "error_rate": round(route.stats.error_rate, 3),
+                "samples": len(route.stats.outcomes),
+                "breaker": route.breaker.state
+            })
+        return {
+            "routes": routes,
+            "ranking": [route.name for route in self.ranked()],
+            "hedge_delay": self.hedge_delay if self.hedge_delay is not None else "auto",
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "failovers": self.failovers
+        }
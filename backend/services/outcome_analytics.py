@@ -0,0 +1,204 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from services.analysis_engine import PlayAnalysisEngine
+from services.catalog_registry import CatalogRegistry
+from services.outcomes import is_explosive, is_success, normalize_label, situation_key
+from services.play_store import PlayStore
+
+ROLLUP_LEVELS = ("play", "concept", "formation")
+ROLLUP_DIMENSIONS = {
+    "coverage": "by_coverage",
+    "front": "by_front",
+    "situation": "by_situation",
+    "opponent": "by_opponent"
+}
+ALL_TIME = "*"
+
+def week_start(day) -> str:
+    """
+    Monday of the game's week, the bucket date ranges are aggregated on
+    """
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    return (day - timedelta(days=day.weekday())).isoformat()
+
+def _stats(plays: int, yards: int, successes: int, explosives: int) -> Dict:
+    return {
+        "plays": plays,
+        "yards_per_play": round(yards / plays, 2) if plays else 0.0,
+        "success_rate": round(successes / plays, 4) if plays else 0.0,
+        "explosive_rate": round(explosives / plays, 4) if plays else 0.0
+    }
+
+class OutcomeAnalytics:
+    """
+    Materialized outcome rollups per play, concept and formation.
+
+    Each logged outcome increments all-time and weekly counters (plays, yards,
+    successes, explosives) overall and per coverage, front, down-and-distance
+    bucket and opponent, so dashboards read a few dozen rows instead of
+    scanning play_outcomes.
+
+    The play's concept, formation and run/pass call are stored on the outcome
+    when it is logged, and a rebuild counts it under those, so rebuilt and
+    incremental rollups agree after a play is edited or deleted.
+    """
+    def __init__(self, store: PlayStore, catalog: CatalogRegistry):
+        self.store = store
+        self.engine = PlayAnalysisEngine(catalog)
+
+    def _keys(self, outcome: Dict) -> List[Tuple[str, str]]:
+        keys = [("play", outcome["play_id"])]
+        concept = normalize_label(outcome.get("concept"))
+        if concept:
+            keys.append(("concept", concept))
+        formation = normalize_label(outcome.get("formation"))
+        if formation:
+            keys.append(("formation", formation))
+        return keys
+
+    def _is_run(self, play: Dict) -> bool:
+        match = self.engine.resolve_concept(play.get("concept"), play.get("name", ""))
+        return bool(match and match[0] == "run")
+
+    def attribute(self, outcome: Dict, play: Dict) -> Dict:
+        """
+        The outcome with the play's concept, formation and run/pass call it is counted under
+        """
+        return {
+            **outcome,
+            "concept": play.get("concept"),
+            "formation": play.get("formation"),
+            "is_run": int(self._is_run(play))
+        }
+
+    def rollup_rows(self, outcome: Dict) -> List[Tuple]:
+        """
+        Rollup increments for one attributed outcome
+        """
+        counts = (
+            1,
+            outcome.get("yards_gained") or 0,
+            int(is_success(outcome)),
+            int(is_explosive(outcome, bool(outcome["is_run"])))
+        )
+        buckets = [
+            ("all", ""),
+            ("coverage", normalize_label(outcome.get("coverage")) or "unknown"),
+            ("front", normalize_label(outcome.get("defensive_front")) or "unknown"),
+            ("situation", situation_key(outcome.get("down"), outcome.get("distance")) or "unknown"),
+            ("opponent", (outcome.get("opponent") or "").strip() or "unknown")
+        ]
+        week = week_start(outcome["game_date"])
+        return [
+            (level, key, period, dimension, bucket) + counts
+            for level, key in self._keys(outcome)
+            for period in (ALL_TIME, week)
+            for dimension, bucket in buckets
+        ]
+
+    def log_outcomes(self, outcomes: List[Dict], plays: Dict[str, Dict]) -> List[Dict]:
+        """
+        Store outcomes and their rollup increments in one transaction.
+        plays maps play_id to the stored play record.
+        """
+        attributed = [self.attribute(outcome, plays[outcome["play_id"]]["play"]) for outcome in outcomes]
+        rollups = [row for outcome in attributed for row in self.rollup_rows(outcome)]
+        return self.store.log_outcomes(attributed, rollups=rollups)
+
+    def rebuild(self, batch_size: int = 5000) -> int:
+        """
+        Recompute every rollup from play_outcomes, e.g. after a backfill.
+        Backfilled outcomes without attribution are counted under their play
+        as it is now, or skipped if it has been deleted. Outcomes logged while
+        the rebuild runs are folded in before the rollups are swapped.
+        Returns the number of outcomes processed.
+        """
+        totals: Dict[Tuple, List[int]] = {}
+        through = self.store.last_outcome_seq()
+        processed = self._accumulate(totals, self.store.iter_outcomes(batch_size, through_seq=through), batch_size)
+        while not self.store.replace_rollups([key + tuple(counts) for key, counts in totals.items()], through):
+            latest = self.store.last_outcome_seq()
+            processed += self._accumulate(
+                totals, self.store.iter_outcomes(batch_size, after_seq=through, through_seq=latest), batch_size
+            )
+            through = latest
+        return processed
+
+    def _accumulate(self, totals: Dict[Tuple, List[int]], outcomes, batch_size: int) -> int:
+        processed = 0
+        batch: List[Dict] = []
+
+        def flush():
+            unattributed = [o["play_id"] for o in batch if o.get("is_run") is None]
+            plays = self.store.get_plays(list(set(unattributed))) if unattributed else {}
+            for outcome in batch:
+                if outcome.get("is_run") is None:
+                    record = plays.get(outcome["play_id"])
+                    if record is None:
+                        continue
+                    outcome = self.attribute(outcome, record["play"])
+                for row in self.rollup_rows(outcome):
+                    counts = totals.setdefault(row[:5], [0, 0, 0, 0])
+                    for i, value in enumerate(row[5:]):
+                        counts[i] += value
+            batch.clear()
+
+        for outcome in outcomes:
+            batch.append(outcome)
+            processed += 1
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+        return processed
+
+    def _level_key(self, level: str, key: str) -> str:
+        return key if level == "play" else normalize_label(key)
+
+    def summary(self, level: str, key: str, start: Optional[date] = None, end: Optional[date] = None) -> Dict:
+        """
+        Stats for one play/concept/formation, all-time or over the weeks that
+        contain start..end
+        """
+        key = self._level_key(level, key)
+        weeks = None
+        if start or end:
+            weeks = (week_start(start) if start else "0000-00-00", week_start(end) if end else "9999-12-31")
+        rows = self.store.rollups(level, key, weeks)
+
+        totals: Dict[Tuple[str, str], List[int]] = {}
+        for row in rows:
+            counts = totals.setdefault((row["dimension"], row["bucket"]), [0, 0, 0, 0])
+            counts[0] += row["plays"]
+            counts[1] += row["yards"]
+            counts[2] += row["successes"]
+            counts[3] += row["explosives"]
+
+        summary = {"level": level, "key": key, **_stats(*totals.get(("all", ""), [0, 0, 0, 0]))}
+        for dimension, field in ROLLUP_DIMENSIONS.items():
+            summary[field] = {
+                bucket: _stats(*counts)
+                for (row_dimension, bucket), counts in sorted(totals.items())
+                if row_dimension == dimension
+            }
+
+        if weeks:
+            weekly = [row for row in rows if row["dimension"] == "all"]
+        else:
+            weekly = self.store.weekly_totals(level, key)
+        summary["weekly"] = [
+            {"week": row["week"], **_stats(row["plays"], row["yards"], row["successes"], row["explosives"])}
+            for row in weekly
+        ]
+        return summary
+
+    def leaders(self, level: str, min_plays: int = 1, limit: int = 25) -> List[Dict]:
+        """
+        Best all-time success rates at a level (e.g. top concepts)
+        """
+        return [
+            {"key": row["key"], **_stats(row["plays"], row["yards"], row["successes"], row["explosives"])}
+            for row in self.store.rollup_leaders(level, min_plays, limit)
+        ]
@@ -0,0 +1,67 @@
+import re
+from typing import Dict, Optional
+
+# Field position enum from 001_initial_schema.sql, own goal line to opponent's
+FIELD_POSITIONS = (
+    "own_1_10", "own_11_20", "own_21_30", "own_31_40", "own_41_50",
+    "opp_49_40", "opp_39_30", "opp_29_20", "opp_19_10", "opp_9_goal"
+)
+RED_ZONE = {"opp_19_10", "opp_9_goal"}
+HASH_MARKS = ("left", "middle", "right")
+
+SUCCESS_RESULTS = {"touchdown", "first_down"}
+FAILURE_RESULTS = {"interception", "fumble", "fumble_lost", "sack", "safety", "turnover"}
+
+# Share of the line to gain that counts as a successful play, by down
+SUCCESS_THRESHOLDS = {1: 0.4, 2: 0.6}
+EXPLOSIVE_PASS_YARDS = 16
+EXPLOSIVE_RUN_YARDS = 12
+
+_LABEL_RE = re.compile(r"[^a-z0-9]+")
+
+def normalize_label(label: Optional[str]) -> str:
+    """
+    "Cover 3" / "cover-3" / "COVER_3" -> "cover_3"
+    """
+    return _LABEL_RE.sub("_", (label or "").lower()).strip("_")
+
+def is_success(outcome: Dict) -> bool:
+    """
+    Standard success rate: 40% of the line to gain on 1st down, 60% on 2nd,
+    all of it on 3rd/4th. Scores and first downs always count.
+    """
+    result = normalize_label(outcome.get("result"))
+    if result in SUCCESS_RESULTS:
+        return True
+    if result in FAILURE_RESULTS:
+        return False
+    yards = outcome.get("yards_gained")
+    if yards is None:
+        return False
+    down = outcome.get("down")
+    distance = outcome.get("distance")
+    if not down or not distance:
+        return yards >= 4
+    return yards >= distance * SUCCESS_THRESHOLDS.get(down, 1.0)
+
+def is_explosive(outcome: Dict, is_run: bool = False) -> bool:
+    yards = outcome.get("yards_gained") or 0
+    return yards >= (EXPLOSIVE_RUN_YARDS if is_run else EXPLOSIVE_PASS_YARDS)
+
+def distance_bucket(distance: Optional[int]) -> str:
+    if distance is None:
+        return "any"
+    if distance <= 3:
+        return "short"
+    if distance <= 6:
+        return "medium"
+    return "long"
+
+def situation_key(down: Optional[int], distance: Optional[int]) -> Optional[str]:
+    """
+    Down-and-distance bucket in the opponent_tendencies format, e.g. "3rd_and_long"
+    """
+    if not down:
+        return None
+    ordinal = {1: "1st", 2: "2nd", 3: "3rd", 4: "4th"}.get(down, f"{down}th")
+    return f"{ordinal}_and_{distance_bucket(distance)}"
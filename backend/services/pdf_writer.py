@@ -0,0 +1,89 @@
+import zlib
+from typing import List
+
+# Object numbers fixed up front so pages can point at them before they exist
+_CATALOG = 1
+_PAGES = 2
+_FONT_REGULAR = 3
+_FONT_BOLD = 4
+_FIRST_FREE = 5
+
+def pdf_string(text: str) -> bytes:
+    """
+    Literal string for a content stream, in the fonts' WinAnsiEncoding
+    (cp1252, so dashes, curly quotes and bullets survive); anything else becomes "?"
+    """
+    data = str(text).encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+class StreamingPDFWriter:
+    """
+    Minimal PDF 1.4 writer that emits bytes as pages are added, so a whole
+    book never has to sit in memory. Only the object offsets are kept; the
+    page tree and xref table go out in finish(). Text uses the standard
+    Helvetica fonts, which every viewer ships, so nothing is embedded.
+    """
+    def __init__(self, width: float = 792, height: float = 612, compress: bool = True):
+        self.width = width
+        self.height = height
+        self.compress = compress
+        self._offsets = {}
+        self._position = 0
+        self._next_object = _FIRST_FREE
+        self._pages: List[int] = []
+
+    def _emit(self, data: bytes) -> bytes:
+        self._position += len(data)
+        return data
+
+    def _object(self, number: int, body: bytes) -> bytes:
+        self._offsets[number] = self._position
+        return self._emit(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+
+    def _allocate(self) -> int:
+        number = self._next_object
+        self._next_object += 1
+        return number
+
+    def header(self) -> bytes:
+        out = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        out += self._object(_FONT_REGULAR, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        out += self._object(_FONT_BOLD, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        return out
+
+    def add_page(self, content: bytes) -> bytes:
+        """
+        Append one page drawn by a content stream (fonts are /F1 and /F2)
+        """
+        stream_number = self._allocate()
+        page_number = self._allocate()
+        if self.compress:
+            content = zlib.compress(content, 6)
+            stream = b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content)
+        else:
+            stream = b"<< /Length %d >>\nstream\n" % len(content)
+        out = self._object(stream_number, stream + content + b"\nendstream")
+        out += self._object(
+            page_number,
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %s %s] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> >>"
+            % (_PAGES, _fmt(self.width), _fmt(self.height), stream_number, _FONT_REGULAR, _FONT_BOLD)
+        )
+        self._pages.append(page_number)
+        return out
+
+    def finish(self) -> bytes:
+        kids = b" ".join(b"%d 0 R" % n for n in self._pages)
+        out = self._object(_PAGES, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self._pages)))
+        out += self._object(_CATALOG, b"<< /Type /Catalog /Pages %d 0 R >>" % _PAGES)
+
+        xref_at = self._position
+        total = self._next_object
+        rows = [b"xref\n0 %d\n" % total, b"0000000000 65535 f \n"]
+        for number in range(1, total):
+            rows.append(b"%010d 00000 n \n" % self._offsets[number])
+        rows.append(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (total, _CATALOG, xref_at))
+        return out + self._emit(b"".join(rows))
+
+def _fmt(value: float) -> bytes:
+    return (b"%d" % value) if float(value).is_integer() else (b"%.2f" % value)
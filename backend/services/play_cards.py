@@ -0,0 +1,392 @@
+import re
+import math
+import textwrap
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from services.pdf_writer import pdf_string
+from services.play_renderer import FIELD_HEIGHT, FIELD_WIDTH, LINEMEN, LOS_Y, render_svg
+
+# Letter landscape, in points
+PAGE_WIDTH = 792
+PAGE_HEIGHT = 612
+MARGIN = 36
+DIAGRAM_SCALE = 0.6  # 1200x600 field -> 720x360 pt
+
+CARD_SECTIONS = (
+    ("What it is", "what_it_is"),
+    ("When to call", "when_to_call"),
+    ("Strengths", "strengths"),
+    ("Weaknesses", "weaknesses")
+)
+
+_PATH_TOKEN_RE = re.compile(r"[MmLlHhVvCcSsQqTtAaZz]|-?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_PARAMS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+
+def card_fields(record: Dict, analysis: Dict, description: Optional[str] = None) -> Dict:
+    """
+    Everything a play card shows, as plain data so it can cross to a worker process
+    """
+    play = record["play"]
+    concept = play.get("concept") or ""
+    what_it_is = play.get("description") or description or (
+        f"{concept} from {play.get('formation')}" if concept else play.get("formation") or ""
+    )
+    return {
+        "id": record["id"],
+        "name": play.get("name") or "Play",
+        "subtitle": " | ".join(
+            part for part in (
+                play.get("formation"),
+                f"{play.get('personnel')} personnel" if play.get("personnel") else None,
+                concept or None
+            ) if part
+        ),
+        "what_it_is": [what_it_is] if what_it_is else [],
+        "when_to_call": list(analysis.get("whenToCall") or []),
+        "strengths": list(analysis.get("strengths") or []),
+        "weaknesses": list(analysis.get("weaknesses") or []),
+        "play": play
+    }
+
+# -- SVG path data -> absolute polyline/curve segments --------------------
+
+def path_segments(d: str) -> List[Tuple]:
+    """
+    Parse SVG path data into absolute ("M", x, y), ("L", x, y),
+    ("C", x1, y1, x2, y2, x, y) and ("Z",) segments. Quadratics become cubics
+    and arcs become straight lines to their end point.
+    """
+    tokens = _PATH_TOKEN_RE.findall(d or "")
+    segments: List[Tuple] = []
+    x = y = start_x = start_y = 0.0
+    last_control = None
+    command = None
+    i = 0
+    while i < len(tokens):
+        if tokens[i].isalpha():
+            command = tokens[i]
+            i += 1
+            if command in "Zz":
+                segments.append(("Z",))
+                x, y = start_x, start_y
+                last_control = None
+                continue
+        if command is None:
+            break
+        upper = command.upper()
+        count = _PARAMS[upper]
+        if i + count > len(tokens) or any(t.isalpha() for t in tokens[i:i + count]):
+            break
+        values = [float(t) for t in tokens[i:i + count]]
+        i += count
+        relative = command.islower()
+
+        def point(px, py):
+            return (x + px, y + py) if relative else (px, py)
+
+        if upper == "M":
+            x, y = point(*values)
+            start_x, start_y = x, y
+            segments.append(("M", x, y))
+            command = "l" if relative else "L"  # extra pairs after M are line-tos
+            last_control = None
+        elif upper in ("L", "T", "A"):
+            if upper == "A":
+                values = values[5:]
+            if upper == "T" and last_control:
+                cx, cy = 2 * x - last_control[0], 2 * y - last_control[1]
+                nx, ny = point(*values)
+                segments.append(_quad(x, y, cx, cy, nx, ny))
+                last_control = (cx, cy)
+            else:
+                nx, ny = point(*values)
+                segments.append(("L", nx, ny))
+                last_control = None
+            x, y = nx, ny
+        elif upper == "H":
+            x = x + values[0] if relative else values[0]
+            segments.append(("L", x, y))
+            last_control = None
+        elif upper == "V":
+            y = y + values[0] if relative else values[0]
+            segments.append(("L", x, y))
+            last_control = None
+        elif upper == "C":
+            x1, y1 = point(values[0], values[1])
+            x2, y2 = point(values[2], values[3])
+            nx, ny = point(values[4], values[5])
+            segments.append(("C", x1, y1, x2, y2, nx, ny))
+            last_control = (x2, y2)
+            x, y = nx, ny
+        elif upper == "S":
+            x1, y1 = (2 * x - last_control[0], 2 * y - last_control[1]) if last_control else (x, y)
+            x2, y2 = point(values[0], values[1])
+            nx, ny = point(values[2], values[3])
+            segments.append(("C", x1, y1, x2, y2, nx, ny))
+            last_control = (x2, y2)
+            x, y = nx, ny
+        elif upper == "Q":
+            cx, cy = point(values[0], values[1])
+            nx, ny = point(values[2], values[3])
+            segments.append(_quad(x, y, cx, cy, nx, ny))
+            last_control = (cx, cy)
+            x, y = nx, ny
+    return segments
+
+def _quad(x0, y0, cx, cy, x, y) -> Tuple:
+    return (
+        "C",
+        x0 + 2 / 3 * (cx - x0), y0 + 2 / 3 * (cy - y0),
+        x + 2 / 3 * (cx - x), y + 2 / 3 * (cy - y),
+        x, y
+    )
+
+# -- PDF -------------------------------------------------------------------
+
+class _PageCanvas:
+    """
+    Collects content-stream operators, mapping field pixels onto the page
+    """
+    def __init__(self, origin_x: float, origin_y: float, scale: float):
+        self.ops: List[bytes] = []
+        self.origin_x = origin_x
+        self.origin_y = origin_y
+        self.scale = scale
+
+    def to_page(self, x: float, y: float) -> Tuple[float, float]:
+        return self.origin_x + x * self.scale, self.origin_y + (FIELD_HEIGHT - y) * self.scale
+
+    def op(self, text: str):
+        self.ops.append(text.encode("latin-1"))
+
+    def color(self, hex_color: str, stroke: bool):
+        value = hex_color.lstrip("#")
+        if len(value) == 3:
+            value = "".join(c * 2 for c in value)
+        r, g, b = (int(value[i:i + 2], 16) / 255 for i in (0, 2, 4))
+        self.op(f"{r:.3f} {g:.3f} {b:.3f} {'RG' if stroke else 'rg'}")
+
+    def line(self, x1, y1, x2, y2):
+        ax, ay = self.to_page(x1, y1)
+        bx, by = self.to_page(x2, y2)
+        self.op(f"{ax:.2f} {ay:.2f} m {bx:.2f} {by:.2f} l S")
+
+    def rect(self, x, y, width, height, fill: bool):
+        ax, ay = self.to_page(x, y + height)
+        self.op(f"{ax:.2f} {ay:.2f} {width * self.scale:.2f} {height * self.scale:.2f} re {'f' if fill else 'S'}")
+
+    def circle(self, x, y, radius, paint: str):
+        cx, cy = self.to_page(x, y)
+        r = radius * self.scale
+        k = 0.5523 * r
+        self.op(
+            f"{cx + r:.2f} {cy:.2f} m "
+            f"{cx + r:.2f} {cy + k:.2f} {cx + k:.2f} {cy + r:.2f} {cx:.2f} {cy + r:.2f} c "
+            f"{cx - k:.2f} {cy + r:.2f} {cx - r:.2f} {cy + k:.2f} {cx - r:.2f} {cy:.2f} c "
+            f"{cx - r:.2f} {cy - k:.2f} {cx - k:.2f} {cy - r:.2f} {cx:.2f} {cy - r:.2f} c "
+            f"{cx + k:.2f} {cy - r:.2f} {cx + r:.2f} {cy - k:.2f} {cx + r:.2f} {cy:.2f} c {paint}"
+        )
+
+    def path(self, segments: List[Tuple]):
+        parts = []
+        for segment in segments:
+            if segment[0] == "Z":
+                parts.append("h")
+                continue
+            coords = [self.to_page(segment[i], segment[i + 1]) for i in range(1, len(segment), 2)]
+            flat = " ".join(f"{px:.2f} {py:.2f}" for px, py in coords)
+            parts.append(f"{flat} {'m' if segment[0] == 'M' else 'l' if segment[0] == 'L' else 'c'}")
+        if parts:
+            self.op(" ".join(parts) + " S")
+
+    def arrowhead(self, segments: List[Tuple]):
+        """
+        Filled arrowhead at the end of a route, pointing along its last segment
+        """
+        points = [(s[-2], s[-1]) for s in segments if s[0] != "Z"]
+        if len(segments) < 2 or len(points) < 2:
+            return
+        last = segments[-1]
+        tip = points[-1]
+        before = (last[3], last[4]) if last[0] == "C" else points[-2]
+        if before == tip:
+            before = points[-2]
+        angle = math.atan2(tip[1] - before[1], tip[0] - before[0])
+        corners = [tip] + [
+            (tip[0] - 18 * math.cos(angle + offset), tip[1] - 18 * math.sin(angle + offset))
+            for offset in (-0.45, 0.45)
+        ]
+        page = [self.to_page(px, py) for px, py in corners]
+        self.op(f"{page[0][0]:.2f} {page[0][1]:.2f} m {page[1][0]:.2f} {page[1][1]:.2f} l "
+                f"{page[2][0]:.2f} {page[2][1]:.2f} l h f")
+
+    def text(self, x: float, y: float, text: str, size: float, bold: bool = False, page_coords: bool = False):
+        if not page_coords:
+            x, y = self.to_page(x, y)
+        self.ops.append(b"BT /%s %.1f Tf %.2f %.2f Td %s Tj ET" % (
+            b"F2" if bold else b"F1", size, x, y, pdf_string(text)
+        ))
+
+def _text_width(text: str, size: float) -> float:
+    # Helvetica averages a little over half an em per character
+    return len(text) * size * 0.55
+
+def _draw_field(canvas: _PageCanvas):
+    canvas.color("#4a9d4a", stroke=False)
+    canvas.rect(0, 0, FIELD_WIDTH, FIELD_HEIGHT, fill=True)
+    canvas.color("#ffffff", stroke=True)
+    canvas.op("3 w")
+    canvas.rect(100, 50, 1000, 500, fill=False)
+    canvas.line(100, 100, 1100, 100)
+    canvas.line(100, 500, 1100, 500)
+    canvas.op("2 w")
+    for y in (150, 250, 350, 450):
+        canvas.line(100, y, 1100, y)
+    canvas.op("1 w")
+    for y in range(100, 501, 10):
+        canvas.line(470, y, 485, y)
+        canvas.line(715, y, 730, y)
+
+def _draw_play(canvas: _PageCanvas, play: Dict):
+    canvas.op("1 J 1 j")
+    for route in play.get("routes") or []:
+        segments = path_segments(route.get("path") or "")
+        if not segments:
+            continue
+        route_color = "#ffeb3b" if route.get("dash") else "#ffffff"
+        canvas.color(route_color, stroke=True)
+        canvas.color(route_color, stroke=False)
+        canvas.op("2.4 w " + ("[6 4] 0 d" if route.get("dash") else "[] 0 d"))
+        canvas.path(segments)
+        canvas.op("[] 0 d")
+        canvas.arrowhead(segments)
+        if route.get("label") and segments[-1][0] != "Z":
+            px, py = canvas.to_page(segments[-1][-2], segments[-1][-1])
+            canvas.color("#ffffff", stroke=False)
+            canvas.text(px + 6, py + 4, str(route["label"]), 7, bold=True, page_coords=True)
+
+    for motion in play.get("motions") or []:
+        if isinstance(motion.get("path"), str):
+            segments = path_segments(motion["path"])
+        else:
+            points = [(p.get("x"), p.get("y")) for p in motion.get("points") or [] if isinstance(p, dict)]
+            points = [(float(px), float(py)) for px, py in points if px is not None and py is not None]
+            segments = [("M",) + points[0]] + [("L",) + p for p in points[1:]] if len(points) >= 2 else []
+        if segments:
+            canvas.color("#ffeb3b", stroke=True)
+            canvas.op("1.5 w [3 3] 0 d")
+            canvas.path(segments)
+            canvas.op("[] 0 d")
+
+    canvas.color("#3b82f6", stroke=True)
+    canvas.op("2 w [9 3] 0 d")
+    canvas.line(100, LOS_Y, 1100, LOS_Y)
+    canvas.op("[] 0 d")
+
+    assignments = (play.get("blocking") or {}).get("assignments") or {}
+    for player in play.get("players") or []:
+        try:
+            x, y = float(player["x"]), float(player["y"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        player_id = str(player.get("id", ""))
+        is_ol = player_id in LINEMEN
+        canvas.color("#dc2626" if is_ol else "#ffffff", stroke=False)
+        canvas.color("#000000", stroke=True)
+        canvas.op("1.2 w")
+        canvas.circle(x, y, 14 if is_ol else 16, "B")
+        canvas.color("#ffffff" if is_ol else "#000000", stroke=False)
+        size = 7
+        px, py = canvas.to_page(x, y)
+        canvas.text(px - _text_width(player_id, size) / 2, py - 2.5, player_id, size, bold=True, page_coords=True)
+        action = player.get("action") or assignments.get(player_id)
+        if action:
+            canvas.color("#ffeb3b", stroke=False)
+            label = str(action)
+            canvas.text(px - _text_width(label, 6) / 2, py - 20, label, 6, page_coords=True)
+
+def render_card_pdf(card: Dict) -> bytes:
+    """
+    PDF content stream for one play card (letter landscape)
+    """
+    diagram_height = FIELD_HEIGHT * DIAGRAM_SCALE
+    diagram_y = PAGE_HEIGHT - MARGIN - 44 - diagram_height
+    canvas = _PageCanvas(MARGIN, diagram_y, DIAGRAM_SCALE)
+
+    canvas.color("#000000", stroke=False)
+    canvas.text(MARGIN, PAGE_HEIGHT - MARGIN - 18, card["name"], 18, bold=True, page_coords=True)
+    canvas.color("#4b5563", stroke=False)
+    canvas.text(MARGIN, PAGE_HEIGHT - MARGIN - 34, card["subtitle"], 10, page_coords=True)
+
+    _draw_field(canvas)
+    _draw_play(canvas, card["play"])
+
+    # Three text columns under the diagram: what it is | when to call | strengths + weaknesses
+    column_width = (PAGE_WIDTH - 2 * MARGIN - 24) / 3
+    columns = [[CARD_SECTIONS[0]], [CARD_SECTIONS[1]], [CARD_SECTIONS[2], CARD_SECTIONS[3]]]
+    top = diagram_y - 16
+    chars = int(column_width / (9 * 0.5))
+    for index, sections in enumerate(columns):
+        x = MARGIN + index * (column_width + 12)
+        y = top
+        for title, field in sections:
+            if y < MARGIN + 12:
+                break
+            canvas.color("#111827", stroke=False)
+            canvas.text(x, y, title.upper(), 9, bold=True, page_coords=True)
+            y -= 12
+            canvas.color("#374151", stroke=False)
+            bullet = "- " if field != "what_it_is" and card[field] else ""
+            for item in card[field] or ["-"]:
+                for n, line in enumerate(textwrap.wrap(bullet + item, chars) or [""]):
+                    if y < MARGIN:
+                        break
+                    canvas.text(x + (8 if n and bullet else 0), y, line, 9, page_coords=True)
+                    y -= 11
+            y -= 6
+    return b"\n".join(canvas.ops)
+
+# -- SVG -------------------------------------------------------------------
+
+def render_card_svg(card: Dict) -> bytes:
+    """
+    Standalone card: the full diagram on top, card text underneath
+    """
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {FIELD_WIDTH} 900" width="{FIELD_WIDTH}" height="900">',
+        '<rect x="0" y="0" width="1200" height="900" fill="#ffffff"/>',
+        render_svg(card["play"], "full"),
+        f'<text x="30" y="640" font-family="Arial, sans-serif" font-size="28" font-weight="bold" fill="#000000">'
+        f'{escape(card["name"])}</text>',
+        f'<text x="30" y="668" font-family="Arial, sans-serif" font-size="16" fill="#4b5563">{escape(card["subtitle"])}</text>'
+    ]
+    columns = [[CARD_SECTIONS[0]], [CARD_SECTIONS[1]], [CARD_SECTIONS[2], CARD_SECTIONS[3]]]
+    for index, sections in enumerate(columns):
+        x = 30 + index * 390
+        y = 705
+        for title, field in sections:
+            parts.append(
+                f'<text x="{x}" y="{y}" font-family="Arial, sans-serif" font-size="15" font-weight="bold" '
+                f'fill="#111827">{escape(title.upper())}</text>'
+            )
+            y += 20
+            bullet = "• " if field != "what_it_is" and card[field] else ""
+            for item in card[field] or ["-"]:
+                for line in textwrap.wrap(bullet + item, 44) or [""]:
+                    if y > 890:
+                        break
+                    parts.append(
+                        f'<text x="{x}" y="{y}" font-family="Arial, sans-serif" font-size="14" '
+                        f'fill="#374151">{escape(line)}</text>'
+                    )
+                    y += 18
+            y += 10
+    parts.append("</svg>")
+    return "".join(parts).encode("utf-8")
+
+def render_card(card: Dict, fmt: str) -> bytes:
+    """
+    Process-pool entry point
+    """
+    return render_card_pdf(card) if fmt == "pdf" else render_card_svg(card)
@@ -0,0 +1,307 @@
+import re
+import csv
+import json
+import asyncio
+from collections import OrderedDict
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from pydantic import ValidationError
+
+from services.outcomes import FIELD_POSITIONS
+from services.play_store import PlayStore
+
+IMPORT_FORMATS = ("ndjson", "csv")
+MAX_LINE_BYTES = 1024 * 1024
+MAX_REPORTED_ERRORS = 1000
+# Recent distinct plays remembered for dropping repeated snaps from game logs
+CSV_DEDUPE_WINDOW = 10_000
+
+# Hudl breakdown columns (and the plainer names coaches rename them to) -> play fields
+CSV_COLUMNS = {
+    "name": ("PLAY NAME", "OFF PLAY", "NAME", "PLAY"),
+    "formation": ("OFF FORM", "FORMATION", "FORM"),
+    "personnel": ("PERSONNEL", "OFF PERS", "PERS"),
+    "concept": ("CONCEPT", "PASS CONCEPT", "RUN CONCEPT"),
+    "description": ("DESCRIPTION", "NOTES"),
+    "down": ("DN", "DOWN"),
+    "distance": ("DIST", "DISTANCE"),
+    "hash": ("HASH",),
+    "yard_line": ("YARD LN", "YARD LINE", "YDLN"),
+    "odk": ("ODK",),
+    "play_type": ("PLAY TYPE",),
+    "tags": ("TAGS",),
+    "players": ("PLAYERS",),
+    "routes": ("ROUTES",)
+}
+ODK_CATEGORIES = {"O": "offense", "D": "defense", "K": "special_teams"}
+HASHES = {"L": "left", "M": "middle", "R": "right"}
+_HEADER_RE = re.compile(r"[^A-Z0-9]+")
+
+def field_position(yard_line: str) -> Optional[str]:
+    """
+    Hudl yard line to the field position enum: negative is our side of the
+    50 (-25 = own 25), positive is theirs (30 = opponent's 30)
+    """
+    try:
+        value = int(float(yard_line))
+    except (TypeError, ValueError):
+        return None
+    if value == 0 or abs(value) > 50:
+        return None
+    if value < 0 or value == 50:
+        return FIELD_POSITIONS[min(4, (abs(value) - 1) // 10)]
+    return FIELD_POSITIONS[9 - value // 10]
+
+def _int(value: str) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Split a streamed body into (line number, line) pairs without holding more
+    than one line. Lines over max_line_bytes come back as None.
+    """
+    buffer = b""
+    number = 0
+    oversized = False
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while True:
+            end = buffer.find(b"\n", start)
+            if end == -1:
+                break
+            number += 1
+            yield number, None if oversized else buffer[start:end].rstrip(b"\r")
+            oversized = False
+            start = end + 1
+        buffer = buffer[start:]
+        if len(buffer) > max_line_bytes:
+            # Keep counting the line but stop storing it
+            oversized = True
+            buffer = b""
+    if buffer or oversized:
+        number += 1
+        yield number, None if oversized else buffer.rstrip(b"\r")
+
+class PlayImporter:
+    """
+    Streams NDJSON or Hudl-style CSV into the play store.
+
+    Records are validated against the Play model and written a batch at a
+    time, one transaction per batch, in a worker thread. The next batch isn't
+    read until the last one is stored, so a slow disk pushes back on the
+    upload instead of piling plays up in memory.
+    """
+    def __init__(
+        self,
+        store: PlayStore,
+        play_model: type,
+        on_saved: Optional[Callable[[List[Dict]], None]] = None,
+        batch_size: int = 1000
+    ):
+        self.store = store
+        self.play_model = play_model
+        self.on_saved = on_saved
+        self.batch_size = batch_size
+
+    async def run(
+        self,
+        chunks: AsyncIterator[bytes],
+        fmt: str = "ndjson",
+        category: str = "offense",
+        tags: Optional[List[str]] = None,
+        dry_run: bool = False
+    ) -> Dict:
+        if fmt not in IMPORT_FORMATS:
+            raise ValueError(f"Unknown import format: {fmt}")
+        report = {
+            "format": fmt,
+            "lines": 0,
+            "imported": 0,
+            "skipped": 0,
+            "failed": 0,
+            "errors": [],
+            "errors_truncated": False
+        }
+        records = self._ndjson_records(chunks) if fmt == "ndjson" else self._csv_records(chunks)
+
+        batch: List[Tuple[int, object]] = []
+        async for line, raw in records:
+            report["lines"] = line
+            batch.append((line, raw))
+            if len(batch) >= self.batch_size:
+                await self._flush(batch, category, tags or [], dry_run, report)
+                batch = []
+        if batch:
+            await self._flush(batch, category, tags or [], dry_run, report)
+        return report
+
+    # -- parsing ---------------------------------------------------------
+
+    async def _ndjson_records(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+        async for line, data in iter_lines(chunks):
+            if data is None:
+                yield line, ValueError(f"Line longer than {MAX_LINE_BYTES} bytes")
+            elif data.strip():
+                yield line, data
+
+    async def _csv_records(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+        """
+        Yields (line, row dict). Quoted fields may span lines, so physical
+        lines are joined until the quotes balance before csv parses them.
+        Repeated snaps of a play are skipped while it is among the last
+        CSV_DEDUPE_WINDOW distinct plays seen, which keeps memory flat; a play
+        that comes back after that many others is imported again.
+        """
+        header = None
+        pending: List[str] = []
+        start_line = 0
+        seen: "OrderedDict[tuple, None]" = OrderedDict()
+        async for line, data in iter_lines(chunks):
+            if data is None:
+                pending = []
+                yield line, ValueError(f"Line longer than {MAX_LINE_BYTES} bytes")
+                continue
+            text = data.decode("utf-8-sig", errors="replace")
+            if not pending:
+                start_line = line
+            pending.append(text)
+            if sum(part.count('"') for part in pending) % 2:
+                if sum(len(part) for part in pending) > MAX_LINE_BYTES:
+                    # A stray quote; give up on this record rather than buffer the rest of the file
+                    pending = []
+                    yield start_line, ValueError("Unterminated quoted field")
+                continue
+            row = next(csv.reader(["\n".join(pending)]), [])
+            pending = []
+            if not any(cell.strip() for cell in row):
+                continue
+            if header is None:
+                header = self._csv_header(row)
+                continue
+            record = {field: row[index].strip() for field, index in header.items() if index < len(row)}
+            # Game-log exports repeat a play on every snap; keep the first
+            key = (record.get("odk"), record.get("name"), record.get("formation"), record.get("personnel"))
+            if record.get("name") and key in seen:
+                seen.move_to_end(key)
+                yield start_line, None
+                continue
+            seen[key] = None
+            if len(seen) > CSV_DEDUPE_WINDOW:
+                seen.popitem(last=False)
+            yield start_line, record
+        if pending:
+            yield start_line, ValueError("Unterminated quoted field")
+
+    def _csv_header(self, row: List[str]) -> Dict[str, int]:
+        normalized = [_HEADER_RE.sub(" ", cell.upper()).strip() for cell in row]
+        header = {}
+        for field, names in CSV_COLUMNS.items():
+            for name in names:
+                if name in normalized:
+                    header[field] = normalized.index(name)
+                    break
+        return header
+
+    # -- validation and storage ------------------------------------------
+
+    def _from_ndjson(self, data: bytes, category: str, tags: List[str]) -> Tuple[Dict, str, List[str], Optional[str]]:
+        obj = json.loads(data)
+        if not isinstance(obj, dict):
+            raise ValueError("Expected a JSON object")
+        if isinstance(obj.get("play"), dict):
+            play = obj["play"]
+        else:
+            play = {k: v for k, v in obj.items() if k not in ("category", "tags", "play_id")}
+        return play, obj.get("category") or category, list(obj.get("tags") or tags), obj.get("play_id")
+
+    def _from_csv(self, row: Dict, category: str, tags: List[str]) -> Optional[Tuple[Dict, str, List[str], Optional[str]]]:
+        odk = (row.get("odk") or "").upper()
+        if not row.get("name") and odk in ("D", "K"):
+            return None  # defensive/kicking snaps in a game log, not plays to import
+        if not row.get("name"):
+            raise ValueError("No play name")
+        play = {
+            "name": row.get("name") or "",
+            "formation": row.get("formation") or "",
+            "players": json.loads(row["players"]) if row.get("players") else [],
+            "routes": json.loads(row["routes"]) if row.get("routes") else []
+        }
+        if row.get("personnel"):
+            play["personnel"] = row["personnel"]
+        for field in ("concept", "description"):
+            if row.get(field):
+                play[field] = row[field]
+        down, distance = _int(row.get("down")), _int(row.get("distance"))
+        if down in (1, 2, 3, 4):
+            play["down"] = down
+        if distance is not None and distance >= 0:
+            play["distance"] = distance
+        hash_mark = HASHES.get((row.get("hash") or "").upper()[:1])
+        if hash_mark:
+            play["hash"] = hash_mark
+        position = field_position(row.get("yard_line"))
+        if position:
+            play["field_position"] = position
+
+        row_tags = list(tags)
+        if row.get("play_type"):
+            row_tags.append(row["play_type"].lower())
+        if row.get("tags"):
+            row_tags.extend(t.strip() for t in re.split(r"[;|]", row["tags"]) if t.strip())
+        return play, ODK_CATEGORIES.get(odk, category), row_tags, None
+
+    def _validate(self, batch: List[Tuple[int, object]], category: str, tags: List[str]):
+        valid, errors, skipped = [], [], 0
+        for line, raw in batch:
+            if raw is None:
+                skipped += 1
+                continue
+            if isinstance(raw, Exception):
+                errors.append((line, str(raw)))
+                continue
+            try:
+                parsed = self._from_ndjson(raw, category, tags) if isinstance(raw, bytes) else self._from_csv(raw, category, tags)
+                if parsed is None:
+                    skipped += 1
+                    continue
+                play, play_category, play_tags, play_id = parsed
+                model = self.play_model.model_validate(play)
+                valid.append((model.model_dump(), play_category, play_tags, play_id))
+            except ValidationError as e:
+                errors.append((line, "; ".join(
+                    f"{'.'.join(str(p) for p in err['loc']) or 'play'}: {err['msg']}" for err in e.errors()
+                )))
+            except (ValueError, TypeError) as e:
+                errors.append((line, f"Invalid record: {str(e)}"))
+        return valid, errors, skipped
+
+    def _process(self, batch: List[Tuple[int, object]], category: str, tags: List[str], dry_run: bool):
+        valid, errors, skipped = self._validate(batch, category, tags)
+        saved = []
+        if valid and not dry_run:
+            ids = self.store.save_plays(valid)
+            saved = [
+                {"id": play_id, "play": play, "category": play_category, "tags": play_tags}
+                for play_id, (play, play_category, play_tags, _) in zip(ids, valid)
+            ]
+        return len(valid), saved, errors, skipped
+
+    async def _flush(self, batch, category: str, tags: List[str], dry_run: bool, report: Dict):
+        imported, saved, errors, skipped = await asyncio.to_thread(self._process, batch, category, tags, dry_run)
+        if self.on_saved:
+            # In-memory indexes are updated on the loop; hand them over in slices so requests keep flowing
+            for start in range(0, len(saved), 100):
+                self.on_saved(saved[start:start + 100])
+                await asyncio.sleep(0)
+        report["imported"] += imported
+        report["skipped"] += skipped
+        report["failed"] += len(errors)
+        for line, message in errors:
+            if len(report["errors"]) >= MAX_REPORTED_ERRORS:
+                report["errors_truncated"] = True
+                break
+            report["errors"].append({"line": line, "error": message})
@@ -0,0 +1,270 @@
+import os
+import re
+import math
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from xml.sax.saxutils import escape, quoteattr
+
+# Bump when the drawing code changes so cached diagrams and ETags roll over
+RENDERER_VERSION = "svg-v1"
+
+FIELD_WIDTH = 1200
+FIELD_HEIGHT = 600
+LOS_Y = 350
+SIZES = {
+    "full": (1200, 600),
+    "thumb": (240, 120)
+}
+LINEMEN = {"C", "LG", "RG", "LT", "RT"}
+
+# Route paths are SVG path data; anything else is dropped rather than emitted
+_PATH_RE = re.compile(r"^[MmLlHhVvCcSsQqTtAaZz0-9eE.,\s+-]*$")
+_COLOR_RE = re.compile(r"^(#[0-9a-fA-F]{3,8}|[a-zA-Z]{3,20})$")
+_POINT_RE = re.compile(r"[ML]\s*(-?\d+(?:\.\d+)?)[\s,]+(-?\d+(?:\.\d+)?)")
+_DASHES = {"dashed": "10,5", "dotted": "2,3"}
+
+def _num(value) -> str:
+    """
+    Compact coordinate: integers without a decimal point, floats to 0.1px
+    """
+    value = float(value)
+    return str(int(value)) if value.is_integer() else f"{value:.1f}"
+
+def _color(value: Optional[str], default: str) -> str:
+    return value if value and _COLOR_RE.match(value) else default
+
+def _points(points: List[Dict]) -> List[Tuple[float, float]]:
+    result = []
+    for point in points or []:
+        try:
+            result.append((float(point["x"]), float(point["y"])))
+        except (KeyError, TypeError, ValueError):
+            continue
+    return result
+
+def render_key(play: Dict, size: str) -> str:
+    """
+    Content hash of everything that affects the drawing; doubles as the ETag
+    """
+    content = {
+        "players": play.get("players", []),
+        "routes": play.get("routes", []),
+        "drawing_elements": play.get("drawing_elements", []),
+        "motions": play.get("motions", []),
+        "blocking": play.get("blocking"),
+        "name": play.get("name")
+    }
+    canonical = json.dumps(content, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(f"{RENDERER_VERSION}:{size}:{canonical}".encode("utf-8")).hexdigest()[:32]
+
+def _field(detail: bool) -> List[str]:
+    parts = [
+        f'<rect x="0" y="0" width="{FIELD_WIDTH}" height="{FIELD_HEIGHT}" fill="#4a9d4a"/>',
+        '<rect x="100" y="50" width="1000" height="500" fill="none" stroke="#ffffff" stroke-width="6"/>',
+        '<line x1="100" y1="100" x2="1100" y2="100" stroke="#ffffff" stroke-width="6"/>',
+        '<line x1="100" y1="500" x2="1100" y2="500" stroke="#ffffff" stroke-width="6"/>',
+        '<g stroke="#ffffff" stroke-width="4">'
+        + "".join(f'<line x1="100" x2="1100" y1="{y}" y2="{y}"/>' for y in (150, 250, 350, 450))
+        + "</g>"
+    ]
+    if detail:
+        ticks = []
+        for y in range(100, 501, 10):
+            ticks.append(f'<line x1="470" x2="485" y1="{y}" y2="{y}"/><line x1="715" x2="730" y1="{y}" y2="{y}"/>')
+        parts.append('<g stroke="#ffffff" stroke-width="3">' + "".join(ticks) + "</g>")
+    return parts
+
+def _drawing_element(element: Dict) -> str:
+    kind = element.get("type")
+    points = _points(element.get("points"))
+    color = _color(element.get("color"), "#000000")
+    dash = _DASHES.get(element.get("lineStyle"))
+    dash_attr = f' stroke-dasharray="{dash}"' if dash else ""
+    if not points:
+        return ""
+
+    if kind == "text":
+        x, y = points[0]
+        text = escape(str(element.get("text") or "Text"))
+        return f'<text x="{_num(x)}" y="{_num(y)}" fill="{color}" font-size="16" font-weight="bold">{text}</text>'
+    if len(points) < 2:
+        return ""
+
+    (x1, y1), (x2, y2) = points[0], points[-1]
+    if kind == "zone":
+        d = "M " + " L ".join(f"{_num(x)},{_num(y)}" for x, y in points) + " Z"
+        return f'<path d="{d}" fill="{color}" fill-opacity="0.2" stroke="{color}" stroke-width="2"{dash_attr}/>'
+    if kind == "curve" and len(points) >= 3:
+        (cx, cy) = points[len(points) // 2]
+        d = f"M {_num(x1)},{_num(y1)} Q {_num(cx)},{_num(cy)} {_num(x2)},{_num(y2)}"
+        return f'<path d="{d}" fill="none" stroke="{color}" stroke-width="2"{dash_attr}/>'
+    if kind in ("motion", "curve") or len(points) > 2:
+        d = "M " + " L ".join(f"{_num(x)},{_num(y)}" for x, y in points)
+        motion_dash = dash_attr or (' stroke-dasharray="10,5"' if kind == "motion" else "")
+        return f'<path d="{d}" fill="none" stroke="{color}" stroke-width="2"{motion_dash}/>'
+
+    line = f'<line x1="{_num(x1)}" y1="{_num(y1)}" x2="{_num(x2)}" y2="{_num(y2)}" stroke="{color}" stroke-width="2"{dash_attr}/>'
+    angle = math.atan2(y2 - y1, x2 - x1)
+    if kind == "arrow":
+        heads = []
+        for offset in (-math.pi / 6, math.pi / 6):
+            hx = x2 - 15 * math.cos(angle + offset)
+            hy = y2 - 15 * math.sin(angle + offset)
+            heads.append(f'<line x1="{_num(x2)}" y1="{_num(y2)}" x2="{_num(hx)}" y2="{_num(hy)}" stroke="{color}" stroke-width="2"/>')
+        return line + "".join(heads)
+    if kind == "block":
+        # Block: a T at the end, perpendicular to the line
+        px, py = 8 * -math.sin(angle), 8 * math.cos(angle)
+        return line + (
+            f'<line x1="{_num(x2 - px)}" y1="{_num(y2 - py)}" x2="{_num(x2 + px)}" y2="{_num(y2 + py)}" '
+            f'stroke="{color}" stroke-width="3"/>'
+        )
+    return line
+
+def render_svg(play: Dict, size: str = "full") -> str:
+    """
+    Standalone SVG of a stored play, styled like Field.tsx. The thumbnail keeps
+    the same 1200x600 coordinate space and drops labels and hash ticks.
+    """
+    width, height = SIZES[size]
+    detail = size == "full"
+    stroke = 4 if detail else 8
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {FIELD_WIDTH} {FIELD_HEIGHT}" '
+        f'width="{width}" height="{height}">',
+        "<title>" + escape(str(play.get("name") or "Play")) + "</title>",
+        '<defs>'
+        '<marker id="arrowWhite" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="8" markerHeight="8" orient="auto">'
+        '<path d="M 0 0 L 10 5 L 0 10 z" fill="#ffffff"/></marker>'
+        '<marker id="arrowYellow" viewBox="0 0 10 10" refX="9" refY="5" markerWidth="8" markerHeight="8" orient="auto">'
+        '<path d="M 0 0 L 10 5 L 0 10 z" fill="#ffeb3b"/></marker>'
+        '</defs>'
+    ]
+    parts.extend(_field(detail))
+
+    for element in play.get("drawing_elements") or []:
+        parts.append(_drawing_element(element))
+
+    for motion in play.get("motions") or []:
+        if isinstance(motion.get("path"), str) and _PATH_RE.match(motion["path"]):
+            parts.append(
+                f'<path d={quoteattr(motion["path"])} fill="none" stroke="#ffeb3b" stroke-width="{stroke}" '
+                'stroke-dasharray="4 6"/>'
+            )
+        else:
+            parts.append(_drawing_element({"type": "motion", "points": motion.get("points"), "color": "#ffeb3b"}))
+
+    routes = play.get("routes") or []
+    route_paths = []
+    labels = []
+    for route in routes:
+        path = route.get("path") or ""
+        if not _PATH_RE.match(path):
+            continue
+        dashed = bool(route.get("dash"))
+        route_paths.append(
+            f'<path d={quoteattr(path)} stroke="{"#ffeb3b" if dashed else "#ffffff"}"'
+            + (' stroke-dasharray="10 6"' if dashed else "")
+            + f' marker-end="url(#{"arrowYellow" if dashed else "arrowWhite"})" opacity="0.95"/>'
+        )
+        matches = _POINT_RE.findall(path)
+        if detail and matches and route.get("label"):
+            x, y = float(matches[-1][0]), float(matches[-1][1])
+            label = str(route["label"])
+            labels.append(
+                f'<rect x="{_num(x + 10)}" y="{_num(y - 25)}" width="{len(label) * 9 + 10}" height="22" '
+                f'fill="#000000" opacity="0.7" rx="3"/>'
+                f'<text x="{_num(x + 15)}" y="{_num(y - 10)}" fill="#ffffff" font-size="13" font-weight="600" '
+                f'font-family="Arial, sans-serif">{escape(label)}</text>'
+            )
+    parts.append(f'<g fill="none" stroke-width="{stroke}">' + "".join(route_paths) + "</g>")
+    parts.extend(labels)
+
+    assignments = (play.get("blocking") or {}).get("assignments") or {}
+    for player in play.get("players") or []:
+        try:
+            x, y = float(player["x"]), float(player["y"])
+        except (KeyError, TypeError, ValueError):
+            continue
+        player_id = str(player.get("id", ""))
+        is_ol = player_id in LINEMEN
+        parts.append(
+            f'<circle cx="{_num(x)}" cy="{_num(y)}" r="{14 if is_ol else 16}" '
+            f'fill="{"#dc2626" if is_ol else "#ffffff"}" stroke="#000000" stroke-width="2"/>'
+        )
+        if not detail:
+            continue
+        parts.append(
+            f'<text x="{_num(x)}" y="{_num(y + 5)}" text-anchor="middle" font-weight="bold" '
+            f'font-size="{12 if is_ol else 13}" fill="{"#ffffff" if is_ol else "#000000"}" '
+            f'font-family="Arial, sans-serif">{escape(player_id)}</text>'
+        )
+        action = player.get("action") or assignments.get(player_id)
+        if action:
+            parts.append(
+                f'<text x="{_num(x)}" y="{_num(y + 35)}" text-anchor="middle" font-size="10" fill="#ffeb3b" '
+                f'font-family="Arial, sans-serif" font-weight="600">{escape(str(action))}</text>'
+            )
+
+    parts.append(
+        f'<line x1="100" x2="1100" y1="{LOS_Y}" y2="{LOS_Y}" stroke="#3b82f6" stroke-width="3" '
+        'stroke-dasharray="15 5" opacity="0.7"/>'
+    )
+    parts.append("</svg>")
+    return "".join(parts)
+
+class PlayRenderer:
+    """
+    Renders play diagrams and keeps the output in an LRU keyed by a content
+    hash of the play, so unchanged plays are a dict lookup and the key can be
+    served as a strong ETag.
+    """
+    def __init__(self, max_entries: int = 2000):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls) -> "PlayRenderer":
+        return cls(max_entries=int(os.getenv("RENDER_CACHE_SIZE", "2000")))
+
+    def render(self, play: Dict, size: str = "full") -> Tuple[str, bytes]:
+        """
+        Returns (etag, svg bytes)
+        """
+        if size not in SIZES:
+            raise ValueError(f"Unknown size: {size}")
+        key = render_key(play, size)
+        with self._lock:
+            svg = self._entries.get(key)
+            if svg is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return key, svg
+        svg = render_svg(play, size).encode("utf-8")
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = svg
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return key, svg
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses
+            }
@@ -0,0 +1,721 @@
+import os
+import json
+import uuid
+import base64
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from services.telemetry import timed_methods
+
+OUTCOME_COLUMNS = (
+    "play_id", "game_date", "opponent", "defensive_front", "coverage", "result",
+    "yards_gained", "down", "distance", "field_position", "hash", "notes",
+    "concept", "formation", "is_run"
+)
+# Rollup attribution recorded when an outcome is logged; NULL on rows written
+# before these columns existed or backfilled straight into the table
+OUTCOME_ATTRIBUTION = (("concept", "TEXT"), ("formation", "TEXT"), ("is_run", "INTEGER"))
+
+# Play columns that can be served without decoding the stored JSON document
+PLAY_COLUMNS = ("name", "formation", "personnel", "concept", "down", "distance", "field_position", "hash")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS plays (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT NOT NULL,
+    formation TEXT,
+    personnel TEXT,
+    concept TEXT,
+    down INTEGER,
+    distance INTEGER,
+    field_position TEXT,
+    hash TEXT,
+    data TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS play_tags (
+    play_id TEXT NOT NULL REFERENCES plays(id) ON DELETE CASCADE,
+    tag TEXT NOT NULL,
+    PRIMARY KEY (play_id, tag)
+);
+CREATE TABLE IF NOT EXISTS playbooks (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    team TEXT,
+    season TEXT,
+    description TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS playbook_plays (
+    playbook_id TEXT NOT NULL REFERENCES playbooks(id) ON DELETE CASCADE,
+    play_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (playbook_id, play_id)
+);
+CREATE TABLE IF NOT EXISTS play_sheets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    situation TEXT NOT NULL,
+    play_ids TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS custom_formations (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    personnel TEXT NOT NULL,
+    category TEXT NOT NULL,
+    description TEXT,
+    positions TEXT NOT NULL,
+    tags TEXT NOT NULL,
+    is_public INTEGER NOT NULL DEFAULT 0,
+    is_validated INTEGER NOT NULL DEFAULT 0,
+    violations TEXT NOT NULL,
+    warnings TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS play_outcomes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT UNIQUE NOT NULL,
+    play_id TEXT NOT NULL,
+    game_date TEXT NOT NULL,
+    opponent TEXT,
+    defensive_front TEXT,
+    coverage TEXT,
+    result TEXT NOT NULL,
+    yards_gained INTEGER,
+    down INTEGER,
+    distance INTEGER,
+    field_position TEXT,
+    hash TEXT,
+    notes TEXT,
+    concept TEXT,
+    formation TEXT,
+    is_run INTEGER,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcome_rollups (
+    level TEXT NOT NULL,
+    key TEXT NOT NULL,
+    week TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    plays INTEGER NOT NULL,
+    yards INTEGER NOT NULL,
+    successes INTEGER NOT NULL,
+    explosives INTEGER NOT NULL,
+    PRIMARY KEY (level, key, dimension, bucket, week)
+);
+CREATE TABLE IF NOT EXISTS opponent_tendencies (
+    opponent_name TEXT PRIMARY KEY,
+    defensive_fronts TEXT,
+    coverages TEXT,
+    blitz_rate REAL,
+    situational_tendencies TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS store_versions (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_plays_category ON plays(category, seq);
+CREATE INDEX IF NOT EXISTS idx_plays_formation ON plays(formation, seq);
+CREATE INDEX IF NOT EXISTS idx_plays_situation ON plays(down, distance, field_position);
+CREATE INDEX IF NOT EXISTS idx_play_tags_tag ON play_tags(tag, play_id);
+CREATE INDEX IF NOT EXISTS idx_outcomes_play ON play_outcomes(play_id, game_date);
+CREATE INDEX IF NOT EXISTS idx_outcomes_date ON play_outcomes(game_date);
+CREATE INDEX IF NOT EXISTS idx_rollups_leaderboard ON outcome_rollups(level, dimension, week, plays);
+CREATE INDEX IF NOT EXISTS idx_playbook_plays_order ON playbook_plays(playbook_id, position);
+"""
+
+def new_id(prefix: str = "") -> str:
+    return f"{prefix}{uuid.uuid4().hex}"
+
+def encode_cursor(seq: int) -> str:
+    return base64.urlsafe_b64encode(str(seq).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: Optional[str]) -> int:
+    if not cursor:
+        return 0
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("utf-8"))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+@timed_methods("play_store")
+class PlayStore:
+    """
+    SQLite (WAL mode) storage for plays, playbooks, play sheets, custom
+    formations, logged play outcomes and opponent tendencies.
+
+    A local stand-in for the Supabase tables in 001_initial_schema.sql: several
+    workers can share one database file, and list queries are served from
+    indexes with keyset (cursor) pagination instead of full scans.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("COACHGRIND_DB_PATH", "coachgrind.db")
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.execute("PRAGMA busy_timeout=5000")
+        self._lock = threading.RLock()
+        with self._lock:
+            self.conn.executescript(SCHEMA)
+            self._add_outcome_attribution()
+
+    def _add_outcome_attribution(self):
+        """
+        Bring play_outcomes tables created before OUTCOME_ATTRIBUTION up to date
+        """
+        columns = {row["name"] for row in self.conn.execute("PRAGMA table_info(play_outcomes)")}
+        for column, kind in OUTCOME_ATTRIBUTION:
+            if column in columns:
+                continue
+            try:
+                self.conn.execute(f"ALTER TABLE play_outcomes ADD COLUMN {column} {kind}")
+            except sqlite3.OperationalError as e:
+                # Another worker sharing the file got there first
+                if "duplicate column" not in str(e):
+                    raise
+
+    def close(self):
+        self.conn.close()
+
+    # -- helpers ---------------------------------------------------------
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _bump(self, conn: sqlite3.Connection, name: str):
+        conn.execute(
+            "INSERT INTO store_versions (name, version) VALUES (?, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1",
+            (name,)
+        )
+
+    def version(self, name: str) -> int:
+        """
+        Monotonic change counter for a collection ("plays", "playbooks", "sheets",
+        "formations", "outcomes", "opponents")
+        """
+        rows = self._query("SELECT version FROM store_versions WHERE name = ?", (name,))
+        return rows[0]["version"] if rows else 0
+
+    # -- plays -----------------------------------------------------------
+
+    def _play_row(self, play_id: str, play: Dict, category: str, now: str) -> Tuple:
+        return (
+            play_id,
+            play["name"],
+            category,
+            play.get("formation"),
+            play.get("personnel"),
+            play.get("concept"),
+            play.get("down"),
+            play.get("distance"),
+            play.get("field_position"),
+            play.get("hash"),
+            json.dumps(play, separators=(",", ":")),
+            now,
+            now
+        )
+
+    def save_play(self, play: Dict, category: str, tags: List[str], play_id: Optional[str] = None) -> str:
+        """
+        Insert a new play, or update it in place when play_id already exists
+        """
+        return self.save_plays([(play, category, tags, play_id)])[0]
+
+    def save_plays(self, records: List[Tuple[Dict, str, List[str], Optional[str]]]) -> List[str]:
+        """
+        Save many (play, category, tags, play_id) records in one transaction
+        """
+        now = datetime.now().isoformat()
+        ids = [play_id or new_id() for _, _, _, play_id in records]
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO plays (id, name, category, formation, personnel, concept, down, distance, "
+                "field_position, hash, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, category = excluded.category, "
+                "formation = excluded.formation, personnel = excluded.personnel, concept = excluded.concept, "
+                "down = excluded.down, distance = excluded.distance, field_position = excluded.field_position, "
+                "hash = excluded.hash, data = excluded.data, updated_at = excluded.updated_at",
+                [
+                    self._play_row(play_id, play, category, now)
+                    for play_id, (play, category, _, _) in zip(ids, records)
+                ]
+            )
+            # Last write wins when the same play appears twice in a batch
+            tags_by_id = {play_id: tags for play_id, (_, _, tags, _) in zip(ids, records)}
+            conn.executemany("DELETE FROM play_tags WHERE play_id = ?", [(play_id,) for play_id in tags_by_id])
+            conn.executemany(
+                "INSERT OR IGNORE INTO play_tags (play_id, tag) VALUES (?, ?)",
+                [(play_id, tag) for play_id, tags in tags_by_id.items() for tag in tags]
+            )
+            self._bump(conn, "plays")
+        return ids
+
+    def _tags_for(self, play_ids: List[str]) -> Dict[str, List[str]]:
+        tags: Dict[str, List[str]] = {play_id: [] for play_id in play_ids}
+        for start in range(0, len(play_ids), 500):
+            chunk = play_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self._query(
+                f"SELECT play_id, tag FROM play_tags WHERE play_id IN ({placeholders})", tuple(chunk)
+            ):
+                tags[row["play_id"]].append(row["tag"])
+        return tags
+
+    def _record(self, row: sqlite3.Row, tags: List[str], fields: Optional[List[str]] = None) -> Dict:
+        if fields and all(f in PLAY_COLUMNS for f in fields):
+            play = {f: row[f] for f in fields}
+        else:
+            play = json.loads(row["data"])
+            if fields:
+                play = {f: play.get(f) for f in fields}
+        return {"id": row["id"], "play": play, "category": row["category"], "tags": tags}
+
+    def get_play(self, play_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM plays WHERE id = ?", (play_id,))
+        if not rows:
+            return None
+        return self._record(rows[0], self._tags_for([play_id])[play_id])
+
+    def get_plays(self, play_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch many plays by id in one pass; missing ids are left out
+        """
+        found = {}
+        for start in range(0, len(play_ids), 500):
+            chunk = play_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            rows = self._query(f"SELECT * FROM plays WHERE id IN ({placeholders})", tuple(chunk))
+            tags = self._tags_for([row["id"] for row in rows])
+            for row in rows:
+                found[row["id"]] = self._record(row, tags[row["id"]])
+        return found
+
+    def delete_play(self, play_id: str) -> bool:
+        """
+        Delete a play and take it out of every playbook and play sheet
+        """
+        with self._transaction() as conn:
+            deleted = conn.execute("DELETE FROM plays WHERE id = ?", (play_id,)).rowcount
+            conn.execute("DELETE FROM playbook_plays WHERE play_id = ?", (play_id,))
+            if deleted:
+                self._bump(conn, "plays")
+            # play_ids is a JSON list; instr() narrows it down to sheets that might hold the id
+            sheets = conn.execute(
+                "SELECT id, play_ids FROM play_sheets WHERE instr(play_ids, ?) > 0", (json.dumps(play_id),)
+            ).fetchall()
+            changed = 0
+            for row in sheets:
+                play_ids = json.loads(row["play_ids"])
+                if play_id in play_ids:
+                    kept = [other for other in play_ids if other != play_id]
+                    conn.execute("UPDATE play_sheets SET play_ids = ? WHERE id = ?", (json.dumps(kept), row["id"]))
+                    changed += 1
+            if changed:
+                self._bump(conn, "sheets")
+        return bool(deleted)
+
+    def list_plays(
+        self,
+        category: Optional[str] = None,
+        tag: Optional[str] = None,
+        formation: Optional[str] = None,
+        down: Optional[int] = None,
+        distance_min: Optional[int] = None,
+        distance_max: Optional[int] = None,
+        field_position: Optional[str] = None,
+        limit: int = 100,
+        cursor: Optional[str] = None,
+        fields: Optional[List[str]] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One page of plays in insertion order. Returns (plays, next_cursor);
+        next_cursor is None on the last page.
+        """
+        clauses = ["p.seq > ?"]
+        params: List = [decode_cursor(cursor)]
+        if category:
+            clauses.append("p.category = ?")
+            params.append(category)
+        if formation:
+            clauses.append("p.formation = ?")
+            params.append(formation)
+        if down is not None:
+            clauses.append("p.down = ?")
+            params.append(down)
+        if distance_min is not None:
+            clauses.append("p.distance >= ?")
+            params.append(distance_min)
+        if distance_max is not None:
+            clauses.append("p.distance <= ?")
+            params.append(distance_max)
+        if field_position:
+            clauses.append("p.field_position = ?")
+            params.append(field_position)
+        if tag:
+            clauses.append("p.id IN (SELECT play_id FROM play_tags WHERE tag = ?)")
+            params.append(tag)
+
+        columns = "p.seq, p.id, p.category, " + ", ".join(f"p.{c}" for c in PLAY_COLUMNS)
+        if not fields or not all(f in PLAY_COLUMNS for f in fields):
+            columns += ", p.data"
+        rows = self._query(
+            f"SELECT {columns} FROM plays p WHERE {' AND '.join(clauses)} ORDER BY p.seq LIMIT ?",
+            tuple(params) + (limit + 1,)
+        )
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["seq"])
+        tags = self._tags_for([row["id"] for row in rows])
+        return [self._record(row, tags[row["id"]], fields) for row in rows], next_cursor
+
+    def count_plays(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM plays")[0]["n"]
+
+    def iter_plays(self, batch_size: int = 1000):
+        """
+        Walk every play in pages, for index builds and exports
+        """
+        cursor = None
+        while True:
+            page, cursor = self.list_plays(limit=batch_size, cursor=cursor)
+            yield from page
+            if cursor is None:
+                return
+
+    # -- playbooks -------------------------------------------------------
+
+    def create_playbook(self, playbook: Dict) -> str:
+        playbook_id = new_id("pb_")
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO playbooks (id, name, team, season, description, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    playbook_id,
+                    playbook["name"],
+                    playbook.get("team"),
+                    playbook.get("season"),
+                    playbook.get("description"),
+                    datetime.now().isoformat()
+                )
+            )
+            self._bump(conn, "playbooks")
+        return playbook_id
+
+    def _playbook_record(self, row: sqlite3.Row, play_ids: List[str]) -> Dict:
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "team": row["team"],
+            "season": row["season"],
+            "description": row["description"],
+            "created_at": row["created_at"],
+            "plays": play_ids
+        }
+
+    def get_playbook(self, playbook_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM playbooks WHERE id = ?", (playbook_id,))
+        if not rows:
+            return None
+        play_ids = [
+            r["play_id"] for r in self._query(
+                "SELECT play_id FROM playbook_plays WHERE playbook_id = ? ORDER BY position", (playbook_id,)
+            )
+        ]
+        return self._playbook_record(rows[0], play_ids)
+
+    def list_playbooks(self) -> List[Dict]:
+        plays: Dict[str, List[str]] = {}
+        for r in self._query("SELECT playbook_id, play_id FROM playbook_plays ORDER BY playbook_id, position"):
+            plays.setdefault(r["playbook_id"], []).append(r["play_id"])
+        return [
+            self._playbook_record(row, plays.get(row["id"], []))
+            for row in self._query("SELECT * FROM playbooks ORDER BY created_at")
+        ]
+
+    def add_play_to_playbook(self, playbook_id: str, play_id: str) -> bool:
+        """
+        Append a play to a playbook; returns False if the playbook doesn't exist
+        """
+        with self._transaction() as conn:
+            if not conn.execute("SELECT 1 FROM playbooks WHERE id = ?", (playbook_id,)).fetchone():
+                return False
+            position = conn.execute(
+                "SELECT COALESCE(MAX(position), -1) + 1 FROM playbook_plays WHERE playbook_id = ?", (playbook_id,)
+            ).fetchone()[0]
+            conn.execute(
+                "INSERT OR IGNORE INTO playbook_plays (playbook_id, play_id, position) VALUES (?, ?, ?)",
+                (playbook_id, play_id, position)
+            )
+            self._bump(conn, "playbooks")
+        return True
+
+    # -- play sheets -----------------------------------------------------
+
+    def create_sheet(self, sheet: Dict) -> str:
+        sheet_id = new_id("sheet_")
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO play_sheets (id, name, situation, play_ids, created_at) VALUES (?, ?, ?, ?, ?)",
+                (sheet_id, sheet["name"], sheet["situation"], json.dumps(sheet["play_ids"]), datetime.now().isoformat())
+            )
+            self._bump(conn, "sheets")
+        return sheet_id
+
+    def list_sheets(self) -> List[Dict]:
+        return [
+            {
+                "id": row["id"],
+                "name": row["name"],
+                "situation": row["situation"],
+                "play_ids": json.loads(row["play_ids"]),
+                "created_at": row["created_at"]
+            }
+            for row in self._query("SELECT * FROM play_sheets ORDER BY seq")
+        ]
+
+    # -- custom formations ----------------------------------------------
+
+    def save_formations(self, formations: List[Dict]) -> List[str]:
+        """
+        Upsert custom formations along with their rules validation result
+        (is_validated, violations, warnings) in one transaction
+        """
+        now = datetime.now().isoformat()
+        ids = []
+        with self._transaction() as conn:
+            for formation in formations:
+                formation_id = formation.get("id") or new_id("form_")
+                conn.execute(
+                    "INSERT INTO custom_formations (id, name, personnel, category, description, positions, tags, "
+                    "is_public, is_validated, violations, warnings, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(id) DO UPDATE SET name = excluded.name, personnel = excluded.personnel, "
+                    "category = excluded.category, description = excluded.description, "
+                    "positions = excluded.positions, tags = excluded.tags, is_public = excluded.is_public, "
+                    "is_validated = excluded.is_validated, violations = excluded.violations, "
+                    "warnings = excluded.warnings, updated_at = excluded.updated_at",
+                    (
+                        formation_id,
+                        formation["name"],
+                        formation["personnel"],
+                        formation["category"],
+                        formation.get("description"),
+                        json.dumps(formation["positions"], separators=(",", ":")),
+                        json.dumps(formation.get("tags") or []),
+                        int(bool(formation.get("is_public"))),
+                        int(bool(formation.get("is_validated"))),
+                        json.dumps(formation.get("violations") or []),
+                        json.dumps(formation.get("warnings") or []),
+                        now,
+                        now
+                    )
+                )
+                ids.append(formation_id)
+            self._bump(conn, "formations")
+        return ids
+
+    def _formation_record(self, row: sqlite3.Row) -> Dict:
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "personnel": row["personnel"],
+            "category": row["category"],
+            "description": row["description"],
+            "positions": json.loads(row["positions"]),
+            "tags": json.loads(row["tags"]),
+            "is_public": bool(row["is_public"]),
+            "is_validated": bool(row["is_validated"]),
+            "violations": json.loads(row["violations"]),
+            "warnings": json.loads(row["warnings"]),
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"]
+        }
+
+    def get_formation(self, formation_id: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM custom_formations WHERE id = ?", (formation_id,))
+        return self._formation_record(rows[0]) if rows else None
+
+    def list_formations(self, is_validated: Optional[bool] = None) -> List[Dict]:
+        if is_validated is None:
+            rows = self._query("SELECT * FROM custom_formations ORDER BY seq")
+        else:
+            rows = self._query(
+                "SELECT * FROM custom_formations WHERE is_validated = ? ORDER BY seq", (int(is_validated),)
+            )
+        return [self._formation_record(row) for row in rows]
+
+    # -- outcomes --------------------------------------------------------
+
+    def log_outcomes(self, outcomes: List[Dict], rollups: Optional[List[Tuple]] = None) -> List[Dict]:
+        """
+        Record play results in one transaction; returns the stored rows with ids.
+        rollups are (level, key, week, dimension, bucket, plays, yards, successes,
+        explosives) increments applied in the same transaction.
+        """
+        now = datetime.now().isoformat()
+        stored = []
+        with self._transaction() as conn:
+            for outcome in outcomes:
+                row = {c: outcome.get(c) for c in OUTCOME_COLUMNS}
+                row["id"] = new_id("out_")
+                row["created_at"] = now
+                conn.execute(
+                    f"INSERT INTO play_outcomes (id, {', '.join(OUTCOME_COLUMNS)}, created_at) "
+                    f"VALUES ({', '.join('?' * (len(OUTCOME_COLUMNS) + 2))})",
+                    (row["id"],) + tuple(row[c] for c in OUTCOME_COLUMNS) + (now,)
+                )
+                stored.append(row)
+            if rollups:
+                self._add_rollups(conn, rollups)
+            self._bump(conn, "outcomes")
+        return stored
+
+    def iter_outcomes(self, batch_size: int = 5000, after_seq: int = 0, through_seq: Optional[int] = None):
+        """
+        Walk logged outcomes in insertion order, for rebuilding derived stats.
+        after_seq/through_seq bound the walk to outcomes logged between two
+        last_outcome_seq() readings.
+        """
+        last_seq = after_seq
+        limit = through_seq if through_seq is not None else -1
+        while True:
+            rows = self._query(
+                "SELECT * FROM play_outcomes WHERE seq > ? AND (? < 0 OR seq <= ?) ORDER BY seq LIMIT ?",
+                (last_seq, limit, limit, batch_size)
+            )
+            for row in rows:
+                yield {key: row[key] for key in row.keys() if key != "seq"}
+            if len(rows) < batch_size:
+                return
+            last_seq = rows[-1]["seq"]
+
+    def last_outcome_seq(self) -> int:
+        return self._query("SELECT COALESCE(MAX(seq), 0) AS seq FROM play_outcomes")[0]["seq"]
+
+    # -- outcome rollups -------------------------------------------------
+
+    def _add_rollups(self, conn: sqlite3.Connection, rollups: List[Tuple]):
+        conn.executemany(
+            "INSERT INTO outcome_rollups (level, key, week, dimension, bucket, plays, yards, successes, explosives) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(level, key, dimension, bucket, week) DO UPDATE SET plays = plays + excluded.plays, "
+            "yards = yards + excluded.yards, successes = successes + excluded.successes, "
+            "explosives = explosives + excluded.explosives",
+            rollups
+        )
+
+    def replace_rollups(self, rollups: List[Tuple], through_seq: Optional[int] = None) -> bool:
+        """
+        Swap in a full recomputation of the rollups (used by backfills).
+        With through_seq, nothing is replaced and False comes back if outcomes
+        past it have been logged since the recomputation read them.
+        """
+        with self._transaction() as conn:
+            if through_seq is not None:
+                newer = conn.execute("SELECT 1 FROM play_outcomes WHERE seq > ? LIMIT 1", (through_seq,)).fetchone()
+                if newer:
+                    return False
+            conn.execute("DELETE FROM outcome_rollups")
+            self._add_rollups(conn, rollups)
+            self._bump(conn, "outcomes")
+        return True
+
+    def rollups(self, level: str, key: str, weeks: Optional[Tuple[str, str]] = None) -> List[sqlite3.Row]:
+        """
+        Rollup rows for one play/concept/formation: the all-time rows ("*"), or
+        the weekly rows between two week starts (inclusive)
+        """
+        if weeks is None:
+            return self._query(
+                "SELECT * FROM outcome_rollups WHERE level = ? AND key = ? AND week = '*'", (level, key)
+            )
+        return self._query(
+            "SELECT * FROM outcome_rollups WHERE level = ? AND key = ? AND week BETWEEN ? AND ? ORDER BY week",
+            (level, key) + tuple(weeks)
+        )
+
+    def weekly_totals(self, level: str, key: str) -> List[sqlite3.Row]:
+        return self._query(
+            "SELECT * FROM outcome_rollups WHERE level = ? AND key = ? AND dimension = 'all' AND week != '*' "
+            "ORDER BY week",
+            (level, key)
+        )
+
+    def rollup_leaders(self, level: str, min_plays: int, limit: int) -> List[sqlite3.Row]:
+        return self._query(
+            "SELECT * FROM outcome_rollups WHERE level = ? AND dimension = 'all' AND week = '*' AND plays >= ? "
+            "ORDER BY CAST(successes AS REAL) / plays DESC, plays DESC LIMIT ?",
+            (level, min_plays, limit)
+        )
+
+    # -- opponents -------------------------------------------------------
+
+    def save_opponent(self, tendencies: Dict):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO opponent_tendencies (opponent_name, defensive_fronts, coverages, blitz_rate, "
+                "situational_tendencies, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(opponent_name) DO UPDATE SET defensive_fronts = excluded.defensive_fronts, "
+                "coverages = excluded.coverages, blitz_rate = excluded.blitz_rate, "
+                "situational_tendencies = excluded.situational_tendencies, updated_at = excluded.updated_at",
+                (
+                    tendencies["opponent_name"],
+                    json.dumps(tendencies.get("defensive_fronts") or {}),
+                    json.dumps(tendencies.get("coverages") or {}),
+                    tendencies.get("blitz_rate"),
+                    json.dumps(tendencies.get("situational_tendencies") or {}),
+                    datetime.now().isoformat()
+                )
+            )
+            self._bump(conn, "opponents")
+
+    def _opponent_record(self, row: sqlite3.Row) -> Dict:
+        return {
+            "opponent_name": row["opponent_name"],
+            "defensive_fronts": json.loads(row["defensive_fronts"] or "{}"),
+            "coverages": json.loads(row["coverages"] or "{}"),
+            "blitz_rate": row["blitz_rate"],
+            "situational_tendencies": json.loads(row["situational_tendencies"] or "{}"),
+            "updated_at": row["updated_at"]
+        }
+
+    def get_opponent(self, opponent_name: str) -> Optional[Dict]:
+        rows = self._query("SELECT * FROM opponent_tendencies WHERE opponent_name = ?", (opponent_name,))
+        return self._opponent_record(rows[0]) if rows else None
+
+    def list_opponents(self) -> List[Dict]:
+        return [
+            self._opponent_record(row)
+            for row in self._query("SELECT * FROM opponent_tendencies ORDER BY opponent_name")
+        ]
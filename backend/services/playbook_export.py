@@ -0,0 +1,329 @@
+import os
+import re
+import json
+import time
+import uuid
+import asyncio
+import zipfile
+import tempfile
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from services.analysis_engine import PlayAnalysisEngine
+from services.catalog_registry import CatalogRegistry
+from services.pdf_writer import StreamingPDFWriter
+from services.play_cards import PAGE_HEIGHT, PAGE_WIDTH, card_fields, render_card
+from services.play_store import PlayStore
+from services.telemetry import log_error
+
+EXPORT_FORMATS = {
+    "pdf": "application/pdf",
+    "zip": "application/zip"
+}
+_ORDINALS = {1: "1st", 2: "2nd", 3: "3rd", 4: "4th"}
+_JOB_ID = re.compile(r"^export_[0-9a-f]{12}$")
+# Seconds between progress writes to a job's status file
+STATUS_WRITE_INTERVAL = 1.0
+
+def export_filename(playbook: Dict, fmt: str) -> str:
+    slug = re.sub(r"[^A-Za-z0-9]+", "-", playbook.get("name") or "playbook").strip("-").lower()
+    return f"{slug or 'playbook'}.{fmt}"
+
+class _DrainBuffer:
+    """
+    Write-only file object for zipfile; the exporter takes bytes out after each member
+    """
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+class PlaybookExporter:
+    """
+    Renders playbooks as PDF (one card per page) or a ZIP of card SVGs.
+
+    Cards are drawn in a process pool and written out in playbook order as
+    they finish, with only a small window of pages in flight, so memory stays
+    flat no matter how big the book is. Everything is local: card text comes
+    from the rules engine and the play itself, never the LLM.
+    """
+    def __init__(self, store: PlayStore, catalog: CatalogRegistry, workers: int = 2, window: int = 0):
+        self.store = store
+        self.engine = PlayAnalysisEngine(catalog)
+        self.workers = max(1, workers)
+        self.window = window or self.workers * 4
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_env(cls, store: PlayStore, catalog: CatalogRegistry) -> "PlaybookExporter":
+        return cls(
+            store,
+            catalog,
+            workers=int(os.getenv("EXPORT_WORKERS", str(min(4, os.cpu_count() or 1)))),
+            window=int(os.getenv("EXPORT_WINDOW", "0"))
+        )
+
+    def _executor(self) -> ProcessPoolExecutor:
+        # Spawned lazily so servers that never export don't pay for idle workers
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def card(self, record: Dict) -> Dict:
+        play = record["play"]
+        analysis, _ = self.engine.analyze(
+            play.get("name") or "",
+            play.get("formation") or "",
+            play.get("personnel") or "11",
+            play.get("routes") or [],
+            play.get("concept")
+        )
+        analysis = dict(analysis)
+        if not analysis.get("whenToCall"):
+            analysis["whenToCall"] = self._situation(play)
+
+        description = None
+        match = self.engine.resolve_concept(play.get("concept"), play.get("name") or "")
+        if match and match[0] == "pass":
+            description = self.engine.concepts[match[1]].get("description")
+        elif match and match[0] == "run":
+            description = self.engine.run_schemes[match[1]].get("description")
+        return card_fields(record, analysis, description)
+
+    def _situation(self, play: Dict) -> List[str]:
+        situation = []
+        if play.get("down"):
+            down = _ORDINALS.get(play["down"], str(play["down"]))
+            situation.append(f"{down} and {play['distance']}" if play.get("distance") else f"{down} down")
+        if play.get("field_position"):
+            situation.append(str(play["field_position"]).replace("_", " ").title())
+        if play.get("hash"):
+            situation.append(f"{str(play['hash']).title()} hash")
+        return [", ".join(situation)] if situation else []
+
+    def cards(self, playbook: Dict, chunk_size: int = 100) -> Iterator[Dict]:
+        """
+        Card data in playbook order; plays deleted since being added are skipped
+        """
+        play_ids = playbook.get("plays") or []
+        for start in range(0, len(play_ids), chunk_size):
+            chunk = play_ids[start:start + chunk_size]
+            records = self.store.get_plays(chunk)
+            for play_id in chunk:
+                if play_id in records:
+                    yield self.card(records[play_id])
+
+    async def _rendered(self, playbook: Dict, fmt: str) -> AsyncIterator[Tuple[Dict, bytes]]:
+        """
+        Yields (card, rendered bytes) in order, keeping at most `window` cards in the pool
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._executor()
+        pending = deque()
+        try:
+            for card in self.cards(playbook):
+                pending.append((card, loop.run_in_executor(pool, render_card, card, fmt)))
+                if len(pending) >= self.window:
+                    card, future = pending.popleft()
+                    yield card, await future
+            while pending:
+                card, future = pending.popleft()
+                yield card, await future
+        finally:
+            # Client went away or a card failed: don't leave queued work behind
+            for _, future in pending:
+                future.cancel()
+
+    async def stream(
+        self,
+        playbook: Dict,
+        fmt: str = "pdf",
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> AsyncIterator[bytes]:
+        """
+        Export bytes, a chunk per finished card
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        total = len(playbook.get("plays") or [])
+        done = 0
+
+        if fmt == "pdf":
+            writer = StreamingPDFWriter(PAGE_WIDTH, PAGE_HEIGHT)
+            yield writer.header()
+            async for _, content in self._rendered(playbook, fmt):
+                yield writer.add_page(content)
+                done += 1
+                if on_progress:
+                    on_progress(done, total)
+            yield writer.finish()
+            return
+
+        buffer = _DrainBuffer()
+        archive = zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED)
+        async for card, svg in self._rendered(playbook, fmt):
+            done += 1
+            name = re.sub(r"[^A-Za-z0-9]+", "-", card["name"]).strip("-").lower() or "play"
+            info = zipfile.ZipInfo(f"{done:03d}-{name}.svg", date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(info, svg)
+            yield buffer.drain()
+            if on_progress:
+                on_progress(done, total)
+        archive.close()
+        yield buffer.drain()
+
+class ExportJobs:
+    """
+    Background exports for playbooks too big to stream in one request. Output
+    goes to a temp file the client downloads once the job is done; finished
+    jobs and their files are dropped after `ttl_seconds`. Each job's status is
+    mirrored to a JSON file next to its output, so with several workers
+    sharing the directory any of them can answer a poll or serve the download.
+    """
+    def __init__(self, exporter: PlaybookExporter, directory: Optional[str] = None, ttl_seconds: int = 3600):
+        self.exporter = exporter
+        self.directory = directory or os.path.join(tempfile.gettempdir(), "coachgrind-exports")
+        self.ttl_seconds = ttl_seconds
+        self._jobs: Dict[str, Dict] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, exporter: PlaybookExporter) -> "ExportJobs":
+        return cls(
+            exporter,
+            directory=os.getenv("EXPORT_DIR") or None,
+            ttl_seconds=int(os.getenv("EXPORT_JOB_TTL_SECONDS", "3600"))
+        )
+
+    def start(self, playbook: Dict, fmt: str) -> Dict:
+        self.cleanup()
+        job_id = f"export_{uuid.uuid4().hex[:12]}"
+        job = {
+            "job_id": job_id,
+            "playbook_id": playbook["id"],
+            "format": fmt,
+            "state": "queued",
+            "done": 0,
+            "total": len(playbook.get("plays") or []),
+            "error": None,
+            "filename": export_filename(playbook, fmt),
+            "path": os.path.join(self.directory, f"{job_id}.{fmt}"),
+            "created_at": time.time(),
+            "finished_at": None
+        }
+        self._jobs[job_id] = job
+        self._save(job)
+        self._tasks[job_id] = asyncio.create_task(self._run(job, playbook))
+        return self.status(job_id)
+
+    def _status_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.json")
+
+    def _save(self, job: Dict):
+        path = self._status_path(job["job_id"])
+        try:
+            with open(f"{path}.tmp", "w") as output:
+                json.dump(job, output)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            log_error(f"Export Status Error: {str(e)}")
+
+    def _load(self, job_id: str) -> Optional[Dict]:
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._status_path(job_id)) as source:
+                return json.load(source)
+        except (OSError, ValueError):
+            return None
+
+    async def _run(self, job: Dict, playbook: Dict):
+        job["state"] = "running"
+        self._save(job)
+        saved_at = time.monotonic()
+
+        def progress(done: int, total: int):
+            nonlocal saved_at
+            job["done"] = done
+            if time.monotonic() - saved_at >= STATUS_WRITE_INTERVAL:
+                saved_at = time.monotonic()
+                self._save(job)
+
+        try:
+            with open(job["path"], "wb") as output:
+                async for chunk in self.exporter.stream(playbook, job["format"], on_progress=progress):
+                    output.write(chunk)
+            # Deleted plays are skipped, so the final count can be short of the playbook size
+            job["total"] = job["done"]
+            job["state"] = "done"
+        except asyncio.CancelledError:
+            job["state"] = "cancelled"
+            raise
+        except Exception as e:
+            log_error(f"Export Error: {str(e)}")
+            job["state"] = "failed"
+            job["error"] = str(e)
+        finally:
+            job["finished_at"] = time.time()
+            self._tasks.pop(job["job_id"], None)
+            if job["state"] != "done" and os.path.exists(job["path"]):
+                os.remove(job["path"])
+            self._save(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """
+        Jobs started by this worker, else whatever the status file says
+        (another worker's job)
+        """
+        return self._jobs.get(job_id) or self._load(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.get(job_id)
+        if job is None:
+            return None
+        return {k: v for k, v in job.items() if k != "path"}
+
+    def cleanup(self):
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.directory):
+            job_id = name[:-len(".json")]
+            if not name.endswith(".json") or job_id in self._tasks:
+                continue
+            job = self._jobs.get(job_id) or self._load(job_id)
+            if job is None or not job["finished_at"] or job["finished_at"] >= cutoff:
+                continue
+            # Another worker may be sweeping the same directory
+            for path in (job["path"], self._status_path(job_id)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            self._jobs.pop(job_id, None)
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks.values(), return_exceptions=True)
@@ -0,0 +1,189 @@
+import re
+import json
+from typing import Dict, List, Optional
+
+from services.analysis_engine import ANALYSIS_FIELDS, PlayAnalysisEngine
+from services.play_cards import path_segments
+from services.route_tree import PIXELS_PER_YARD, ROUTE_TREE, route_id
+
+# Part of every analysis cache key; bump when the prompt text or encoding changes
+PROMPT_VERSION = "prompt-v2"
+
+_NAME_RE = re.compile(r"[^a-z0-9]+")
+
+ROLE = (
+    "You are an expert football coach with deep knowledge of offensive schemes, defensive "
+    "coverages, and game strategy. Use real football terminology and keep every point specific "
+    "and actionable. Always answer with a single JSON object."
+)
+
+ENCODING = """ENCODING
+Requests name catalog items by the ids above where one matches, otherwise by their own name.
+routes: space-separated, one per receiver.
+  PLAYER:ROUTE/DEPTH = a route-tree route; DEPTH is its deepest point in yards past the player's alignment.
+  PLAYER:~x,y;x,y... = a custom route as waypoints in yards from the alignment (x + toward the offense's right, y + downfield).
+  A trailing * marks a dashed route (motion, swing or option)."""
+
+ANALYSIS_TASK = """TASK: analyze the play in the request and fill in this JSON:
+{"whenToCall": [3-4 specific game situations when this play is effective],
+ "bestAgainst": [3-4 defensive schemes/coverages this beats],
+ "strengths": [3-4 key advantages of this play],
+ "weaknesses": [2-3 vulnerabilities to watch for],
+ "coachingPoints": [3-4 key coaching points for execution],
+ "qbProgression": [3-5 step QB read progression],
+ "adjustments": {"vsMan": "Adjustment against man coverage", "vsZone": "Adjustment against zone coverage", "vsBlitz": "Hot route adjustment for blitz"},
+ "redZone": "Effectiveness and adjustments in red zone",
+ "keyMatchups": [2-3 critical player matchups for success]}
+When the request has a fields line, include only those fields."""
+
+GENERATION_TASK = """TASK: Generate a complete football play from the coach's description in the request.
+Return this JSON:
+{"name": "Play name",
+ "formation": "Formation name (e.g., Gun Trips Right, I-Form Strong)",
+ "personnel": "Personnel grouping (e.g., 11, 12, 21)",
+ "concept": "Core concept (e.g., Mesh, Smash, Power)",
+ "players": [{"id": "position", "x": x_coord, "y": y_coord}],
+ "routes": [{"from": "player_id", "routeType": "route-tree id", "path": "SVG path string", "label": "Route label"}],
+ "blocking": {"scheme": "Blocking scheme name", "assignments": {"position": "assignment"}},
+ "description": "Brief play description",
+ "coachingNotes": "Key coaching points"}
+Use standard football positions: QB, RB, FB, X, Z, Y, F, H, C, LG, RG, LT, RT.
+The field is 1200px wide x 600px tall; the line of scrimmage is y=350, offense starts around y=380 and attacks toward y=0, 10px per yard."""
+
+COUNTERS_TASK = """TASK: Suggest 5 effective plays against the defense in the request.
+Return {"plays": [5 of {"playName": "Name of the play", "formation": "Offensive formation", "concept": "Core concept", "reasoning": "Why this works against that defense", "keyPoints": ["2-3 execution keys"]}]}"""
+
+TASKS = {
+    "analysis": ANALYSIS_TASK,
+    "generation": GENERATION_TASK,
+    "counters": COUNTERS_TASK
+}
+
+def _normalize(name: Optional[str]) -> str:
+    return _NAME_RE.sub("-", (name or "").lower()).strip("-")
+
+def _yards(value: float) -> str:
+    return str(int(round(value / PIXELS_PER_YARD)))
+
+def encode_route(route: Dict) -> str:
+    """
+    One route in the compact form described in ENCODING
+    """
+    player = str(route.get("from") or route.get("from_player") or "?")
+    points = [(s[-2], s[-1]) for s in path_segments(route.get("path") or "") if s[0] != "Z"]
+    dashed = "*" if route.get("dash") else ""
+    known = route_id(route)
+    if not points:
+        return f"{player}:{known or _normalize(route.get('label')) or '?'}{dashed}"
+
+    x0, y0 = points[0]
+    if known:
+        depth = max(y0 - y for _, y in points)
+        return f"{player}:{known}/{_yards(depth)}{dashed}"
+    waypoints = ";".join(f"{_yards(x - x0)},{_yards(y0 - y)}" for x, y in points[1:])
+    return f"{player}:~{waypoints}{dashed}"
+
+def encode_routes(routes: List[Dict]) -> str:
+    return " ".join(encode_route(route) for route in routes)
+
+class Prompt:
+    """
+    One LLM request split at the cache boundary: `system` is fixed for a task
+    and catalog version (the cacheable prefix), `user` is everything that
+    changes per call.
+    """
+    __slots__ = ("task", "system", "user")
+
+    def __init__(self, task: str, system: str, user: str):
+        self.task = task
+        self.system = system
+        self.user = user
+
+    def messages(self) -> List[Dict]:
+        return [
+            {"role": "system", "content": self.system},
+            {"role": "user", "content": self.user}
+        ]
+
+class PromptBuilder:
+    """
+    Builds the three AIService prompts. Static text (role, catalog glossary,
+    encoding rules, output schema) goes first and is identical from call to
+    call, so provider prefix caches apply; the play itself goes last, encoded
+    compactly against the catalog ids the prefix defines.
+    """
+    def __init__(self, engine: PlayAnalysisEngine):
+        self.engine = engine
+        self._version = None
+        self._systems: Dict[str, str] = {}
+        self._formations: Dict[str, str] = {}
+
+    def _refresh(self):
+        snapshot = self.engine.catalog.snapshot
+        if snapshot.version == self._version:
+            return
+        items = snapshot.items
+        catalog = self._glossary(items)
+        self._systems = {task: f"{ROLE}\n\n{catalog}\n\n{ENCODING}\n\n{text}" for task, text in TASKS.items()}
+        self._formations = {}
+        for kind in ("formations", "base_formations"):
+            for formation in items[kind]:
+                self._formations[_normalize(formation["id"])] = formation["id"]
+                self._formations[_normalize(formation["name"])] = formation["id"]
+        self._version = snapshot.version
+
+    def _glossary(self, items: Dict) -> str:
+        lines = ["CATALOG", "Route tree: " + ", ".join(ROUTE_TREE)]
+        lines.append("Pass concepts (id = routes by player, depth in yards | beats):")
+        for concept in items["expanded_concepts"]:
+            routes = ", ".join(
+                f"{player} {route['type']} {route.get('depth', '')}".rstrip()
+                for player, route in concept["routes"].items()
+            )
+            lines.append(f"  {concept['id']} = {routes} | {', '.join(concept.get('bestAgainst', []))}")
+        lines.append("Concept notes: " + "; ".join(f"{c['id']} = {c['notes']}" for c in items["concepts"]))
+        lines.append("Run schemes: " + "; ".join(f"{r['id']} = {r['name']}: {r['notes']}" for r in items["run_schemes"]))
+        lines.append("Protections: " + "; ".join(f"{p['id']} = {p['name']}: {p['notes']}" for p in items["protections"]))
+        lines.append("Formations: " + "; ".join(
+            f"{f['id']} = {f['name']}" for f in items["formations"] + items["base_formations"]
+        ))
+        return "\n".join(lines)
+
+    def _concept(self, concept: Optional[str], play_name: str) -> str:
+        match = self.engine.resolve_concept(concept, play_name)
+        if match:
+            return match[1]
+        return concept or "custom"
+
+    def _formation(self, formation: str) -> str:
+        return self._formations.get(_normalize(formation), formation)
+
+    def analysis(
+        self,
+        play_name: str,
+        formation: str,
+        personnel: str,
+        routes: List[Dict],
+        concept: Optional[str],
+        fields: List[str]
+    ) -> Prompt:
+        self._refresh()
+        lines = [
+            f"play: {play_name}",
+            f"formation: {self._formation(formation)}",
+            f"personnel: {personnel}",
+            f"concept: {self._concept(concept, play_name)}",
+            f"routes: {encode_routes(routes)}"
+        ]
+        # Only ask for what the rules engine couldn't fill
+        if len(fields) < len(ANALYSIS_FIELDS):
+            lines.append(f"fields: {','.join(fields)}")
+        return Prompt("analysis", self._systems["analysis"], "\n".join(lines))
+
+    def generation(self, description: str) -> Prompt:
+        self._refresh()
+        return Prompt("generation", self._systems["generation"], f"description: {json.dumps(description)}")
+
+    def counters(self, defensive_scheme: str) -> Prompt:
+        self._refresh()
+        return Prompt("counters", self._systems["counters"], f"defense: {defensive_scheme}")
@@ -0,0 +1,451 @@
+import os
+import json
+import asyncio
+import math
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+import redis.asyncio as aioredis
+
+from services.telemetry import log_error
+
+TIERS = ("free", "pro", "enterprise")
+
+# rate/burst: per-user token bucket (requests per second / bucket size)
+# tier_rate/tier_burst: one bucket shared by everyone on the tier (None = unlimited)
+# concurrency/tier_concurrency: in-flight LLM requests per user and per tier
+# daily_tokens: LLM tokens (input + output) per user per UTC day
+# priority: position in the LLM admission queue, lower goes first
+DEFAULT_TIER_LIMITS = {
+    "free": {
+        "rate": 0.2, "burst": 5, "tier_rate": 5.0, "tier_burst": 20,
+        "concurrency": 1, "tier_concurrency": 4, "daily_tokens": 50_000, "priority": 2
+    },
+    "pro": {
+        "rate": 1.0, "burst": 20, "tier_rate": 20.0, "tier_burst": 60,
+        "concurrency": 4, "tier_concurrency": 16, "daily_tokens": 1_000_000, "priority": 1
+    },
+    "enterprise": {
+        "rate": 5.0, "burst": 50, "tier_rate": None, "tier_burst": None,
+        "concurrency": 16, "tier_concurrency": None, "daily_tokens": None, "priority": 0
+    }
+}
+
+# Endpoints that end in LLM calls; prefixes, so the /stream variants are covered
+LIMITED_PATHS = (
+    "/api/analysis/analyze",
+    "/api/analysis/generate",
+    "/api/analysis/suggest-counters",
+    "/api/analysis/batch"
+)
+
+# Concurrency leases expire on their own if a worker dies holding one
+LEASE_TTL_SECONDS = 300
+PRINCIPAL_CACHE_SECONDS = 5.0
+
+class Principal:
+    """
+    Who a request is charged to: a user id, or the client address when anonymous
+    """
+    __slots__ = ("key", "tier", "limits", "leases")
+
+    def __init__(self, key: str, tier: str, limits: Dict):
+        self.key = key
+        self.tier = tier
+        self.limits = limits
+        # (lease key, lease id) taken by admit(), handed back by release()
+        self.leases: List[Tuple[str, str]] = []
+
+    @property
+    def priority(self) -> int:
+        return self.limits["priority"]
+
+# Set by TierLimitMiddleware for the duration of a limited request
+current_principal: ContextVar[Optional[Principal]] = ContextVar("current_principal", default=None)
+
+class RateLimited(Exception):
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+def seconds_until_utc_midnight(now: Optional[float] = None) -> float:
+    now = time.time() if now is None else now
+    return 86400 - now % 86400
+
+def utc_day(now: Optional[float] = None) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(now))
+
+class MemoryLimitBackend:
+    """
+    Limits for a single worker
+    """
+    def __init__(self, max_buckets: int = 50_000):
+        self.max_buckets = max_buckets
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._leases: Dict[str, Dict[str, float]] = {}
+        self._usage: Dict[str, int] = {}
+        self._usage_day = utc_day()
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        Take `cost` from the bucket; returns 0 if allowed, else seconds until it would be
+        """
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        if tokens < cost:
+            self._buckets[key] = (tokens, now)
+            return (cost - tokens) / rate
+        self._buckets[key] = (tokens - cost, now)
+        if len(self._buckets) > self.max_buckets:
+            self._prune(now)
+        return 0.0
+
+    def _prune(self, now: float):
+        # A bucket idle long enough to have refilled is the same as no bucket
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if now - updated > 3600:
+                del self._buckets[key]
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        """
+        Take a concurrency lease; returns its id, or None when `limit` are held
+        """
+        now = time.monotonic()
+        leases = {
+            lease: expires for lease, expires in self._leases.get(key, {}).items() if expires > now
+        }
+        if len(leases) >= limit:
+            self._leases[key] = leases
+            return None
+        lease = uuid.uuid4().hex
+        leases[lease] = now + LEASE_TTL_SECONDS
+        self._leases[key] = leases
+        return lease
+
+    async def release(self, key: str, lease: str):
+        leases = self._leases.get(key)
+        if leases is not None:
+            leases.pop(lease, None)
+            if not leases:
+                del self._leases[key]
+
+    def _roll(self):
+        today = utc_day()
+        if today != self._usage_day:
+            self._usage = {}
+            self._usage_day = today
+
+    async def used(self, key: str) -> int:
+        self._roll()
+        return self._usage.get(key, 0)
+
+    async def charge(self, key: str, amount: int):
+        self._roll()
+        self._usage[key] = self._usage.get(key, 0) + amount
+
+    def stats(self) -> Dict:
+        return {"backend": "memory", "buckets": len(self._buckets), "leases": sum(len(leases) for leases in self._leases.values())}
+
+    async def close(self):
+        pass
+
+# KEYS[1] bucket; ARGV rate, burst, cost. Returns seconds to wait ("0" = allowed).
+TOKEN_BUCKET_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local wait = 0
+if tokens < cost then
+  wait = (cost - tokens) / rate
+else
+  tokens = tokens - cost
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+# KEYS[1] lease set; ARGV limit, lease id, ttl. Leases are scored by expiry so
+# one that is never released drops out on its own. Returns 1 if taken.
+LEASE_LUA = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local ttl = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[1]) then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now + ttl, ARGV[2])
+redis.call('EXPIRE', KEYS[1], math.ceil(ttl))
+return 1
+"""
+
+class RedisLimitBackend:
+    """
+    Same interface on Redis so limits hold across workers. Buckets and lease
+    sets are updated atomically in Lua scripts using the Redis clock.
+    """
+    def __init__(self, redis_url: str, namespace: str = "coachgrind:limits"):
+        self.redis = aioredis.from_url(redis_url)
+        self.namespace = namespace
+        self._bucket = self.redis.register_script(TOKEN_BUCKET_LUA)
+        self._lease = self.redis.register_script(LEASE_LUA)
+
+    def _key(self, kind: str, value: str) -> str:
+        return f"{self.namespace}:{kind}:{value}"
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        wait = await self._bucket(keys=[self._key("bucket", key)], args=[rate, burst, cost])
+        return float(wait)
+
+    async def acquire(self, key: str, limit: int) -> Optional[str]:
+        lease = uuid.uuid4().hex
+        taken = await self._lease(keys=[self._key("leases", key)], args=[limit, lease, LEASE_TTL_SECONDS])
+        return lease if int(taken) else None
+
+    async def release(self, key: str, lease: str):
+        await self.redis.zrem(self._key("leases", key), lease)
+
+    async def used(self, key: str) -> int:
+        value = await self.redis.get(self._key("tokens", f"{utc_day()}:{key}"))
+        return int(value) if value is not None else 0
+
+    async def charge(self, key: str, amount: int):
+        usage_key = self._key("tokens", f"{utc_day()}:{key}")
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.incrby(usage_key, amount)
+            pipe.expire(usage_key, 2 * 86400)
+            await pipe.execute()
+
+    def stats(self) -> Dict:
+        return {"backend": "redis"}
+
+    async def close(self):
+        await self.redis.aclose()
+
+class TierLimiter:
+    """
+    Per-user and per-tier token buckets, per-user and per-tier concurrency
+    quotas and per-user daily LLM token budgets, keyed on the caller's
+    subscription tier
+    """
+    def __init__(self, backend=None, tiers: Optional[Dict[str, Dict]] = None, enabled: bool = True):
+        self.backend = backend or MemoryLimitBackend()
+        self.tiers = tiers or DEFAULT_TIER_LIMITS
+        self.enabled = enabled
+        self.rejections: Dict[str, int] = {}
+        self._pending_charges = set()
+
+    @classmethod
+    def from_env(cls) -> "TierLimiter":
+        """
+        TIER_LIMITS is JSON overriding any of DEFAULT_TIER_LIMITS, e.g.
+        {"free": {"rate": 0.5, "daily_tokens": 100000}}
+        """
+        tiers = {tier: dict(limits) for tier, limits in DEFAULT_TIER_LIMITS.items()}
+        overrides = json.loads(os.getenv("TIER_LIMITS") or "{}")
+        for tier, limits in overrides.items():
+            tiers.setdefault(tier, dict(DEFAULT_TIER_LIMITS["free"])).update(limits)
+        redis_url = os.getenv("REDIS_URL") or None
+        return cls(
+            backend=RedisLimitBackend(redis_url) if redis_url else MemoryLimitBackend(),
+            tiers=tiers,
+            enabled=os.getenv("RATE_LIMITS_ENABLED", "true").lower() not in ("0", "false", "no")
+        )
+
+    def principal(self, key: str, tier: Optional[str]) -> Principal:
+        tier = tier if tier in self.tiers else "free"
+        return Principal(key, tier, self.tiers[tier])
+
+    def _reject(self, principal: Principal, reason: str, message: str, retry_after: float) -> RateLimited:
+        counter = f"{principal.tier}:{reason}"
+        self.rejections[counter] = self.rejections.get(counter, 0) + 1
+        return RateLimited(message, retry_after)
+
+    async def admit(self, principal: Principal):
+        """
+        Check budget, take the concurrency leases, then the buckets; raises
+        RateLimited. Every successful admit must be paired with release().
+        Concurrency goes first so a request turned away for being over it
+        doesn't also spend a token.
+        """
+        limits = principal.limits
+        if limits.get("daily_tokens") is not None:
+            if await self.backend.used(f"user:{principal.key}") >= limits["daily_tokens"]:
+                raise self._reject(
+                    principal, "budget", "Daily AI token budget used up for your plan",
+                    seconds_until_utc_midnight()
+                )
+
+        try:
+            await self._lease(principal, f"user:{principal.key}", limits["concurrency"], "concurrency",
+                              "Too many AI requests in flight for your account")
+            if limits.get("tier_concurrency") is not None:
+                await self._lease(principal, f"tier:{principal.tier}", limits["tier_concurrency"], "tier_concurrency",
+                                  f"The {principal.tier} plan is at capacity, please retry")
+
+            wait = await self.backend.take(f"user:{principal.key}", limits["rate"], limits["burst"])
+            if wait > 0:
+                raise self._reject(principal, "rate", "Too many AI requests, slow down", wait)
+            if limits.get("tier_rate") is not None:
+                wait = await self.backend.take(f"tier:{principal.tier}", limits["tier_rate"], limits["tier_burst"])
+                if wait > 0:
+                    raise self._reject(principal, "tier_rate", f"The {principal.tier} plan is at capacity, please retry", wait)
+        except BaseException:
+            await self.release(principal)
+            raise
+
+    async def _lease(self, principal: Principal, key: str, limit: int, reason: str, message: str):
+        lease = await self.backend.acquire(key, limit)
+        if lease is None:
+            raise self._reject(principal, reason, message, 1)
+        principal.leases.append((key, lease))
+
+    async def release(self, principal: Principal):
+        leases, principal.leases = principal.leases, []
+        for key, lease in leases:
+            try:
+                await self.backend.release(key, lease)
+            except Exception as e:
+                log_error(f"Rate Limit Release Error: {str(e)}")
+
+    async def charge(self, principal: Principal, tokens: int):
+        try:
+            await self.backend.charge(f"user:{principal.key}", tokens)
+        except Exception as e:
+            log_error(f"Token Budget Error: {str(e)}")
+
+    def record_usage(self, span: Dict):
+        """
+        AIService usage listener: charge the current principal for a finished call
+        """
+        principal = current_principal.get()
+        tokens = span.get("input_tokens", 0) + span.get("output_tokens", 0)
+        if principal is None or not tokens:
+            return
+        task = asyncio.ensure_future(self.charge(principal, tokens))
+        self._pending_charges.add(task)
+        task.add_done_callback(self._pending_charges.discard)
+
+    async def usage(self, principal: Principal) -> Dict:
+        used = await self.backend.used(f"user:{principal.key}")
+        budget = principal.limits.get("daily_tokens")
+        return {
+            "tier": principal.tier,
+            "tokens_used_today": used,
+            "daily_tokens": budget,
+            "tokens_remaining": max(0, budget - used) if budget is not None else None,
+            "resets_in_seconds": int(seconds_until_utc_midnight())
+        }
+
+    def collect_metrics(self):
+        yield ("rate_limit_rejections_total", "counter", "Requests refused with 429, by tier and reason", [
+            ({"tier": key.split(":")[0], "reason": key.split(":")[1]}, count)
+            for key, count in sorted(self.rejections.items())
+        ])
+
+    def stats(self) -> Dict:
+        return {"enabled": self.enabled, "rejections": dict(self.rejections), **self.backend.stats()}
+
+    async def close(self):
+        await self.backend.close()
+
+class TierLimitMiddleware:
+    """
+    ASGI middleware for the LLM endpoints: resolves the caller's tier from
+    their session (Bearer header or session_token query param; anonymous
+    callers are limited as free-tier by client address), admits or answers
+    429 with Retry-After, and holds the concurrency leases until the
+    response has been fully sent, streams included
+    """
+    def __init__(self, app, paths: Tuple[str, ...] = LIMITED_PATHS):
+        self.app = app
+        self.paths = paths
+        self._principals: Dict[str, Tuple[float, str, Optional[str]]] = {}
+
+    def _token(self, scope) -> Optional[str]:
+        for name, value in scope.get("headers") or []:
+            if name == b"authorization":
+                scheme, _, token = value.decode("latin-1").partition(" ")
+                if scheme.lower() == "bearer" and token:
+                    return token.strip()
+        query = parse_qs((scope.get("query_string") or b"").decode("latin-1"))
+        tokens = query.get("session_token")
+        return tokens[0] if tokens else None
+
+    async def _identify(self, scope) -> Tuple[str, Optional[str]]:
+        """
+        (principal key, tier) for the request, cached briefly per session token
+        """
+        token = self._token(scope)
+        if token:
+            cached = self._principals.get(token)
+            if cached and cached[0] > time.monotonic():
+                return cached[1], cached[2]
+            auth_store = getattr(scope["app"].state, "auth_store", None)
+            session = await auth_store.get_session(token) if auth_store else None
+            if session:
+                user = await auth_store.get_user(session["user_id"])
+                identity = (session["user_id"], (user or {}).get("subscription"))
+                if len(self._principals) > 10_000:
+                    self._principals.clear()
+                self._principals[token] = (time.monotonic() + PRINCIPAL_CACHE_SECONDS, *identity)
+                return identity
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}", None
+
+    async def _send_429(self, send, error: RateLimited, tier: str):
+        body = json.dumps({"detail": str(error)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(error.retry_after).encode()),
+                (b"x-ratelimit-tier", tier.encode())
+            ]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        limiter = getattr(scope["app"].state, "limiter", None) if scope["type"] == "http" else None
+        if (
+            limiter is None
+            or not limiter.enabled
+            or scope["method"] == "OPTIONS"
+            or not scope["path"].startswith(self.paths)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key, tier = await self._identify(scope)
+        principal = limiter.principal(key, tier)
+        admitted = True
+        try:
+            await limiter.admit(principal)
+        except RateLimited as e:
+            await self._send_429(send, e, principal.tier)
+            return
+        except Exception as e:
+            # Fail open: a limits backend outage shouldn't take the AI features down with it
+            log_error(f"Rate Limit Error: {str(e)}")
+            admitted = False
+
+        token = current_principal.set(principal)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_principal.reset(token)
+            if admitted:
+                await limiter.release(principal)
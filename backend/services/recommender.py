@@ -0,0 +1,384 @@
+import math
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from services.analysis_engine import PlayAnalysisEngine
+from services.catalog_registry import CatalogRegistry
+from services.outcomes import (
+    FIELD_POSITIONS, HASH_MARKS, RED_ZONE, is_success, normalize_label, situation_key
+)
+
+# Beta prior: a play with no history scores BASE_SUCCESS_RATE, nudged up for
+# coverages its concept is built to beat, worth PRIOR_ATTEMPTS real snaps
+BASE_SUCCESS_RATE = 0.45
+BEST_AGAINST_BONUS = 0.15
+PRIOR_ATTEMPTS = 4.0
+
+# Situational fit multipliers; plays without situational data stay neutral
+DOWN_MATCH = 1.1
+DOWN_MISMATCH = 0.85
+DISTANCE_FALLOFF_YARDS = 4.0
+FIELD_MATCH = 1.1
+FIELD_ADJACENT = 1.0
+FIELD_MISMATCH = 0.92
+HASH_MATCH = 1.05
+HASH_MISMATCH = 0.98
+
+_FIELD_CODES = {name: i for i, name in enumerate(FIELD_POSITIONS)}
+_HASH_CODES = {name: i for i, name in enumerate(HASH_MARKS)}
+# Play kind per slot, from the resolved concept; 0 when it doesn't resolve
+KIND_CODES = {"pass": 1, "run": 2}
+
+def coverage_mix(
+    opponent: Optional[Dict],
+    down: Optional[int] = None,
+    distance: Optional[int] = None,
+    field_position: Optional[str] = None,
+    situation: Optional[str] = None
+) -> Dict[str, float]:
+    """
+    Opponent's coverage distribution for this situation: the matching
+    situational_tendencies entry (an explicit situation such as "two_minute",
+    then "3rd_and_long", then "red_zone") when it has a coverage mix,
+    otherwise their overall mix. Normalized to sum to 1.
+    """
+    if not opponent:
+        return {}
+    situational = opponent.get("situational_tendencies") or {}
+    candidates = [situation, situation_key(down, distance)]
+    if field_position in RED_ZONE:
+        candidates.append("red_zone")
+    mix = None
+    for key in candidates:
+        entry = situational.get(key) if key else None
+        if isinstance(entry, dict) and entry.get("coverage"):
+            mix = entry["coverage"]
+            break
+    mix = mix or opponent.get("coverages") or {}
+
+    normalized: Dict[str, float] = {}
+    for coverage, share in mix.items():
+        if share and share > 0:
+            label = normalize_label(coverage)
+            normalized[label] = normalized.get(label, 0.0) + float(share)
+    total = sum(normalized.values())
+    return {k: v / total for k, v in normalized.items()} if total else {}
+
+class PlayRecommender:
+    """
+    Ranks every stored play by expected success against a coverage mix.
+
+    Keeps play x coverage success and attempt matrices plus a smoothed rate
+    matrix; logging an outcome updates one cell, so ranking is a single
+    matrix-vector product and a situational-fit multiply over all plays.
+    """
+    def __init__(self, catalog: CatalogRegistry):
+        self.engine = PlayAnalysisEngine(catalog)
+        self.coverages: Dict[str, int] = {}
+        self._slots: Dict[str, int] = {}
+        self._slot_ids: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._info: List[Optional[Dict]] = []
+        self._best_against: List[Set[str]] = []
+        self._allocate(1024, 0)
+
+    def _allocate(self, rows: int, columns: int):
+        self._successes = np.zeros((rows, columns))
+        self._attempts = np.zeros((rows, columns))
+        self._prior = np.full((rows, columns), BASE_SUCCESS_RATE)
+        self._rates = np.full((rows, columns), BASE_SUCCESS_RATE)
+        self._active = np.zeros(rows, dtype=bool)
+        self._kinds = np.zeros(rows, dtype=np.int8)
+        self._downs = np.zeros(rows, dtype=np.int8)
+        self._distances = np.full(rows, np.nan)
+        self._fields = np.full(rows, -1, dtype=np.int8)
+        self._hashes = np.full(rows, -1, dtype=np.int8)
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def rebuild(self, plays: Iterable[Dict], outcomes: Iterable[Dict]):
+        self.coverages = {}
+        self._slots = {}
+        self._slot_ids = []
+        self._free_slots = []
+        self._info = []
+        self._best_against = []
+        self._allocate(1024, 0)
+        for record in plays:
+            self.add_play(record)
+        for outcome in outcomes:
+            self.record_outcome(outcome)
+
+    # -- matrix growth ---------------------------------------------------
+
+    def _grow_rows(self):
+        rows = len(self._active)
+        for name in ("_successes", "_attempts"):
+            matrix = getattr(self, name)
+            setattr(self, name, np.vstack([matrix, np.zeros_like(matrix)]))
+        for name in ("_prior", "_rates"):
+            matrix = getattr(self, name)
+            setattr(self, name, np.vstack([matrix, np.full_like(matrix, BASE_SUCCESS_RATE)]))
+        self._active = np.concatenate([self._active, np.zeros(rows, dtype=bool)])
+        self._kinds = np.concatenate([self._kinds, np.zeros(rows, dtype=np.int8)])
+        self._downs = np.concatenate([self._downs, np.zeros(rows, dtype=np.int8)])
+        self._distances = np.concatenate([self._distances, np.full(rows, np.nan)])
+        self._fields = np.concatenate([self._fields, np.full(rows, -1, dtype=np.int8)])
+        self._hashes = np.concatenate([self._hashes, np.full(rows, -1, dtype=np.int8)])
+
+    def _coverage_column(self, coverage: str) -> int:
+        column = self.coverages.get(coverage)
+        if column is not None:
+            return column
+        column = len(self.coverages)
+        self.coverages[coverage] = column
+        rows = len(self._active)
+        prior = np.full((rows, 1), BASE_SUCCESS_RATE)
+        for slot, best in enumerate(self._best_against):
+            if coverage in best:
+                prior[slot, 0] += BEST_AGAINST_BONUS
+        self._successes = np.hstack([self._successes, np.zeros((rows, 1))])
+        self._attempts = np.hstack([self._attempts, np.zeros((rows, 1))])
+        self._prior = np.hstack([self._prior, prior])
+        self._rates = np.hstack([self._rates, prior.copy()])
+        return column
+
+    def _refresh_rates(self, slot: int):
+        self._rates[slot] = (
+            (self._successes[slot] + self._prior[slot] * PRIOR_ATTEMPTS)
+            / (self._attempts[slot] + PRIOR_ATTEMPTS)
+        )
+
+    # -- updates ---------------------------------------------------------
+
+    def _concept_best_against(self, match: Optional[Tuple[str, str]]) -> Set[str]:
+        if not match or match[0] != "pass":
+            return set()
+        concept = self.engine.concepts.get(match[1], {})
+        return {normalize_label(c) for c in concept.get("bestAgainst", [])}
+
+    def add_play(self, record: Dict):
+        """
+        Add a play or refresh its situational data; outcome history is kept
+        """
+        play_id = record["id"]
+        play = record.get("play", {})
+        slot = self._slots.get(play_id)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._slot_ids[slot] = play_id
+            else:
+                slot = len(self._slot_ids)
+                if slot >= len(self._active):
+                    self._grow_rows()
+                self._slot_ids.append(play_id)
+                self._info.append(None)
+                self._best_against.append(set())
+            self._slots[play_id] = slot
+
+        self._info[slot] = {
+            "name": play.get("name"),
+            "formation": play.get("formation"),
+            "personnel": play.get("personnel"),
+            "concept": play.get("concept"),
+            "category": record.get("category")
+        }
+        match = self.engine.resolve_concept(play.get("concept"), play.get("name", ""))
+        self._kinds[slot] = KIND_CODES.get(match[0], 0) if match else 0
+        best = self._concept_best_against(match)
+        self._best_against[slot] = best
+        columns = [self._coverage_column(coverage) for coverage in best]
+        self._prior[slot] = BASE_SUCCESS_RATE
+        self._prior[slot, columns] += BEST_AGAINST_BONUS
+        self._refresh_rates(slot)
+
+        self._active[slot] = True
+        self._downs[slot] = play.get("down") or 0
+        distance = play.get("distance")
+        self._distances[slot] = np.nan if distance is None else distance
+        self._fields[slot] = _FIELD_CODES.get(play.get("field_position"), -1)
+        self._hashes[slot] = _HASH_CODES.get(play.get("hash"), -1)
+
+    def remove_play(self, play_id: str):
+        slot = self._slots.pop(play_id, None)
+        if slot is None:
+            return
+        self._successes[slot] = 0.0
+        self._attempts[slot] = 0.0
+        self._prior[slot] = BASE_SUCCESS_RATE
+        self._rates[slot] = BASE_SUCCESS_RATE
+        self._active[slot] = False
+        self._kinds[slot] = 0
+        self._slot_ids[slot] = None
+        self._info[slot] = None
+        self._best_against[slot] = set()
+        self._free_slots.append(slot)
+
+    def record_outcome(self, outcome: Dict):
+        """
+        Fold one logged outcome into its play x coverage cell
+        """
+        slot = self._slots.get(outcome.get("play_id"))
+        coverage = normalize_label(outcome.get("coverage"))
+        if slot is None or not coverage:
+            return
+        column = self._coverage_column(coverage)
+        self._attempts[slot, column] += 1
+        self._successes[slot, column] += is_success(outcome)
+        self._rates[slot, column] = (
+            (self._successes[slot, column] + self._prior[slot, column] * PRIOR_ATTEMPTS)
+            / (self._attempts[slot, column] + PRIOR_ATTEMPTS)
+        )
+
+    # -- queries ---------------------------------------------------------
+
+    def _mix_vector(self, mix: Dict[str, float]) -> Tuple[np.ndarray, float]:
+        """
+        (weights over the known coverage columns, share of the mix on coverages
+        without a column). Queries never add columns: a coverage nothing has
+        been logged against and no concept is best against rates at the prior
+        for every play, so its share only needs BASE_SUCCESS_RATE.
+        """
+        weights = np.zeros(len(self.coverages))
+        unseen = 0.0
+        if mix:
+            for coverage, share in mix.items():
+                column = self.coverages.get(coverage)
+                if column is None:
+                    unseen += share
+                else:
+                    weights[column] += share
+        elif len(weights):
+            # No scouting data: weight coverages by how often we've seen them
+            seen = self._attempts.sum(axis=0)
+            weights = seen / seen.sum() if seen.sum() else np.full(len(weights), 1.0 / len(weights))
+        return weights, unseen
+
+    def situational_fit(
+        self,
+        down: Optional[int] = None,
+        distance: Optional[int] = None,
+        field_position: Optional[str] = None,
+        hash: Optional[str] = None
+    ) -> np.ndarray:
+        """
+        Per-play multiplier for how well each play's tagged situation matches
+        """
+        n = len(self._slot_ids)
+        fit = np.ones(n)
+        if down:
+            downs = self._downs[:n]
+            fit *= np.where(downs == 0, 1.0, np.where(downs == down, DOWN_MATCH, DOWN_MISMATCH))
+        if distance is not None:
+            gap = np.abs(self._distances[:n] - distance)
+            fit *= np.where(np.isnan(gap), 1.0, 0.8 + 0.3 * np.exp(-np.nan_to_num(gap) / DISTANCE_FALLOFF_YARDS))
+        field = _FIELD_CODES.get(field_position, -1)
+        if field >= 0:
+            fields = self._fields[:n].astype(np.int16)
+            gap = np.abs(fields - field)
+            fit *= np.where(
+                fields < 0, 1.0,
+                np.where(gap == 0, FIELD_MATCH, np.where(gap == 1, FIELD_ADJACENT, FIELD_MISMATCH))
+            )
+        hash_code = _HASH_CODES.get(hash, -1)
+        if hash_code >= 0:
+            hashes = self._hashes[:n]
+            fit *= np.where(hashes < 0, 1.0, np.where(hashes == hash_code, HASH_MATCH, HASH_MISMATCH))
+        return fit
+
+    def expected_success(self, mix: Dict[str, float]) -> np.ndarray:
+        """
+        Expected success rate of every slot against a coverage mix
+        """
+        weights, unseen = self._mix_vector(mix)
+        n = len(self._slot_ids)
+        if not len(weights):
+            return np.full(n, BASE_SUCCESS_RATE * (unseen if mix else 1.0))
+        return self._rates[:n] @ weights + BASE_SUCCESS_RATE * unseen
+
+    def score_matrix(self, situations: List[Dict], category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Scores of every slot in several situations at once: one product of the
+        rate matrix with the stacked coverage mixes, times each situation's fit.
+        situations are dicts with mix, down, distance, field_position and hash.
+        Returns (scores, expected), both situations x slots; slots that are
+        inactive or outside the category score -inf.
+        """
+        n = len(self._slot_ids)
+        mixes = [self._mix_vector(situation.get("mix") or {}) for situation in situations]
+        unseen = np.array([
+            share if situation.get("mix") or len(weights) else 1.0
+            for situation, (weights, share) in zip(situations, mixes)
+        ])
+        if self.coverages and situations:
+            expected = (self._rates[:n] @ np.stack([weights for weights, _ in mixes], axis=1)).T
+            expected += BASE_SUCCESS_RATE * unseen[:, None]
+        else:
+            expected = np.repeat(BASE_SUCCESS_RATE * unseen[:, None], n, axis=1)
+        fit = np.stack([
+            self.situational_fit(s.get("down"), s.get("distance"), s.get("field_position"), s.get("hash"))
+            for s in situations
+        ]) if situations else np.ones((0, n))
+
+        eligible = self._active[:n].copy()
+        if category:
+            eligible &= np.array([info is not None and info["category"] == category for info in self._info], dtype=bool)
+        scores = np.where(eligible, expected * fit, -math.inf)
+        return scores, expected
+
+    def play_info(self, slot: int) -> Dict:
+        return {"id": self._slot_ids[slot], **self._info[slot], "kind": self.kind(slot)}
+
+    def kind(self, slot: int) -> Optional[str]:
+        code = int(self._kinds[slot])
+        return next((name for name, value in KIND_CODES.items() if value == code), None)
+
+    def kinds(self) -> np.ndarray:
+        return self._kinds[:len(self._slot_ids)]
+
+    def recommend(
+        self,
+        mix: Dict[str, float],
+        down: Optional[int] = None,
+        distance: Optional[int] = None,
+        field_position: Optional[str] = None,
+        hash: Optional[str] = None,
+        category: Optional[str] = None,
+        limit: int = 20
+    ) -> List[Dict]:
+        n = len(self._slot_ids)
+        if not self._slots:
+            return []
+        expected = self.expected_success(mix)
+        fit = self.situational_fit(down, distance, field_position, hash)
+        scores = np.where(self._active[:n], expected * fit, -math.inf)
+        if category:
+            scores[[info is None or info["category"] != category for info in self._info]] = -math.inf
+
+        candidates = np.flatnonzero(np.isfinite(scores))
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        columns = [(coverage, self.coverages.get(coverage)) for coverage in mix]
+        results = []
+        for slot in candidates:
+            results.append({
+                "id": self._slot_ids[slot],
+                **self._info[slot],
+                "score": round(float(scores[slot]), 4),
+                "expected_success": round(float(expected[slot]), 4),
+                "situational_fit": round(float(fit[slot]), 4),
+                "attempts": int(self._attempts[slot].sum()),
+                "by_coverage": {
+                    coverage: {
+                        "success_rate": round(float(self._rates[slot, column]), 4) if column is not None else BASE_SUCCESS_RATE,
+                        "attempts": int(self._attempts[slot, column]) if column is not None else 0
+                    }
+                    for coverage, column in columns
+                }
+            })
+        return results
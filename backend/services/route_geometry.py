@@ -0,0 +1,340 @@
+import math
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.formation_rules import CENTER_X, is_lineman
+from services.play_cards import path_segments
+from services.play_renderer import LOS_Y
+from services.route_tree import PIXELS_PER_YARD, route_id
+
+# Field coordinates: 1200x600 px, 10 px per yard, offense attacks toward y=0.
+# Routes are resampled every yard of running, so sample k is roughly where the
+# receiver is at time k (all receivers assumed to run at the same speed).
+STEP = PIXELS_PER_YARD
+MAX_STEPS = 60
+CURVE_STEP = 8.0  # px per flattened curve segment
+
+TURN_NOISE_DEGREES = 3.0  # per-yard heading changes below this are drift, not a cut
+BREAK_DEGREES = 35.0  # total turn that makes a break
+
+CONTACT_YARDS = 1.5  # closer than this, two receivers are in each other's way
+PICK_WINDOW_STEPS = 2  # arriving within this many yards of running counts as a rub
+LEGAL_PICK_YARDS = 1  # contact within a yard of the LOS is legal before the throw
+MIN_SPACING_YARDS = 4  # route landmarks closer than this share a defender
+
+PAIR_BATCH_CELLS = 2_000_000  # bounds the (pairs, steps) narrow-phase arrays
+
+CONFLICT_ORDER = {"collision": 0, "illegal_pick_risk": 1, "spacing": 2}
+
+@lru_cache(maxsize=64)
+def _bezier_basis(count: int) -> np.ndarray:
+    t = np.linspace(0.0, 1.0, count + 1)[1:, None]
+    u = 1.0 - t
+    return np.hstack([u ** 3, 3 * u * u * t, 3 * u * t * t, t ** 3])
+
+def flatten(segments: List[Tuple]) -> np.ndarray:
+    """
+    Polyline (N, 2) for the first subpath of path_segments() output, with
+    cubics flattened into chords of about CURVE_STEP px
+    """
+    pieces: List[np.ndarray] = []
+    points: List[Tuple[float, float]] = []
+    last = None
+    for segment in segments:
+        kind = segment[0]
+        if kind == "M":
+            if last is not None:
+                break
+            last = first = (segment[1], segment[2])
+            points.append(last)
+        elif last is None:
+            continue
+        elif kind in ("L", "Z"):
+            last = (segment[1], segment[2]) if kind == "L" else first
+            points.append(last)
+        elif kind == "C":
+            (x0, y0), (x1, y1, x2, y2, x3, y3) = last, segment[1:]
+            span = math.hypot(x1 - x0, y1 - y0) + math.hypot(x2 - x1, y2 - y1) + math.hypot(x3 - x2, y3 - y2)
+            count = max(2, min(32, math.ceil(span / CURVE_STEP)))
+            if points:
+                pieces.append(np.array(points, dtype=float))
+                points = []
+            pieces.append(_bezier_basis(count) @ np.array([[x0, y0], [x1, y1], [x2, y2], [x3, y3]]))
+            last = (x3, y3)
+    if points:
+        pieces.append(np.array(points, dtype=float))
+    if not pieces:
+        return np.zeros((0, 2))
+    return pieces[0] if len(pieces) == 1 else np.concatenate(pieces)
+
+def resample(polyline: np.ndarray, step: float = STEP, max_steps: int = MAX_STEPS) -> Tuple[np.ndarray, float]:
+    """
+    Points every `step` px of arc length (plus the end point), and the total length
+    """
+    legs = polyline[1:] - polyline[:-1]
+    lengths = np.hypot(legs[:, 0], legs[:, 1])
+    moving = lengths > 1e-9
+    polyline, lengths = polyline[np.concatenate([[True], moving])], lengths[moving]
+    total = float(lengths.sum())
+    if total == 0:
+        return polyline[:1], 0.0
+    along = np.concatenate([[0.0], np.cumsum(lengths)])
+    stations = np.arange(0.0, min(total, step * max_steps), step)
+    if total - stations[-1] > 1e-6 and len(stations) <= max_steps:
+        stations = np.append(stations, total)
+    samples = np.empty((len(stations), 2))
+    samples[:, 0] = np.interp(stations, along, polyline[:, 0])
+    samples[:, 1] = np.interp(stations, along, polyline[:, 1])
+    return samples, total
+
+def resample_many(polylines: List[np.ndarray], step: float = STEP, max_steps: int = MAX_STEPS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    resample() for many non-empty polylines at once: (points, index of the
+    polyline each point came from). Polylines are laid end to end along one arc-length
+    axis with a gap between them, so a single interpolation covers them all.
+    """
+    if not polylines:
+        return np.zeros((0, 2)), np.zeros(0, dtype=int)
+    counts = np.array([len(polyline) for polyline in polylines])
+    vertices = np.concatenate(polylines)
+    firsts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    lasts = firsts + counts - 1
+
+    legs = vertices[1:] - vertices[:-1]
+    lengths = np.hypot(legs[:, 0], legs[:, 1])
+    gap = float(lengths.sum()) + step * max_steps + 1.0
+    lengths[lasts[:-1]] = gap  # the "leg" joining one polyline to the next
+    along = np.concatenate([[0.0], np.cumsum(lengths)])
+    totals = along[lasts] - along[firsts]
+
+    reach = np.minimum(totals, step * max_steps)
+    stations = np.maximum(1, np.ceil(reach / step - 1e-9)).astype(int)
+    ends = (totals - (stations - 1) * step > 1e-6) & (stations <= max_steps)
+    per_line = stations + ends
+    owners = np.repeat(np.arange(len(polylines)), per_line)
+    offsets = np.concatenate([[0], np.cumsum(per_line)[:-1]])
+    index = np.arange(len(owners)) - offsets[owners]
+    local = np.where(ends[owners] & (index == stations[owners]), totals[owners], index * step)
+    keys = along[firsts][owners] + local
+    points = np.column_stack([np.interp(keys, along, vertices[:, 0]), np.interp(keys, along, vertices[:, 1])])
+    return points, owners
+
+def _yards(pixels: float) -> float:
+    return round(float(pixels) / PIXELS_PER_YARD, 1)
+
+def _depth(y: float) -> float:
+    return _yards(LOS_Y - y)
+
+def heading(dx: float, dy: float, start_x: float) -> str:
+    """
+    Compass for a route leg relative to the receiver's alignment: vertical,
+    diagonal-in/out (post/corner), in/out, back-in/out (curl/comeback).
+    Players aligned on the ball get left/right instead of in/out.
+    """
+    if abs(start_x - CENTER_X) < PIXELS_PER_YARD:
+        inside, names = dx, ("right", "left")
+    else:
+        inside, names = (dx if start_x < CENTER_X else -dx), ("in", "out")
+    angle = math.degrees(math.atan2(inside, -dy))
+    side = names[0] if angle > 0 else names[1]
+    if abs(angle) <= 22.5:
+        return "vertical"
+    if abs(angle) <= 67.5:
+        return f"diagonal-{side}"
+    if abs(angle) <= 112.5:
+        return side
+    return f"back-{side}"
+
+def _breaks(samples: np.ndarray) -> List[int]:
+    """
+    Sample indices where the route cuts. Consecutive turning samples are
+    summed so rounded cuts and flattening artifacts count as one break.
+    """
+    if len(samples) < 3:
+        return []
+    legs = samples[1:] - samples[:-1]
+    angles = np.degrees(np.arctan2(legs[:, 1], legs[:, 0]))
+    turns = (angles[1:] - angles[:-1] + 180.0) % 360.0 - 180.0
+    turning = np.flatnonzero(np.abs(turns) > TURN_NOISE_DEGREES)
+    breaks = []
+    for run in np.split(turning, np.flatnonzero(np.diff(turning) > 1) + 1):
+        if len(run) and abs(turns[run].sum()) >= BREAK_DEGREES:
+            breaks.append(int(run[np.abs(turns[run]).argmax()]) + 1)
+    return breaks
+
+def is_pattern(player: str, route_type: Optional[str]) -> bool:
+    """
+    Receiver routes take part in spacing checks; blocking paths don't
+    """
+    return not is_lineman(player) and route_type != "block"
+
+@lru_cache(maxsize=8192)
+def _trace_path(path: str) -> Optional[Tuple]:
+    """
+    Everything that depends on the path alone; libraries repeat paths a lot
+    """
+    polyline = flatten(path_segments(path))
+    if len(polyline) < 2:
+        return None
+    samples, total = resample(polyline)
+    samples.setflags(write=False)
+    return samples, total, tuple(polyline[0].tolist()), tuple(polyline[-1].tolist()), float(polyline[:, 1].min()), tuple(_breaks(samples))
+
+def _trace(route: Dict) -> Tuple[Optional[Dict], Optional[np.ndarray]]:
+    traced = _trace_path(route.get("path") or "")
+    if traced is None:
+        return None, None
+    samples, total, (start_x, start_y), (end_x, end_y), top, indices = traced
+
+    breaks = []
+    for index in indices:
+        x, y = samples[index]
+        nx, ny = samples[min(index + 1, len(samples) - 1)]
+        breaks.append({
+            "x": round(float(x), 1),
+            "y": round(float(y), 1),
+            "depth": _depth(y),
+            "at": _yards(index * STEP),
+            "direction": heading(nx - x, ny - y, start_x)
+        })
+    leg_x, leg_y = samples[indices[-1]] if indices else (start_x, start_y)
+    player = route.get("from_player") or route.get("from")
+    route_type = route_id(route)
+    geometry = {
+        "player": player,
+        "route_type": route_type,
+        "pattern": is_pattern(str(player or ""), route_type),
+        "start": {"x": round(start_x, 1), "y": round(start_y, 1)},
+        "end": {"x": round(end_x, 1), "y": round(end_y, 1)},
+        "depth": _depth(top),
+        "length": _yards(total),
+        "stem": breaks[0]["at"] if breaks else _yards(total),
+        "breaks": breaks,
+        "direction": heading(end_x - leg_x, end_y - leg_y, start_x)
+    }
+    return geometry, samples
+
+def route_polyline(route: Dict) -> Optional[np.ndarray]:
+    """
+    The route's flattened path, None without a drawable path
+    """
+    polyline = flatten(path_segments(route.get("path") or ""))
+    return polyline if len(polyline) >= 2 else None
+
+def route_geometry(route: Dict) -> Optional[Dict]:
+    """
+    Depth (yards past the LOS at the route's deepest point), length, stem,
+    breaks and final direction for one route; None without a drawable path
+    """
+    return _trace(route)[0]
+
+def _conflict(kind: str, first: str, second: str, x: float, y: float, **extra) -> Dict:
+    return {
+        "type": kind,
+        "players": [first, second],
+        "x": round(x, 1),
+        "y": round(y, 1),
+        "depth": _depth(y),
+        **extra
+    }
+
+def annotate_batch(plays: List[Dict]) -> List[Dict]:
+    """
+    Route geometry plus spacing conflicts for many plays in one pass.
+    Receiver routes across the whole batch are padded into one (routes, steps, 2)
+    array; a bounding-box broad phase picks the route pairs worth checking and
+    the narrow phase compares every time-aligned sample pair at once:
+      collision          two receivers at the same spot at the same time, at or
+                         within a yard of the LOS
+      illegal_pick_risk  paths cross within PICK_WINDOW_STEPS yards of each other
+                         more than a yard past the LOS (a rub after the snap);
+                         this takes the place of any collision for the same pair
+      spacing            route landmarks (end points) closer than MIN_SPACING_YARDS
+    Returns [{"routes": [...], "conflicts": [...]}] in input order.
+    """
+    results = []
+    owners: List[Tuple[int, str]] = []
+    traces: List[np.ndarray] = []
+    for play_index, play in enumerate(plays):
+        routes = []
+        for route in play.get("routes") or []:
+            geometry, samples = _trace(route)
+            if geometry is None:
+                continue
+            routes.append(geometry)
+            if geometry["pattern"]:
+                owners.append((play_index, str(geometry["player"])))
+                traces.append(samples)
+        results.append({"routes": routes, "conflicts": []})
+    if len(traces) < 2:
+        return results
+
+    # Pad every route by holding its last point: the receiver has settled there
+    counts = np.array([len(samples) for samples in traces])
+    offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    steps = int(counts.max())
+    flat = np.concatenate(traces).astype(np.float32)
+    paths = flat[offsets[:, None] + np.minimum(np.arange(steps)[None, :], counts[:, None] - 1)]
+
+    # Candidate pairs: every pair of receivers within the same play
+    play_of = np.array([owner[0] for owner in owners])
+    boundaries = np.flatnonzero(np.diff(play_of)) + 1
+    firsts, seconds = [], []
+    for begin, end in zip(np.concatenate([[0], boundaries]), np.concatenate([boundaries, [len(owners)]])):
+        if end - begin > 1:
+            i, j = np.triu_indices(end - begin, 1)
+            firsts.append(i + begin)
+            seconds.append(j + begin)
+    if not firsts:
+        return results
+    a, b = np.concatenate(firsts), np.concatenate(seconds)
+
+    found: List[Tuple[int, Dict]] = []
+    contact = CONTACT_YARDS * PIXELS_PER_YARD
+
+    ends = paths[:, -1]
+    gaps = np.hypot(*(ends[a] - ends[b]).T)
+    tight = np.flatnonzero(gaps < MIN_SPACING_YARDS * PIXELS_PER_YARD)
+    middles = ((ends[a[tight]] + ends[b[tight]]) / 2).tolist()
+    for i, j, (x, y), gap in zip(a[tight].tolist(), b[tight].tolist(), middles, gaps[tight].tolist()):
+        found.append((i, _conflict("spacing", owners[i][1], owners[j][1], x, y, distance=_yards(gap))))
+
+    # Broad phase: bounding boxes grown by the contact distance must overlap
+    low, high = paths.min(axis=1), paths.max(axis=1)
+    overlap = np.all((low[a] <= high[b] + contact) & (low[b] <= high[a] + contact), axis=1)
+    a, b = a[overlap], b[overlap]
+
+    # Narrow phase: both checks only compare samples a few yards of running
+    # apart, so scan the diagonal band of the (steps x steps) distance matrix
+    deep = paths[:, :, 1] < LOS_Y - LEGAL_PICK_YARDS * PIXELS_PER_YARD
+    chunk = max(1, PAIR_BATCH_CELLS // steps)
+    for begin in range(0, len(a), chunk):
+        first, second = a[begin:begin + chunk], b[begin:begin + chunk]
+        collision = np.full(len(first), steps)
+        pick = np.full(len(first), steps)
+        for lag in range(-PICK_WINDOW_STEPS, PICK_WINDOW_STEPS + 1):
+            low, high = max(0, -lag), steps - max(0, lag)
+            delta = paths[first, low:high] - paths[second, low + lag:high + lag]
+            close = (delta * delta).sum(axis=2) <= contact * contact
+            if abs(lag) <= 1:
+                collision = np.minimum(collision, np.where(close.any(axis=1), close.argmax(axis=1) + low, steps))
+            rub = close & deep[first, low:high]
+            pick = np.minimum(pick, np.where(rub.any(axis=1), rub.argmax(axis=1) + low, steps))
+        collision[pick < steps] = steps
+        for kind, at in (("collision", collision), ("illegal_pick_risk", pick)):
+            # First contact along the first route's path
+            pairs = np.flatnonzero(at < steps)
+            points = paths[first[pairs], at[pairs]].tolist()
+            for i, j, (x, y) in zip(first[pairs].tolist(), second[pairs].tolist(), points):
+                found.append((i, _conflict(kind, owners[i][1], owners[j][1], x, y)))
+
+    for route_index, conflict in found:
+        results[owners[route_index][0]]["conflicts"].append(conflict)
+    for result in results:
+        result["conflicts"].sort(key=lambda c: (CONFLICT_ORDER[c["type"]], c["players"]))
+    return results
+
+def play_geometry(play: Dict) -> Dict:
+    return annotate_batch([play])[0]
@@ -0,0 +1,29 @@
+import re
+from typing import Dict, Optional
+
+PIXELS_PER_YARD = 10
+
+# Route ids the designer produces (PlayerActionMenu), plus common names mapped onto them
+ROUTE_TREE = (
+    "hitch", "curl", "out", "dig", "corner", "post", "go", "slant", "shallow", "deep-cross",
+    "comeback", "wheel", "swing", "flare", "check", "block", "flat", "hook", "seam", "fade",
+    "sit", "whip", "arrow", "angle", "checkdown"
+)
+ROUTE_ALIASES = {
+    "in": "dig", "fly": "go", "streak": "go", "vert": "go", "vertical": "go", "mesh": "shallow",
+    "drag": "shallow", "cross": "deep-cross", "crosser": "deep-cross", "check-release": "check",
+    "pass-pro": "block", "option": "sit", "stick": "hook"
+}
+_ROUTES = set(ROUTE_TREE)
+_NAME_RE = re.compile(r"[^a-z0-9]+")
+
+def _normalize(name: Optional[str]) -> str:
+    return _NAME_RE.sub("-", (name or "").lower()).strip("-")
+
+def route_id(route: Dict) -> Optional[str]:
+    for name in (route.get("routeType"), route.get("route_type"), route.get("label")):
+        key = _normalize(name)
+        key = ROUTE_ALIASES.get(key, key)
+        if key in _ROUTES:
+            return key
+    return None
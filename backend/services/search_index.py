@@ -0,0 +1,293 @@
+import re
+import math
+import heapq
+import bisect
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+
+# Field weights for BM25F-style scoring
+FIELD_WEIGHTS = {
+    "name": 3.0,
+    "concept": 2.0,
+    "formation": 2.0,
+    "tags": 1.5,
+    "notes": 1.0
+}
+
+# Shorthand coaches type that should hit the spelled-out words. Applied to
+# documents and queries alike, so "PA Boot Rt" and "play action boot right"
+# index the same terms. "lt" is left alone: it's the left tackle as often as left.
+ABBREVIATIONS = {
+    "rt": ["right"],
+    "rgt": ["right"],
+    "lft": ["left"],
+    "pa": ["play", "action"],
+    "te": ["tight", "end"]
+}
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+FUZZY_MIN_SIMILARITY = 0.3
+FUZZY_MAX_EXPANSIONS = 3
+PREFIX_MAX_EXPANSIONS = 20
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+def words(text: Optional[str]) -> List[str]:
+    return _TOKEN_RE.findall((text or "").lower())
+
+def tokenize(text: Optional[str]) -> List[str]:
+    tokens = []
+    for word in words(text):
+        tokens.extend(ABBREVIATIONS.get(word, (word,)))
+    return tokens
+
+def trigrams(term: str) -> Set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def play_fields(record: Dict) -> Dict[str, str]:
+    """
+    Searchable text per field for a stored play record
+    """
+    play = record.get("play", {})
+    notes = " ".join(
+        str(play.get(key) or "") for key in ("description", "coachingNotes", "coaching_notes")
+    )
+    return {
+        "name": play.get("name", ""),
+        "concept": play.get("concept") or "",
+        "formation": play.get("formation") or "",
+        "tags": " ".join(record.get("tags", [])),
+        "notes": notes
+    }
+
+class PlaySearchIndex:
+    """
+    In-memory inverted index over plays with BM25F ranking, trigram fuzzy
+    matching for typos ("trps rt mesh") and prefix expansion of the last
+    query term for search-as-you-type. Updated incrementally on save/delete;
+    scoring runs over NumPy posting arrays that are rebuilt lazily per term.
+    """
+    def __init__(self):
+        self.postings: Dict[str, Dict[int, float]] = {}  # term -> {doc slot: weighted tf}
+        self.doc_terms: Dict[str, Dict[str, float]] = {}
+        self.doc_info: Dict[str, Dict] = {}
+        self.total_length = 0.0
+        self.trigram_terms: Dict[str, Set[str]] = {}
+        self.vocabulary: List[str] = []  # sorted, for prefix lookups
+
+        # Dense per-slot arrays so scoring is vectorized
+        self._slots: Dict[str, int] = {}
+        self._slot_ids: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._lengths = np.zeros(1024)
+        self._categories: List[Optional[str]] = []
+        self._arrays: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    def __len__(self) -> int:
+        return len(self.doc_terms)
+
+    def rebuild(self, records: Iterable[Dict]):
+        self.__init__()
+        for record in records:
+            self.add(record)
+
+    # -- updates ---------------------------------------------------------
+
+    def _add_term(self, term: str):
+        self.postings[term] = {}
+        bisect.insort(self.vocabulary, term)
+        for gram in trigrams(term):
+            self.trigram_terms.setdefault(gram, set()).add(term)
+
+    def _drop_term(self, term: str):
+        del self.postings[term]
+        self._arrays.pop(term, None)
+        i = bisect.bisect_left(self.vocabulary, term)
+        if i < len(self.vocabulary) and self.vocabulary[i] == term:
+            self.vocabulary.pop(i)
+        for gram in trigrams(term):
+            terms = self.trigram_terms.get(gram)
+            if terms is not None:
+                terms.discard(term)
+                if not terms:
+                    del self.trigram_terms[gram]
+
+    def _allocate_slot(self, play_id: str) -> int:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_ids[slot] = play_id
+        else:
+            slot = len(self._slot_ids)
+            self._slot_ids.append(play_id)
+            self._categories.append(None)
+            if slot >= len(self._lengths):
+                self._lengths = np.concatenate([self._lengths, np.zeros(len(self._lengths))])
+        self._slots[play_id] = slot
+        return slot
+
+    def add(self, record: Dict):
+        """
+        Index (or re-index) one stored play record
+        """
+        play_id = record["id"]
+        if play_id in self.doc_terms:
+            self.remove(play_id)
+
+        weighted: Counter = Counter()
+        for field, text in play_fields(record).items():
+            for token in tokenize(text):
+                weighted[token] += FIELD_WEIGHTS[field]
+
+        slot = self._allocate_slot(play_id)
+        for term, tf in weighted.items():
+            if term not in self.postings:
+                self._add_term(term)
+            self.postings[term][slot] = tf
+            self._arrays.pop(term, None)
+
+        length = sum(weighted.values())
+        self.doc_terms[play_id] = dict(weighted)
+        self._lengths[slot] = length
+        self._categories[slot] = record.get("category")
+        self.total_length += length
+        play = record.get("play", {})
+        self.doc_info[play_id] = {
+            "name": play.get("name"),
+            "formation": play.get("formation"),
+            "concept": play.get("concept"),
+            "category": record.get("category"),
+            "tags": list(record.get("tags", []))
+        }
+
+    def remove(self, play_id: str):
+        terms = self.doc_terms.pop(play_id, None)
+        if terms is None:
+            return
+        slot = self._slots.pop(play_id)
+        for term in terms:
+            docs = self.postings.get(term)
+            if docs is None:
+                continue
+            docs.pop(slot, None)
+            self._arrays.pop(term, None)
+            if not docs:
+                self._drop_term(term)
+        self.total_length -= self._lengths[slot]
+        self._lengths[slot] = 0.0
+        self._categories[slot] = None
+        self._slot_ids[slot] = None
+        self._free_slots.append(slot)
+        self.doc_info.pop(play_id, None)
+
+    def _posting_arrays(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            docs = self.postings[term]
+            arrays = (
+                np.fromiter(docs.keys(), dtype=np.int64, count=len(docs)),
+                np.fromiter(docs.values(), dtype=np.float64, count=len(docs))
+            )
+            self._arrays[term] = arrays
+        return arrays
+
+    # -- queries ---------------------------------------------------------
+
+    def _fuzzy(self, token: str) -> List[Tuple[str, float]]:
+        grams = trigrams(token)
+        overlap: Counter = Counter()
+        for gram in grams:
+            for term in self.trigram_terms.get(gram, ()):
+                overlap[term] += 1
+        scored = []
+        for term, shared in overlap.items():
+            similarity = shared / (len(grams) + len(trigrams(term)) - shared)
+            if similarity >= FUZZY_MIN_SIMILARITY and term != token:
+                scored.append((term, similarity))
+        return heapq.nlargest(FUZZY_MAX_EXPANSIONS, scored, key=lambda ts: ts[1])
+
+    def _prefix(self, token: str) -> List[str]:
+        matches = []
+        i = bisect.bisect_left(self.vocabulary, token)
+        while i < len(self.vocabulary) and len(matches) < PREFIX_MAX_EXPANSIONS:
+            term = self.vocabulary[i]
+            if not term.startswith(token):
+                break
+            if term != token:
+                matches.append(term)
+            i += 1
+        return matches
+
+    def _expand(self, token: str, is_last: bool, prefix: bool) -> Dict[str, float]:
+        """
+        Query term -> weight for the exact term plus typo and prefix expansions
+        """
+        expansions: Dict[str, float] = {}
+        if token in self.postings:
+            expansions[token] = 1.0
+        if prefix and is_last:
+            for term in self._prefix(token):
+                expansions.setdefault(term, 0.9)
+        if token not in self.postings:
+            for term, similarity in self._fuzzy(token):
+                expansions[term] = max(expansions.get(term, 0.0), 0.8 * similarity)
+        return expansions
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        prefix: bool = True,
+        category: Optional[str] = None
+    ) -> List[Dict]:
+        tokens = tokenize(query)
+        n_docs = len(self.doc_terms)
+        if not tokens or not n_docs:
+            return []
+        avg_length = self.total_length / n_docs
+        # Search-as-you-type completes what was typed ("pa" -> "pass"), not its expansion
+        typed = words(query)[-1]
+
+        scores = np.zeros(len(self._slot_ids))
+        lengths = self._lengths[:len(self._slot_ids)]
+        for i, token in enumerate(tokens):
+            expansions = self._expand(token, i == len(tokens) - 1, prefix)
+            if prefix and i == len(tokens) - 1 and typed != token:
+                for term in self._prefix(typed):
+                    if term not in tokens:
+                        expansions.setdefault(term, 0.9)
+            for term, weight in expansions.items():
+                slots, tf = self._posting_arrays(term)
+                idf = math.log(1 + (n_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths[slots] / avg_length)
+                scores[slots] += weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        if category:
+            scores[[c != category for c in self._categories]] = 0.0
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        results = []
+        for slot in candidates:
+            play_id = self._slot_ids[slot]
+            results.append({"id": play_id, "score": round(float(scores[slot]), 4), **self.doc_info[play_id]})
+        return results
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """
+        Autocomplete the last word of a partial query, most common terms first
+        """
+        typed = words(prefix)
+        if not typed:
+            return []
+        last = typed[-1]
+        completions = self._prefix(last)
+        if last in self.postings:
+            completions.insert(0, last)
+        completions.sort(key=lambda term: len(self.postings[term]), reverse=True)
+        return completions[:limit]
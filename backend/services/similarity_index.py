@@ -0,0 +1,506 @@
+import re
+import zlib
+import asyncio
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from services.analysis_engine import PlayAnalysisEngine
+from services.catalog_registry import CatalogRegistry
+from services.formation_rules import is_lineman
+from services.play_renderer import FIELD_WIDTH, LOS_Y
+from services.route_tree import ROUTE_TREE, route_id
+from services.route_geometry import resample_many, route_polyline
+
+DUPLICATE_THRESHOLD = 0.95
+# Most duplicate pairs kept per play; a batch of copies of one play would
+# otherwise pair every copy with every other
+MAX_PAIRS_PER_PLAY = 20
+PAIR_BLOCK_ROWS = 2048
+REBUILD_BATCH = 2048
+
+# Positions are soft-binned onto grids whose columns are symmetric about the
+# middle of the field, so mirroring a play (x -> 1200 - x, as flipHoriz does in
+# the designer) is just reversing the columns.
+X_CENTERS = np.arange(50.0, FIELD_WIDTH, 100.0)
+ALIGNMENT_DEPTHS = np.array([0.0, 25.0, 50.0, 75.0])  # px behind the LOS
+ROUTE_DEPTHS = np.array([-30.0, 0.0, 50.0, 100.0, 150.0, 200.0, 250.0])  # px past the LOS
+ROUTE_TYPES = {name: i for i, name in enumerate(ROUTE_TREE)}
+
+# (block, size, weight): each block is normalized on its own, then weighted
+BLOCKS = (
+    ("alignment", len(ALIGNMENT_DEPTHS) * len(X_CENTERS), 1.0),
+    ("routes", len(ROUTE_DEPTHS) * len(X_CENTERS), 1.5),
+    ("route_types", len(ROUTE_TREE) + 1, 1.0),
+    ("concept", 16, 0.8),
+    ("protection", 8, 0.3),
+    ("personnel", 8, 0.3)
+)
+_OFFSETS = {}
+_position = 0
+for _name, _size, _weight in BLOCKS:
+    _OFFSETS[_name] = (_position, _position + _size)
+    _position += _size
+DIMENSIONS = _position
+
+def _mirror_permutation() -> np.ndarray:
+    order = np.arange(DIMENSIONS)
+    for name, rows in (("alignment", len(ALIGNMENT_DEPTHS)), ("routes", len(ROUTE_DEPTHS))):
+        start, end = _OFFSETS[name]
+        order[start:end] = np.arange(start, end).reshape(rows, len(X_CENTERS))[:, ::-1].ravel()
+    return order
+
+MIRROR = _mirror_permutation()
+_COLUMN_SIDE = np.arange(len(X_CENTERS)) - (len(X_CENTERS) - 1) / 2
+
+_NAME_RE = re.compile(r"[^a-z0-9]+")
+
+def _soft_grid(xs: np.ndarray, ys: np.ndarray, y_centers: np.ndarray, owners: np.ndarray, count: int) -> np.ndarray:
+    """
+    Bilinear histograms over (y_centers x X_CENTERS), one row per owner, so a
+    few pixels' difference moves weight gradually instead of jumping bins
+    """
+    cells = len(y_centers) * len(X_CENTERS)
+    grid = np.zeros(count * cells)
+    if not len(xs):
+        return grid.reshape(count, cells)
+    fx = np.interp(xs, X_CENTERS, np.arange(len(X_CENTERS)))
+    fy = np.interp(ys, y_centers, np.arange(len(y_centers)))
+    x0, y0 = np.floor(fx).astype(int), np.floor(fy).astype(int)
+    x1, y1 = np.minimum(x0 + 1, len(X_CENTERS) - 1), np.minimum(y0 + 1, len(y_centers) - 1)
+    wx, wy = fx - x0, fy - y0
+    base = owners * cells
+    width = len(X_CENTERS)
+    for rows, cols, weights in (
+        (y0, x0, (1 - wy) * (1 - wx)), (y0, x1, (1 - wy) * wx),
+        (y1, x0, wy * (1 - wx)), (y1, x1, wy * wx)
+    ):
+        grid += np.bincount(base + rows * width + cols, weights=weights, minlength=len(grid))
+    return grid.reshape(count, cells)
+
+def _hashed(block: str, key: Optional[str]) -> Optional[int]:
+    if not key:
+        return None
+    start, end = _OFFSETS[block]
+    # crc32 rather than hash(): stable across processes and restarts
+    return start + zlib.crc32(key.encode()) % (end - start)
+
+def _normalize(name: Optional[str]) -> str:
+    return _NAME_RE.sub("-", str(name or "").lower()).strip("-")
+
+class PlaySimilarityIndex:
+    """
+    Structural nearest-neighbour search over the play library.
+
+    Every play becomes a fixed-length vector: skill-player alignment and route
+    paths soft-binned onto field grids, route types, and hashed concept,
+    protection and personnel. Vectors are stored in the canonical orientation
+    (strength to the right) and queries also try the mirrored vector, so a
+    play and its flip match exactly. Rows live in one unit-normalized
+    float32 matrix; a query is a matrix-vector product over the library.
+
+    Plays with no skill-player alignment and no routes (bare imports) are
+    left out: they'd all share one vector and all be each other's duplicates.
+    """
+    def __init__(
+        self,
+        catalog: CatalogRegistry,
+        duplicate_threshold: float = DUPLICATE_THRESHOLD,
+        max_pairs_per_play: int = MAX_PAIRS_PER_PLAY
+    ):
+        self.engine = PlayAnalysisEngine(catalog)
+        self.duplicate_threshold = duplicate_threshold
+        self.max_pairs_per_play = max_pairs_per_play
+        self._pairs_lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._slots: Dict[str, int] = {}
+        self._slot_ids: List[Optional[str]] = []
+        self._free_slots: List[int] = []
+        self._info: List[Optional[Dict]] = []
+        self._vectors = np.zeros((1024, DIMENSIONS), dtype=np.float32)
+        self._flipped = np.zeros(1024, dtype=bool)
+        self._active = np.zeros(1024, dtype=bool)
+        # Library-wide duplicate pairs, built on first use and then kept up to
+        # date: play id -> {partner id: (score, mirrored)}, stored both ways
+        self._pairs: Optional[Dict[str, Dict[str, Tuple[float, bool]]]] = None
+        # Plays written while the pairs are being built in a thread
+        self._pending: Optional[set] = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def rebuild(self, records: Iterable[Dict]):
+        self._reset()
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= REBUILD_BATCH:
+                self._add_batch(batch)
+                batch = []
+        self._add_batch(batch)
+
+    # -- features --------------------------------------------------------
+
+    @staticmethod
+    def has_geometry(play: Dict) -> bool:
+        """
+        Whether the play has anything to compare: a skill player or a route
+        """
+        for player in play.get("players") or []:
+            if player.get("x") is not None and player.get("y") is not None and not is_lineman(str(player.get("id", ""))):
+                return True
+        return any(
+            not is_lineman(str(route.get("from_player") or route.get("from") or "")) and route_polyline(route) is not None
+            for route in play.get("routes") or []
+        )
+
+    def features(self, play: Dict) -> Tuple[np.ndarray, bool]:
+        """
+        (unit vector in canonical orientation, whether the play was mirrored to get there)
+        """
+        vectors, flipped = self.features_batch([play])
+        return vectors[0], bool(flipped[0])
+
+    def features_batch(self, plays: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        features() for many plays at once; the route resampling and grid
+        binning run over the whole batch in single array operations
+        """
+        count = len(plays)
+        vectors = np.zeros((count, DIMENSIONS))
+        alignment, aligned_by = [], []
+        polylines, routed_by = [], []
+        for row, play in enumerate(plays):
+            for player in play.get("players") or []:
+                if player.get("x") is not None and player.get("y") is not None and not is_lineman(str(player.get("id", ""))):
+                    alignment.append((player["x"], player["y"]))
+                    aligned_by.append(row)
+            for route in play.get("routes") or []:
+                if is_lineman(str(route.get("from_player") or route.get("from") or "")):
+                    continue
+                kind = route_id(route)
+                polyline = route_polyline(route) if kind != "block" else None
+                if polyline is None:
+                    continue
+                polylines.append(polyline)
+                routed_by.append(row)
+                vectors[row, _OFFSETS["route_types"][0] + ROUTE_TYPES.get(kind, len(ROUTE_TREE))] += 1
+
+            name = play.get("name", "")
+            concept = self.engine.resolve_concept(play.get("concept"), name)
+            protection = self.engine.resolve_protection(name, (play.get("blocking") or {}).get("scheme"))
+            for block, key in (
+                ("concept", ":".join(concept) if concept else _normalize(play.get("concept"))),
+                ("protection", protection),
+                ("personnel", _normalize(play.get("personnel")))
+            ):
+                column = _hashed(block, key)
+                if column is not None:
+                    vectors[row, column] = 1.0
+
+        points = np.array(alignment, dtype=float).reshape(-1, 2)
+        start, end = _OFFSETS["alignment"]
+        vectors[:, start:end] = _soft_grid(points[:, 0], points[:, 1] - LOS_Y, ALIGNMENT_DEPTHS, np.array(aligned_by, dtype=int), count)
+        points, owners = resample_many(polylines)
+        start, end = _OFFSETS["routes"]
+        vectors[:, start:end] = _soft_grid(points[:, 0], LOS_Y - points[:, 1], ROUTE_DEPTHS, np.array(routed_by, dtype=int)[owners], count)
+
+        for block, _, weight in BLOCKS:
+            start, end = _OFFSETS[block]
+            norms = np.linalg.norm(vectors[:, start:end], axis=1, keepdims=True)
+            vectors[:, start:end] *= weight / np.where(norms > 0, norms, 1.0)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms > 0, norms, 1.0)
+
+        # Canonical orientation: more alignment and route weight on the right
+        side = np.zeros(count)
+        for block, rows in (("alignment", len(ALIGNMENT_DEPTHS)), ("routes", len(ROUTE_DEPTHS))):
+            start, end = _OFFSETS[block]
+            side += vectors[:, start:end].reshape(count, rows, -1).sum(axis=1) @ _COLUMN_SIDE
+        flipped = side < -1e-9
+        vectors[flipped] = vectors[flipped][:, MIRROR]
+        return vectors.astype(np.float32), flipped
+
+    # -- updates ---------------------------------------------------------
+
+    def _grow(self):
+        rows = len(self._active)
+        self._vectors = np.vstack([self._vectors, np.zeros_like(self._vectors)])
+        self._flipped = np.concatenate([self._flipped, np.zeros(rows, dtype=bool)])
+        self._active = np.concatenate([self._active, np.zeros(rows, dtype=bool)])
+
+    def add(self, record: Dict):
+        """
+        Index a new play or re-index an edited one
+        """
+        self._add_batch([record])
+
+    def _add_batch(self, records: List[Dict]):
+        indexed = []
+        for record in records:
+            if self.has_geometry(record.get("play", {})):
+                indexed.append(record)
+            else:
+                # An edit may have cleared the diagram
+                self.remove(record["id"])
+        records = indexed
+        if not records:
+            return
+        vectors, flipped = self.features_batch([record.get("play", {}) for record in records])
+        for record, vector, mirrored in zip(records, vectors, flipped.tolist()):
+            self._store(record, vector, mirrored)
+
+    def _store(self, record: Dict, vector: np.ndarray, flipped: bool):
+        play_id = record["id"]
+        play = record.get("play", {})
+        slot = self._slots.get(play_id)
+        if slot is None:
+            if self._free_slots:
+                slot = self._free_slots.pop()
+                self._slot_ids[slot] = play_id
+            else:
+                slot = len(self._slot_ids)
+                if slot >= len(self._active):
+                    self._grow()
+                self._slot_ids.append(play_id)
+                self._info.append(None)
+            self._slots[play_id] = slot
+        self._info[slot] = {
+            "name": play.get("name"),
+            "formation": play.get("formation"),
+            "concept": play.get("concept"),
+            "category": record.get("category")
+        }
+        self._vectors[slot] = vector
+        self._flipped[slot] = flipped
+        self._active[slot] = True
+
+        if self._pending is not None:
+            self._pending.add(play_id)
+        if self._pairs is not None:
+            self._drop_pairs(play_id)
+            self._pair(play_id, slot)
+
+    def remove(self, play_id: str):
+        slot = self._slots.pop(play_id, None)
+        if slot is None:
+            return
+        self._vectors[slot] = 0.0
+        self._active[slot] = False
+        self._slot_ids[slot] = None
+        self._info[slot] = None
+        self._free_slots.append(slot)
+        if self._pending is not None:
+            self._pending.add(play_id)
+        if self._pairs is not None:
+            self._drop_pairs(play_id)
+
+    def _drop_pairs(self, play_id: str):
+        for other in self._pairs.pop(play_id, {}):
+            self._pairs[other].pop(play_id, None)
+
+    def _link(self, pairs: Dict, first: str, second: str, score: float, mirrored: bool) -> bool:
+        """
+        Record a pair unless either play is at its cap; a play at its cap
+        gives up its weakest pair to a better one
+        """
+        cap = self.max_pairs_per_play
+        weakest = {}
+        for play_id in (first, second):
+            partners = pairs.get(play_id)
+            if partners is not None and len(partners) >= cap:
+                weakest[play_id] = min(partners, key=lambda other: partners[other][0])
+                if partners[weakest[play_id]][0] >= score:
+                    return False
+        for play_id, other in weakest.items():
+            pairs[play_id].pop(other, None)
+            pairs[other].pop(play_id, None)
+        pairs.setdefault(first, {})[second] = (score, mirrored)
+        pairs.setdefault(second, {})[first] = (score, mirrored)
+        return True
+
+    def _pair(self, play_id: str, slot: int):
+        """
+        Duplicate pairs for one (re-)indexed play, in either orientation
+        """
+        scores, mirrored = self._scores(self._vectors[slot])
+        scores[slot] = -np.inf
+        candidates = np.flatnonzero(scores >= self.duplicate_threshold)
+        if len(candidates) > self.max_pairs_per_play:
+            candidates = candidates[np.argpartition(-scores[candidates], self.max_pairs_per_play)[:self.max_pairs_per_play]]
+        flipped = bool(self._flipped[slot])
+        for other in candidates[np.argsort(-scores[candidates], kind="stable")]:
+            self._link(
+                self._pairs, play_id, self._slot_ids[other], float(scores[other]),
+                bool(mirrored[other] != (flipped != self._flipped[other]))
+            )
+
+    # -- queries ---------------------------------------------------------
+
+    def _scores(self, vector: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cosine similarity of every row to `vector` in either orientation, and
+        whether the mirrored orientation was the better one
+        """
+        n = len(self._slot_ids)
+        direct = self._vectors[:n] @ vector
+        mirrored = self._vectors[:n] @ vector[MIRROR]
+        use_mirror = mirrored > direct
+        scores = np.where(use_mirror, mirrored, direct)
+        scores[~self._active[:n]] = -np.inf
+        return scores, use_mirror
+
+    def similar(
+        self,
+        play: Dict,
+        limit: int = 10,
+        min_score: float = 0.0,
+        category: Optional[str] = None,
+        exclude: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        The most similar stored plays to `play`, best first. "mirrored" marks
+        matches that line up once one of the two plays is flipped.
+        """
+        if not self._slots:
+            return []
+        vector, flipped = self.features(play)
+        return self._neighbours(vector, flipped, limit, min_score, category, exclude)
+
+    def similar_to(self, play_id: str, limit: int = 10, min_score: float = 0.0, category: Optional[str] = None) -> Optional[List[Dict]]:
+        """
+        Neighbours of a stored play, or None if it isn't indexed
+        """
+        slot = self._slots.get(play_id)
+        if slot is None:
+            return None
+        return self._neighbours(self._vectors[slot], bool(self._flipped[slot]), limit, min_score, category, play_id)
+
+    def _neighbours(
+        self,
+        vector: np.ndarray,
+        flipped: bool,
+        limit: int,
+        min_score: float,
+        category: Optional[str],
+        exclude: Optional[str]
+    ) -> List[Dict]:
+        scores, use_mirror = self._scores(vector)
+        if exclude in self._slots:
+            scores[self._slots[exclude]] = -np.inf
+        if category:
+            scores[[info is None or info["category"] != category for info in self._info]] = -np.inf
+
+        candidates = np.flatnonzero(scores >= min_score)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {
+                "id": self._slot_ids[slot],
+                **self._info[slot],
+                "score": round(float(scores[slot]), 4),
+                "mirrored": bool(use_mirror[slot] != (flipped != self._flipped[slot]))
+            }
+            for slot in candidates
+        ]
+
+    def duplicates_of(self, play_id: str, limit: int = 10) -> Optional[List[Dict]]:
+        return self.similar_to(play_id, limit=limit, min_score=self.duplicate_threshold)
+
+    def _build_pairs(self) -> Dict[str, Dict[str, Tuple[float, bool]]]:
+        """
+        Self-join of a snapshot of the library in row blocks, upper triangle
+        only, keeping each row's best `max_pairs_per_play` matches. Uses the
+        stored canonical orientation, which lines up flipped copies of all
+        but near-symmetric plays; later adds check both orientations.
+        """
+        n = len(self._slot_ids)
+        slot_ids = list(self._slot_ids[:n])
+        vectors = self._vectors[:n].copy()
+        active = self._active[:n].copy()
+        flipped = self._flipped[:n].copy()
+        cap = self.max_pairs_per_play
+        found = []
+        for start in range(0, n, PAIR_BLOCK_ROWS):
+            end = min(n, start + PAIR_BLOCK_ROWS)
+            block = vectors[start:end] @ vectors[start:].T
+            block[:, :end - start][np.tril_indices(end - start)] = -np.inf
+            block[~active[start:end]] = -np.inf
+            block[:, ~active[start:n]] = -np.inf
+            block[block < self.duplicate_threshold] = -np.inf
+            if block.shape[1] > cap:
+                columns = np.argpartition(-block, cap, axis=1)[:, :cap]
+            else:
+                columns = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+            values = np.take_along_axis(block, columns, axis=1)
+            rows, picks = np.nonzero(np.isfinite(values))
+            for row, pick in zip(rows.tolist(), picks.tolist()):
+                first, second = start + row, start + int(columns[row, pick])
+                found.append((float(values[row, pick]), first, second))
+
+        pairs: Dict[str, Dict[str, Tuple[float, bool]]] = {}
+        found.sort(key=lambda pair: -pair[0])
+        for score, first, second in found:
+            self._link(pairs, slot_ids[first], slot_ids[second], score, bool(flipped[first] != flipped[second]))
+        return pairs
+
+    def _install_pairs(self, pairs: Dict[str, Dict[str, Tuple[float, bool]]]):
+        """
+        Adopt freshly built pairs, redoing any play written since the snapshot
+        """
+        pending, self._pending = self._pending or set(), None
+        self._pairs = pairs
+        for play_id in pending:
+            self._drop_pairs(play_id)
+            slot = self._slots.get(play_id)
+            if slot is not None:
+                self._pair(play_id, slot)
+
+    async def ensure_pairs(self):
+        """
+        Build the library-wide duplicate pairs in a worker thread, once
+        """
+        if self._pairs is not None:
+            return
+        async with self._pairs_lock:
+            if self._pairs is not None:
+                return
+            self._pending = set()
+            try:
+                pairs = await asyncio.to_thread(self._build_pairs)
+            except BaseException:
+                self._pending = None
+                raise
+            self._install_pairs(pairs)
+
+    def duplicates(self, limit: int = 100, category: Optional[str] = None) -> List[Dict]:
+        """
+        Likely duplicate pairs across the whole library, most similar first
+        """
+        if self._pairs is None:
+            self._install_pairs(self._build_pairs())
+        ranked = sorted(
+            ((score, first, second, mirrored)
+             for first, partners in self._pairs.items()
+             for second, (score, mirrored) in partners.items() if first < second),
+            key=lambda pair: -pair[0]
+        )
+        results = []
+        for score, first, second, mirrored in ranked:
+            plays = [{"id": play_id, **self._info[self._slots[play_id]]} for play_id in (first, second)]
+            if category and any(play["category"] != category for play in plays):
+                continue
+            results.append({"plays": plays, "score": round(score, 4), "mirrored": mirrored})
+            if len(results) >= limit:
+                break
+        return results
+
+    def stats(self) -> Dict:
+        return {
+            "plays": len(self._slots),
+            "dimensions": DIMENSIONS,
+            "duplicate_pairs": sum(len(partners) for partners in self._pairs.values()) // 2 if self._pairs is not None else None
+        }
@@ -0,0 +1,330 @@
+import os
+import json
+import time
+import uuid
+import inspect
+import threading
+from bisect import bisect_left
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Seconds
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+LLM_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+QUEUE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+OPERATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Set per HTTP request by TelemetryMiddleware; tasks spawned by a handler inherit it
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+JSON_LOGS = os.getenv("LOG_FORMAT", "text").lower() == "json"
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Tuple[str, ...], values: Tuple, extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._child())
+        return child
+
+    def _child(self):
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(self._samples(key, child))
+        return lines
+
+class _Value:
+    __slots__ = ("value", "_lock")
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _child(self):
+        return _Value()
+
+    def _samples(self, key, child) -> List[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(child.value)}"]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum", "_lock")
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = HTTP_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self):
+        return _Buckets(self.buckets)
+
+    def _samples(self, key, child) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            le = 'le="%s"' % _number(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+        lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+# (name, kind, help, [(labels, value), ...]) produced at scrape time
+Samples = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+class MetricsRegistry:
+    """
+    Prometheus text exposition for metrics updated in place, plus collectors
+    that read current state (queues, caches, breakers) when /metrics is scraped
+    """
+    def __init__(self):
+        self.metrics: List[_Metric] = []
+        self.collectors: List[Callable[[], Iterable[Samples]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Tuple[float, ...] = HTTP_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, help_text, labelnames, buckets))
+
+    def _add(self, metric: _Metric) -> _Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Samples]]):
+        self.collectors.append(collector)
+
+    def unregister_collector(self, collector: Callable[[], Iterable[Samples]]):
+        if collector in self.collectors:
+            self.collectors.remove(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for collector in list(self.collectors):
+            try:
+                collected = list(collector())
+            except Exception as e:
+                log_error(f"Metrics Collector Error: {str(e)}")
+                continue
+            for name, kind, help_text, samples in collected:
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+HTTP_REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route template and status code", ("method", "route", "status")
+)
+HTTP_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds", "Time from request start to the last response byte", ("method", "route")
+)
+HTTP_IN_FLIGHT = REGISTRY.gauge(
+    "http_requests_in_flight", "Requests currently being handled", ("method", "route")
+)
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_queue_wait_seconds", "Time spent waiting for an LLM admission slot", ("task",), QUEUE_BUCKETS
+)
+LLM_DURATION = REGISTRY.histogram(
+    "llm_request_duration_seconds", "Provider call latency (time to first token for streams)",
+    ("task", "route", "outcome"), LLM_BUCKETS
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total", "Tokens by kind: input, output, cached (served from the prompt cache), cache_write",
+    ("task", "route", "kind")
+)
+LLM_HEDGES = REGISTRY.counter("llm_hedged_requests_total", "Hedged second requests, by which call won", ("winner",))
+LLM_FAILOVERS = REGISTRY.counter("llm_failovers_total", "Calls retried on the next route after a failure")
+OPERATION_DURATION = REGISTRY.histogram(
+    "operation_duration_seconds", "Catalog and storage operation latency", ("component", "operation"), OPERATION_BUCKETS
+)
+
+def log_event(event: str, **fields):
+    """
+    One structured JSON log line, tagged with the current request id.
+    A no-op unless LOG_FORMAT=json.
+    """
+    if not JSON_LOGS:
+        return
+    record = {"ts": round(time.time(), 3), "event": event, "request_id": request_id.get(), **fields}
+    print(json.dumps(record, default=str), flush=True)
+
+def log_error(message: str, **fields):
+    """
+    Errors keep their plain print() form unless JSON logs are on
+    """
+    if JSON_LOGS:
+        log_event("error", level="error", message=message, **fields)
+    else:
+        print(message)
+
+def timed(component: str, operation: Optional[str] = None):
+    """
+    Record a function's duration in operation_duration_seconds
+    """
+    def decorate(func):
+        child = OPERATION_DURATION.labels(component, operation or func.__name__)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                child.observe(time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+def timed_methods(component: str):
+    """
+    Class decorator: time every public, non-generator method
+    """
+    def decorate(cls):
+        for name, value in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.isfunction(value) or inspect.isgeneratorfunction(value):
+                continue
+            setattr(cls, name, timed(component, name)(value))
+        return cls
+    return decorate
+
+class TelemetryMiddleware:
+    """
+    ASGI middleware: per-route latency histogram, in-flight gauge and status
+    counts, an X-Request-ID on every response (taken from the request when the
+    client sends one) and a JSON access log line when LOG_FORMAT=json.
+    Routes are labelled by template (/api/plays/{play_id}) to keep series bounded.
+    """
+    def __init__(self, app, route_cache_size: int = 2048):
+        self.app = app
+        self.route_cache_size = route_cache_size
+        self._routes: Dict[Tuple[str, str], str] = {}
+
+    def _route(self, scope) -> str:
+        key = (scope["method"], scope["path"])
+        route = self._routes.get(key)
+        if route is None:
+            route = self._match(scope)
+            if len(self._routes) >= self.route_cache_size:
+                self._routes.clear()
+            self._routes[key] = route
+        return route
+
+    def _match(self, scope) -> str:
+        router = getattr(scope.get("app"), "router", None)
+        partial = None
+        for route in getattr(router, "routes", ()):
+            regex = getattr(route, "path_regex", None)
+            if regex is None or not regex.match(scope["path"]):
+                continue
+            methods = getattr(route, "methods", None)
+            if not methods or scope["method"] in methods:
+                return route.path
+            if partial is None:
+                partial = route.path
+        return partial or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = self._route(scope)
+        incoming = dict(scope.get("headers") or []).get(b"x-request-id")
+        rid = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex[:16]
+        token = request_id.set(rid)
+        in_flight = HTTP_IN_FLIGHT.labels(method, route)
+        in_flight.inc()
+        status = 500
+        started = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers") or []) + [(b"x-request-id", rid.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            HTTP_REQUESTS.labels(method, route, status).inc()
+            HTTP_DURATION.labels(method, route).observe(elapsed)
+            log_event(
+                "request",
+                method=method,
+                path=scope.get("path"),
+                route=route,
+                status=status,
+                duration_ms=round(elapsed * 1000, 2)
+            )
+            request_id.reset(token)
@@ -0,0 +1,50 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import pytest
+
+from services.catalog_registry import CatalogRegistry
+from services.play_store import PlayStore
+
+LINE = [("LT", 540), ("LG", 570), ("C", 600), ("RG", 630), ("RT", 660)]
+
+def make_play(name: str = "Trips Right Mesh", receivers=None, **fields) -> dict:
+    """
+    A drawn offensive play: the line, QB, RB and receivers as (id, x, path)
+    """
+    receivers = receivers if receivers is not None else [
+        ("X", 200, "M 200 355 L 200 205"),
+        ("Z", 1000, "M 1000 355 L 1000 255 L 1100 255"),
+        ("Y", 900, "M 900 355 L 900 305 L 700 305"),
+        ("H", 800, "M 800 355 L 800 295 L 600 295")
+    ]
+    players = [{"id": pid, "x": x, "y": 350} for pid, x in LINE]
+    players += [{"id": "QB", "x": 600, "y": 400}, {"id": "RB", "x": 640, "y": 410}]
+    routes = []
+    for pid, x, path in receivers:
+        players.append({"id": pid, "x": x, "y": 355})
+        routes.append({"from_player": pid, "path": path, "label": ""})
+    return {
+        "name": name,
+        "formation": "Gun Trips",
+        "personnel": "11",
+        "concept": "Mesh",
+        "players": players,
+        "routes": routes,
+        **fields
+    }
+
+def record(play_id: str, play: dict, category: str = "offense") -> dict:
+    return {"id": play_id, "play": play, "category": category, "tags": []}
+
+@pytest.fixture(scope="session")
+def catalog():
+    return CatalogRegistry(reload_interval=0)
+
+@pytest.fixture
+def store(tmp_path):
+    store = PlayStore(str(tmp_path / "plays.db"))
+    yield store
+    store.close()
@@ -0,0 +1,72 @@
+import asyncio
+import json
+
+import pytest
+
+from services import telemetry
+from services.analysis_cache import AnalysisCache, analysis_cache_key
+
+def run(coro):
+    return asyncio.run(coro)
+
+@pytest.fixture(params=["memory", "redis"])
+def cache(request, monkeypatch):
+    if request.param == "memory":
+        return AnalysisCache()
+    fakeredis = pytest.importorskip("fakeredis")
+    monkeypatch.setattr("services.analysis_cache.aioredis.from_url", lambda url: fakeredis.FakeAsyncRedis())
+    return AnalysisCache(redis_url="redis://localhost")
+
+def test_key_ignores_case_and_spacing():
+    routes = [{"from_player": "X", "path": "M 200 355 L 200 205"}]
+    assert analysis_cache_key("Gun  Trips", "11", routes, "Mesh", "v1") == analysis_cache_key("gun trips", "11", routes, " mesh", "v1")
+    assert analysis_cache_key("Gun Trips", "11", routes, "Mesh", "v1") != analysis_cache_key("Gun Trips", "11", routes, "Mesh", "v2")
+
+def test_concurrent_misses_compute_once(cache):
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"analysis": "ok"}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert run(scenario()) == [{"analysis": "ok"}] * 5
+    assert calls == 1
+    assert cache.counters["misses"] == 1 and cache.counters["coalesced"] == 4
+
+def test_invalidate_counts_each_analysis_once(cache):
+    async def scenario():
+        await cache.set("a", {"n": 1})
+        await cache.set("b", {"n": 2})
+        if cache.redis is not None:
+            # Only in Redis, e.g. written by another worker
+            await cache.redis.set(cache._redis_key("c"), "{}")
+        removed = await cache.invalidate()
+        return removed, await cache.get("a")
+
+    removed, after = run(scenario())
+    assert removed == (3 if cache.redis is not None else 2)
+    assert after is None
+    assert cache.stats()["entries"] == 0
+
+def test_redis_errors_are_structured_logs(monkeypatch, capsys):
+    class BrokenRedis:
+        async def get(self, key):
+            raise ConnectionError("redis is down")
+
+    monkeypatch.setattr(telemetry, "JSON_LOGS", True)
+    cache = AnalysisCache()
+    cache.redis = BrokenRedis()
+    token = telemetry.request_id.set("req-1")
+    try:
+        assert run(cache.get("k")) is None
+    finally:
+        telemetry.request_id.reset(token)
+    record = json.loads(capsys.readouterr().out.strip())
+    assert record["event"] == "error" and record["request_id"] == "req-1"
+    assert record["message"] == "Analysis Cache Redis Error: redis is down"
+    assert cache.counters["redis_errors"] == 1
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import make_play
+from services.analysis_engine import ANALYSIS_FIELDS, PlayAnalysisEngine
+
+DAGGER = [
+    ("X", 200, "M 200 355 L 200 150 L 500 150", "Deep Dig"),
+    ("Z", 1000, "M 1000 355 L 1000 100", "Go"),
+    ("Y", 900, "M 900 355 L 900 130", "Seam"),
+    ("F", 800, "M 800 355 L 800 320 L 400 320", "Drag")
+]
+CHECKDOWN = {"from_player": "RB", "path": "M 640 410 L 700 350", "label": "Checkdown"}
+
+@pytest.fixture
+def engine(catalog):
+    return PlayAnalysisEngine(catalog)
+
+def dagger(receivers=DAGGER, **fields) -> dict:
+    play = make_play("Dagger", receivers=[(pid, x, path) for pid, x, path, _ in receivers], concept="Dagger", **fields)
+    for route, (_, _, _, label) in zip(play["routes"], receivers):
+        route["label"] = label
+    play["routes"].append(dict(CHECKDOWN))
+    return play
+
+def analyze(engine, play: dict):
+    return engine.analyze(play["name"], play["formation"], play["personnel"], play["routes"], play.get("concept"))
+
+def test_catalog_play_is_answered_without_the_llm(engine):
+    analysis, missing = analyze(engine, dagger())
+    assert missing == []
+    assert any("deep dig" in read for read in analysis["qbProgression"])
+
+def test_redrawn_routes_are_treated_as_custom(engine):
+    verticals = [(pid, x, f"M {x} 355 L {x} 0", "") for pid, x, _, _ in DAGGER]
+    play = dagger(verticals)
+    play["routes"][-1]["path"] = "M 640 410 L 640 0"
+    analysis, missing = analyze(engine, play)
+    assert analysis == {} and missing == ANALYSIS_FIELDS
+
+    # Same play found only by its name
+    analysis, missing = analyze(engine, {**play, "concept": None, "name": "Trips Dagger"})
+    assert analysis == {} and missing == ANALYSIS_FIELDS
+
+def test_relabelled_route_is_custom(engine):
+    receivers = [("X", 200, "M 200 355 L 200 150 L 500 150", "Post")] + DAGGER[1:]
+    assert analyze(engine, dagger(receivers))[1] == ANALYSIS_FIELDS
+
+def test_depth_outside_tolerance_is_custom(engine):
+    shallow_dig = [("X", 200, "M 200 355 L 200 250 L 500 250", "Deep Dig")] + DAGGER[1:]
+    assert analyze(engine, dagger(shallow_dig))[1] == ANALYSIS_FIELDS
+
+def test_vertical_routes_may_run_deeper(engine):
+    to_the_top = DAGGER[:1] + [("Z", 1000, "M 1000 355 L 1000 0", "Go"), ("Y", 900, "M 900 355 L 900 0", "Fade")] + DAGGER[3:]
+    assert analyze(engine, dagger(to_the_top))[1] == []
+
+def test_extra_player_is_custom(engine):
+    play = dagger()
+    play["routes"].append({"from_player": "H", "path": "M 700 355 L 700 300", "label": "Hitch"})
+    assert analyze(engine, play)[1] == ANALYSIS_FIELDS
@@ -0,0 +1,72 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from conftest import make_play, record
+from services.call_sheet import SECTIONS, CallSheetOptimizer
+from services.recommender import PlayRecommender
+
+CONCEPTS = ["Mesh", "Smash", "Flood", "Stick", "Dagger", "Levels", "Inside Zone", "Outside Zone", "Duo", "Power"]
+FORMATIONS = ["Gun Trips", "Gun Bunch", "Empty", "Pistol Ace"]
+PERSONNEL = ["10", "11", "12", "21"]
+
+@pytest.fixture(scope="module")
+def recommender(catalog):
+    rng = random.Random(5)
+    recommender = PlayRecommender(catalog)
+    recommender.rebuild(
+        [
+            record(f"p{n}", make_play(
+                f"Play {n}",
+                concept=rng.choice(CONCEPTS),
+                formation=rng.choice(FORMATIONS),
+                personnel=rng.choice(PERSONNEL)
+            ))
+            for n in range(1500)
+        ],
+        []
+    )
+    return recommender
+
+OPPONENT = {
+    "coverages": {"cover_3": 0.5, "cover_1": 0.3, "cover_2": 0.2},
+    "situational_tendencies": {"3rd_and_long": {"coverage": {"cover_0": 0.6, "cover_1": 0.4}}}
+}
+
+def test_full_sheet_respects_constraints(recommender):
+    sheet = CallSheetOptimizer(recommender).build(opponent=OPPONENT, max_plays=60, max_sections_per_play=3)
+    assert [section["key"] for section in sheet["sections"]] == [spec["key"] for spec in SECTIONS]
+    uses = Counter()
+    for section in sheet["sections"]:
+        plays = section["plays"]
+        uses.update(play["id"] for play in plays)
+        assert len(plays) + section["unfilled"] == section["size"]
+        concepts = [play["concept"] for play in plays]
+        assert len(concepts) == len(set(concepts))
+        assert max(Counter(play["formation"] for play in plays).values()) <= math.ceil(0.5 * section["size"])
+        assert len({play["personnel"] for play in plays}) >= min(2, len(plays))
+        assert [play["score"] for play in plays] == sorted((play["score"] for play in plays), reverse=True)
+    assert len(uses) == sheet["play_count"] <= 60
+    assert max(uses.values()) <= 3
+    # Ten concepts in the library: every section of ten or fewer fills
+    assert all(not section["unfilled"] for section in sheet["sections"] if section["size"] <= 10)
+
+def test_tendency_breakers_land_on_a_tight_sheet(recommender):
+    tendencies = {formation: "pass" for formation in FORMATIONS}
+    sheet = CallSheetOptimizer(recommender).build(
+        coverages={"cover_1": 1.0}, sections=["third_long"], sizes={"third_long": 6},
+        max_plays=6, break_tendencies=tendencies
+    )
+    plays = sheet["sections"][0]["plays"]
+    assert len(plays) == 6 and sheet["play_count"] <= 6
+    breakers = {play["formation"] for play in plays if play["tendency_breaker"]}
+    for formation in FORMATIONS:
+        assert any(play["formation"] == formation and play["kind"] == "run" for play in plays)
+    assert breakers <= set(FORMATIONS)
+
+def test_query_coverages_do_not_grow_the_recommender(recommender):
+    columns = dict(recommender.coverages)
+    CallSheetOptimizer(recommender).build(coverages={"zone_blitz_special": 1.0}, sections=["openers"])
+    assert recommender.coverages == columns
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from services.llm_providers import empty_usage
+from services.llm_router import MIN_SAMPLES, CircuitBreaker, LLMRouter, LLMUnavailable
+from services.prompt_builder import Prompt
+
+PROMPT = Prompt("analysis", "system", "user")
+
+class FakeProvider:
+    def __init__(self, name: str, delay: float = 0.0, error: bool = False):
+        self.name = name
+        self.model = "test"
+        self.delay = delay
+        self.error = error
+        self.calls = 0
+
+    async def complete(self, prompt, temperature, max_tokens):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(f"{self.name} is down")
+        return f"answer from {self.name}", empty_usage()
+
+    async def stream(self, prompt, temperature, max_tokens, usage):
+        await asyncio.sleep(self.delay)
+        yield f"answer from {self.name}"
+
+def run(coro):
+    return asyncio.run(coro)
+
+def route(router: LLMRouter, name: str):
+    return next(r for r in router.routes if r.provider.name == name)
+
+def test_fails_over_to_the_next_provider():
+    router = LLMRouter([FakeProvider("down", error=True), FakeProvider("up")], hedge_delay=0)
+    assert run(router.complete(PROMPT, 0.2, 100)) == "answer from up"
+    assert route(router, "down").stats.error_rate == 1.0
+    assert router.failovers == 1
+
+def test_timeouts_count_as_failures_and_open_the_breaker():
+    router = LLMRouter([FakeProvider("hangs", delay=10)], hedge_delay=0, failure_threshold=3)
+    for _ in range(3):
+        with pytest.raises(LLMUnavailable):
+            run(router.complete(PROMPT, 0.2, 100, timeout=0.02))
+    hangs = route(router, "hangs")
+    assert len(hangs.stats.outcomes) == 3 and hangs.stats.error_rate == 1.0
+    assert hangs.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(LLMUnavailable):
+        run(router.complete(PROMPT, 0.2, 100, timeout=0.02))
+    assert hangs.provider.calls == 3
+
+def test_primary_that_loses_to_its_hedge_is_ranked_down():
+    router = LLMRouter([FakeProvider("slow", delay=10), FakeProvider("fast")], hedge_delay=0.01, failure_threshold=100)
+    for _ in range(MIN_SAMPLES):
+        assert run(router.complete(PROMPT, 0.2, 100, timeout=5)) == "answer from fast"
+    slow = route(router, "slow")
+    assert len(slow.stats.outcomes) == MIN_SAMPLES and slow.stats.error_rate == 1.0
+    assert slow.score() is not None
+    assert [r.provider.name for r in router.ranked()] == ["fast", "slow"]
+    assert run(router.complete(PROMPT, 0.2, 100, timeout=5)) == "answer from fast"
+    assert slow.provider.calls == MIN_SAMPLES
+
+def test_hedge_that_loses_to_the_primary_gets_no_verdict():
+    router = LLMRouter([FakeProvider("primary", delay=0.05), FakeProvider("hedge", delay=10)], hedge_delay=0.01)
+    assert run(router.complete(PROMPT, 0.2, 100)) == "answer from primary"
+    hedge = route(router, "hedge")
+    assert router.hedges == 1
+    assert len(hedge.stats.outcomes) == 0 and hedge.breaker.failures == 0
+    assert hedge.breaker.state == CircuitBreaker.CLOSED
+
+def test_request_cancellation_is_not_a_failure():
+    router = LLMRouter([FakeProvider("slow", delay=10)], hedge_delay=0)
+
+    async def scenario():
+        call = asyncio.create_task(router.complete(PROMPT, 0.2, 100, timeout=30))
+        await asyncio.sleep(0.02)
+        call.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await call
+
+    run(scenario())
+    slow = route(router, "slow")
+    assert len(slow.stats.outcomes) == 0 and slow.breaker.failures == 0
+
+def test_stream_timeout_counts_as_failure():
+    router = LLMRouter([FakeProvider("hangs", delay=10)], hedge_delay=0)
+
+    async def scenario():
+        with pytest.raises(LLMUnavailable):
+            async for _ in router.stream(PROMPT, 0.2, 100, timeout=0.02):
+                pass
+
+    run(scenario())
+    assert route(router, "hangs").stats.error_rate == 1.0
@@ -0,0 +1,95 @@
+import sqlite3
+
+import pytest
+
+from conftest import make_play
+from services.outcome_analytics import OutcomeAnalytics
+from services.play_store import PlayStore
+
+@pytest.fixture
+def analytics(store, catalog):
+    return OutcomeAnalytics(store, catalog)
+
+def outcome(play_id: str, yards: int = 6, **fields) -> dict:
+    return {
+        "play_id": play_id, "game_date": "2026-09-05", "opponent": "Rivals", "coverage": "Cover 3",
+        "result": "gain", "yards_gained": yards, "down": 1, "distance": 10, **fields
+    }
+
+def log(analytics, *outcomes) -> list:
+    plays = analytics.store.get_plays(list({o["play_id"] for o in outcomes}))
+    return analytics.log_outcomes(list(outcomes), plays)
+
+def rollup_table(store) -> list:
+    return [tuple(row) for row in store._query(
+        "SELECT level, key, week, dimension, bucket, plays, yards, successes, explosives "
+        "FROM outcome_rollups ORDER BY level, key, week, dimension, bucket"
+    )]
+
+def save_mesh(store, count: int) -> list:
+    return [store.save_play(make_play(f"Mesh {n}", concept="Mesh"), "offense", []) for n in range(count)]
+
+def test_incremental_rollups_equal_a_rebuild(analytics, store):
+    ids = save_mesh(store, 3)
+    log(analytics, *(outcome(play_id, yards=4 * n + 3) for n, play_id in enumerate(ids)))
+    log(analytics, outcome(ids[0], yards=25, coverage="Cover 1", down=3, distance=2))
+    incremental = rollup_table(store)
+    assert analytics.summary("concept", "Mesh")["plays"] == 4
+
+    assert analytics.rebuild(batch_size=2) == 4
+    assert rollup_table(store) == incremental
+
+def test_deleted_and_edited_plays_keep_their_counts_on_rebuild(analytics, store):
+    ids = save_mesh(store, 3)
+    log(analytics, *(outcome(play_id) for play_id in ids))
+    store.delete_play(ids[0])
+    store.save_play(make_play("Mesh 1", concept="Smash", formation="Ace"), "offense", [], play_id=ids[1])
+    incremental = rollup_table(store)
+    assert analytics.summary("concept", "Mesh")["plays"] == 3
+
+    analytics.rebuild()
+    assert rollup_table(store) == incremental
+    assert analytics.summary("concept", "Mesh")["plays"] == 3
+    assert analytics.summary("concept", "Smash")["plays"] == 0
+
+def test_backfilled_outcomes_use_the_current_play(analytics, store):
+    keep, gone = save_mesh(store, 2)
+    store.log_outcomes([outcome(keep), outcome(gone)])
+    store.delete_play(gone)
+    assert analytics.rebuild() == 2
+    assert analytics.summary("concept", "Mesh")["plays"] == 1
+    assert analytics.summary("play", keep)["plays"] == 1
+
+def test_outcomes_logged_during_a_rebuild_are_kept(analytics, store, monkeypatch):
+    ids = save_mesh(store, 2)
+    log(analytics, outcome(ids[0]))
+    replace = store.replace_rollups
+    late = []
+
+    def replace_after_a_late_write(rollups, through_seq=None):
+        if not late:
+            late.extend(log(analytics, outcome(ids[1], yards=30)))
+        return replace(rollups, through_seq)
+
+    monkeypatch.setattr(store, "replace_rollups", replace_after_a_late_write)
+    assert analytics.rebuild() == 2
+    assert analytics.summary("concept", "Mesh")["plays"] == 2
+    incremental = rollup_table(store)
+    monkeypatch.undo()
+    analytics.rebuild()
+    assert rollup_table(store) == incremental
+
+def test_existing_outcome_tables_gain_attribution_columns(tmp_path):
+    path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE play_outcomes (seq INTEGER PRIMARY KEY AUTOINCREMENT, id TEXT UNIQUE NOT NULL, "
+        "play_id TEXT NOT NULL, game_date TEXT NOT NULL, opponent TEXT, defensive_front TEXT, coverage TEXT, "
+        "result TEXT NOT NULL, yards_gained INTEGER, down INTEGER, distance INTEGER, field_position TEXT, "
+        "hash TEXT, notes TEXT, created_at TEXT NOT NULL)"
+    )
+    conn.close()
+    store = PlayStore(path)
+    store.log_outcomes([outcome("p1", concept="Mesh", formation="Gun", is_run=0)])
+    assert next(store.iter_outcomes())["concept"] == "Mesh"
+    store.close()
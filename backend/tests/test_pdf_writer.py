@@ -0,0 +1,17 @@
+from services.pdf_writer import StreamingPDFWriter, pdf_string
+
+def test_strings_use_win_ansi_encoding():
+    assert pdf_string("Play 0 — “smart” • café") == b"(Play 0 \x97 \x93smart\x94 \x95 caf\xe9)"
+    assert pdf_string("中") == b"(?)"
+
+def test_strings_escape_delimiters():
+    assert pdf_string("a(b)\\c") == b"(a\\(b\\)\\\\c)"
+
+def test_pages_stream_into_a_complete_document():
+    writer = StreamingPDFWriter(compress=False)
+    data = writer.header()
+    data += writer.add_page(b"BT /F1 12 Tf 72 72 Td " + pdf_string("Trips Right — Mesh") + b" Tj ET")
+    data += writer.finish()
+    assert data.startswith(b"%PDF-1.4") and data.rstrip().endswith(b"%%EOF")
+    assert b"(Trips Right \x97 Mesh)" in data
+    assert b"/Count 1" in data
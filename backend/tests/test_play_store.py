@@ -0,0 +1,76 @@
+import pytest
+
+from conftest import make_play
+
+def save(store, count: int, **fields) -> list:
+    return store.save_plays([
+        (make_play(f"Play {n}", **fields), "offense", ["base"] if n % 2 else [], None)
+        for n in range(count)
+    ])
+
+def test_save_get_and_update_in_place(store):
+    play_id = store.save_play(make_play("Trips Right Mesh"), "offense", ["3rd down"])
+    record = store.get_play(play_id)
+    assert record["play"]["name"] == "Trips Right Mesh"
+    assert record["tags"] == ["3rd down"]
+
+    version = store.version("plays")
+    assert store.save_play(make_play("Trips Right Mesh v2"), "offense", [], play_id=play_id) == play_id
+    assert store.get_play(play_id)["play"]["name"] == "Trips Right Mesh v2"
+    assert store.get_play(play_id)["tags"] == []
+    assert store.count_plays() == 1
+    assert store.version("plays") == version + 1
+
+def test_cursor_pages_cover_every_play_once(store):
+    ids = save(store, 25)
+    seen, cursor = [], None
+    while True:
+        page, cursor = store.list_plays(limit=10, cursor=cursor)
+        seen += [record["id"] for record in page]
+        if cursor is None:
+            break
+    assert seen == ids
+    assert [record["id"] for record in store.iter_plays(batch_size=7)] == ids
+
+def test_filters_and_field_projection(store):
+    save(store, 6, down=3, distance=4)
+    save(store, 4, down=1, distance=10)
+    plays, cursor = store.list_plays(down=3, distance_max=5)
+    assert len(plays) == 6 and cursor is None
+    plays, _ = store.list_plays(tag="base", fields=["name", "down"])
+    assert len(plays) == 5
+    assert set(plays[0]["play"]) == {"name", "down"}
+
+def test_bad_cursor_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.list_plays(cursor="not-a-cursor")
+
+def test_get_plays_skips_missing_ids(store):
+    ids = save(store, 3)
+    assert set(store.get_plays(ids + ["missing"])) == set(ids)
+
+def test_delete_removes_play_from_playbooks_and_sheets(store):
+    keep, gone = save(store, 2)
+    playbook_id = store.create_playbook({"name": "Week 1"})
+    store.add_play_to_playbook(playbook_id, keep)
+    store.add_play_to_playbook(playbook_id, gone)
+    store.create_sheet({"name": "3rd Down", "situation": "3rd Down", "play_ids": [gone, keep, gone]})
+    untouched = store.create_sheet({"name": "Red Zone", "situation": "Red Zone", "play_ids": [keep]})
+    sheets_version = store.version("sheets")
+
+    assert store.delete_play(gone)
+    assert store.get_play(gone) is None
+    assert store.get_playbook(playbook_id)["plays"] == [keep]
+    sheets = {sheet["name"]: sheet for sheet in store.list_sheets()}
+    assert sheets["3rd Down"]["play_ids"] == [keep]
+    assert next(s for s in store.list_sheets() if s["id"] == untouched)["play_ids"] == [keep]
+    assert store.version("sheets") == sheets_version + 1
+
+    # Nothing left to change: no version bump
+    assert not store.delete_play(gone)
+    assert store.version("sheets") == sheets_version + 1
+
+def test_opponents_round_trip(store):
+    store.save_opponent({"opponent_name": "Rivals", "coverages": {"cover_3": 0.6}, "defensive_fronts": {}})
+    assert store.get_opponent("Rivals")["coverages"] == {"cover_3": 0.6}
+    assert [o["opponent_name"] for o in store.list_opponents()] == ["Rivals"]
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from services.rate_limits import (
+    DEFAULT_TIER_LIMITS, MemoryLimitBackend, RateLimited, RedisLimitBackend, TierLimiter
+)
+
+def run(coro):
+    return asyncio.run(coro)
+
+def limits(**overrides) -> dict:
+    return {**DEFAULT_TIER_LIMITS["free"], "daily_tokens": None, **overrides}
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request, monkeypatch):
+    if request.param == "memory":
+        return MemoryLimitBackend()
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    monkeypatch.setattr("services.rate_limits.aioredis.from_url", lambda url: fakeredis.FakeAsyncRedis())
+    return RedisLimitBackend("redis://localhost")
+
+def test_token_bucket_allows_burst_then_waits(backend):
+    async def scenario():
+        assert [await backend.take("user:a", 1.0, 3) for _ in range(3)] == [0, 0, 0]
+        assert await backend.take("user:a", 1.0, 3) > 0
+        assert await backend.take("user:b", 1.0, 3) == 0
+
+    run(scenario())
+
+def test_leases_cap_concurrency_and_release_by_id(backend):
+    async def scenario():
+        first = await backend.acquire("user:a", 2)
+        second = await backend.acquire("user:a", 2)
+        assert first and second and first != second
+        assert await backend.acquire("user:a", 2) is None
+        await backend.release("user:a", first)
+        # A second release of the same lease can't free someone else's slot
+        await backend.release("user:a", first)
+        assert await backend.acquire("user:a", 2)
+        assert await backend.acquire("user:a", 2) is None
+
+    run(scenario())
+
+def test_expired_lease_frees_its_slot(backend, monkeypatch):
+    monkeypatch.setattr("services.rate_limits.LEASE_TTL_SECONDS", 0.05)
+
+    async def scenario():
+        leaked = await backend.acquire("user:a", 1)
+        assert leaked and await backend.acquire("user:a", 1) is None
+        await asyncio.sleep(0.1)
+        fresh = await backend.acquire("user:a", 1)
+        assert fresh
+        # The leaked lease coming back late doesn't touch the new one
+        await backend.release("user:a", leaked)
+        assert await backend.acquire("user:a", 1) is None
+
+    run(scenario())
+
+def test_daily_usage_accumulates(backend):
+    async def scenario():
+        await backend.charge("user:a", 120)
+        await backend.charge("user:a", 30)
+        assert await backend.used("user:a") == 150
+        assert await backend.used("user:b") == 0
+
+    run(scenario())
+
+def test_concurrency_rejection_does_not_spend_a_token():
+    limiter = TierLimiter(tiers={"free": limits(rate=0.001, burst=2, concurrency=1, tier_rate=None)})
+
+    async def scenario():
+        holder = limiter.principal("a", "free")
+        await limiter.admit(holder)
+        for _ in range(3):
+            with pytest.raises(RateLimited):
+                await limiter.admit(limiter.principal("a", "free"))
+        await limiter.release(holder)
+        await limiter.admit(limiter.principal("a", "free"))
+
+    run(scenario())
+    assert limiter.rejections == {"free:concurrency": 3}
+
+def test_rejected_admit_returns_its_leases():
+    limiter = TierLimiter(tiers={"free": limits(rate=0.001, burst=1, concurrency=2, tier_rate=None, tier_concurrency=None)})
+
+    async def scenario():
+        await limiter.admit(limiter.principal("a", "free"))
+        rejected = limiter.principal("a", "free")
+        with pytest.raises(RateLimited):
+            await limiter.admit(rejected)
+        assert rejected.leases == []
+        assert limiter.backend.stats()["leases"] == 1
+
+    run(scenario())
+    assert limiter.rejections == {"free:rate": 1}
+
+def test_daily_budget_is_enforced():
+    limiter = TierLimiter(tiers={"free": limits(daily_tokens=100)})
+
+    async def scenario():
+        principal = limiter.principal("a", "free")
+        await limiter.charge(principal, 100)
+        with pytest.raises(RateLimited):
+            await limiter.admit(principal)
+        usage = await limiter.usage(principal)
+        assert usage["tokens_remaining"] == 0
+
+    run(scenario())
+    assert limiter.rejections == {"free:budget": 1}
@@ -0,0 +1,75 @@
+import pytest
+
+from conftest import make_play, record
+from services.recommender import BASE_SUCCESS_RATE, PlayRecommender, coverage_mix
+
+@pytest.fixture
+def recommender(catalog):
+    recommender = PlayRecommender(catalog)
+    recommender.rebuild(
+        [
+            record("mesh", make_play("Mesh", concept="Mesh")),
+            record("smash", make_play("Smash", concept="Smash")),
+            record("zone", make_play("Inside Zone", concept="Inside Zone", down=3, distance=2)),
+            record("punt", make_play("Punt Safe", concept=None), category="special_teams")
+        ],
+        []
+    )
+    return recommender
+
+def test_logged_outcomes_move_a_play_up(recommender):
+    for _ in range(6):
+        recommender.record_outcome({"play_id": "smash", "coverage": "Cover 1", "result": "touchdown"})
+        recommender.record_outcome({"play_id": "mesh", "coverage": "Cover 1", "result": "incomplete"})
+    ranked = recommender.recommend({"cover_1": 1.0}, category="offense")
+    assert [play["id"] for play in ranked][:1] == ["smash"]
+    assert ranked[0]["by_coverage"]["cover_1"]["attempts"] == 6
+    assert "punt" not in {play["id"] for play in ranked}
+
+def test_situational_fit_prefers_tagged_situation(recommender):
+    fit = recommender.situational_fit(down=3, distance=2)
+    slot = recommender._slots
+    assert fit[slot["zone"]] > fit[slot["mesh"]] == 1.0
+
+def test_unknown_coverages_do_not_grow_the_matrices(recommender):
+    columns = dict(recommender.coverages)
+    shape = recommender._rates.shape
+    for n in range(50):
+        plays = recommender.recommend({f"made_up_{n}": 0.5, "cover_3": 0.5})
+        assert plays
+        assert plays[0]["by_coverage"][f"made_up_{n}"] == {"success_rate": BASE_SUCCESS_RATE, "attempts": 0}
+    assert recommender.coverages == columns
+    assert recommender._rates.shape == shape == recommender._attempts.shape
+
+def test_unknown_coverage_scores_at_the_prior(recommender):
+    expected = recommender.expected_success({"never_seen": 1.0})
+    assert expected[recommender._slots["mesh"]] == pytest.approx(BASE_SUCCESS_RATE)
+
+def test_removed_play_is_not_recommended(recommender):
+    recommender.remove_play("mesh")
+    assert "mesh" not in {play["id"] for play in recommender.recommend({})}
+
+def test_coverage_mix_prefers_explicit_situation():
+    opponent = {
+        "coverages": {"cover_3": 3, "cover_1": 1},
+        "situational_tendencies": {
+            "two_minute": {"coverage": {"cover_2": 1}},
+            "3rd_and_long": {"coverage": {"cover_0": 1}}
+        }
+    }
+    assert coverage_mix(opponent) == {"cover_3": 0.75, "cover_1": 0.25}
+    assert coverage_mix(opponent, 3, 9) == {"cover_0": 1.0}
+    assert coverage_mix(opponent, 3, 9, situation="two_minute") == {"cover_2": 1.0}
+
+def test_score_matrix_matches_single_queries_without_new_columns(recommender):
+    columns = dict(recommender.coverages)
+    situations = [
+        {"mix": {"cover_1": 0.5, "invented": 0.5}, "down": 3, "distance": 2},
+        {"mix": {}, "field_position": "opp_19_10"}
+    ]
+    scores, expected = recommender.score_matrix(situations, category="offense")
+    assert recommender.coverages == columns
+    for row, situation in enumerate(situations):
+        assert expected[row] == pytest.approx(recommender.expected_success(situation["mix"]))
+    assert scores[0, recommender._slots["punt"]] == float("-inf")
+    assert scores[0, recommender._slots["zone"]] > scores[0, recommender._slots["mesh"]]
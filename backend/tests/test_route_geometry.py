@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+
+from conftest import make_play
+from services.route_geometry import (
+    annotate_batch, flatten, heading, play_geometry, resample, resample_many, route_geometry
+)
+from services.play_cards import path_segments
+
+def conflicts(receivers) -> list:
+    return [(c["type"], c["players"]) for c in play_geometry(make_play(receivers=receivers))["conflicts"]]
+
+def test_out_route_geometry():
+    geometry = route_geometry({"from_player": "Z", "path": "M 1000 355 L 1000 255 L 1100 255"})
+    assert geometry["depth"] == 9.5
+    assert geometry["length"] == 20.0
+    assert geometry["stem"] == 10.0
+    assert [b["direction"] for b in geometry["breaks"]] == ["out"]
+    assert geometry["direction"] == "out"
+    assert geometry["pattern"]
+
+def test_geometry_is_plain_json():
+    result = play_geometry(make_play())
+    route = result["routes"][0]
+    for point in (route["start"], route["end"]):
+        assert all(type(value) is float for value in point.values())
+    assert json.loads(json.dumps(result)) == result
+
+def test_undrawable_route_has_no_geometry():
+    assert route_geometry({"from_player": "X", "path": ""}) is None
+    assert route_geometry({"from_player": "X", "path": "M 200 355"}) is None
+
+def test_heading_is_relative_to_alignment():
+    assert heading(0, -10, 200) == "vertical"
+    assert heading(10, 0, 200) == "in"
+    assert heading(10, 0, 1000) == "out"
+    assert heading(10, -10, 600) == "diagonal-right"
+
+def test_deep_collision_is_reported_once_as_a_pick():
+    meet = [("A", 500, "M 500 355 L 500 255 L 700 255"), ("B", 700, "M 700 355 L 700 255 L 500 255")]
+    assert conflicts(meet) == [("illegal_pick_risk", ["A", "B"])]
+
+def test_contact_at_the_line_is_a_collision():
+    shallow = [("A", 500, "M 500 355 L 700 355"), ("B", 700, "M 700 355 L 500 355")]
+    assert conflicts(shallow) == [("collision", ["A", "B"])]
+
+def test_landmarks_too_close_share_a_defender():
+    stacked = [("A", 500, "M 500 355 L 500 255"), ("B", 560, "M 560 355 L 530 255")]
+    assert conflicts(stacked) == [("spacing", ["A", "B"])]
+
+def test_spread_routes_have_no_conflicts():
+    assert conflicts(None) == []
+
+def test_batch_matches_single_plays():
+    plays = [
+        make_play(),
+        make_play(receivers=[("A", 500, "M 500 355 L 500 255 L 700 255"), ("B", 700, "M 700 355 L 700 255 L 500 255")]),
+        make_play(receivers=[])
+    ]
+    assert annotate_batch(plays) == [play_geometry(play) for play in plays]
+
+def test_resample_many_matches_resample():
+    paths = ["M 200 355 L 200 205", "M 1000 355 C 1000 300 1050 250 1100 250", "M 600 400 L 600 398"]
+    polylines = [flatten(path_segments(path)) for path in paths]
+    points, owners = resample_many(polylines)
+    for index, polyline in enumerate(polylines):
+        assert points[owners == index] == pytest.approx(resample(polyline)[0])
+    assert np.all(np.diff(owners) >= 0)
@@ -0,0 +1,59 @@
+import pytest
+
+from conftest import record
+from services.search_index import PlaySearchIndex, tokenize
+
+def play(play_id: str, name: str, concept: str = "", formation: str = "", tags=(), category: str = "offense") -> dict:
+    return {**record(play_id, {"name": name, "concept": concept, "formation": formation}, category), "tags": list(tags)}
+
+@pytest.fixture
+def index():
+    index = PlaySearchIndex()
+    index.rebuild([
+        play("boot", "Play Action Boot Right", concept="Boot", formation="Singleback"),
+        play("pa_boot", "PA Boot Rt", concept="Boot", formation="Singleback"),
+        play("mesh", "Trips Right Mesh", concept="Mesh", formation="Gun Trips", tags=["3rd down"]),
+        play("stick", "Trips Left Stick", concept="Stick", formation="Gun Trips"),
+        play("seam", "TE Seam", concept="Seams", formation="Ace"),
+        play("lt_pull", "Power LT Pull", concept="Power", formation="I Form"),
+        play("punt", "Punt Safe", category="special_teams")
+    ])
+    return index
+
+def ids(results):
+    return [result["id"] for result in results]
+
+def test_abbreviations_expand_to_words():
+    assert tokenize("PA Boot Rt") == ["play", "action", "boot", "right"]
+    assert tokenize("TE seam") == ["tight", "end", "seam"]
+    # LT is as likely the left tackle as left
+    assert tokenize("LT pull") == ["lt", "pull"]
+
+@pytest.mark.parametrize("query", ["PA", "play action", "pa boot"])
+def test_play_action_matches_either_spelling(index, query):
+    assert set(ids(index.search(query))[:2]) == {"boot", "pa_boot"}
+
+def test_tight_end_matches_te(index):
+    assert ids(index.search("tight end", prefix=False)) == ["seam"]
+
+def test_lt_is_not_left(index):
+    assert ids(index.search("lt", prefix=False)) == ["lt_pull"]
+    assert "lt_pull" not in ids(index.search("left", prefix=False))
+
+def test_bm25_ranks_name_matches_and_filters_category(index):
+    assert ids(index.search("trips right mesh"))[0] == "mesh"
+    assert ids(index.search("punt")) == ["punt"]
+    assert ids(index.search("punt", category="offense")) == []
+
+def test_typos_and_prefixes(index):
+    assert ids(index.search("trps rt mesh"))[0] == "mesh"
+    assert ids(index.search("stic"))[0] == "stick"
+    assert "stick" in index.suggest("trips st")
+
+def test_remove_and_reindex(index):
+    index.remove("mesh")
+    assert "mesh" not in ids(index.search("mesh"))
+    index.add(play("stick", "Bunch Snag", concept="Snag", formation="Gun Bunch"))
+    assert ids(index.search("stick", prefix=False)) == []
+    assert ids(index.search("snag")) == ["stick"]
+    assert len(index) == 6
@@ -0,0 +1,74 @@
+import asyncio
+import re
+
+from conftest import make_play, record
+from services.similarity_index import PlaySimilarityIndex
+
+def mirror(play: dict) -> dict:
+    flip = lambda match: f"{match.group(1)} {1200 - int(match.group(2))}"
+    return {
+        **play,
+        "players": [{**p, "x": 1200 - p["x"]} for p in play["players"]],
+        "routes": [{**r, "path": re.sub(r"([ML]) (\d+)", flip, r["path"])} for r in play["routes"]]
+    }
+
+def bare(name: str) -> dict:
+    # What a CSV import without diagrams produces
+    return {"name": name, "formation": "Gun Trips", "personnel": "11", "concept": "Mesh", "players": [], "routes": []}
+
+def test_mirrored_copy_is_a_duplicate(catalog):
+    index = PlaySimilarityIndex(catalog)
+    play = make_play()
+    index.rebuild([record("a", play), record("b", mirror(play)), record("c", make_play(receivers=[("X", 200, "M 200 355 L 200 155")]))])
+    pairs = index.duplicates()
+    assert [(p["plays"][0]["id"], p["plays"][1]["id"], p["mirrored"]) for p in pairs] == [("a", "b", True)]
+    assert index.duplicates_of("a")[0]["id"] == "b"
+
+def test_plays_without_geometry_are_not_indexed(catalog):
+    index = PlaySimilarityIndex(catalog)
+    index.rebuild([record(f"bare_{n}", bare(f"Imported {n}")) for n in range(200)] + [record("drawn", make_play())])
+    assert len(index) == 1
+    assert index.duplicates() == []
+    assert index.similar_to("bare_0") is None
+
+    # Clearing a diagram takes the play back out
+    index.add(record("drawn", bare("Drawn")))
+    assert len(index) == 0
+
+def test_pairs_per_play_are_capped(catalog):
+    index = PlaySimilarityIndex(catalog, max_pairs_per_play=5)
+    index.rebuild([record(f"copy_{n}", make_play(f"Copy {n}")) for n in range(40)])
+    index.duplicates(limit=1000)
+    assert all(len(partners) <= 5 for partners in index._pairs.values())
+    assert index.stats()["duplicate_pairs"] <= 40 * 5 // 2
+
+    # Incremental adds respect the cap too
+    for n in range(40, 60):
+        index.add(record(f"copy_{n}", make_play(f"Copy {n}")))
+    assert all(len(partners) <= 5 for partners in index._pairs.values())
+
+def test_remove_drops_only_that_plays_pairs(catalog):
+    index = PlaySimilarityIndex(catalog)
+    play = make_play()
+    other = make_play(receivers=[("X", 200, "M 200 355 L 200 155"), ("Z", 1000, "M 1000 355 L 1000 155")])
+    index.rebuild([record("a", play), record("b", play), record("c", other), record("d", other)])
+    assert len(index.duplicates()) == 2
+    index.remove("a")
+    assert [(p["plays"][0]["id"], p["plays"][1]["id"]) for p in index.duplicates()] == [("c", "d")]
+    assert all("a" not in partners for partners in index._pairs.values())
+
+def test_ensure_pairs_builds_off_the_loop_and_keeps_later_writes(catalog):
+    index = PlaySimilarityIndex(catalog)
+    play = make_play()
+    index.rebuild([record("a", play), record("b", play)])
+
+    async def scenario():
+        build = asyncio.create_task(index.ensure_pairs())
+        await asyncio.sleep(0)
+        # Written while the join runs in its thread
+        index.add(record("c", play))
+        await build
+
+    asyncio.run(scenario())
+    ids = {tuple(p["id"] for p in pair["plays"]) for pair in index.duplicates()}
+    assert ids == {("a", "b"), ("a", "c"), ("b", "c")}
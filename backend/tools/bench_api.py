@@ -0,0 +1,341 @@
+"""
+End-to-end load benchmark: the full app (middleware, stores, indexes, LLM
+client) runs in-process against the stub LLM server, and virtual users drive
+a weighted request mix at each concurrency level in a sweep.
+
+    python tools/bench_api.py
+    python tools/bench_api.py --mix llm --concurrency 1,8,32 --latency 1.0 --jitter 0.3 --error-rate 0.02
+    python tools/bench_api.py --output before.json
+    python tools/bench_api.py --output after.json --compare before.json --threshold 0.15
+
+Reports throughput, p50/p95/p99 per route and event-loop lag for every step,
+and writes them as JSON (with the git commit) for comparing runs. --compare
+exits non-zero when a route's p95 or a step's throughput regressed by more
+than --threshold. The stub runs on its own thread and event loop, so its
+work shows up as GIL contention but not as loop lag; pass --stub-url to use
+one in a separate process instead.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+import uvicorn
+
+from bench_auth import heartbeat, percentile
+from bench_workers import WORDS, free_port, synthetic_play
+import stub_llm_server
+
+DEFENSES = ["Cover 2", "Cover 3", "Cover 1 Robber", "Quarters", "Tampa 2", "Cover 0 Blitz"]
+IDEAS = ["quick game vs press", "red zone fade", "third and long dagger", "RPO off inside zone", "play action shot"]
+
+MIXES = {
+    "reads": {"catalog": 30, "list": 25, "search": 25, "get_play": 20},
+    "writes": {"save": 60, "list": 25, "get_play": 15},
+    "llm": {"analyze": 60, "generate": 25, "counters": 15},
+    "auth": {"login": 40, "profile": 60},
+    "mixed": {
+        "catalog": 18, "list": 14, "search": 14, "get_play": 14, "save": 8,
+        "analyze": 10, "generate": 4, "counters": 2, "login": 4, "profile": 12
+    }
+}
+
+class Context:
+    """
+    Data the virtual users share: seeded plays, accounts and the ETags a
+    browser would be holding
+    """
+    def __init__(self, plays, users):
+        self.plays = plays
+        self.users = users
+        self.sessions = []
+        self.etags = {}
+
+async def op_catalog(client, ctx, rng):
+    # About half the frontend's polls revalidate a library it already has
+    etag = ctx.etags.get("formations") if rng.random() < 0.5 else None
+    response = await client.get("/api/plays/library/formations", headers={"if-none-match": etag} if etag else None)
+    if response.status_code == 200:
+        ctx.etags["formations"] = response.headers.get("etag")
+    return response
+
+async def op_list(client, ctx, rng):
+    return await client.get("/api/plays/", params={"limit": 100})
+
+async def op_search(client, ctx, rng):
+    return await client.get("/api/plays/search", params={"q": " ".join(rng.sample(WORDS, 2))})
+
+async def op_get_play(client, ctx, rng):
+    return await client.get(f"/api/plays/bench_{rng.randrange(len(ctx.plays))}")
+
+async def op_save(client, ctx, rng):
+    play = synthetic_play(rng, rng.randrange(1_000_000))
+    return await client.post("/api/plays/save", json={"play": play, "category": "offense", "tags": ["bench"]})
+
+async def op_analyze(client, ctx, rng):
+    play = rng.choice(ctx.plays)
+    return await client.post("/api/analysis/analyze", json={
+        "play_name": play["name"],
+        "formation": play["formation"],
+        "personnel": play["personnel"],
+        "routes": play["routes"],
+        "concept": play["concept"]
+    })
+
+async def op_generate(client, ctx, rng):
+    return await client.post("/api/analysis/generate", json={
+        "description": f"{rng.choice(IDEAS)} from {rng.choice(['trips', 'bunch', 'empty', 'twins'])} #{rng.randrange(500)}"
+    })
+
+async def op_counters(client, ctx, rng):
+    return await client.post("/api/analysis/suggest-counters", json={"defensive_scheme": rng.choice(DEFENSES)})
+
+async def op_login(client, ctx, rng):
+    email, password = rng.choice(ctx.users)
+    response = await client.post("/api/auth/login", json={"email": email, "password": password})
+    if response.status_code == 200:
+        ctx.sessions.append(response.json()["session_token"])
+    return response
+
+async def op_profile(client, ctx, rng):
+    return await client.get("/api/auth/profile", params={"session_token": rng.choice(ctx.sessions)})
+
+OPERATIONS = {name[3:]: func for name, func in globals().items() if name.startswith("op_")}
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10
+        ).stdout.strip() or "unknown"
+    except (OSError, subprocess.SubprocessError):
+        return "unknown"
+
+def start_stub(args) -> str:
+    stub_llm_server.configure(args.latency, args.jitter, args.error_rate)
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(stub_llm_server.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    deadline = time.time() + 10
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("Stub LLM server did not start")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+def configure_env(args, workdir: str, stub_url: str):
+    """
+    Must run before main is imported: services read their settings at startup
+    """
+    os.environ.update({
+        "COACHGRIND_DB_PATH": os.path.join(workdir, "bench.db"),
+        "EXPORT_DIR": os.path.join(workdir, "exports"),
+        "OPENAI_BASE_URL": f"{stub_url}/v1",
+        "OPENAI_API_KEY": "stub",
+        "LLM_PROVIDER": "openai",
+        "RATE_LIMITS_ENABLED": "true" if args.rate_limits else "false",
+        "CATALOG_RELOAD_INTERVAL_SECONDS": "0"
+    })
+    for name in ("REDIS_URL", "LLM_PROVIDERS"):
+        os.environ.pop(name, None)
+
+def seed(count: int, rng: random.Random):
+    from services.play_store import PlayStore
+
+    plays = [synthetic_play(rng, n) for n in range(count)]
+    store = PlayStore()
+    for start in range(0, count, 1000):
+        store.save_plays([(play, "offense", [], f"bench_{start + i}") for i, play in enumerate(plays[start:start + 1000])])
+    store.close()
+    return plays
+
+def summarize(samples, elapsed: float):
+    latencies = [latency for latency, _ in samples]
+    statuses = defaultdict(int)
+    for _, status in samples:
+        statuses[str(status)] += 1
+    errors = sum(count for status, count in statuses.items() if not status.startswith(("2", "3")))
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "throughput": round(len(samples) / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        "statuses": dict(statuses)
+    }
+
+async def run_step(client, ctx, mix, concurrency: int, args) -> dict:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    samples = defaultdict(list)
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    deadline = measure_from + args.duration
+
+    async def virtual_user(n: int):
+        rng = random.Random(args.seed * 7919 + concurrency * 131 + n)
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                return
+            name = rng.choices(names, weights)[0]
+            try:
+                response = await OPERATIONS[name](client, ctx, rng)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            if now >= measure_from:
+                samples[name].append((time.perf_counter() - now, status))
+
+    async def measure_lag():
+        await asyncio.sleep(args.warmup)
+        await heartbeat(lags, stop)
+
+    lags = []
+    stop = asyncio.Event()
+    beat = asyncio.create_task(measure_lag())
+    await asyncio.gather(*(virtual_user(n) for n in range(concurrency)))
+    elapsed = time.perf_counter() - measure_from
+    stop.set()
+    await beat
+
+    every = [sample for route in samples.values() for sample in route]
+    return {
+        "concurrency": concurrency,
+        "duration": round(elapsed, 2),
+        **summarize(every, elapsed),
+        "loop_lag_ms": {
+            "p50": round(percentile(lags, 50) * 1000, 2),
+            "p99": round(percentile(lags, 99) * 1000, 2),
+            "max": round(max(lags or [0]) * 1000, 2)
+        },
+        "routes": {name: summarize(samples[name], elapsed) for name in sorted(samples)}
+    }
+
+def print_step(step: dict):
+    lag = step["loop_lag_ms"]
+    print(f"\n🏈 concurrency {step['concurrency']}: {step['throughput']:.0f} req/s, {step['errors']} errors, "
+          f"p50 {step['p50_ms']:.1f} ms  p95 {step['p95_ms']:.1f} ms  p99 {step['p99_ms']:.1f} ms | "
+          f"loop lag p50 {lag['p50']:.1f} ms  p99 {lag['p99']:.1f} ms  max {lag['max']:.1f} ms")
+    print(f"   {'route':<10} {'count':>6} {'req/s':>7} {'err':>5} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, route in step["routes"].items():
+        print(f"   {name:<10} {route['count']:>6} {route['throughput']:>7.1f} {route['errors']:>5} "
+              f"{route['p50_ms']:>8.1f} {route['p95_ms']:>8.1f} {route['p99_ms']:>8.1f}")
+
+def compare(results: dict, baseline: dict, threshold: float, min_delta_ms: float) -> list:
+    """
+    Regressions against a previous run: throughput drops and p95 increases
+    beyond the threshold, per concurrency step and route. Sub-millisecond
+    routes swing by more than 10% between identical runs, so a p95 also has
+    to move by min_delta_ms to count.
+    """
+    regressions = []
+    previous = {step["concurrency"]: step for step in baseline.get("steps", [])}
+    print(f"\n🏈 Compared with {baseline.get('meta', {}).get('commit', '?')} (threshold {threshold:.0%})")
+    for step in results["steps"]:
+        before = previous.get(step["concurrency"])
+        if before is None or not before["throughput"]:
+            continue
+        change = step["throughput"] / before["throughput"] - 1
+        print(f"   concurrency {step['concurrency']}: {before['throughput']:.0f} -> {step['throughput']:.0f} req/s ({change:+.0%})")
+        if change < -threshold:
+            regressions.append(f"concurrency {step['concurrency']} throughput {change:+.0%}")
+        for name, route in step["routes"].items():
+            old = before["routes"].get(name)
+            if not old or not old["p95_ms"] or not route["count"]:
+                continue
+            change = route["p95_ms"] / old["p95_ms"] - 1
+            slower = change > threshold and route["p95_ms"] - old["p95_ms"] >= min_delta_ms
+            marker = "  <-- regression" if slower else ""
+            print(f"      {name:<10} p95 {old['p95_ms']:.1f} -> {route['p95_ms']:.1f} ms ({change:+.0%}){marker}")
+            if marker:
+                regressions.append(f"concurrency {step['concurrency']} {name} p95 {change:+.0%}")
+    return regressions
+
+async def run(args) -> dict:
+    # Imported here, after configure_env
+    from main import app
+
+    rng = random.Random(args.seed)
+    plays = seed(args.plays, rng)
+    users = [(f"bench{n}@example.com", f"pw-{n}") for n in range(args.users)]
+    ctx = Context(plays, users)
+
+    steps = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for n, (email, password) in enumerate(users):
+                await client.post("/api/auth/signup", json={"email": email, "password": password, "name": f"Coach {n}"})
+                response = await client.post("/api/auth/login", json={"email": email, "password": password})
+                ctx.sessions.append(response.json()["session_token"])
+
+            mix = MIXES[args.mix]
+            for concurrency in args.concurrency:
+                step = await run_step(client, ctx, mix, concurrency, args)
+                print_step(step)
+                steps.append(step)
+
+        llm = app.state.ai_service.stats()
+        cache = app.state.ai_service.cache.stats()
+
+    return {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+            "stub": None if args.stub_url else dict(stub_llm_server.app.state.counters),
+            "llm": llm,
+            "analysis_cache": cache
+        },
+        "steps": steps
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="End-to-end API load and latency benchmark")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="mixed")
+    parser.add_argument("--concurrency", type=lambda s: [int(n) for n in s.split(",")], default=[1, 8, 32, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per concurrency step")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unmeasured seconds before each step")
+    parser.add_argument("--plays", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.5, help="Stub LLM latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.2, help="Stub latency varies by +/- this much")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of stub LLM calls that fail")
+    parser.add_argument("--stub-url", default=None, help="Use a running stub_llm_server instead of starting one")
+    parser.add_argument("--rate-limits", action="store_true", help="Keep per-tier rate limits on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", default=None, help="Write results as JSON")
+    parser.add_argument("--compare", default=None, help="Baseline JSON from an earlier run")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Relative change counted as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=2.0, help="Smallest p95 increase counted as a regression")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="coachgrind-bench-")
+    configure_env(args, workdir, args.stub_url.rstrip("/") if args.stub_url else start_stub(args))
+    results = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+        print(f"\n🏈 Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as source:
+            regressions = compare(results, json.load(source), args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n🏈 {len(regressions)} regression(s): " + "; ".join(regressions))
+            sys.exit(1)
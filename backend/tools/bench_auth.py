@@ -0,0 +1,96 @@
+"""
+Login storm against the auth endpoints, measuring how responsive the event
+loop stays while passwords are being hashed.
+
+    python tools/bench_auth.py --users 50 --logins 400 --concurrency 100
+    python tools/bench_auth.py --inline   # hash on the loop, for comparison
+
+A heartbeat task sleeps 5 ms at a time and records how late it wakes up;
+that lateness is the event-loop lag every other request would see.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+from fastapi import FastAPI
+
+from api import auth_api
+from services.auth_store import AuthStore
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+async def heartbeat(lags, stop: asyncio.Event, interval: float = 0.005):
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def run(args):
+    store = AuthStore(hash_workers=args.workers, sweep_interval=0)
+    if args.inline:
+        # Baseline: hash right on the event loop, as a naive implementation would
+        async def inline(func, *func_args):
+            return func(*func_args)
+        store._run = inline
+
+    app = FastAPI()
+    app.state.auth_store = store
+    app.include_router(auth_api.router, prefix="/api/auth")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for n in range(args.users):
+            await client.post("/api/auth/signup", json={
+                "email": f"coach{n}@example.com", "password": f"pw-{n}", "name": f"Coach {n}"
+            })
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+        latencies = []
+        failures = 0
+
+        async def login(n: int):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post("/api/auth/login", json={
+                    "email": f"coach{n % args.users}@example.com", "password": f"pw-{n % args.users}"
+                })
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    failures += 1
+
+        lags = []
+        stop = asyncio.Event()
+        beat = asyncio.create_task(heartbeat(lags, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*(login(n) for n in range(args.logins)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await beat
+
+    await store.close()
+    mode = "inline" if args.inline else f"{args.workers} hash workers"
+    print(f"🏈 {args.logins} logins ({mode}, concurrency {args.concurrency}) in {elapsed:.2f}s "
+          f"= {args.logins / elapsed:.0f} logins/s, {failures} failed")
+    print(f"   login latency  p50 {percentile(latencies, 50) * 1000:.0f} ms  "
+          f"p95 {percentile(latencies, 95) * 1000:.0f} ms")
+    print(f"   loop lag       p50 {percentile(lags, 50) * 1000:.1f} ms  p99 {percentile(lags, 99) * 1000:.1f} ms  "
+          f"max {max(lags or [0]) * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Login throughput and event-loop lag benchmark")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1))
+    parser.add_argument("--inline", action="store_true", help="Hash on the event loop instead of the pool")
+    asyncio.run(run(parser.parse_args()))
@@ -0,0 +1,256 @@
+"""
+Throughput of the API as uvicorn workers are added, against one shared
+SQLite library and Redis, plus a check that a play saved through one worker
+shows up in every worker's search index.
+
+    python tools/bench_workers.py --workers 1,2,4 --plays 5000 --requests 4000
+    REDIS_URL=redis://localhost:6379/0 python tools/bench_workers.py
+
+Without REDIS_URL a throwaway redis-server is started when one is on the
+PATH. fakeredis can't stand in here: it lives inside one process, and the
+point is several. The load is the CPU-bound read mix (search, similar plays,
+route geometry, diagrams), so scaling tops out at the core count; the load
+generator needs a core of its own too.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+import httpx
+
+from services.play_store import PlayStore
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+LINE = [("LT", 540), ("LG", 570), ("C", 600), ("RG", 630), ("RT", 660)]
+CONCEPTS = ["Mesh", "Smash", "Flood", "Stick", "Dagger", "Levels"]
+ROUTE_TYPES = ["go", "hitch", "out", "dig", "post", "corner", "slant", "curl"]
+WORDS = ["trips", "bunch", "empty", "rt", "lt", "z", "fast", "over", "spot", "china"]
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def synthetic_play(rng: random.Random, n: int) -> dict:
+    side = rng.choice([-1, 1])
+    receivers = [("X", 600 - side * 400), ("Z", 600 + side * 400), ("Y", 600 + side * 300), ("H", 600 + side * 200)]
+    players = [{"id": pid, "x": x, "y": 350} for pid, x in LINE]
+    players.append({"id": "QB", "x": 600, "y": 400})
+    players.append({"id": "RB", "x": 600 + side * 40, "y": 410})
+    routes = []
+    for pid, x in receivers:
+        x += rng.randint(-40, 40)
+        players.append({"id": pid, "x": x, "y": 355})
+        depth = 350 - rng.randint(5, 18) * 10
+        cut = x + rng.choice([-1, 1]) * rng.randint(0, 30) * 10
+        route_type = rng.choice(ROUTE_TYPES)
+        routes.append({
+            "from_player": pid,
+            "path": f"M {x} 355 L {x} {depth} L {cut} {depth - rng.randint(0, 8) * 10}",
+            "label": route_type.title(),
+            "route_type": route_type
+        })
+    return {
+        "name": f"{' '.join(rng.sample(WORDS, 3)).title()} {n}",
+        "formation": rng.choice(["Gun Trips", "Gun Bunch", "Empty", "Pistol Ace"]),
+        "personnel": rng.choice(["10", "11", "12", "21"]),
+        "concept": rng.choice(CONCEPTS),
+        "players": players,
+        "routes": routes
+    }
+
+def seed(path: str, count: int, rng: random.Random):
+    store = PlayStore(path)
+    records = [(synthetic_play(rng, n), "offense", [], f"bench_{n}") for n in range(count)]
+    for start in range(0, count, 1000):
+        store.save_plays(records[start:start + 1000])
+    store.close()
+
+def start_redis():
+    if not shutil.which("redis-server"):
+        return None, None
+    port = free_port()
+    process = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    time.sleep(0.5)
+    return process, f"redis://127.0.0.1:{port}/0"
+
+def start_server(workers: int, port: int, env: dict, log_path: str) -> subprocess.Popen:
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "info", "--no-access-log"],
+        cwd=BACKEND_DIR, env={**env, "WEB_CONCURRENCY": str(workers)}, stdout=log, stderr=subprocess.STDOUT
+    )
+    # Every worker logs its own startup line once its lifespan has finished
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        with open(log_path) as source:
+            if source.read().count("Application startup complete") >= workers:
+                return process
+        if process.poll() is not None:
+            break
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{workers} worker(s) did not start, see {log_path}")
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+def request_mix(rng: random.Random, plays: int):
+    play_id = f"bench_{rng.randrange(plays)}"
+    roll = rng.random()
+    if roll < 0.35:
+        return "GET", f"/api/plays/search?q={'+'.join(rng.sample(WORDS, 2))}"
+    if roll < 0.6:
+        return "GET", f"/api/plays/{play_id}/similar?limit=10"
+    if roll < 0.8:
+        return "GET", f"/api/plays/{play_id}/geometry"
+    return "GET", f"/api/plays/{play_id}/diagram.svg"
+
+async def load(base_url: str, args, rng: random.Random):
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies = []
+    failures = 0
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        async def one(method: str, url: str):
+            nonlocal failures
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, url)
+                    if response.status_code != 200:
+                        failures += 1
+                except httpx.HTTPError:
+                    failures += 1
+                latencies.append(time.perf_counter() - started)
+
+        requests = [request_mix(rng, args.plays) for _ in range(args.requests)]
+        # Warm every worker's caches before timing
+        await asyncio.gather(*(one(*request) for request in requests[:args.concurrency * 4]))
+        latencies.clear()
+        failures = 0
+        started = time.perf_counter()
+        await asyncio.gather(*(one(*request) for request in requests))
+        elapsed = time.perf_counter() - started
+    return args.requests / elapsed, latencies, failures
+
+async def propagation(base_url: str, rng: random.Random, probes: int = 40, timeout: float = 5.0):
+    """
+    Save a play through one worker, then search for it on fresh connections
+    (spread over the workers by the kernel) until every probe finds it
+    """
+    marker = f"zz{rng.randrange(16 ** 8):08x}"
+    play = synthetic_play(rng, 0)
+    play["name"] = f"Propagation {marker}"
+    async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+        response = await client.post("/api/plays/save", json={"play": play, "category": "offense", "tags": []})
+        response.raise_for_status()
+    saved_at = time.perf_counter()
+
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        while time.perf_counter() - saved_at < timeout:
+            responses = await asyncio.gather(*(client.get(f"/api/plays/search?q={marker}") for _ in range(probes)))
+            found = sum(1 for r in responses if r.status_code == 200 and r.json().get("results"))
+            if found == probes:
+                return time.perf_counter() - saved_at, found, probes
+            await asyncio.sleep(0.05)
+    return None, found, probes
+
+def run(args):
+    rng = random.Random(args.seed)
+    workdir = tempfile.mkdtemp(prefix="coachgrind-bench-")
+    db_path = os.path.join(workdir, "bench.db")
+    print(f"🏈 Seeding {args.plays} plays into {db_path}")
+    seed(db_path, args.plays, rng)
+
+    redis_process = None
+    redis_url = args.redis_url
+    if not redis_url:
+        redis_process, redis_url = start_redis()
+    if not redis_url:
+        print("   No REDIS_URL and no redis-server on the PATH: workers won't see each other's writes")
+
+    env = {
+        **os.environ,
+        "COACHGRIND_DB_PATH": db_path,
+        "EXPORT_DIR": os.path.join(workdir, "exports"),
+        "RATE_LIMITS_ENABLED": "false",
+        "CATALOG_RELOAD_INTERVAL_SECONDS": "0",
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench")
+    }
+    if redis_url:
+        env["REDIS_URL"] = redis_url
+    else:
+        env.pop("REDIS_URL", None)
+
+    results = []
+    try:
+        for workers in args.workers:
+            port = free_port()
+            server = start_server(workers, port, env, os.path.join(workdir, f"uvicorn-{workers}.log"))
+            try:
+                base_url = f"http://127.0.0.1:{port}"
+                throughput, latencies, failures = asyncio.run(load(base_url, args, rng))
+                seen = asyncio.run(propagation(base_url, rng)) if redis_url or workers == 1 else None
+            finally:
+                stop_server(server)
+            results.append((workers, throughput, latencies, failures, seen))
+            print(f"   {workers} worker(s): {throughput:.0f} req/s")
+    finally:
+        if redis_process is not None:
+            redis_process.terminate()
+
+    baseline = results[0][1] / results[0][0]
+    print(f"\n🏈 {args.requests} requests, concurrency {args.concurrency}, {args.plays} plays, "
+          f"{os.cpu_count()} CPUs, redis: {'yes' if redis_url else 'no'}")
+    print(f"   {'workers':>7} {'req/s':>8} {'speedup':>8} {'eff':>5} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} "
+          f"{'failed':>6}  propagation")
+    for workers, throughput, latencies, failures, seen in results:
+        if seen is None:
+            visible = "skipped (no redis)"
+        elif seen[0] is None:
+            visible = f"{seen[1]}/{seen[2]} probes after 5s"
+        else:
+            visible = f"{seen[0] * 1000:.0f} ms"
+        print(f"   {workers:>7} {throughput:>8.0f} {throughput / results[0][1]:>7.2f}x "
+              f"{throughput / (baseline * workers):>5.0%} {percentile(latencies, 50) * 1000:>7.1f} "
+              f"{percentile(latencies, 95) * 1000:>7.1f} {percentile(latencies, 99) * 1000:>7.1f} "
+              f"{failures:>6}  {visible}")
+    if not args.keep:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Multi-worker throughput scaling benchmark")
+    parser.add_argument("--workers", type=lambda s: [int(n) for n in s.split(",")],
+                        default=[n for n in (1, 2, 4, 8) if n <= max(1, os.cpu_count() or 1)])
+    parser.add_argument("--plays", type=int, default=5000)
+    parser.add_argument("--requests", type=int, default=4000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--redis-url", default=os.getenv("REDIS_URL"))
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--keep", action="store_true", help="Keep the temp database and uvicorn logs")
+    run(parser.parse_args())
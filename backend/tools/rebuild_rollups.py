@@ -0,0 +1,29 @@
+"""
+Recompute the outcome analytics rollups from play_outcomes, e.g. after
+backfilling old games straight into the database.
+
+    python tools/rebuild_rollups.py
+    COACHGRIND_DB_PATH=/data/coachgrind.db python tools/rebuild_rollups.py
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from services.catalog_registry import CatalogRegistry
+from services.outcome_analytics import OutcomeAnalytics
+from services.play_store import PlayStore
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild outcome analytics rollups")
+    parser.add_argument("--db", default=None, help="SQLite path (defaults to COACHGRIND_DB_PATH)")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    store = PlayStore(args.db)
+    started = time.perf_counter()
+    processed = OutcomeAnalytics(store, CatalogRegistry(reload_interval=0)).rebuild(args.batch_size)
+    store.close()
+    print(f"🏈 Rebuilt rollups from {processed} outcomes in {time.perf_counter() - started:.2f}s")
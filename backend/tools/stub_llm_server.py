@@ -0,0 +1,291 @@
+"""
+Local stand-in for the OpenAI chat-completions and Anthropic messages endpoints.
+
+Run it and point the backend at it:
+
+    python tools/stub_llm_server.py --port 9009 --latency 3.0
+    python tools/stub_llm_server.py --latency 1.5 --jitter 0.5 --error-rate 0.02
+    OPENAI_BASE_URL=http://127.0.0.1:9009/v1 OPENAI_API_KEY=stub uvicorn main:app
+    LLM_PROVIDER=anthropic ANTHROPIC_BASE_URL=http://127.0.0.1:9009 ANTHROPIC_API_KEY=stub uvicorn main:app
+
+Usage is reported with a rough 4-characters-per-token estimate, and a system
+prompt seen before is reported as cached the way the real prefix caches do
+(1024-token minimum, 128-token steps), so token accounting can be checked
+without an API key. --jitter spreads each response's latency uniformly over
+latency +/- jitter, and --error-rate answers that share of calls with a 500
+in the provider's error format, to exercise retries and failover.
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+import argparse
+import asyncio
+import json
+import random
+import time
+import uvicorn
+
+app = FastAPI(title="Stub LLM")
+app.state.latency = 0.0
+app.state.jitter = 0.0
+app.state.error_rate = 0.0
+app.state.seen_prefixes = set()
+app.state.counters = {"requests": 0, "errors": 0}
+
+MIN_CACHED_TOKENS = 1024
+
+STUB_ANALYSIS = {
+    "whenToCall": ["3rd and medium", "Red zone", "2-minute drill"],
+    "bestAgainst": ["Cover 3", "Man coverage"],
+    "strengths": ["Quick read for the QB", "Stresses underneath defenders"],
+    "weaknesses": ["Vulnerable to interior pressure"],
+    "coachingPoints": ["Win leverage off the line", "Settle in open windows"],
+    "qbProgression": ["Pre-snap: ID the Mike", "Read 1: shallow", "Read 2: dig", "Checkdown: RB"],
+    "adjustments": {
+        "vsMan": "Convert crossers to rub routes",
+        "vsZone": "Sit in the window",
+        "vsBlitz": "Hot to the slot"
+    },
+    "redZone": "Compress splits and work the back line",
+    "keyMatchups": ["Slot vs nickel", "X vs boundary corner"]
+}
+
+STUB_PLAY = {
+    "name": "Stub Trips Right Mesh",
+    "formation": "Gun Trips Right",
+    "personnel": "11",
+    "concept": "Mesh",
+    "players": [
+        {"id": "QB", "x": 600, "y": 450},
+        {"id": "RB", "x": 640, "y": 500},
+        {"id": "X", "x": 220, "y": 340},
+        {"id": "Z", "x": 900, "y": 340},
+        {"id": "Y", "x": 760, "y": 350},
+        {"id": "F", "x": 980, "y": 320}
+    ],
+    "routes": [
+        {"from": "X", "routeType": "shallow", "path": "M 220 340 L 260 300 L 700 300", "label": "Mesh"},
+        {"from": "Z", "routeType": "shallow", "path": "M 900 340 L 860 310 L 400 310", "label": "Mesh"}
+    ],
+    "blocking": {"scheme": "Half-Slide Right", "assignments": {"RB": "Scan Mike to Will"}},
+    "description": "Stub play returned by the local LLM server",
+    "coachingNotes": "Avoid the illegal pick at the mesh point"
+}
+
+STUB_COUNTERS = {
+    "plays": [
+        {
+            "playName": "Mesh",
+            "formation": "Gun Trips Right",
+            "concept": "Mesh",
+            "reasoning": "Crossers beat man leverage",
+            "keyPoints": ["Win at the mesh point", "QB reads shallow to sit"]
+        }
+    ]
+}
+
+def configure(latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0):
+    """
+    Set the simulated provider behaviour (also used when embedded by the benchmarks)
+    """
+    app.state.latency = latency
+    app.state.jitter = jitter
+    app.state.error_rate = error_rate
+
+def _latency() -> float:
+    return max(0.0, app.state.latency + random.uniform(-app.state.jitter, app.state.jitter))
+
+def _failure(anthropic: bool = False):
+    """
+    An injected provider error for this call, or None
+    """
+    app.state.counters["requests"] += 1
+    if app.state.error_rate <= 0 or random.random() >= app.state.error_rate:
+        return None
+    app.state.counters["errors"] += 1
+    if anthropic:
+        body = {"type": "error", "error": {"type": "api_error", "message": "Injected stub error"}}
+    else:
+        body = {"error": {"message": "Injected stub error", "type": "server_error", "code": None}}
+    return JSONResponse(body, status_code=500)
+
+def _pick_content(messages) -> dict:
+    prompt = " ".join(str(m.get("content", "")) for m in messages)
+    if "Generate a complete football play" in prompt:
+        return STUB_PLAY
+    if "Suggest 5 effective plays" in prompt:
+        return STUB_COUNTERS
+    return STUB_ANALYSIS
+
+def _tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+def _usage(system: str, prompt: str, content: str) -> dict:
+    """
+    Estimated token counts; cached is the share of the prompt served from the prefix cache
+    """
+    system_tokens = _tokens(system) if system else 0
+    cached = 0
+    if system_tokens >= MIN_CACHED_TOKENS:
+        if system in app.state.seen_prefixes:
+            cached = system_tokens // 128 * 128
+        app.state.seen_prefixes.add(system)
+    return {"input": system_tokens + _tokens(prompt), "output": _tokens(content), "cached": cached}
+
+def _openai_usage(messages, content: str) -> dict:
+    system = " ".join(str(m.get("content", "")) for m in messages if m.get("role") == "system")
+    prompt = " ".join(str(m.get("content", "")) for m in messages if m.get("role") != "system")
+    usage = _usage(system, prompt, content)
+    return {
+        "prompt_tokens": usage["input"],
+        "completion_tokens": usage["output"],
+        "total_tokens": usage["input"] + usage["output"],
+        "prompt_tokens_details": {"cached_tokens": usage["cached"]}
+    }
+
+def _stream_chunks(model: str, content: str, latency: float, usage: dict = None, chunk_size: int = 24):
+    """
+    Emit the content as chat.completion.chunk SSE events spread over the latency
+    """
+    pieces = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+    delay = latency / max(len(pieces), 1)
+
+    async def events():
+        for piece in pieces:
+            await asyncio.sleep(delay)
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        if usage is not None:
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    failure = _failure()
+    if failure is not None:
+        return failure
+    messages = body.get("messages", [])
+    content = json.dumps(_pick_content(messages))
+    usage = _openai_usage(messages, content)
+    if body.get("stream"):
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        return _stream_chunks(body.get("model", "stub"), content, _latency(), usage if include_usage else None)
+
+    await asyncio.sleep(_latency())
+    return {
+        "id": f"chatcmpl-stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": usage
+    }
+
+def _system_text(system) -> str:
+    if isinstance(system, list):
+        return " ".join(block.get("text", "") for block in system)
+    return system or ""
+
+def _message_text(content) -> str:
+    if isinstance(content, list):
+        return " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+    return str(content or "")
+
+@app.post("/v1/messages")
+async def messages(request: Request):
+    body = await request.json()
+    failure = _failure(anthropic=True)
+    if failure is not None:
+        return failure
+    system = _system_text(body.get("system"))
+    prompt = " ".join(_message_text(m.get("content")) for m in body.get("messages", []))
+    content = json.dumps(_pick_content([{"content": system}, {"content": prompt}]))
+    # The client prefills "{", so the reply continues after it
+    if prompt.endswith("{"):
+        content = content[1:]
+    cache_marked = isinstance(body.get("system"), list) and any("cache_control" in b for b in body["system"])
+    written = 0
+    if cache_marked:
+        estimate = _usage(system, prompt, content)
+        system_tokens = estimate["input"] - _tokens(prompt)
+        if not estimate["cached"] and system_tokens >= MIN_CACHED_TOKENS:
+            written = system_tokens
+    else:
+        estimate = _usage("", f"{system} {prompt}", content)
+    cached = estimate["cached"]
+    usage = {
+        "input_tokens": estimate["input"] - cached - written,
+        "output_tokens": estimate["output"],
+        "cache_creation_input_tokens": written,
+        "cache_read_input_tokens": cached
+    }
+    model = body.get("model", "stub")
+    message_id = f"msg_stub_{time.time_ns()}"
+
+    if body.get("stream"):
+        pieces = [content[i:i + 24] for i in range(0, len(content), 24)]
+        delay = _latency() / max(len(pieces), 1)
+
+        async def events():
+            def event(name: str, data: dict) -> str:
+                return f"event: {name}\ndata: {json.dumps({'type': name, **data})}\n\n"
+            yield event("message_start", {"message": {
+                "id": message_id, "type": "message", "role": "assistant", "model": model, "content": [],
+                "stop_reason": None, "stop_sequence": None, "usage": {**usage, "output_tokens": 1}
+            }})
+            yield event("content_block_start", {"index": 0, "content_block": {"type": "text", "text": ""}})
+            for piece in pieces:
+                await asyncio.sleep(delay)
+                yield event("content_block_delta", {"index": 0, "delta": {"type": "text_delta", "text": piece}})
+            yield event("content_block_stop", {"index": 0})
+            yield event("message_delta", {
+                "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                "usage": {"output_tokens": usage["output_tokens"]}
+            })
+            yield event("message_stop", {})
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    await asyncio.sleep(_latency())
+    return {
+        "id": message_id,
+        "type": "message",
+        "role": "assistant",
+        "model": model,
+        "content": [{"type": "text", "text": content}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": usage
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI / Anthropic LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9009)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds to wait before responding")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Latency varies uniformly by +/- this many seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of calls answered with a 500")
+    args = parser.parse_args()
+
+    configure(args.latency, args.jitter, args.error_rate)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -144,15 +144,7 @@ export default function App() {
       setPlayAnalysis(analysis);
     } catch (error) {
       console.error("Failed to analyze play:", error);
-      // Use default analysis if API fails
-      setPlayAnalysis({
-        whenToCall: ["3rd and medium", "Red zone", "2-minute drill"],
-        bestAgainst: ["Cover 2", "Man coverage", "Blitz packages"],
-        strengths: ["Multiple options", "Quick developing", "Hard to defend"],
-        weaknesses: ["Needs pass protection", "Vulnerable to zone drops"],
-        coachingPoints: ["Set proper spacing", "Time the mesh", "Check protection"],
-        qbProgression: ["Pre-snap read", "Mesh concept", "Corner route", "Checkdown"]
-      });
+      alert("Play analysis is unavailable right now. Please try again shortly.");
     } finally {
       setIsAnalyzing(false);
     }
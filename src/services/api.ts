@@ -98,6 +98,77 @@ class CoachGrindAPI {
     return result.play;
   }
 
+  // Streaming variants: onField fires for each top-level field as the server parses it
+  async streamAnalyzePlay(
+    playName: string,
+    formation: string,
+    personnel: string,
+    routes: any[],
+    onField: (key: keyof PlayAnalysis, value: any) => void,
+    concept?: string
+  ): Promise<PlayAnalysis> {
+    return this.streamEvents('/analysis/analyze/stream', {
+      play_name: playName,
+      formation,
+      personnel,
+      routes,
+      concept,
+    }, onField);
+  }
+
+  async streamGeneratePlay(
+    description: string,
+    onField: (key: keyof GeneratedPlay, value: any) => void
+  ): Promise<GeneratedPlay> {
+    return this.streamEvents('/analysis/generate/stream', { description }, onField);
+  }
+
+  private async streamEvents(
+    endpoint: string,
+    body: any,
+    onField: (key: any, value: any) => void
+  ): Promise<any> {
+    const headers: HeadersInit = { 'Content-Type': 'application/json' };
+    if (this.token) {
+      headers['Authorization'] = `Bearer ${this.token}`;
+    }
+
+    const response = await fetch(`${API_BASE_URL}${endpoint}`, {
+      method: 'POST',
+      headers,
+      body: JSON.stringify(body),
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`API error: ${response.statusText}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary = buffer.indexOf('\n\n');
+      while (boundary !== -1) {
+        const raw = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+        boundary = buffer.indexOf('\n\n');
+
+        const event = raw.match(/^event: (.*)$/m)?.[1];
+        const data = raw.match(/^data: (.*)$/m)?.[1];
+        if (!event || data === undefined) continue;
+
+        const payload = JSON.parse(data);
+        if (event === 'field') onField(payload.key, payload.value);
+        if (event === 'done') return payload;
+        if (event === 'error') throw new Error(`API error: ${payload.detail}`);
+      }
+    }
+    throw new Error('API error: stream ended early');
+  }
+
   async suggestCounterPlays(defensiveScheme: string): Promise<any[]> {
     const result = await this.request('/analysis/suggest-counters', {
       method: 'POST',
@@ -107,9 +178,18 @@ class CoachGrindAPI {
   }
 
   // Play management endpoints
+  // The list endpoint is paged; follow next_cursor until the last page
   async getAllPlays(): Promise<any[]> {
-    const result = await this.request('/plays/');
-    return result.plays;
+    const plays: any[] = [];
+    let cursor: string | null = null;
+    do {
+      const params = new URLSearchParams({ limit: '1000' });
+      if (cursor) params.set('cursor', cursor);
+      const result = await this.request(`/plays/?${params}`);
+      plays.push(...result.plays);
+      cursor = result.next_cursor;
+    } while (cursor);
+    return plays;
   }
 
   async getPlay(playId: string): Promise<any> {
@@ -117,18 +197,61 @@ class CoachGrindAPI {
     return result.play;
   }
 
+  async searchPlays(query: string, limit: number = 20, category?: string): Promise<any[]> {
+    const params = new URLSearchParams({ q: query, limit: String(limit) });
+    if (category) params.set('category', category);
+    const result = await this.request(`/plays/search?${params}`);
+    return result.results;
+  }
+
+  async suggestSearchTerms(query: string): Promise<string[]> {
+    const result = await this.request(`/plays/search/suggest?q=${encodeURIComponent(query)}`);
+    return result.suggestions;
+  }
+
+  // Usable directly as an <img src>; the server answers 304 when unchanged
+  getPlayDiagramUrl(playId: string, size: 'full' | 'thumb' = 'full'): string {
+    return `${API_BASE_URL}/plays/${playId}/diagram.svg?size=${size}`;
+  }
+
+  async getThumbnails(playIds: string[]): Promise<Record<string, { etag: string; svg: string }>> {
+    const result = await this.request('/plays/thumbnails', {
+      method: 'POST',
+      body: JSON.stringify({ play_ids: playIds }),
+    });
+    return result.thumbnails;
+  }
+
   async savePlay(
     play: any,
     category: string = 'offense',
-    tags: string[] = []
+    tags: string[] = [],
+    playId?: string
   ): Promise<string> {
     const result = await this.request('/plays/save', {
       method: 'POST',
-      body: JSON.stringify({ play, category, tags }),
+      body: JSON.stringify({ play, category, tags, play_id: playId }),
     });
     return result.play_id;
   }
 
+  // Bulk import an NDJSON or Hudl CSV file; returns counts and errors by line
+  async importPlays(
+    file: Blob,
+    format: 'ndjson' | 'csv' = 'ndjson',
+    options: { category?: string; tags?: string[]; dryRun?: boolean } = {}
+  ): Promise<any> {
+    const params = new URLSearchParams({ format });
+    if (options.category) params.set('category', options.category);
+    if (options.tags?.length) params.set('tags', options.tags.join(','));
+    if (options.dryRun) params.set('dry_run', 'true');
+    return this.request(`/plays/import?${params}`, {
+      method: 'POST',
+      headers: { 'Content-Type': format === 'csv' ? 'text/csv' : 'application/x-ndjson' },
+      body: file,
+    });
+  }
+
   async deletePlay(playId: string): Promise<void> {
     await this.request(`/plays/${playId}`, {
       method: 'DELETE',
@@ -145,6 +268,24 @@ class CoachGrindAPI {
     return result.concepts;
   }
 
+  // Formation rules: positions is {playerId: {x, y, onLOS, eligible}}
+  async validateFormations(
+    formations: Array<{ positions: Record<string, any> }>
+  ): Promise<Array<{ valid: boolean; violations: string[]; warnings: string[] }>> {
+    const result = await this.request('/formations/validate-batch', {
+      method: 'POST',
+      body: JSON.stringify({ formations }),
+    });
+    return result.results;
+  }
+
+  async saveCustomFormation(formation: any, formationId?: string): Promise<any> {
+    return this.request('/formations/save', {
+      method: 'POST',
+      body: JSON.stringify({ ...formation, formation_id: formationId }),
+    });
+  }
+
   // Playbook endpoints
   async getPlaybooks(): Promise<any[]> {
     const result = await this.request('/playbook/');
@@ -188,9 +329,91 @@ class CoachGrindAPI {
     return result.sheets;
   }
 
-  async exportPlaybook(playbookId: string, format: string = 'pdf'): Promise<any> {
-    const result = await this.request(`/playbook/export/${playbookId}?format=${format}`);
-    return result;
+  // Returns the file, or a background job (see getExportJob) for large playbooks
+  async exportPlaybook(
+    playbookId: string,
+    format: 'pdf' | 'zip' = 'pdf'
+  ): Promise<{ file?: Blob; job?: any }> {
+    const headers: HeadersInit = {};
+    if (this.token) {
+      headers['Authorization'] = `Bearer ${this.token}`;
+    }
+    const response = await fetch(
+      `${API_BASE_URL}/playbook/export/${playbookId}?format=${format}`,
+      { headers }
+    );
+    if (!response.ok) {
+      throw new Error(`API error: ${response.statusText}`);
+    }
+    if (response.status === 202) {
+      return { job: (await response.json()).job };
+    }
+    return { file: await response.blob() };
+  }
+
+  async startExportJob(playbookId: string, format: 'pdf' | 'zip' = 'pdf'): Promise<any> {
+    const result = await this.request(`/playbook/export/${playbookId}/jobs?format=${format}`, {
+      method: 'POST',
+    });
+    return result.job;
+  }
+
+  // job.state is queued, running, done, failed or cancelled; done/total track progress
+  async getExportJob(jobId: string): Promise<any> {
+    const result = await this.request(`/playbook/export/jobs/${jobId}`);
+    return result.job;
+  }
+
+  getExportDownloadUrl(jobId: string): string {
+    return `${API_BASE_URL}/playbook/export/jobs/${jobId}/download`;
+  }
+
+  // Game plan endpoints
+  async logOutcomes(outcomes: any[]): Promise<string[]> {
+    const result = await this.request('/gameplan/outcomes', {
+      method: 'POST',
+      body: JSON.stringify({ outcomes }),
+    });
+    return result.outcome_ids;
+  }
+
+  async saveOpponentTendencies(tendencies: any): Promise<void> {
+    await this.request('/gameplan/opponents', {
+      method: 'POST',
+      body: JSON.stringify(tendencies),
+    });
+  }
+
+  async recommendPlays(situation: {
+    down?: number;
+    distance?: number;
+    field_position?: string;
+    hash?: string;
+    opponent?: string;
+    coverages?: Record<string, number>;
+    limit?: number;
+  }): Promise<any[]> {
+    const result = await this.request('/gameplan/recommend', {
+      method: 'POST',
+      body: JSON.stringify(situation),
+    });
+    return result.plays;
+  }
+
+  // level is 'play', 'concept' or 'formation'; start/end are YYYY-MM-DD
+  async getOutcomeAnalytics(
+    level: string,
+    key: string,
+    start?: string,
+    end?: string
+  ): Promise<any> {
+    const params = new URLSearchParams();
+    if (start) params.set('start', start);
+    if (end) params.set('end', end);
+    const result = await this.request(
+      `/gameplan/analytics/${level}/${encodeURIComponent(key)}?${params}`
+    );
+    return result.analytics;
   }
 
   // Auth endpoints
@@ -7,11 +7,13 @@ echo "Cleaning up old processes..."
 lsof -ti:8080 | xargs -r kill -9 2>/dev/null
 lsof -ti:8002 | xargs -r kill -9 2>/dev/null
 
-# Start backend
-echo "Starting backend API on port 8002..."
+# Start backend (WEB_CONCURRENCY > 1 runs several workers; set REDIS_URL so
+# they share sessions, rate limits and cache invalidation)
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-1}
+echo "Starting backend API on port 8002 with $WEB_CONCURRENCY worker(s)..."
 cd /root/coach-grind/backend
 source venv/bin/activate
-nohup uvicorn main:app --host 0.0.0.0 --port 8002 > backend.log 2>&1 &
+nohup uvicorn main:app --host 0.0.0.0 --port 8002 --workers $WEB_CONCURRENCY > backend.log 2>&1 &
 BACKEND_PID=$!
 echo "Backend started with PID: $BACKEND_PID"
 